@@ -5,7 +5,10 @@ import sys
 # Add the root directory to sys.path so 'app' can be imported
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Vercel Serverless Function entrypoint for Flask
-from app import create_app
+# Vercel Serverless Function entrypoint for Flask.  ServerlessConfig skips
+# schema creation once done; NumPy/onnxruntime/NLTK load on the first
+# prediction rather than at import time.
+from app import create_app  # noqa: E402
+from app.config import ServerlessConfig  # noqa: E402
 
-app = create_app()
+app = create_app(ServerlessConfig)
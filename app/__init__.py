@@ -1,5 +1,9 @@
 from __future__ import annotations
 
+import hashlib
+import os
+from pathlib import Path
+
 from flask import Flask
 
 from .config import Config, get_config
@@ -19,15 +23,84 @@ def create_app(config_class: type[Config] | None = None) -> Flask:
     db.init_app(app)
     csrf.init_app(app)
 
-    from .routes import main_bp  # noqa: WPS433 (import within function)
+    from . import caching, profiling  # noqa: WPS433 (import within function)
+    from .routes import main_bp  # noqa: WPS433
 
     app.register_blueprint(main_bp)
+    caching.init_app(app)
+    profiling.init_app(app)
 
     with app.app_context():
         # Ensure models are imported so that SQLAlchemy sees them
         from . import models  # noqa: F401,WPS433
 
-        # Create tables if they do not yet exist (useful for local/dev setups).
-        db.create_all()
+        # Apply pending schema migrations (normally a single version check).
+        _ensure_schema(app)
+
+        if app.config.get("MODEL_PINNED_VERSIONS"):
+            _preload_models(app)
 
     return app
+
+
+def _ensure_schema(app: Flask) -> None:
+    """Bring the database schema up to date with a single version check.
+
+    The common case is one ``SELECT`` against ``schema_version``.  With
+    ``SCHEMA_STAMP_PATH`` set, even that is skipped once the stamp records the
+    current database and schema version.  The stamp holds a SHA-256 digest of
+    the database URI rather than the URI itself, which may carry a password.
+    """
+
+    from . import migrations  # noqa: WPS433
+
+    stamp_path = app.config.get("SCHEMA_STAMP_PATH")
+    uri_digest = hashlib.sha256(
+        app.config["SQLALCHEMY_DATABASE_URI"].encode("utf-8")
+    ).hexdigest()
+    stamp_value = f"{uri_digest}#{migrations.HEAD}"
+    if stamp_path:
+        try:
+            if Path(stamp_path).read_text(encoding="utf-8") == stamp_value:
+                return
+        except OSError:
+            pass
+
+    version = migrations.current_version(db.engine)
+    if version < migrations.HEAD:
+        if not app.config.get("SCHEMA_AUTO_MIGRATE", True):
+            app.logger.warning(
+                "Database schema is at version %s, expected %s. "
+                "Run scripts/migrate_db.py.",
+                version,
+                migrations.HEAD,
+            )
+            return
+        migrations.upgrade(db.engine)
+
+    if stamp_path:
+        try:
+            _write_stamp(stamp_path, stamp_value)
+        except OSError:
+            # A read-only filesystem only costs us the optimization.
+            pass
+
+
+def _write_stamp(path: str, value: str) -> None:
+    # Owner-only, also when an older stamp was created with wider permissions.
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as stamp:
+        os.fchmod(stamp.fileno(), 0o600)
+        stamp.write(value)
+
+
+def _preload_models(app: Flask) -> None:
+    """Load pinned model versions now so their first requests don't pay for it."""
+
+    from .registry import get_registry  # noqa: WPS433 (import within function)
+
+    failed = get_registry().preload()
+    if failed:
+        app.logger.warning(
+            "Pinned model versions could not be loaded: %s", ", ".join(failed)
+        )
@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Mapping
+
+from flask import current_app
+
+from . import metrics
+
+DEADLINE_HEADER = "X-Request-Deadline"
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request arrives after its client-supplied deadline."""
+
+
+class Overloaded(Exception):
+    """Raised when the concurrency limit is reached and a request is shed."""
+
+    def __init__(self, retry_after: int = 1) -> None:
+        super().__init__("Server is overloaded.")
+        self.retry_after = retry_after
+
+
+class AdaptiveLimiter:
+    """Concurrency limit for the inference path that adapts to measured latency.
+
+    Two controllers are supported:
+
+    * ``"aimd"`` – additive increase while latency stays under
+      ``latency_target_ms``, multiplicative decrease (``backoff``) above it.
+    * ``"gradient"`` – compares a slow moving average of latency (the
+      uncongested baseline) with the latest sample and scales the limit by
+      their ratio, plus ``sqrt(limit)`` of headroom for queueing.
+
+    The limiter never blocks: :meth:`try_acquire` either admits a request or
+    reports that it should be shed.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        algorithm: str = "gradient",
+        latency_target_ms: float = 250.0,
+        backoff: float = 0.9,
+        tolerance: float = 2.0,
+        smoothing: float = 0.2,
+        long_window: int = 600,
+    ) -> None:
+        if algorithm not in {"aimd", "gradient"}:
+            raise ValueError(f"Unknown admission algorithm: {algorithm!r}")
+
+        self.algorithm = algorithm
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.latency_target = latency_target_ms / 1000.0
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self._long_alpha = 2.0 / (long_window + 1)
+
+        self._lock = threading.Lock()
+        self._limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self._inflight = 0
+        self._long_rtt: float | None = None
+        self._last_rtt: float | None = None
+
+        self.admitted = 0
+        self.shed = 0
+        self.expired = 0
+        self.errors = 0
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
+
+    def try_acquire(self) -> bool:
+        """Reserve a slot; return ``False`` if the request should be shed."""
+
+        with self._lock:
+            if self._inflight >= int(self._limit):
+                self.shed += 1
+                return False
+            self._inflight += 1
+            self.admitted += 1
+            return True
+
+    def release(self, latency: float, failed: bool = False) -> None:
+        """Free a slot and feed the observed *latency* (seconds) to the controller."""
+
+        with self._lock:
+            inflight = self._inflight
+            self._inflight = max(0, inflight - 1)
+            self._last_rtt = latency
+            if failed:
+                self.errors += 1
+
+            if self.algorithm == "aimd":
+                self._update_aimd(latency, inflight, failed)
+            else:
+                self._update_gradient(latency, inflight)
+
+    def record_expired(self) -> None:
+        with self._lock:
+            self.expired += 1
+
+    def _update_aimd(self, latency: float, inflight: int, failed: bool) -> None:
+        if failed or latency > self.latency_target:
+            new_limit = self._limit * self.backoff
+        elif inflight * 2 >= self._limit:
+            new_limit = self._limit + 1
+        else:
+            return
+        self._limit = min(max(new_limit, self.min_limit), self.max_limit)
+
+    def _update_gradient(self, latency: float, inflight: int) -> None:
+        if self._long_rtt is None:
+            self._long_rtt = latency
+        else:
+            self._long_rtt += self._long_alpha * (latency - self._long_rtt)
+            # Let the baseline recover quickly after a sustained slowdown so we
+            # don't stay pinned to an inflated "normal" latency.
+            if self._long_rtt > 2 * latency:
+                self._long_rtt *= 0.95
+
+        # Don't grow the limit when the server isn't using it.
+        if inflight < self._limit / 2:
+            return
+
+        short_rtt = max(latency, 1e-6)
+        gradient = max(0.5, min(1.0, self.tolerance * self._long_rtt / short_rtt))
+        new_limit = self._limit * gradient + math.sqrt(self._limit)
+        new_limit = self._limit * (1 - self.smoothing) + new_limit * self.smoothing
+        self._limit = min(max(new_limit, self.min_limit), self.max_limit)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "active": True,
+                "algorithm": self.algorithm,
+                "limit": int(self._limit),
+                "inflight": self._inflight,
+                "admitted": self.admitted,
+                "shed": self.shed,
+                "expired": self.expired,
+                "errors": self.errors,
+                "last_latency_ms": None
+                if self._last_rtt is None
+                else self._last_rtt * 1000,
+                "baseline_latency_ms": None
+                if self._long_rtt is None
+                else self._long_rtt * 1000,
+            }
+
+
+_LIMITER: AdaptiveLimiter | None = None
+_EXPIRED_WITHOUT_LIMITER = 0
+
+
+def get_limiter() -> AdaptiveLimiter | None:
+    """Return the process-wide limiter, creating it from app config on first use."""
+
+    global _LIMITER
+
+    if not current_app.config.get("ADMISSION_ENABLED", True):
+        return None
+
+    if _LIMITER is None:
+        cfg = current_app.config
+        _LIMITER = AdaptiveLimiter(
+            initial_limit=cfg.get("ADMISSION_INITIAL_LIMIT", 8),
+            min_limit=cfg.get("ADMISSION_MIN_LIMIT", 1),
+            max_limit=cfg.get("ADMISSION_MAX_LIMIT", 64),
+            algorithm=cfg.get("ADMISSION_ALGORITHM", "gradient"),
+            latency_target_ms=cfg.get("ADMISSION_LATENCY_TARGET_MS", 250.0),
+        )
+    return _LIMITER
+
+
+def parse_deadline(headers: Mapping[str, str]) -> float | None:
+    """Return the absolute deadline (epoch seconds) sent by the client, if any.
+
+    The ``X-Request-Deadline`` header carries Unix time in milliseconds.
+    Malformed values are ignored rather than failing the request.
+    """
+
+    raw = headers.get(DEADLINE_HEADER)
+    if not raw:
+        return None
+    try:
+        return float(raw) / 1000.0
+    except ValueError:
+        return None
+
+
+def check_deadline(deadline: float | None) -> None:
+    """Raise :class:`DeadlineExceeded` if *deadline* has already passed."""
+
+    global _EXPIRED_WITHOUT_LIMITER
+
+    if deadline is None or time.time() < deadline:
+        return
+
+    limiter = get_limiter()
+    if limiter is not None:
+        limiter.record_expired()
+    else:
+        _EXPIRED_WITHOUT_LIMITER += 1
+    raise DeadlineExceeded()
+
+
+@contextmanager
+def admit(deadline: float | None = None) -> Iterator[None]:
+    """Guard a block of inference work with deadline and concurrency checks."""
+
+    check_deadline(deadline)
+
+    limiter = get_limiter()
+    if limiter is None:
+        yield
+        return
+
+    if not limiter.try_acquire():
+        raise Overloaded()
+
+    start = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except Exception:
+        failed = True
+        raise
+    finally:
+        limiter.release(time.perf_counter() - start, failed=failed)
+
+
+def _metrics() -> Dict[str, Any]:
+    if _LIMITER is None:
+        return {"active": False, "expired": _EXPIRED_WITHOUT_LIMITER}
+    return _LIMITER.snapshot()
+
+
+metrics.register_source("admission", _metrics)
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import functools
+import gzip
+import hashlib
+import mimetypes
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, NamedTuple, Tuple
+
+from flask import Flask, Response, current_app, request, send_from_directory, session
+from werkzeug.http import generate_etag
+from werkzeug.security import safe_join
+
+from . import metrics
+
+# HTTP-level caching for the server-rendered pages and static assets:
+#
+# * gzip for compressible responses above COMPRESS_MIN_BYTES; static files use
+#   the ``<file>.gz`` written by scripts/precompress_static.py when present,
+#   so serving them costs no CPU at all;
+# * ETags on GET responses, answered with 304 when the client already has
+#   the body (Flask's send_file does the same for static files);
+# * ``url_for("static", ...)`` adds a content hash (``?v=<hash>``), and such
+#   URLs are served with a year-long ``immutable`` Cache-Control;
+# * ``cached_page`` keeps the rendered (and compressed) output of pages that
+#   are the same for every visitor, such as home and about.
+
+_STATS: Dict[str, int] = {
+    "compressed": 0,
+    "bytes_in": 0,
+    "bytes_out": 0,
+    "not_modified": 0,
+    "page_hits": 0,
+    "page_misses": 0,
+    "page_bypassed": 0,
+    "static_precompressed": 0,
+    "static_immutable": 0,
+}
+
+
+class CachedPage(NamedTuple):
+    body: bytes
+    gzipped: bytes | None
+    last_modified: float
+    expires: float
+
+
+def init_app(app: Flask) -> None:
+    """Install the compression/validation hook and the static asset handling."""
+
+    app.after_request(_finish)
+    if app.config.get("STATIC_FINGERPRINT", True):
+        app.url_defaults(_fingerprint)
+    if "static" in app.view_functions:
+        app.view_functions["static"] = _static_view(app.view_functions["static"])
+
+
+def _accepts_gzip() -> bool:
+    return request.accept_encodings["gzip"] > 0
+
+
+def _compressible(mimetype: str | None) -> bool:
+    return mimetype in current_app.config.get("COMPRESS_MIMETYPES", ())
+
+
+def compress(data: bytes) -> bytes:
+    # mtime=0 keeps the output (and therefore its ETag) identical across workers.
+    return gzip.compress(
+        data, compresslevel=current_app.config.get("COMPRESS_LEVEL", 6), mtime=0
+    )
+
+
+def _finish(response: Response) -> Response:
+    # Streamed bodies (NDJSON) and files are left alone; static files are
+    # handled by _static_view.
+    if response.is_streamed or response.direct_passthrough:
+        return response
+
+    config = current_app.config
+    if (
+        config.get("COMPRESS_ENABLED", True)
+        and "Content-Encoding" not in response.headers
+        and response.status_code == 200
+        and _compressible(response.mimetype)
+    ):
+        size = response.calculate_content_length() or 0
+        if size >= config.get("COMPRESS_MIN_BYTES", 1024):
+            response.vary.add("Accept-Encoding")
+            if _accepts_gzip():
+                data = compress(response.get_data())
+                response.set_data(data)
+                response.headers["Content-Encoding"] = "gzip"
+                _STATS["compressed"] += 1
+                _STATS["bytes_in"] += size
+                _STATS["bytes_out"] += len(data)
+
+    if request.method in ("GET", "HEAD") and response.status_code == 200:
+        if not response.get_etag()[0]:
+            response.add_etag()
+        response.make_conditional(request)
+        if response.status_code == 304:
+            _STATS["not_modified"] += 1
+    return response
+
+
+def cached_page(view: Callable[..., str]) -> Callable[..., Response]:
+    """Serve the rendered output of *view* from memory for ``PAGE_CACHE_SECONDS``.
+
+    Only for pages that look the same to every visitor.  Requests with
+    pending flash messages render normally, since the layout shows them.
+    The cache lives in ``app.extensions`` and is per worker.
+    """
+
+    @functools.wraps(view)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        ttl = current_app.config.get("PAGE_CACHE_SECONDS", 0)
+        if ttl <= 0 or session.get("_flashes"):
+            _STATS["page_bypassed"] += 1
+            return view(*args, **kwargs)
+
+        pages: Dict[str, CachedPage] = current_app.extensions.setdefault(
+            "page_cache", {}
+        )
+        now = time.monotonic()
+        page = pages.get(request.path)
+        if page is None or page.expires <= now:
+            _STATS["page_misses"] += 1
+            body = view(*args, **kwargs).encode("utf-8")
+            config = current_app.config
+            gzipped = None
+            if config.get("COMPRESS_ENABLED", True) and len(body) >= config.get(
+                "COMPRESS_MIN_BYTES", 1024
+            ):
+                gzipped = compress(body)
+            page = CachedPage(body, gzipped, _templates_mtime(), now + ttl)
+            pages[request.path] = page
+        else:
+            _STATS["page_hits"] += 1
+
+        response = current_app.response_class(mimetype="text/html")
+        if page.gzipped is not None:
+            response.vary.add("Accept-Encoding")
+        if page.gzipped is not None and _accepts_gzip():
+            response.set_data(page.gzipped)
+            response.headers["Content-Encoding"] = "gzip"
+        else:
+            response.set_data(page.body)
+        response.set_etag(generate_etag(response.get_data()))
+        response.last_modified = page.last_modified
+        # Browsers revalidate every time; with the ETag that is a 304.
+        response.cache_control.no_cache = True
+        return response
+
+    return wrapper
+
+
+def _templates_mtime() -> float:
+    """Newest template mtime: the same in every worker, unlike the render time."""
+
+    folder = Path(current_app.root_path) / (current_app.template_folder or "templates")
+    return max(
+        (path.stat().st_mtime for path in folder.glob("*.html")), default=time.time()
+    )
+
+
+def static_digest(filename: str) -> str | None:
+    """Short content hash of a static file, cached until the file changes."""
+
+    folder = current_app.static_folder
+    path = safe_join(folder, filename) if folder else None
+    if path is None:
+        return None
+    try:
+        mtime = Path(path).stat().st_mtime
+    except OSError:
+        return None
+    digests: Dict[str, Tuple[float, str]] = current_app.extensions.setdefault(
+        "static_digests", {}
+    )
+    cached = digests.get(filename)
+    if cached is None or cached[0] != mtime:
+        digest = hashlib.sha256(Path(path).read_bytes()).hexdigest()[:12]
+        cached = (mtime, digest)
+        digests[filename] = cached
+    return cached[1]
+
+
+def _fingerprint(endpoint: str, values: Dict[str, Any]) -> None:
+    if endpoint == "static" and "filename" in values and "v" not in values:
+        digest = static_digest(values["filename"])
+        if digest:
+            values["v"] = digest
+
+
+def _static_view(original: Callable[..., Response]) -> Callable[..., Response]:
+    @functools.wraps(original)
+    def view(filename: str) -> Response:
+        folder = current_app.static_folder
+        source = safe_join(folder, filename) if folder else None
+        mimetype = mimetypes.guess_type(filename)[0]
+        response = None
+        if source is not None and _compressible(mimetype):
+            precompressed = Path(f"{source}.gz")
+            if _accepts_gzip() and _is_current(precompressed, Path(source)):
+                response = send_from_directory(
+                    folder, f"{filename}.gz", mimetype=mimetype
+                )
+                response.headers["Content-Encoding"] = "gzip"
+                _STATS["static_precompressed"] += 1
+        if response is None:
+            response = original(filename=filename)
+        if _compressible(mimetype):
+            response.vary.add("Accept-Encoding")
+
+        fingerprint = request.args.get("v")
+        if (
+            response.status_code in (200, 304)
+            and fingerprint
+            and fingerprint == static_digest(filename)
+        ):
+            response.cache_control.public = True
+            response.cache_control.max_age = current_app.config.get(
+                "STATIC_IMMUTABLE_MAX_AGE", 31536000
+            )
+            response.cache_control.immutable = True
+            response.cache_control.no_cache = None
+            _STATS["static_immutable"] += 1
+        return response
+
+    return view
+
+
+def _is_current(precompressed: Path, source: Path) -> bool:
+    try:
+        return precompressed.stat().st_mtime >= source.stat().st_mtime
+    except OSError:
+        return False
+
+
+metrics.register_source("http_cache", lambda: dict(_STATS))
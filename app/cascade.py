@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import json
+import math
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+from flask import current_app
+
+from . import metrics
+from .mime import extract_text
+
+CASCADE_FILENAME = "cascade.json"
+
+# Same tokenization as app.spam.transform_text, minus stemming.
+_TOKEN_PATTERN = re.compile(r"\b\w+\b")
+
+_STATS: Dict[str, int] = {
+    "stage1_exits": 0,
+    "stage1_spam": 0,
+    "stage1_ham": 0,
+    "stage2": 0,
+}
+
+# False until the first lookup; None afterwards when no cascade.json exists.
+_FIRST_STAGE: "FirstStage | None | bool" = False
+
+
+def tokens(text: str | bytes) -> set[str]:
+    """Unstemmed, lowercased tokens of *text*; shared by training and serving."""
+
+    return extracted_tokens(extract_text(text))
+
+
+def extracted_tokens(text: str) -> set[str]:
+    """:func:`tokens` of text that has already been through ``extract_text``."""
+
+    return set(_TOKEN_PATTERN.findall(text.lower()))
+
+
+class FirstStage:
+    """Pruned linear model over binary unstemmed-token features.
+
+    Scoring is a dictionary lookup per distinct token plus one sigmoid, so it
+    costs a small fraction of stemming and ONNX inference.  A message exits at
+    this stage when its spam probability is ``<= low`` or ``>= high``;
+    ``ml/cascade.py`` calibrates both thresholds so exits meet a target
+    precision.
+    """
+
+    def __init__(
+        self, weights: Dict[str, float], bias: float, low: float, high: float
+    ) -> None:
+        self.weights = weights
+        self.bias = bias
+        self.low = low
+        self.high = high
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FirstStage":
+        return cls(data["weights"], data["bias"], data["low"], data["high"])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "weights": self.weights,
+            "bias": self.bias,
+            "low": self.low,
+            "high": self.high,
+        }
+
+    def probability(self, text: str | bytes, extracted: bool = False) -> float:
+        """Stage-1 spam probability; *extracted* skips ``extract_text``."""
+
+        weights = self.weights
+        if extracted:
+            words = extracted_tokens(text)  # type: ignore[arg-type]
+        else:
+            words = tokens(text)
+        score = self.bias + sum(weights.get(token, 0.0) for token in words)
+        if score < -60:
+            return 0.0
+        return 1.0 / (1.0 + math.exp(-score))
+
+    def decide(self, text: str | bytes, extracted: bool = False) -> float | None:
+        """Return the spam probability if stage 1 is confident, else ``None``."""
+
+        proba = self.probability(text, extracted)
+        if proba <= self.low or proba >= self.high:
+            return proba
+        return None
+
+
+def load_first_stage(base_dir: Path) -> FirstStage | None:
+    path = base_dir / CASCADE_FILENAME
+    if not path.exists():
+        return None
+    with path.open(encoding="utf-8") as cascade_file:
+        return FirstStage.from_dict(json.load(cascade_file))
+
+
+def get_first_stage() -> FirstStage | None:
+    """Return the first stage from ``MODEL_DIR`` if ``CASCADE_ENABLED`` and present."""
+
+    global _FIRST_STAGE
+
+    if not current_app.config.get("CASCADE_ENABLED", False):
+        return None
+    if _FIRST_STAGE is False:
+        _FIRST_STAGE = load_first_stage(
+            Path(current_app.config.get("MODEL_DIR", "model"))
+        )
+    return _FIRST_STAGE  # type: ignore[return-value]
+
+
+def reset() -> None:
+    """Forget the loaded first stage, e.g. after a new model is published."""
+
+    global _FIRST_STAGE
+
+    _FIRST_STAGE = False
+
+
+def split(texts: Sequence[str]) -> tuple[List[float | None], List[int]]:
+    """Run stage 1 over *texts*, which serving has already run through ``extract_text``.
+
+    Returns the per-text stage-1 probability (``None`` where stage 2 is needed)
+    and the indices that still need stage 2.
+    """
+
+    stage = get_first_stage()
+    if stage is None:
+        return [None] * len(texts), list(range(len(texts)))
+
+    decided: List[float | None] = []
+    remaining: List[int] = []
+    for index, text in enumerate(texts):
+        proba = stage.decide(text, extracted=True)
+        decided.append(proba)
+        if proba is None:
+            remaining.append(index)
+        else:
+            _STATS["stage1_exits"] += 1
+            _STATS["stage1_spam" if proba >= stage.high else "stage1_ham"] += 1
+    _STATS["stage2"] += len(remaining)
+    return decided, remaining
+
+
+def _snapshot() -> Dict[str, Any]:
+    total = _STATS["stage1_exits"] + _STATS["stage2"]
+    return {**_STATS, "exit_rate": _STATS["stage1_exits"] / total if total else 0.0}
+
+
+metrics.register_source("cascade", _snapshot)
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Mapping
+
+from flask import Request, Response, current_app
+
+# Optional fast serializers.  Both are pure accelerators: without them the
+# prediction API falls back to the standard-library JSON codec, and
+# application/msgpack is rejected with 415 (requests) or not offered (responses).
+try:  # pragma: no cover - depends on the environment
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
+
+try:  # pragma: no cover - depends on the environment
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None  # type: ignore[assignment]
+
+JSON_MIMETYPE = "application/json"
+MSGPACK_MIMETYPE = "application/msgpack"
+_MSGPACK_ALIASES = {MSGPACK_MIMETYPE, "application/x-msgpack"}
+
+
+class UnsupportedMediaType(Exception):
+    """Raised when a request body uses an encoding this server cannot decode."""
+
+
+def _to_builtin(value: Any) -> Any:
+    """Fallback for NumPy values in the stdlib and MessagePack encoders."""
+
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+def _use_orjson() -> bool:
+    backend = current_app.config.get("JSON_BACKEND", "auto")
+    return orjson is not None and backend in {"auto", "orjson"}
+
+
+def available_mimetypes() -> list[str]:
+    mimetypes = [JSON_MIMETYPE]
+    if msgpack is not None:
+        mimetypes.extend(sorted(_MSGPACK_ALIASES))
+    return mimetypes
+
+
+def decode_request(request: Request) -> Any:
+    """Decode the body of a prediction request according to its Content-Type.
+
+    Returns ``None`` for a missing or malformed body, mirroring
+    ``request.get_json(silent=True)``.
+    """
+
+    mimetype = request.mimetype
+    if mimetype in _MSGPACK_ALIASES:
+        if msgpack is None:
+            raise UnsupportedMediaType(mimetype)
+        try:
+            return msgpack.unpackb(request.get_data(cache=False), raw=False)
+        except (ValueError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError):
+            return None
+
+    if not request.is_json:
+        return None
+
+    try:
+        return loads_json(request.get_data(cache=False))
+    except ValueError:
+        return None
+
+
+def loads_json(raw: bytes) -> Any:
+    """Parse JSON *raw* bytes with the configured backend; raises ``ValueError``."""
+
+    if _use_orjson():
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def negotiate(request: Request) -> str:
+    """Pick the response mimetype from the request's Accept header."""
+
+    best = request.accept_mimetypes.best_match(
+        available_mimetypes(), default=JSON_MIMETYPE
+    )
+    return MSGPACK_MIMETYPE if best in _MSGPACK_ALIASES else JSON_MIMETYPE
+
+
+def encode(payload: Any, mimetype: str) -> bytes:
+    """Serialize *payload* as *mimetype*; NumPy arrays are accepted as values."""
+
+    if mimetype == MSGPACK_MIMETYPE:
+        return msgpack.packb(payload, default=_to_builtin, use_bin_type=True)
+    if _use_orjson():
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, default=_to_builtin, separators=(",", ":")).encode(
+        "utf-8"
+    )
+
+
+def respond(
+    request: Request,
+    payload: Any,
+    status: int = 200,
+    headers: Mapping[str, str] | None = None,
+) -> Response:
+    """Build a response encoded in the format the client asked for."""
+
+    mimetype = negotiate(request)
+    response = Response(encode(payload, mimetype), status=status, mimetype=mimetype)
+    response.vary.add("Accept")
+    if headers:
+        response.headers.update(headers)
+    return response
+
+
+def error(
+    request: Request, message: str, status: int, headers: Dict[str, str] | None = None
+) -> Response:
+    return respond(request, {"error": message}, status=status, headers=headers)
@@ -33,10 +33,245 @@ class Config:
     WTF_CSRF_TIME_LIMIT = None
 
     MODEL_DIR: Path = Path(os.environ.get("MODEL_DIR", BASE_DIR / "model"))
+    # How often workers check MODEL_DIR for a newly published model; 0 disables.
+    MODEL_RELOAD_SECONDS: float = float(os.environ.get("MODEL_RELOAD_SECONDS", "30"))
+    # Answer confident messages with the cheap first stage in MODEL_DIR/cascade.json
+    # (trained by ml/train.py) and only send the rest to the ONNX model.
+    CASCADE_ENABLED: bool = os.environ.get("CASCADE_ENABLED", "false").lower() == "true"
+
+    # Reuse confident results for near-duplicates of recently scored messages
+    # (see app/neardup.py).  THRESHOLD is the minimum estimated Jaccard
+    # similarity of the messages' word 1/2-gram sets.
+    NEARDUP_ENABLED: bool = os.environ.get("NEARDUP_ENABLED", "false").lower() == "true"
+    NEARDUP_THRESHOLD: float = float(os.environ.get("NEARDUP_THRESHOLD", "0.8"))
+    NEARDUP_MAX_ENTRIES: int = int(os.environ.get("NEARDUP_MAX_ENTRIES", "20000"))
+    NEARDUP_TTL_SECONDS: float = float(os.environ.get("NEARDUP_TTL_SECONDS", "3600"))
+    NEARDUP_CONFIDENCE: float = float(os.environ.get("NEARDUP_CONFIDENCE", "0.95"))
+    NEARDUP_MIN_TOKENS: int = int(os.environ.get("NEARDUP_MIN_TOKENS", "8"))
+
+    # Shadow scoring (see app/shadow.py): MODEL_DIR/<SHADOW_MODEL_VERSION>/ scores
+    # a sample of /api/predict traffic after responses are sent.  Shadow work
+    # is dropped once in-flight requests reach SHADOW_BUSY_FRACTION of the
+    # admission limit, or when its queue is full.
+    SHADOW_MODEL_VERSION: str = os.environ.get("SHADOW_MODEL_VERSION", "")
+    SHADOW_SAMPLE_RATE: float = float(os.environ.get("SHADOW_SAMPLE_RATE", "0.1"))
+    SHADOW_WORKERS: int = int(os.environ.get("SHADOW_WORKERS", "1"))
+    SHADOW_MAX_QUEUE: int = int(os.environ.get("SHADOW_MAX_QUEUE", "256"))
+    SHADOW_BUSY_FRACTION: float = float(os.environ.get("SHADOW_BUSY_FRACTION", "0.5"))
+
+    # Where the default model runs: "local" loads it in every worker process;
+    # "sidecar" sends texts to scripts/inference_sidecar.py over the Unix
+    # socket SIDECAR_SOCKET (see app/sidecar.py), so one process per host
+    # holds the model and batches requests from all workers.  A worker that
+    # can't reach the sidecar scores in-process for SIDECAR_RETRY_SECONDS.
+    # Requests that arrive while the sidecar is scoring are merged into its
+    # next batch of up to SIDECAR_MAX_BATCH texts; SIDECAR_BATCH_WAIT_MS > 0
+    # also holds each batch open that long for more requests.
+    INFERENCE_BACKEND: str = os.environ.get("INFERENCE_BACKEND", "local")
+    SIDECAR_SOCKET: str = os.environ.get(
+        "SIDECAR_SOCKET", "/tmp/spam-classifier-inference.sock"
+    )
+    SIDECAR_TIMEOUT: float = float(os.environ.get("SIDECAR_TIMEOUT", "5"))
+    SIDECAR_RETRY_SECONDS: float = float(os.environ.get("SIDECAR_RETRY_SECONDS", "5"))
+    SIDECAR_POOL_SIZE: int = int(os.environ.get("SIDECAR_POOL_SIZE", "8"))
+    SIDECAR_MAX_BATCH: int = int(os.environ.get("SIDECAR_MAX_BATCH", "256"))
+    SIDECAR_BATCH_WAIT_MS: float = float(os.environ.get("SIDECAR_BATCH_WAIT_MS", "0"))
+
+    # Multi-version serving (see app/registry.py).  Requests pick a version
+    # under MODEL_DIR/<version>/ with an X-Model-Version header, a model_version
+    # query parameter or a MODEL_ROUTES rule (a JSON list).  Loaded sessions are
+    # kept in an LRU pool bounded by MODEL_POOL_MAX_MB; pinned versions are
+    # loaded at startup and never evicted.
+    MODEL_POOL_MAX_MB: float = float(os.environ.get("MODEL_POOL_MAX_MB", "512"))
+    MODEL_PINNED_VERSIONS: list[str] = [
+        version.strip()
+        for version in os.environ.get("MODEL_PINNED_VERSIONS", "").split(",")
+        if version.strip()
+    ]
+    MODEL_ROUTES: str = os.environ.get("MODEL_ROUTES", "")
+
+    # Tokens returned by explain=true on the prediction API (see app/explain.py)
+    EXPLAIN_TOP_K: int = int(os.environ.get("EXPLAIN_TOP_K", "10"))
+
+    # Prediction history of signed-in /predict users (see app/history.py).
+    # Rows are inserted by a background thread after the response is sent, in
+    # batches of up to HISTORY_BATCH_SIZE; beyond HISTORY_MAX_QUEUE waiting
+    # rows new ones are dropped.  A text the user submitted within
+    # HISTORY_REUSE_SECONDS is answered from history while the served model
+    # (its content digest) is unchanged (0 disables reuse).  /history shows
+    # HISTORY_PAGE_SIZE rows.
+    HISTORY_ENABLED: bool = os.environ.get("HISTORY_ENABLED", "true").lower() == "true"
+    HISTORY_REUSE_SECONDS: float = float(
+        os.environ.get("HISTORY_REUSE_SECONDS", "86400")
+    )
+    HISTORY_PAGE_SIZE: int = int(os.environ.get("HISTORY_PAGE_SIZE", "20"))
+    HISTORY_MAX_QUEUE: int = int(os.environ.get("HISTORY_MAX_QUEUE", "1000"))
+    HISTORY_BATCH_SIZE: int = int(os.environ.get("HISTORY_BATCH_SIZE", "100"))
+
+    # HTTP caching (see app/caching.py).  Compressible responses of at least
+    # COMPRESS_MIN_BYTES are gzipped; static files are served from their
+    # precompressed .gz (scripts/precompress_static.py) when one exists.
+    # Fingerprinted static URLs are cached as immutable for
+    # STATIC_IMMUTABLE_MAX_AGE seconds; pages such as home and about are kept
+    # rendered in memory for PAGE_CACHE_SECONDS (0 disables).
+    COMPRESS_ENABLED: bool = (
+        os.environ.get("COMPRESS_ENABLED", "true").lower() == "true"
+    )
+    COMPRESS_MIN_BYTES: int = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+    COMPRESS_LEVEL: int = int(os.environ.get("COMPRESS_LEVEL", "6"))
+    COMPRESS_MIMETYPES: list[str] = [
+        mimetype.strip()
+        for mimetype in os.environ.get(
+            "COMPRESS_MIMETYPES",
+            "text/html,text/css,text/javascript,application/javascript,"
+            "application/json,image/svg+xml",
+        ).split(",")
+        if mimetype.strip()
+    ]
+    STATIC_FINGERPRINT: bool = (
+        os.environ.get("STATIC_FINGERPRINT", "true").lower() == "true"
+    )
+    STATIC_IMMUTABLE_MAX_AGE: int = int(
+        os.environ.get("STATIC_IMMUTABLE_MAX_AGE", "31536000")
+    )
+    PAGE_CACHE_SECONDS: float = float(os.environ.get("PAGE_CACHE_SECONDS", "300"))
+
+    # Router mode (router_wsgi.py, see app/router.py): forwards prediction
+    # requests to ROUTER_BACKENDS, comma-separated base URLs of instances of
+    # this app.  "hash" sends each message to the backend owning its text
+    # fingerprint on a consistent-hash ring, so near-duplicates share caches;
+    # "round_robin" is the cache-oblivious baseline.
+    ROUTER_BACKENDS: list[str] = [
+        backend.strip()
+        for backend in os.environ.get("ROUTER_BACKENDS", "").split(",")
+        if backend.strip()
+    ]
+    ROUTER_STRATEGY: str = os.environ.get("ROUTER_STRATEGY", "hash")
+    ROUTER_REPLICAS: int = int(os.environ.get("ROUTER_REPLICAS", "128"))
+    ROUTER_HEALTH_INTERVAL: float = float(os.environ.get("ROUTER_HEALTH_INTERVAL", "5"))
+    ROUTER_TIMEOUT: float = float(os.environ.get("ROUTER_TIMEOUT", "10"))
+    ROUTER_POOL_SIZE: int = int(os.environ.get("ROUTER_POOL_SIZE", "16"))
+
+    # Milter daemon for scoring at SMTP time (scripts/milter_daemon.py, see
+    # app/milter.py).  Messages scoring at least MILTER_REJECT_THRESHOLD are
+    # rejected with a 550; the rest get an X-Spam-Probability header when
+    # MILTER_ADD_HEADER is set.  It fails open: a message not decided within
+    # MILTER_DECISION_TIMEOUT seconds, or arriving while MILTER_MAX_PENDING
+    # messages are queued, is accepted unscored.  Only the first
+    # MILTER_MAX_BYTES of each message are scored.  MILTER_TIMEOUT is how long
+    # an MTA connection may stay silent before it is closed.
+    MILTER_HOST: str = os.environ.get("MILTER_HOST", "127.0.0.1")
+    MILTER_PORT: int = int(os.environ.get("MILTER_PORT", "8894"))
+    MILTER_REJECT_THRESHOLD: float = float(
+        os.environ.get("MILTER_REJECT_THRESHOLD", "0.9")
+    )
+    MILTER_ADD_HEADER: bool = (
+        os.environ.get("MILTER_ADD_HEADER", "true").lower() == "true"
+    )
+    MILTER_TIMEOUT: float = float(os.environ.get("MILTER_TIMEOUT", "30"))
+    MILTER_DECISION_TIMEOUT: float = float(
+        os.environ.get("MILTER_DECISION_TIMEOUT", "2")
+    )
+    MILTER_MAX_BATCH: int = int(os.environ.get("MILTER_MAX_BATCH", "64"))
+    MILTER_MAX_PENDING: int = int(os.environ.get("MILTER_MAX_PENDING", "1000"))
+    MILTER_MAX_BYTES: int = int(os.environ.get("MILTER_MAX_BYTES", "262144"))
+
+    # Shared secret for operational endpoints such as /api/metrics.  When empty,
+    # those endpoints are disabled.
+    ADMIN_TOKEN: str = os.environ.get("ADMIN_TOKEN", "")
+
+    # API keys are issued and revoked with scripts/manage_api_keys.py.  A key's
+    # last_used_at is written at most once per API_KEY_TOUCH_SECONDS.
+    API_KEY_TOUCH_SECONDS: float = float(os.environ.get("API_KEY_TOUCH_SECONDS", "60"))
+
+    # Opt-in request profiling (see app/profiling.py).  When enabled, requests
+    # to PROFILE_PATHS are profiled if they carry an X-Profile header and a
+    # valid X-Admin-Token, or at random with probability PROFILE_SAMPLE_RATE.
+    # Profiles are cProfile .prof files ("pstats") or collapsed stacks for
+    # flamegraphs ("collapsed").  Disabled, no hook is installed at all.
+    PROFILE_ENABLED: bool = os.environ.get("PROFILE_ENABLED", "false").lower() == "true"
+    PROFILE_SAMPLE_RATE: float = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_PATHS: list[str] = [
+        path.strip()
+        for path in os.environ.get("PROFILE_PATHS", "/api/predict,/predict").split(",")
+        if path.strip()
+    ]
+    PROFILE_FORMAT: str = os.environ.get("PROFILE_FORMAT", "pstats")
+    PROFILE_INTERVAL_MS: float = float(os.environ.get("PROFILE_INTERVAL_MS", "1"))
+    PROFILE_DIR: Path = Path(
+        os.environ.get("PROFILE_DIR", BASE_DIR / "reports" / "profiles")
+    )
+    PROFILE_MAX_FILES: int = int(os.environ.get("PROFILE_MAX_FILES", "200"))
+
+    # Adaptive admission control for the inference path (see app/admission.py).
+    ADMISSION_ENABLED: bool = (
+        os.environ.get("ADMISSION_ENABLED", "true").lower() == "true"
+    )
+    ADMISSION_ALGORITHM: str = os.environ.get("ADMISSION_ALGORITHM", "gradient")
+    ADMISSION_INITIAL_LIMIT: int = int(os.environ.get("ADMISSION_INITIAL_LIMIT", "8"))
+    ADMISSION_MIN_LIMIT: int = int(os.environ.get("ADMISSION_MIN_LIMIT", "1"))
+    ADMISSION_MAX_LIMIT: int = int(os.environ.get("ADMISSION_MAX_LIMIT", "64"))
+    ADMISSION_LATENCY_TARGET_MS: float = float(
+        os.environ.get("ADMISSION_LATENCY_TARGET_MS", "250"),
+    )
+
+    # Serialization for the prediction API: "auto" uses orjson when installed,
+    # "stdlib" forces the standard-library json module.
+    JSON_BACKEND: str = os.environ.get("JSON_BACKEND", "auto")
+    BATCH_MAX_ITEMS: int = int(os.environ.get("BATCH_MAX_ITEMS", "1000"))
+
+    # NDJSON streaming endpoint (/api/predict/stream)
+    STREAM_BATCH_SIZE: int = int(os.environ.get("STREAM_BATCH_SIZE", "256"))
+    STREAM_MAX_LINE_BYTES: int = int(os.environ.get("STREAM_MAX_LINE_BYTES", "65536"))
+
+    # Asynchronous scoring jobs (POST /api/jobs, app/jobs.py).  Workers started
+    # by scripts/job_workers.py claim jobs with a lease; a job whose worker
+    # dies is picked up again once the lease expires, at most
+    # JOBS_MAX_ATTEMPTS times.  JOBS_INPUT_DIR is where file jobs may read
+    # from; file jobs are disabled while it is empty.
+    JOBS_MAX_TEXTS: int = int(os.environ.get("JOBS_MAX_TEXTS", "100000"))
+    JOBS_INPUT_DIR: str = os.environ.get("JOBS_INPUT_DIR", "")
+    JOBS_BATCH_SIZE: int = int(os.environ.get("JOBS_BATCH_SIZE", "256"))
+    JOBS_LEASE_SECONDS: float = float(os.environ.get("JOBS_LEASE_SECONDS", "60"))
+    JOBS_MAX_ATTEMPTS: int = int(os.environ.get("JOBS_MAX_ATTEMPTS", "3"))
+    JOBS_POLL_SECONDS: float = float(os.environ.get("JOBS_POLL_SECONDS", "1"))
+    JOBS_WORKERS: int = int(os.environ.get("JOBS_WORKERS", "2"))
+    JOBS_PAGE_SIZE: int = int(os.environ.get("JOBS_PAGE_SIZE", "1000"))
+    JOBS_RETENTION_HOURS: float = float(os.environ.get("JOBS_RETENTION_HOURS", "24"))
+
+    # Streaming traffic statistics (GET /api/traffic, app/sketches.py).  Each
+    # worker keeps fixed-size sketches per STATS_WINDOW_SECONDS window and
+    # writes them to STATS_DIR every STATS_FLUSH_SECONDS so the endpoint can
+    # merge all workers; with STATS_DIR empty it only sees its own process.
+    STATS_ENABLED: bool = os.environ.get("STATS_ENABLED", "false").lower() == "true"
+    STATS_DIR: str = os.environ.get("STATS_DIR", "")
+    STATS_FLUSH_SECONDS: float = float(os.environ.get("STATS_FLUSH_SECONDS", "10"))
+    STATS_WINDOW_SECONDS: int = int(os.environ.get("STATS_WINDOW_SECONDS", "3600"))
+    STATS_TOP_K: int = int(os.environ.get("STATS_TOP_K", "20"))
+
+    # Apply pending migrations (app/migrations.py) when the app starts.  When
+    # disabled, startup only checks the version and logs a warning if behind.
+    SCHEMA_AUTO_MIGRATE: bool = (
+        os.environ.get("SCHEMA_AUTO_MIGRATE", "true").lower() == "true"
+    )
+
+    # When set, even the schema version check is skipped once this stamp file
+    # records the current database (as a digest of its URI) and schema version.
+    # It is written owner-only.  Used on serverless cold starts.
+    SCHEMA_STAMP_PATH: str | None = os.environ.get("SCHEMA_STAMP_PATH") or None
 
     TESTING: bool = False
 
 
+class ServerlessConfig(Config):
+    """Configuration tuned for cold starts on the Vercel Python runtime."""
+
+    SCHEMA_STAMP_PATH: str | None = os.environ.get(
+        "SCHEMA_STAMP_PATH",
+        "/tmp/spam_classifier.schema",
+    )
+
+
 class TestingConfig(Config):
     """Configuration used by the pytest test suite."""
 
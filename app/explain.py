@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import itertools
+import json
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+EXPLAIN_FILENAME = "explain.json"
+
+# path -> (mtime, table); tables are reloaded when the file is republished.
+_TABLES: Dict[Path, Tuple[float, "ContributionTable"]] = {}
+_LOCK = threading.Lock()
+
+Explanation = List[Dict[str, Any]]
+
+
+class ContributionTable:
+    """Per-token contributions of the served linear TF-IDF model.
+
+    For a linear classifier over L2-normalized TF-IDF features the decision
+    score is ``sum(tf(t) * idf(t) * coef(t)) / norm + intercept``, so each
+    token's share is known exactly from ``idf`` and ``coef``.  Both are
+    exported next to the model (``explain.json``, written by
+    ``ml.pipeline.contribution_table``); serving only tokenizes the already
+    preprocessed text the way ``TfidfVectorizer`` does and does a few NumPy
+    operations per batch.
+    """
+
+    def __init__(self, data: Dict[str, Any]) -> None:
+        import numpy as np  # noqa: WPS433 (deferred heavy import)
+
+        self.index = {
+            term: position for position, term in enumerate(data["vocabulary"])
+        }
+        self.terms = np.array(data["vocabulary"], dtype=object)
+        self.idf = np.asarray(data["idf"], dtype=np.float64)
+        self.weighted = self.idf * np.asarray(data["coef"], dtype=np.float64)
+        self.ngram_range = tuple(data.get("ngram_range", (1, 1)))
+        self.lowercase = data.get("lowercase", True)
+        self.sublinear_tf = data.get("sublinear_tf", False)
+        self.norm = data.get("norm", "l2")
+        self.intercept = float(data.get("intercept", 0.0))
+        self._token_pattern = re.compile(data.get("token_pattern", r"(?u)\b\w\w+\b"))
+
+    def _term_ids(self, text: str) -> List[int]:
+        if self.lowercase:
+            text = text.lower()
+        tokens = self._token_pattern.findall(text)
+        low, high = self.ngram_range
+        terms = list(tokens) if low == 1 else []
+        for size in range(max(low, 2), high + 1):
+            terms += [
+                " ".join(tokens[start : start + size])
+                for start in range(len(tokens) - size + 1)
+            ]
+        return [
+            term_id for term_id in map(self.index.get, terms) if term_id is not None
+        ]
+
+    def explain(
+        self, processed_texts: Sequence[str], top_k: int = 10
+    ) -> List[Explanation]:
+        """Top *top_k* tokens by absolute contribution to the spam score, per text.
+
+        Positive contributions push towards spam, negative ones towards ham;
+        they sum (with the intercept) to the model's logit.
+        """
+
+        import numpy as np  # noqa: WPS433 (deferred heavy import)
+
+        ids_per_text = [self._term_ids(text) for text in processed_texts]
+        lengths = np.fromiter(
+            (len(ids) for ids in ids_per_text), dtype=np.int64, count=len(ids_per_text)
+        )
+        explanations: List[Explanation] = [[] for _ in processed_texts]
+        if not lengths.sum():
+            return explanations
+
+        doc_ids = np.repeat(np.arange(len(ids_per_text)), lengths)
+        term_ids = np.fromiter(
+            itertools.chain.from_iterable(ids_per_text),
+            dtype=np.int64,
+            count=int(lengths.sum()),
+        )
+
+        # Term frequencies per (document, term) pair, all documents at once.
+        keys, counts = np.unique(doc_ids * len(self.idf) + term_ids, return_counts=True)
+        docs, terms = np.divmod(keys, len(self.idf))
+        tf = 1.0 + np.log(counts) if self.sublinear_tf else counts.astype(np.float64)
+        values = tf * self.idf[terms]
+        if self.norm == "l2":
+            norms = np.sqrt(
+                np.bincount(docs, weights=values**2, minlength=len(ids_per_text))
+            )
+        elif self.norm == "l1":
+            norms = np.bincount(
+                docs, weights=np.abs(values), minlength=len(ids_per_text)
+            )
+        else:
+            norms = np.ones(len(ids_per_text))
+        contributions = (
+            tf * self.weighted[terms] / np.where(norms > 0, norms, 1.0)[docs]
+        )
+
+        # Sort by document, then by decreasing |contribution|; keep each
+        # document's head.
+        order = np.lexsort((-np.abs(contributions), docs))
+        starts = np.searchsorted(docs[order], np.arange(len(ids_per_text)))
+        ends = np.append(starts[1:], len(order))
+        for doc, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+            head = order[start : min(end, start + top_k)]
+            explanations[doc] = [
+                {"token": term, "contribution": round(value, 6)}
+                for term, value in zip(
+                    self.terms[terms[head]].tolist(), contributions[head].tolist()
+                )
+            ]
+        return explanations
+
+
+def load_table(base_dir: Path) -> ContributionTable | None:
+    """Return the contribution table in *base_dir*, or ``None`` if there is none."""
+
+    path = base_dir / EXPLAIN_FILENAME
+    try:
+        mtime = path.stat().st_mtime
+    except OSError:
+        return None
+    cached = _TABLES.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with _LOCK:
+        cached = _TABLES.get(path)
+        if cached is None or cached[0] != mtime:
+            with path.open(encoding="utf-8") as table_file:
+                cached = (mtime, ContributionTable(json.load(table_file)))
+            _TABLES[path] = cached
+    return cached[1]
+
+
+def reset() -> None:
+    """Drop all loaded contribution tables, e.g. after a new model is loaded."""
+
+    with _LOCK:
+        _TABLES.clear()
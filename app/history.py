@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import queue
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+import sqlalchemy as sa
+from flask import Flask, Response, current_app
+
+from . import metrics
+from .extensions import db
+from .models import PredictionHistory
+
+# Per-user prediction history for signed-in /predict submissions.
+#
+# Rows never cost the response a commit: record() queues the row once the
+# response has been sent, and one writer thread per worker inserts whatever
+# has queued up in a single multi-row INSERT and commit.  When
+# HISTORY_MAX_QUEUE rows are already waiting, new ones are dropped (history
+# is a convenience, not a record of truth).
+#
+# lookup() answers a repeat of the same text from the user's history when it
+# was scored within HISTORY_REUSE_SECONDS by the exact model that is serving
+# now (its content digest, see app.spam.model_key), using the
+# (user_id, text_hash, created_at) index.  Answers reused from history are not
+# recorded again.  page()
+# reads newest first with keyset pagination on (created_at, id), so every
+# page is an index range scan no matter how deep the user pages.
+
+_STATS: Dict[str, int] = {
+    "recorded": 0,
+    "dropped": 0,
+    "flushes": 0,
+    "errors": 0,
+    "lookups": 0,
+    "reused": 0,
+}
+
+_WRITER_LOCK = threading.Lock()
+
+_CURSOR_FORMAT = "%Y%m%d%H%M%S%f"
+
+
+class HistoryWriter:
+    """Inserts queued history rows in batches on a daemon thread."""
+
+    def __init__(
+        self, app: Flask, max_queue: int = 1000, batch_size: int = 100
+    ) -> None:
+        self.app = app
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(
+            target=self._work, name="history-writer", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, row: Dict[str, Any]) -> bool:
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            _STATS["dropped"] += 1
+            return False
+        return True
+
+    def join(self) -> None:
+        """Block until every queued row has been written (used by tests and tooling)."""
+
+        self._queue.join()
+
+    def _work(self) -> None:
+        while True:
+            rows = [self._queue.get()]
+            while len(rows) < self.batch_size:
+                try:
+                    rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(rows)
+            except Exception:  # noqa: BLE001 - a failed flush must not stop the writer
+                _STATS["errors"] += 1
+                self.app.logger.exception(
+                    "Writing %d prediction history rows failed", len(rows)
+                )
+            finally:
+                for _ in rows:
+                    self._queue.task_done()
+
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        with self.app.app_context():
+            try:
+                db.session.execute(sa.insert(PredictionHistory), rows)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+        _STATS["recorded"] += len(rows)
+        _STATS["flushes"] += 1
+
+
+def get_writer() -> HistoryWriter:
+    """Return this app's history writer, starting it on first use."""
+
+    writer = current_app.extensions.get("history_writer")
+    if writer is None:
+        with _WRITER_LOCK:
+            writer = current_app.extensions.get("history_writer")
+            if writer is None:
+                writer = current_app.extensions["history_writer"] = HistoryWriter(
+                    current_app._get_current_object(),
+                    max_queue=current_app.config.get("HISTORY_MAX_QUEUE", 1000),
+                    batch_size=current_app.config.get("HISTORY_BATCH_SIZE", 100),
+                )
+    return writer
+
+
+def enabled() -> bool:
+    return bool(current_app.config.get("HISTORY_ENABLED", True))
+
+
+def lookup(user_id: int, text: str, model_digest: str | None) -> float | None:
+    """Return the probability *user_id* recently got for *text*, if still reusable.
+
+    Only rows scored by the model *model_digest* within ``HISTORY_REUSE_SECONDS``
+    count.
+    """
+
+    reuse_seconds = current_app.config.get("HISTORY_REUSE_SECONDS", 86400.0)
+    if not reuse_seconds or model_digest is None:
+        return None
+    _STATS["lookups"] += 1
+    probability = (
+        db.session.query(PredictionHistory.probability)
+        .filter(
+            PredictionHistory.user_id == user_id,
+            PredictionHistory.text_hash == PredictionHistory.hash_text(text),
+            PredictionHistory.created_at
+            >= datetime.utcnow() - timedelta(seconds=reuse_seconds),
+            PredictionHistory.model_digest == model_digest,
+        )
+        .order_by(PredictionHistory.created_at.desc())
+        .limit(1)
+        .scalar()
+    )
+    if probability is not None:
+        _STATS["reused"] += 1
+    return probability
+
+
+def record(
+    response: Response,
+    user_id: int,
+    text: str,
+    probability: float,
+    model_version: str | None,
+    model_digest: str | None = None,
+) -> Response:
+    """Queue a history row for this submission once *response* has been sent."""
+
+    writer = get_writer()
+    row = {
+        "user_id": user_id,
+        "text_hash": PredictionHistory.hash_text(text),
+        "text": text,
+        "probability": float(probability),
+        "model_version": model_version,
+        "model_digest": model_digest,
+        # The submission time, not the (later) time the row is written.
+        "created_at": datetime.utcnow(),
+    }
+    response.call_on_close(lambda: writer.submit(row))
+    return response
+
+
+def encode_cursor(entry: PredictionHistory) -> str:
+    return f"{entry.created_at.strftime(_CURSOR_FORMAT)}-{entry.id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Parse a cursor from :func:`encode_cursor`; ``ValueError`` if malformed."""
+
+    created_at, _, entry_id = cursor.partition("-")
+    return datetime.strptime(created_at, _CURSOR_FORMAT), int(entry_id)
+
+
+def page(
+    user_id: int, before: str | None = None, limit: int = 20
+) -> Tuple[List[PredictionHistory], str | None]:
+    """Return up to *limit* of *user_id*'s entries before the cursor, newest first.
+
+    The second item is the cursor for the next page, or ``None`` on the last one.
+    """
+
+    query = PredictionHistory.query.filter(PredictionHistory.user_id == user_id)
+    if before:
+        created_at, entry_id = decode_cursor(before)
+        # The first condition bounds the range on the (user_id, created_at, id)
+        # index on every backend; the second only skips the rows sharing the
+        # cursor's timestamp that the previous page already showed.
+        query = query.filter(
+            PredictionHistory.created_at <= created_at,
+            sa.or_(
+                PredictionHistory.created_at < created_at,
+                sa.and_(
+                    PredictionHistory.created_at == created_at,
+                    PredictionHistory.id < entry_id,
+                ),
+            ),
+        )
+    entries = (
+        query.order_by(PredictionHistory.created_at.desc(), PredictionHistory.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    if len(entries) > limit:
+        return entries[:limit], encode_cursor(entries[limit - 1])
+    return entries, None
+
+
+def _snapshot() -> Dict[str, Any]:
+    writer = current_app.extensions.get("history_writer")
+    return {**_STATS, "queued": writer._queue.qsize() if writer is not None else 0}
+
+
+metrics.register_source("history", _snapshot)
@@ -0,0 +1,558 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+import sqlalchemy as sa
+from flask import Flask, current_app
+
+from . import metrics, streaming
+from .extensions import db
+from .models import ScoringJob, ScoringJobItem
+from .spam import get_pipeline_and_metadata, label_for, predict_spam_probabilities
+
+# Asynchronous scoring jobs.  POST /api/jobs stores a job and its texts (or a
+# reference to an input file) in the app's database and returns at once;
+# worker processes (scripts/job_workers.py, run_pool below) claim queued jobs
+# in priority order and score them in batches through app.spam.
+#
+# Claiming is a compare-and-set UPDATE on the job's attempt counter, so it
+# works on SQLite and MySQL alike without row locks.  The claiming worker
+# holds a lease that it renews with every committed batch; if it dies, the
+# lease runs out (or the pool supervisor expires it at once) and another
+# worker resumes the job after the last committed batch.
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+MIN_PRIORITY = 0
+MAX_PRIORITY = 9
+
+_NDJSON_SUFFIXES = (".ndjson", ".jsonl")
+_METRICS_WINDOW_SECONDS = 300
+_CLAIM_CANDIDATES = 8
+_PURGE_INTERVAL_SECONDS = 60.0
+
+
+class JobInputError(ValueError):
+    """A file job's input can't be used; the job fails without being retried."""
+
+
+def default_worker_id(pid: int | None = None) -> str:
+    return f"{socket.gethostname()}:{os.getpid() if pid is None else pid}"[:64]
+
+
+def resolve_input(name: str) -> Path:
+    """Return the path of input file *name*, which must be inside ``JOBS_INPUT_DIR``."""
+
+    root = current_app.config.get("JOBS_INPUT_DIR") or ""
+    if not root:
+        raise JobInputError("File jobs are disabled on this server.")
+    base = Path(root).resolve()
+    path = (base / name).resolve()
+    if not path.is_relative_to(base) or not path.is_file():
+        raise JobInputError(f"File '{name}' was not found in the job input directory.")
+    return path
+
+
+def submit(
+    texts: Sequence[str] | None = None,
+    source: str | None = None,
+    priority: int = 0,
+    user_id: int | None = None,
+) -> ScoringJob:
+    """Queue a job for inline *texts* or the input file *source*; the caller commits."""
+
+    job = ScoringJob(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        status=QUEUED,
+        priority=priority,
+        source=source,
+        processed=0,
+        attempts=0,
+        created_at=datetime.utcnow(),
+    )
+    db.session.add(job)
+    if texts is not None:
+        job.total = len(texts)
+        db.session.flush()
+        _insert_items(
+            [
+                {"job_id": job.id, "position": index, "text": text}
+                for index, text in enumerate(texts)
+            ]
+        )
+    return job
+
+
+def _insert_items(rows: List[Dict[str, Any]]) -> None:
+    for start in range(0, len(rows), 1000):
+        db.session.execute(sa.insert(ScoringJobItem), rows[start : start + 1000])
+
+
+def _claimable(now: datetime) -> Any:
+    return sa.or_(
+        ScoringJob.status == QUEUED,
+        sa.and_(ScoringJob.status == RUNNING, ScoringJob.lease_expires_at < now),
+    )
+
+
+def claim(worker_id: str, now: datetime | None = None) -> ScoringJob | None:
+    """Take the lease on the highest-priority claimable job, or return None.
+
+    A running job whose lease expired has lost its worker.  It is claimed
+    again unless it has used up ``JOBS_MAX_ATTEMPTS``, in which case it fails.
+    """
+
+    now = datetime.utcnow() if now is None else now
+    config = current_app.config
+    max_attempts = config.get("JOBS_MAX_ATTEMPTS", 3)
+    lease = timedelta(seconds=config.get("JOBS_LEASE_SECONDS", 60.0))
+
+    candidates = (
+        db.session.query(ScoringJob.id, ScoringJob.attempts)
+        .filter(_claimable(now))
+        .order_by(ScoringJob.priority.desc(), ScoringJob.created_at)
+        .limit(_CLAIM_CANDIDATES)
+        .all()
+    )
+    for job_id, attempts in candidates:
+        if attempts >= max_attempts:
+            values: Dict[str, Any] = {
+                "status": FAILED,
+                "lease_owner": None,
+                "lease_expires_at": None,
+                "finished_at": now,
+                "error": (
+                    f"Gave up after {attempts} attempts; "
+                    "the worker stopped responding."
+                ),
+            }
+        else:
+            values = {
+                "status": RUNNING,
+                "lease_owner": worker_id,
+                "lease_expires_at": now + lease,
+                "attempts": attempts + 1,
+                "started_at": sa.func.coalesce(ScoringJob.started_at, now),
+            }
+        # Whoever bumps the attempt counter first wins; the others match no row.
+        won = ScoringJob.query.filter(
+            ScoringJob.id == job_id, ScoringJob.attempts == attempts, _claimable(now)
+        ).update(values, synchronize_session=False)
+        db.session.commit()
+        if won and values["status"] == RUNNING:
+            return db.session.get(ScoringJob, job_id)
+    return None
+
+
+def _update_owned(job_id: str, worker_id: str, **values: Any) -> bool:
+    """Commit pending work plus *values* if *worker_id* still holds the lease.
+
+    Otherwise roll back.
+    """
+
+    updated = ScoringJob.query.filter_by(
+        id=job_id, lease_owner=worker_id, status=RUNNING
+    ).update(values, synchronize_session=False)
+    if updated != 1:
+        db.session.rollback()
+        return False
+    db.session.commit()
+    return True
+
+
+def _ingest(job: ScoringJob) -> int:
+    """Read a file job's input into items; return how many lines were invalid."""
+
+    from .routes import MAX_TEXT_LENGTH  # noqa: WPS433 (routes imports this module)
+
+    config = current_app.config
+    max_texts = config.get("JOBS_MAX_TEXTS", 100_000)
+    path = resolve_input(job.source or "")
+    ndjson = path.suffix.lower() in _NDJSON_SUFFIXES
+
+    rows: List[Dict[str, Any]] = []
+    invalid = 0
+    with path.open("rb") as stream:
+        for line_number, raw in streaming.iter_lines(
+            stream, config.get("STREAM_MAX_LINE_BYTES", 65_536)
+        ):
+            if ndjson:
+                entry = streaming.parse_line(line_number, raw, MAX_TEXT_LENGTH)
+                text, error = entry.text, entry.error
+            elif raw is None:
+                text, error = None, "Line too long."
+            else:
+                text, error = raw.decode("utf-8", "replace"), None
+                if len(text) > MAX_TEXT_LENGTH:
+                    text, error = None, "Text too long."
+            rows.append(
+                {
+                    "job_id": job.id,
+                    "position": line_number,
+                    "text": text,
+                    "error": error,
+                }
+            )
+            invalid += error is not None
+            if len(rows) > max_texts:
+                raise JobInputError(f"File has more than {max_texts} messages.")
+    _insert_items(rows)
+    return invalid
+
+
+def run_job(job: ScoringJob, worker_id: str, stop: Any = None) -> bool:
+    """Score a job claimed by *worker_id* to completion; False if it did not finish.
+
+    That happens when the lease was lost meanwhile, or when *stop* is set: the
+    job is then queued again without counting the attempt, and is resumed
+    after its last committed batch.
+    """
+
+    config = current_app.config
+    batch_size = config.get("JOBS_BATCH_SIZE", 256)
+    lease = timedelta(seconds=config.get("JOBS_LEASE_SECONDS", 60.0))
+    job_id, processed, attempts = job.id, job.processed, job.attempts
+
+    if job.total is None:
+        processed = _ingest(job)
+        total = (
+            db.session.query(sa.func.count())
+            .filter(ScoringJobItem.job_id == job_id)
+            .scalar()
+        )
+        if not _update_owned(job_id, worker_id, total=total, processed=processed):
+            return False
+
+    cursor = -1
+    while True:
+        if stop is not None and stop.is_set():
+            _update_owned(
+                job_id,
+                worker_id,
+                status=QUEUED,
+                lease_owner=None,
+                lease_expires_at=None,
+                attempts=attempts - 1,
+            )
+            return False
+        items = (
+            ScoringJobItem.query.filter(
+                ScoringJobItem.job_id == job_id,
+                ScoringJobItem.position > cursor,
+                ScoringJobItem.probability.is_(None),
+                ScoringJobItem.error.is_(None),
+            )
+            .order_by(ScoringJobItem.position)
+            .limit(batch_size)
+            .all()
+        )
+        if not items:
+            break
+        probabilities = predict_spam_probabilities(
+            [item.text for item in items]
+        ).tolist()
+        for item, proba in zip(items, probabilities):
+            item.probability = proba
+        cursor = items[-1].position
+        processed += len(items)
+        if not _update_owned(
+            job_id,
+            worker_id,
+            processed=processed,
+            lease_expires_at=datetime.utcnow() + lease,
+        ):
+            return False
+
+    _, metadata = get_pipeline_and_metadata()
+    return _update_owned(
+        job_id,
+        worker_id,
+        status=DONE,
+        lease_owner=None,
+        lease_expires_at=None,
+        error=None,
+        model_version=str(metadata.get("version", "unknown"))[:64],
+        finished_at=datetime.utcnow(),
+    )
+
+
+def _release(job: ScoringJob, worker_id: str, error: str, retry: bool) -> None:
+    """Give a job back after an error: requeue it, or fail it when out of attempts."""
+
+    if retry and job.attempts < current_app.config.get("JOBS_MAX_ATTEMPTS", 3):
+        values: Dict[str, Any] = {"status": QUEUED}
+    else:
+        values = {"status": FAILED, "finished_at": datetime.utcnow()}
+    _update_owned(
+        job.id,
+        worker_id,
+        lease_owner=None,
+        lease_expires_at=None,
+        error=error[:255],
+        **values,
+    )
+
+
+def expire_leases(worker_id: str) -> int:
+    """Make *worker_id*'s running jobs claimable now, e.g. after its process died."""
+
+    expired = ScoringJob.query.filter_by(lease_owner=worker_id, status=RUNNING).update(
+        {"lease_expires_at": datetime.utcnow()}, synchronize_session=False
+    )
+    db.session.commit()
+    return expired
+
+
+def purge(older_than: datetime) -> int:
+    """Delete finished jobs and their items; returns the number of jobs removed."""
+
+    job_ids = [
+        job_id
+        for (job_id,) in db.session.query(ScoringJob.id)
+        .filter(ScoringJob.finished_at < older_than)
+        .limit(100)
+    ]
+    if job_ids:
+        ScoringJobItem.query.filter(ScoringJobItem.job_id.in_(job_ids)).delete(
+            synchronize_session=False
+        )
+        ScoringJob.query.filter(ScoringJob.id.in_(job_ids)).delete(
+            synchronize_session=False
+        )
+    db.session.commit()
+    return len(job_ids)
+
+
+def run_worker(
+    app: Flask,
+    stop: Any = None,
+    worker_id: str | None = None,
+    exit_when_idle: bool = False,
+) -> int:
+    """Claim and run jobs until *stop* is set; returns the number of jobs completed.
+
+    With *exit_when_idle* the worker returns as soon as nothing is claimable.
+    """
+
+    stop = stop if stop is not None else threading.Event()
+    worker_id = worker_id or default_worker_id()
+    completed = 0
+    purged_at = 0.0
+    with app.app_context():
+        poll_seconds = app.config.get("JOBS_POLL_SECONDS", 1.0)
+        retention = timedelta(hours=app.config.get("JOBS_RETENTION_HOURS", 24.0))
+        while not stop.is_set():
+            try:
+                job = claim(worker_id)
+                if job is None:
+                    if exit_when_idle:
+                        break
+                    if time.monotonic() - purged_at >= _PURGE_INTERVAL_SECONDS:
+                        purge(datetime.utcnow() - retention)
+                        purged_at = time.monotonic()
+                    stop.wait(poll_seconds)
+                    continue
+                completed += _run_claimed(app, job, worker_id, stop)
+            except sa.exc.SQLAlchemyError:
+                db.session.rollback()
+                app.logger.exception(
+                    "Job queue database error; retrying in %s s", poll_seconds
+                )
+                stop.wait(poll_seconds)
+            finally:
+                db.session.remove()
+    return completed
+
+
+def _run_claimed(app: Flask, job: ScoringJob, worker_id: str, stop: Any) -> bool:
+    try:
+        return run_job(job, worker_id, stop)
+    except JobInputError as exc:
+        db.session.rollback()
+        _release(job, worker_id, str(exc), retry=False)
+    except sa.exc.SQLAlchemyError:
+        raise
+    except Exception as exc:  # noqa: BLE001 - any scoring failure is retried
+        db.session.rollback()
+        app.logger.exception("Scoring job %s failed (attempt %s)", job.id, job.attempts)
+        _release(job, worker_id, f"{type(exc).__name__}: {exc}", retry=True)
+    return False
+
+
+def _worker_main(config_class: Any, stop: Any) -> None:
+    from . import create_app  # noqa: WPS433 (the package imports this module)
+
+    # Ctrl-C reaches the whole process group; let the supervisor decide.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    run_worker(create_app(config_class), stop)
+
+
+def run_pool(processes: int, config_class: Any = None, stop: Any = None) -> None:
+    """Run *processes* worker processes until *stop* is set, replacing any that die.
+
+    A dead worker's lease is expired at once, so its job is resumed by the
+    next free worker instead of waiting for ``JOBS_LEASE_SECONDS``.
+    """
+
+    from . import create_app  # noqa: WPS433 (the package imports this module)
+
+    stop = stop if stop is not None else multiprocessing.Event()
+    app = create_app(config_class)
+
+    def spawn() -> Any:
+        process = multiprocessing.Process(
+            target=_worker_main, args=(config_class, stop), name="job-worker"
+        )
+        process.start()
+        return process
+
+    workers = [spawn() for _ in range(processes)]
+    try:
+        while not stop.wait(1.0):
+            for index, process in enumerate(workers):
+                if process.is_alive():
+                    continue
+                app.logger.warning(
+                    "Job worker %s exited with code %s; restarting it",
+                    process.pid,
+                    process.exitcode,
+                )
+                with app.app_context():
+                    expire_leases(default_worker_id(process.pid))
+                workers[index] = spawn()
+    finally:
+        stop.set()
+        for process in workers:
+            process.join(timeout=app.config.get("JOBS_LEASE_SECONDS", 60.0))
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+
+def describe(job: ScoringJob) -> Dict[str, Any]:
+    def timestamp(value: datetime | None) -> str | None:
+        return value.isoformat() + "Z" if value is not None else None
+
+    return {
+        "id": job.id,
+        "status": job.status,
+        "priority": job.priority,
+        "total": job.total,
+        "processed": job.processed,
+        "attempts": job.attempts,
+        "error": job.error,
+        "model_version": job.model_version,
+        "created_at": timestamp(job.created_at),
+        "started_at": timestamp(job.started_at),
+        "finished_at": timestamp(job.finished_at),
+    }
+
+
+def results(job: ScoringJob, after: int, limit: int) -> List[Dict[str, Any]]:
+    """Finished items of *job* after position *after*, in order (keyset pagination)."""
+
+    key = "line" if job.source is not None else "index"
+    items = (
+        ScoringJobItem.query.filter(
+            ScoringJobItem.job_id == job.id,
+            ScoringJobItem.position > after,
+            sa.or_(
+                ScoringJobItem.probability.isnot(None), ScoringJobItem.error.isnot(None)
+            ),
+        )
+        .order_by(ScoringJobItem.position)
+        .limit(limit)
+        .all()
+    )
+    page = []
+    for item in items:
+        if item.error is not None:
+            page.append({key: item.position, "error": item.error})
+        else:
+            page.append(
+                {
+                    key: item.position,
+                    "prediction": label_for(item.probability),
+                    "probability": item.probability,
+                }
+            )
+    return page
+
+
+def stats(
+    now: datetime | None = None, window: float = _METRICS_WINDOW_SECONDS
+) -> Dict[str, Any]:
+    """Queue depth by status, plus throughput of jobs finished in the last *window* s.
+
+    Computed from the database, so it covers every worker process and host.
+    """
+
+    now = datetime.utcnow() if now is None else now
+    counts = dict(
+        db.session.query(ScoringJob.status, sa.func.count())
+        .group_by(ScoringJob.status)
+        .all()
+    )
+    oldest = (
+        db.session.query(sa.func.min(ScoringJob.created_at))
+        .filter(ScoringJob.status == QUEUED)
+        .scalar()
+    )
+    finished = (
+        db.session.query(
+            ScoringJob.created_at,
+            ScoringJob.started_at,
+            ScoringJob.finished_at,
+            ScoringJob.total,
+        )
+        .filter(
+            ScoringJob.status == DONE,
+            ScoringJob.finished_at >= now - timedelta(seconds=window),
+        )
+        .all()
+    )
+    texts = sum(total or 0 for _, _, _, total in finished)
+    run_seconds = sum(
+        (finished_at - started_at).total_seconds()
+        for _, started_at, finished_at, _ in finished
+    )
+    wait_seconds = sum(
+        (started_at - created_at).total_seconds()
+        for created_at, started_at, _, _ in finished
+    )
+    return {
+        **{status: counts.get(status, 0) for status in (QUEUED, RUNNING, DONE, FAILED)},
+        "oldest_queued_seconds": (now - oldest).total_seconds()
+        if oldest is not None
+        else 0.0,
+        "window_seconds": window,
+        "jobs_completed": len(finished),
+        "texts_completed": texts,
+        "texts_per_second": texts / window,
+        "texts_per_run_second": texts / run_seconds if run_seconds else 0.0,
+        "mean_queue_wait_seconds": wait_seconds / len(finished) if finished else 0.0,
+    }
+
+
+def _snapshot() -> Dict[str, Any]:
+    try:
+        return stats()
+    except sa.exc.SQLAlchemyError:
+        db.session.rollback()
+        return {"error": "job queue database unavailable"}
+
+
+metrics.register_source("jobs", _snapshot)
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import contextlib
+import gc
+import os
+import sys
+import threading
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterator, List
+
+# Process memory accounting for GET /api/memory and scripts/memory_report.py.
+# Everything here reads /proc on demand; nothing runs on the request path
+# except the one-time load/first-inference measurements in app/spam.py.
+
+_HEAVY_PACKAGES = (
+    "numpy",
+    "onnxruntime",
+    "nltk",
+    "sklearn",
+    "scipy",
+    "sqlalchemy",
+    "flask",
+)
+
+# name -> RSS growth (bytes) measured around one-off events such as loading
+# an ONNX session or its first inference, which is when onnxruntime's CPU
+# arena allocates most of its memory.
+_EVENTS: Dict[str, List[int]] = {}
+_SEEN: set = set()
+_LOCK = threading.Lock()
+
+
+def _read_kb_fields(path: str) -> Dict[str, int]:
+    """Parse ``Name:  123 kB`` lines from a /proc file into bytes."""
+
+    fields: Dict[str, int] = {}
+    try:
+        with open(path, encoding="ascii") as proc_file:
+            for line in proc_file:
+                name, _, value = line.partition(":")
+                parts = value.split()
+                if len(parts) == 2 and parts[1] == "kB":
+                    fields[name] = int(parts[0]) * 1024
+    except OSError:
+        pass
+    return fields
+
+
+def current_rss() -> int:
+    return _read_kb_fields("/proc/self/status").get("VmRSS", 0)
+
+
+def process_memory() -> Dict[str, int]:
+    """RSS, USS (private pages), shared pages, PSS and peak RSS in bytes.
+
+    USS is what the worker would free if it exited; shared pages (code,
+    copy-on-write data inherited from a preloading gunicorn master) are
+    counted once per pod, not per worker.  PSS splits shared pages evenly
+    between the processes mapping them, so summing PSS over workers gives
+    the pod's real footprint.
+    """
+
+    status = _read_kb_fields("/proc/self/status")
+    rollup = _read_kb_fields("/proc/self/smaps_rollup")
+    if not status:  # pragma: no cover - not Linux
+        import resource  # noqa: WPS433 (POSIX only)
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {"peak_rss": peak if sys.platform == "darwin" else peak * 1024}
+
+    return {
+        "rss": status.get("VmRSS", 0),
+        "peak_rss": status.get("VmHWM", 0),
+        "uss": rollup.get("Private_Clean", 0) + rollup.get("Private_Dirty", 0),
+        "shared": rollup.get("Shared_Clean", 0) + rollup.get("Shared_Dirty", 0),
+        "pss": rollup.get("Pss", 0),
+        "anonymous": rollup.get("Anonymous", 0),
+        "swap": rollup.get("Swap", 0),
+    }
+
+
+def library_rss(limit: int = 10) -> Dict[str, int]:
+    """Resident bytes of mapped files, grouped by heavy package (or file name).
+
+    Covers the code and read-only data of shared libraries such as
+    onnxruntime's; heap memory those libraries allocate shows up in
+    ``anonymous`` instead.
+    """
+
+    totals: Dict[str, int] = {}
+    current = None
+    try:
+        with open("/proc/self/smaps", encoding="utf-8", errors="replace") as smaps:
+            for line in smaps:
+                head = line.split(None, 5)
+                if len(head) >= 5 and "-" in head[0] and ":" not in head[0]:
+                    current = (
+                        _mapping_owner(head[5].strip()) if len(head) == 6 else None
+                    )
+                elif current and line.startswith("Rss:"):
+                    totals[current] = (
+                        totals.get(current, 0) + int(line.split()[1]) * 1024
+                    )
+    except OSError:
+        return {}
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)
+    return dict(ranked[:limit])
+
+
+def _mapping_owner(path: str) -> str | None:
+    if not path.startswith("/"):
+        return None
+    parts = Path(path).parts
+    for package in _HEAVY_PACKAGES:
+        if package in parts or f"{package}.libs" in parts:
+            return package
+    return Path(path).name
+
+
+def python_heap() -> Dict[str, Any]:
+    """Interpreter view: allocator blocks, GC-tracked objects and tracemalloc totals."""
+
+    heap: Dict[str, Any] = {
+        "allocated_blocks": sys.getallocatedblocks(),
+        "gc_objects": len(gc.get_objects()),
+        "gc_counts": list(gc.get_count()),
+        "tracemalloc": tracemalloc.is_tracing(),
+    }
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        heap["traced_current"] = current
+        heap["traced_peak"] = peak
+    return heap
+
+
+@contextlib.contextmanager
+def track(name: str) -> Iterator[None]:
+    """Record the RSS growth of the ``with`` block under *name* if it completes."""
+
+    before = current_rss()
+    yield
+    with _LOCK:
+        _EVENTS.setdefault(name, []).append(current_rss() - before)
+
+
+def track_once(key: Hashable, name: str) -> contextlib.AbstractContextManager:
+    """Like :func:`track`, but only the first time *key* is seen."""
+
+    if key in _SEEN:
+        return contextlib.nullcontext()
+    with _LOCK:
+        if key in _SEEN:
+            return contextlib.nullcontext()
+        _SEEN.add(key)
+    return track(name)
+
+
+def report(libraries: int = 10) -> Dict[str, Any]:
+    """Everything the admin endpoint and CLI print for this worker."""
+
+    with _LOCK:
+        events = {name: list(deltas) for name, deltas in _EVENTS.items()}
+    loaded = [package for package in _HEAVY_PACKAGES if package in sys.modules]
+    return {
+        "pid": os.getpid(),
+        "process": process_memory(),
+        "python_heap": python_heap(),
+        "libraries": library_rss(libraries),
+        "imported": loaded,
+        # RSS growth around loading each ONNX session and around its first
+        # inference; the latter is mostly onnxruntime's CPU arena.
+        "onnx": {
+            "session_loads": events.get("onnx_session_load", []),
+            "arena_estimate": events.get("onnx_first_inference", []),
+        },
+        "events": {
+            name: deltas
+            for name, deltas in events.items()
+            if not name.startswith("onnx_")
+        },
+    }
+
+
+def allocation_diff(burst: Callable[[], Any], top: int = 15) -> Dict[str, Any]:
+    """Run *burst* between two tracemalloc snapshots; return the top growth by line.
+
+    Tracing is started (and stopped again) if it isn't already on, so only
+    allocations made during the burst that are still alive afterwards show
+    up.  Steady growth across repeated bursts points at a leak.
+    """
+
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        gc.collect()
+        before = tracemalloc.take_snapshot()
+        rss_before = current_rss()
+        burst()
+        gc.collect()
+        after = tracemalloc.take_snapshot()
+        rss_after = current_rss()
+    finally:
+        if started:
+            tracemalloc.stop()
+
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    stats = after.filter_traces(filters).compare_to(
+        before.filter_traces(filters), "lineno"
+    )
+    return {
+        "rss_growth": rss_after - rss_before,
+        "traced_growth": sum(stat.size_diff for stat in stats),
+        "top": [
+            {
+                "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                "size_diff": stat.size_diff,
+                "count_diff": stat.count_diff,
+            }
+            for stat in stats[:top]
+            if stat.size_diff
+        ],
+    }
@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Dict
+
+# Process-local registry of metric sources.  Each source is a zero-argument
+# callable returning a JSON-serializable mapping; ``snapshot`` collects all of
+# them for the admin ``/api/metrics`` endpoint.
+
+MetricsSource = Callable[[], Dict[str, Any]]
+
+_SOURCES: Dict[str, MetricsSource] = {}
+
+
+def register_source(name: str, source: MetricsSource) -> None:
+    """Register (or replace) the metrics *source* published under *name*."""
+
+    _SOURCES[name] = source
+
+
+def snapshot() -> Dict[str, Any]:
+    """Return the current values of every registered metrics source."""
+
+    return {name: source() for name, source in sorted(_SOURCES.items())}
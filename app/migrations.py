@@ -0,0 +1,281 @@
+"""Versioned schema migrations.
+
+Each migration is a numbered function that receives a SQLAlchemy
+``Connection`` and brings the schema from the previous version to its own.
+Migrations declare their tables with a private ``MetaData`` (a snapshot of the
+schema at that version) rather than importing :mod:`app.models`, so later model
+changes never alter what an old migration does.
+
+The applied version is recorded in the single-column ``schema_version`` table.
+On startup the app only needs :func:`current_version`, which is one indexed
+``SELECT``.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Callable, List, NamedTuple
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Connection, Engine
+
+SCHEMA_VERSION_TABLE = "schema_version"
+
+_version_metadata = sa.MetaData()
+schema_version = sa.Table(
+    SCHEMA_VERSION_TABLE,
+    _version_metadata,
+    sa.Column("version", sa.Integer, primary_key=True),
+    sa.Column("applied_at", sa.DateTime, nullable=False),
+)
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+def _users_id_type(conn: Connection) -> sa.types.TypeEngine:
+    """Return the column type of ``users.id`` so foreign keys match it exactly.
+
+    ``docker/mysql/init/01-init.sql`` creates ``users.id`` as ``INT UNSIGNED``,
+    and MySQL rejects foreign keys whose type differs from the referenced
+    column.
+    """
+
+    for column in sa.inspect(conn).get_columns("users"):
+        if column["name"] == "id":
+            return column["type"]
+    return sa.Integer()
+
+
+def _m0001_users(conn: Connection) -> None:
+    metadata = sa.MetaData()
+    users = sa.Table(
+        "users",
+        metadata,
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("full_name", sa.String(100), nullable=False),
+        sa.Column("username", sa.String(50), nullable=False),
+        sa.Column("email", sa.String(254), nullable=False),
+        sa.Column("phone", sa.String(20), nullable=False),
+        sa.Column("password", sa.String(128), nullable=False),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+        sa.Index("ix_users_username", "username", unique=True),
+        sa.Index("ix_users_email", "email", unique=True),
+    )
+    # Deployments that predate migrations already have this table.
+    users.create(conn, checkfirst=True)
+
+
+def _m0002_audit_logs_and_api_keys(conn: Connection) -> None:
+    metadata = sa.MetaData()
+    user_id_type = _users_id_type(conn)
+    sa.Table("users", metadata, sa.Column("id", user_id_type, primary_key=True))
+    audit_logs = sa.Table(
+        "audit_logs",
+        metadata,
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("user_id", user_id_type, sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("action", sa.String(64), nullable=False),
+        sa.Column("detail", sa.Text, nullable=True),
+        sa.Column("ip_address", sa.String(45), nullable=True),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+        sa.Index("ix_audit_logs_created_at", "created_at"),
+        sa.Index("ix_audit_logs_user_id_created_at", "user_id", "created_at"),
+    )
+    api_keys = sa.Table(
+        "api_keys",
+        metadata,
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("user_id", user_id_type, sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("name", sa.String(100), nullable=False),
+        sa.Column("key_prefix", sa.String(12), nullable=False),
+        sa.Column("key_hash", sa.String(64), nullable=False),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+        sa.Column("last_used_at", sa.DateTime, nullable=True),
+        sa.Column("revoked_at", sa.DateTime, nullable=True),
+        sa.Index("ix_api_keys_key_hash", "key_hash", unique=True),
+        sa.Index("ix_api_keys_user_id", "user_id"),
+    )
+    audit_logs.create(conn, checkfirst=True)
+    api_keys.create(conn, checkfirst=True)
+
+
+def _m0003_label_feedback(conn: Connection) -> None:
+    metadata = sa.MetaData()
+    user_id_type = _users_id_type(conn)
+    sa.Table("users", metadata, sa.Column("id", user_id_type, primary_key=True))
+    label_feedback = sa.Table(
+        "label_feedback",
+        metadata,
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("text_hash", sa.String(64), nullable=False),
+        sa.Column("text", sa.Text, nullable=False),
+        sa.Column("label", sa.SmallInteger, nullable=False),
+        sa.Column("predicted_label", sa.SmallInteger, nullable=True),
+        sa.Column("model_version", sa.String(64), nullable=True),
+        sa.Column("user_id", user_id_type, sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+        sa.Column("updated_at", sa.DateTime, nullable=False),
+        sa.Index("ix_label_feedback_text_hash", "text_hash", unique=True),
+        sa.Index("ix_label_feedback_updated_at", "updated_at"),
+    )
+    label_feedback.create(conn, checkfirst=True)
+
+
+def _m0004_scoring_jobs(conn: Connection) -> None:
+    metadata = sa.MetaData()
+    user_id_type = _users_id_type(conn)
+    sa.Table("users", metadata, sa.Column("id", user_id_type, primary_key=True))
+    scoring_jobs = sa.Table(
+        "scoring_jobs",
+        metadata,
+        sa.Column("id", sa.String(32), primary_key=True),
+        sa.Column("user_id", user_id_type, sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("status", sa.String(16), nullable=False),
+        sa.Column("priority", sa.SmallInteger, nullable=False),
+        sa.Column("source", sa.String(255), nullable=True),
+        sa.Column("total", sa.Integer, nullable=True),
+        sa.Column("processed", sa.Integer, nullable=False),
+        sa.Column("attempts", sa.Integer, nullable=False),
+        sa.Column("lease_owner", sa.String(64), nullable=True),
+        sa.Column("lease_expires_at", sa.DateTime, nullable=True),
+        sa.Column("error", sa.String(255), nullable=True),
+        sa.Column("model_version", sa.String(64), nullable=True),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+        sa.Column("started_at", sa.DateTime, nullable=True),
+        sa.Column("finished_at", sa.DateTime, nullable=True),
+        sa.Index("ix_scoring_jobs_user_id", "user_id"),
+        sa.Index("ix_scoring_jobs_finished_at", "finished_at"),
+        sa.Index(
+            "ix_scoring_jobs_status_priority_created_at",
+            "status",
+            "priority",
+            "created_at",
+        ),
+    )
+    scoring_job_items = sa.Table(
+        "scoring_job_items",
+        metadata,
+        sa.Column(
+            "job_id", sa.String(32), sa.ForeignKey("scoring_jobs.id"), primary_key=True
+        ),
+        sa.Column("position", sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column("text", sa.Text, nullable=True),
+        sa.Column("probability", sa.Float, nullable=True),
+        sa.Column("error", sa.String(100), nullable=True),
+    )
+    scoring_jobs.create(conn, checkfirst=True)
+    scoring_job_items.create(conn, checkfirst=True)
+
+
+def _m0005_prediction_history(conn: Connection) -> None:
+    metadata = sa.MetaData()
+    user_id_type = _users_id_type(conn)
+    sa.Table("users", metadata, sa.Column("id", user_id_type, primary_key=True))
+    prediction_history = sa.Table(
+        "prediction_history",
+        metadata,
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("user_id", user_id_type, sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("text_hash", sa.String(64), nullable=False),
+        sa.Column("text", sa.Text, nullable=False),
+        sa.Column("probability", sa.Float, nullable=False),
+        sa.Column("model_version", sa.String(64), nullable=True),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+        sa.Index(
+            "ix_prediction_history_user_id_created_at_id", "user_id", "created_at", "id"
+        ),
+        sa.Index(
+            "ix_prediction_history_user_id_text_hash_created_at",
+            "user_id",
+            "text_hash",
+            "created_at",
+        ),
+    )
+    prediction_history.create(conn, checkfirst=True)
+
+
+def _m0006_prediction_history_model_digest(conn: Connection) -> None:
+    columns = {
+        column["name"] for column in sa.inspect(conn).get_columns("prediction_history")
+    }
+    if "model_digest" not in columns:
+        conn.execute(
+            sa.text(
+                "ALTER TABLE prediction_history ADD COLUMN model_digest VARCHAR(64)"
+            ),
+        )
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "users table", _m0001_users),
+    Migration(2, "audit_logs and api_keys tables", _m0002_audit_logs_and_api_keys),
+    Migration(3, "label_feedback table", _m0003_label_feedback),
+    Migration(4, "scoring_jobs and scoring_job_items tables", _m0004_scoring_jobs),
+    Migration(5, "prediction_history table", _m0005_prediction_history),
+    Migration(
+        6,
+        "prediction_history.model_digest column",
+        _m0006_prediction_history_model_digest,
+    ),
+]
+
+HEAD = MIGRATIONS[-1].version
+
+
+def current_version(engine: Engine) -> int:
+    """Return the applied schema version, or ``0`` for an unmanaged database."""
+
+    try:
+        with engine.connect() as conn:
+            version = conn.execute(
+                sa.select(sa.func.max(schema_version.c.version))
+            ).scalar()
+    except sa.exc.DBAPIError:
+        # The schema_version table doesn't exist yet.
+        return 0
+    return int(version or 0)
+
+
+def upgrade(engine: Engine, target: int | None = None) -> List[int]:
+    """Apply pending migrations up to *target* (default: :data:`HEAD`).
+
+    Each migration runs and is recorded in its own transaction, so an
+    interrupted upgrade resumes from the last completed version.  Several
+    processes may upgrade at once (workers starting with
+    ``SCHEMA_AUTO_MIGRATE``): a version another process applied first is
+    skipped.  Returns the versions that were applied.
+    """
+
+    target = HEAD if target is None else target
+    try:
+        with engine.begin() as conn:
+            schema_version.create(conn, checkfirst=True)
+    except sa.exc.DBAPIError:
+        if not sa.inspect(engine).has_table(SCHEMA_VERSION_TABLE):
+            raise
+
+    applied: List[int] = []
+    start = current_version(engine)
+    for migration in MIGRATIONS:
+        if migration.version <= start or migration.version > target:
+            continue
+        try:
+            with engine.begin() as conn:
+                migration.upgrade(conn)
+                conn.execute(
+                    schema_version.insert().values(
+                        version=migration.version,
+                        applied_at=datetime.utcnow(),
+                    ),
+                )
+        except sa.exc.DBAPIError:
+            # Our DDL or schema_version row collided with a concurrent upgrade.
+            if current_version(engine) < migration.version:
+                raise
+            continue
+        applied.append(migration.version)
+    return applied
@@ -0,0 +1,433 @@
+from __future__ import annotations
+
+import asyncio
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Sequence, Tuple
+
+from flask import Flask
+
+from . import sketches
+
+# Inline scoring at SMTP time.  scripts/milter_daemon.py speaks the milter
+# protocol (version 6, as implemented by Postfix and Sendmail) to any number
+# of concurrent MTA connections on one asyncio loop.  Each message's headers
+# and body are collected and, at end of body, scored through
+# spam.predict_spam_probabilities (so preprocessing, the cascade and the
+# sidecar backend apply).  Messages from all connections that are waiting
+# while a batch is scored form the next batch.
+#
+# The daemon fails open: a message that can't be decided within
+# MILTER_DECISION_TIMEOUT, or whose scoring raises, or that arrives while
+# MILTER_MAX_PENDING messages are already waiting, is let through unscored.
+# A connection that sends nothing for MILTER_TIMEOUT seconds is closed.  The
+# MTA's milter_default_action decides what happens when the daemon is down.
+
+MILTER_VERSION = 6
+
+# Commands (MTA -> filter)
+SMFIC_ABORT = b"A"
+SMFIC_BODY = b"B"
+SMFIC_CONNECT = b"C"
+SMFIC_MACRO = b"D"
+SMFIC_BODYEOB = b"E"
+SMFIC_HELO = b"H"
+SMFIC_QUIT_NC = b"K"
+SMFIC_HEADER = b"L"
+SMFIC_MAIL = b"M"
+SMFIC_EOH = b"N"
+SMFIC_OPTNEG = b"O"
+SMFIC_QUIT = b"Q"
+SMFIC_RCPT = b"R"
+SMFIC_DATA = b"T"
+SMFIC_UNKNOWN = b"U"
+
+# Replies (filter -> MTA)
+SMFIR_ADDHEADER = b"h"
+SMFIR_CONTINUE = b"c"
+SMFIR_ACCEPT = b"a"
+SMFIR_REPLYCODE = b"y"
+SMFIR_TEMPFAIL = b"t"
+
+SMFIF_ADDHDRS = 0x01
+
+# Protocol flags: steps the MTA may skip (NO*) or not wait for a reply to (NR_*).
+SMFIP_NOCONNECT = 0x01
+SMFIP_NOHELO = 0x02
+SMFIP_NORCPT = 0x08
+SMFIP_NR_HDR = 0x80
+SMFIP_NOUNKNOWN = 0x100
+SMFIP_NODATA = 0x200
+SMFIP_NR_MAIL = 0x4000
+SMFIP_NR_EOH = 0x40000
+SMFIP_NR_BODY = 0x80000
+
+# Everything but the envelope sender, headers and body is skipped, and
+# nothing before end of body waits for a reply, when the MTA allows it.
+WANTED_PROTOCOL = (
+    SMFIP_NOCONNECT
+    | SMFIP_NOHELO
+    | SMFIP_NORCPT
+    | SMFIP_NOUNKNOWN
+    | SMFIP_NODATA
+    | SMFIP_NR_MAIL
+    | SMFIP_NR_HDR
+    | SMFIP_NR_EOH
+    | SMFIP_NR_BODY
+)
+
+# Commands answered with "continue" unless the negotiated flag says not to.
+_NO_REPLY_FLAGS = {
+    SMFIC_MAIL: SMFIP_NR_MAIL,
+    SMFIC_HEADER: SMFIP_NR_HDR,
+    SMFIC_EOH: SMFIP_NR_EOH,
+    SMFIC_BODY: SMFIP_NR_BODY,
+}
+_REPLIED = (SMFIC_CONNECT, SMFIC_HELO, SMFIC_RCPT, SMFIC_DATA, SMFIC_UNKNOWN)
+
+_LENGTH = struct.Struct(">I")
+_OPTNEG = struct.Struct(">III")
+_MAX_PACKET_BYTES = 1 << 20
+
+SPAM_HEADER = "X-Spam-Probability"
+REJECT_REPLY = b"550 5.7.1 Message rejected as spam\0"
+
+_STATS: Dict[str, int] = {
+    "connections": 0,
+    "connections_timed_out": 0,
+    "messages": 0,
+    "rejected": 0,
+    "accepted": 0,
+    "fail_open_timeout": 0,
+    "fail_open_error": 0,
+    "fail_open_overload": 0,
+    "batches": 0,
+}
+
+
+class MilterProtocolError(ValueError):
+    """A packet that doesn't follow the milter protocol."""
+
+
+def encode_packet(command: bytes, data: bytes = b"") -> bytes:
+    return _LENGTH.pack(len(data) + 1) + command + data
+
+
+async def read_packet(
+    reader: asyncio.StreamReader, timeout: float | None = None
+) -> Tuple[bytes, bytes]:
+    """Read one ``(command, data)`` packet.
+
+    Raises ``asyncio.IncompleteReadError`` at EOF.
+    """
+
+    header = await asyncio.wait_for(reader.readexactly(_LENGTH.size), timeout)
+    (length,) = _LENGTH.unpack(header)
+    if not 0 < length <= _MAX_PACKET_BYTES:
+        raise MilterProtocolError(f"bad packet length {length}")
+    packet = await asyncio.wait_for(reader.readexactly(length), timeout)
+    return packet[:1], packet[1:]
+
+
+class Scorer:
+    """Scores messages from every connection in shared batches on one thread.
+
+    Scoring runs in a single worker thread so the event loop keeps serving
+    connections meanwhile; messages that queue up during a batch are scored
+    together in the next one, up to ``max_batch``.
+    """
+
+    def __init__(self, app: Flask, max_batch: int, max_pending: int) -> None:
+        self.app = app
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self._queue: "asyncio.Queue[Tuple[bytes, str, asyncio.Future]]" = (
+            asyncio.Queue()
+        )
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="milter-scorer")
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._executor.shutdown(wait=True)
+
+    @property
+    def overloaded(self) -> bool:
+        return self._queue.qsize() >= self.max_pending
+
+    def score(self, message: bytes, sender: str = "") -> "asyncio.Future[float]":
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((message, sender, future))
+        return future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            # Messages whose connection already gave up are not scored.
+            batch = [item for item in batch if not item[2].done()]
+            if not batch:
+                continue
+            try:
+                probabilities = await loop.run_in_executor(
+                    self._executor,
+                    self._score,
+                    [message for message, _, _ in batch],
+                    [sender for _, sender, _ in batch],
+                )
+            except Exception as exc:  # noqa: BLE001 - each waiting message fails open
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            _STATS["batches"] += 1
+            for (_, _, future), proba in zip(batch, probabilities):
+                if not future.done():
+                    future.set_result(proba)
+
+    def _score(self, messages: Sequence[bytes], senders: Sequence[str]) -> List[float]:
+        from .spam import (
+            predict_spam_probabilities,
+        )  # noqa: WPS433 (spam loads the model stack)
+
+        with self.app.app_context():
+            probabilities = predict_spam_probabilities(list(messages)).tolist()
+            for sender in senders:
+                if sender:
+                    sketches.observe_sender(sender)
+        return probabilities
+
+
+class _Message:
+    __slots__ = ("sender", "headers", "body", "size")
+
+    def __init__(self) -> None:
+        self.sender = ""
+        self.headers: List[bytes] = []
+        self.body: List[bytes] = []
+        self.size = 0
+
+    def add(self, chunk: bytes, limit: int) -> None:
+        # Only the first `limit` bytes are scored; the rest is not kept.
+        room = limit - self.size
+        if room > 0:
+            self.body.append(chunk[:room])
+            self.size += min(len(chunk), room)
+
+    def raw(self) -> bytes:
+        return b"".join(self.headers) + b"\r\n" + b"".join(self.body)
+
+
+class MilterServer:
+    """Accepts MTA connections and answers each message at end of body."""
+
+    def __init__(self, app: Flask) -> None:
+        config = app.config
+        self.app = app
+        self.reject_threshold = config.get("MILTER_REJECT_THRESHOLD", 0.9)
+        self.timeout = config.get("MILTER_TIMEOUT", 30.0)
+        self.decision_timeout = config.get("MILTER_DECISION_TIMEOUT", 2.0)
+        self.max_bytes = config.get("MILTER_MAX_BYTES", 256 * 1024)
+        self.add_header = config.get("MILTER_ADD_HEADER", True)
+        self.scorer = Scorer(
+            app,
+            config.get("MILTER_MAX_BATCH", 64),
+            config.get("MILTER_MAX_PENDING", 1000),
+        )
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        _STATS["connections"] += 1
+        protocol, actions = 0, 0
+        message = _Message()
+        try:
+            while True:
+                try:
+                    command, data = await read_packet(reader, self.timeout)
+                except asyncio.TimeoutError:
+                    _STATS["connections_timed_out"] += 1
+                    return
+                if command == SMFIC_OPTNEG:
+                    protocol, actions = self._negotiate(writer, data)
+                elif command == SMFIC_MACRO:
+                    continue
+                elif command == SMFIC_MAIL:
+                    message = _Message()
+                    message.sender = (
+                        data.split(b"\0", 1)[0].decode("utf-8", "replace").strip("<>")
+                    )
+                elif command == SMFIC_HEADER:
+                    name, _, value = data.rstrip(b"\0").partition(b"\0")
+                    message.headers.append(name + b": " + value + b"\r\n")
+                elif command == SMFIC_BODY:
+                    message.add(data, self.max_bytes)
+                elif command == SMFIC_BODYEOB:
+                    message.add(data, self.max_bytes)
+                    writer.write(await self._decide(message, actions))
+                    message = _Message()
+                    await writer.drain()
+                    continue
+                elif command in (SMFIC_ABORT, SMFIC_QUIT_NC):
+                    message = _Message()
+                    continue
+                elif command == SMFIC_QUIT:
+                    return
+                if command in _REPLIED or (
+                    command in _NO_REPLY_FLAGS
+                    and not protocol & _NO_REPLY_FLAGS[command]
+                ):
+                    writer.write(encode_packet(SMFIR_CONTINUE))
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, MilterProtocolError):
+            return
+        finally:
+            writer.close()
+
+    def _negotiate(self, writer: asyncio.StreamWriter, data: bytes) -> Tuple[int, int]:
+        try:
+            _, offered_actions, offered_protocol = _OPTNEG.unpack_from(data)
+        except struct.error as exc:
+            raise MilterProtocolError("bad option negotiation") from exc
+        actions = offered_actions & (SMFIF_ADDHDRS if self.add_header else 0)
+        protocol = offered_protocol & WANTED_PROTOCOL
+        writer.write(
+            encode_packet(SMFIC_OPTNEG, _OPTNEG.pack(MILTER_VERSION, actions, protocol))
+        )
+        return protocol, actions
+
+    async def _decide(self, message: _Message, actions: int) -> bytes:
+        _STATS["messages"] += 1
+        if self.scorer.overloaded:
+            _STATS["fail_open_overload"] += 1
+            return encode_packet(SMFIR_CONTINUE)
+        future = self.scorer.score(message.raw(), message.sender)
+        try:
+            proba = await asyncio.wait_for(future, self.decision_timeout)
+        except asyncio.TimeoutError:
+            _STATS["fail_open_timeout"] += 1
+            return encode_packet(SMFIR_CONTINUE)
+        except Exception:  # noqa: BLE001 - fail open, but leave a trace
+            _STATS["fail_open_error"] += 1
+            self.app.logger.exception("Scoring a message failed; accepting it unscored")
+            return encode_packet(SMFIR_CONTINUE)
+
+        if proba >= self.reject_threshold:
+            _STATS["rejected"] += 1
+            return encode_packet(SMFIR_REPLYCODE, REJECT_REPLY)
+        _STATS["accepted"] += 1
+        reply = b""
+        if actions & SMFIF_ADDHDRS:
+            reply = encode_packet(
+                SMFIR_ADDHEADER, f"{SPAM_HEADER}\0{proba:.4f}\0".encode("ascii")
+            )
+        return reply + encode_packet(SMFIR_CONTINUE)
+
+
+async def serve(
+    app: Flask,
+    host: str,
+    port: int,
+    stop: asyncio.Event,
+    started: "asyncio.Future | None" = None,
+) -> None:
+    """Run the milter on *host*:*port* until *stop* is set.
+
+    *started*, if given, receives the bound port (useful with port 0).
+    """
+
+    milter = MilterServer(app)
+    milter.scorer.start()
+    server = await asyncio.start_server(milter.handle, host, port)
+    bound = server.sockets[0].getsockname()[1]
+    app.logger.info("Milter listening on %s:%s", host, bound)
+    if started is not None:
+        started.set_result(bound)
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        server.close()
+        await server.wait_closed()
+        await milter.scorer.close()
+
+
+def stats() -> Dict[str, int]:
+    return dict(_STATS)
+
+
+class MtaClient:
+    """The MTA side of one milter connection, for the simulator and tests."""
+
+    OFFERED_PROTOCOL = WANTED_PROTOCOL
+
+    def __init__(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.protocol = 0
+        self.actions = 0
+
+    @classmethod
+    async def connect(
+        cls, host: str, port: int, protocol: int | None = None
+    ) -> "MtaClient":
+        reader, writer = await asyncio.open_connection(host, port)
+        client = cls(reader, writer)
+        offered = cls.OFFERED_PROTOCOL if protocol is None else protocol
+        writer.write(
+            encode_packet(
+                SMFIC_OPTNEG, _OPTNEG.pack(MILTER_VERSION, SMFIF_ADDHDRS, offered)
+            )
+        )
+        _, data = await read_packet(reader)
+        _, client.actions, client.protocol = _OPTNEG.unpack(data)
+        return client
+
+    async def _send(self, command: bytes, data: bytes = b"") -> None:
+        self.writer.write(encode_packet(command, data))
+        if command in _NO_REPLY_FLAGS and not self.protocol & _NO_REPLY_FLAGS[command]:
+            await self.writer.drain()
+            reply, _ = await read_packet(self.reader)
+            if reply != SMFIR_CONTINUE:
+                raise MilterProtocolError(f"unexpected reply {reply!r} to {command!r}")
+
+    async def deliver(
+        self, sender: str, headers: Sequence[Tuple[str, str]], body: bytes
+    ) -> Tuple[bytes, List[Tuple[bytes, bytes]]]:
+        """Send one message; return the final reply and any modifications before it."""
+
+        await self._send(SMFIC_MAIL, f"<{sender}>\0".encode("utf-8"))
+        for name, value in headers:
+            await self._send(SMFIC_HEADER, f"{name}\0{value}\0".encode("utf-8"))
+        await self._send(SMFIC_EOH)
+        for start in range(0, len(body), 65535):
+            await self._send(SMFIC_BODY, body[start : start + 65535])
+        self.writer.write(encode_packet(SMFIC_BODYEOB))
+        await self.writer.drain()
+        modifications = []
+        while True:
+            reply, data = await read_packet(self.reader)
+            if reply in (SMFIR_CONTINUE, SMFIR_ACCEPT, SMFIR_REPLYCODE, SMFIR_TEMPFAIL):
+                return reply, modifications
+            modifications.append((reply, data))
+
+    async def abort(self) -> None:
+        self.writer.write(encode_packet(SMFIC_ABORT))
+        await self.writer.drain()
+
+    async def close(self) -> None:
+        self.writer.write(encode_packet(SMFIC_QUIT))
+        try:
+            await self.writer.drain()
+        except ConnectionError:
+            pass
+        self.writer.close()
@@ -0,0 +1,358 @@
+from __future__ import annotations
+
+import binascii
+import codecs
+import io
+import re
+import time
+from email.header import decode_header, make_header
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Tuple
+
+from . import metrics
+
+# Per-message limits for the extraction stage.  Input beyond MAX_MESSAGE_BYTES
+# is ignored, parts after the first MAX_MIME_PARTS are dropped and multiparts
+# nested deeper than MAX_MIME_DEPTH are skipped.  These limits depend only on
+# the message, so training (ml/pipeline.py) and serving (app/spam.py) see
+# identical text and cached preprocessing output stays valid.
+#
+# MAX_MESSAGE_SECONDS is an additional wall-clock budget that only serving
+# passes (app.spam.prepare_served_text); extraction then stops with whatever
+# it has.  It is never applied by default because its result depends on load.
+MAX_MESSAGE_BYTES = 512 * 1024
+MAX_MIME_PARTS = 100
+MAX_MIME_DEPTH = 8
+MAX_MESSAGE_SECONDS = 0.05
+
+_HEADER_LINE = re.compile(r"^([A-Za-z0-9][A-Za-z0-9-]*):[ \t]", re.MULTILINE)
+_KNOWN_HEADERS = frozenset(
+    {
+        "from",
+        "to",
+        "cc",
+        "subject",
+        "date",
+        "received",
+        "return-path",
+        "message-id",
+        "reply-to",
+        "delivered-to",
+    },
+)
+_MIME_HEADERS = frozenset({"content-type", "mime-version", "content-transfer-encoding"})
+_HTML_HINT = re.compile(
+    r"<\s*(html|body|div|p|br|table|td|span|a|font|img)\b", re.IGNORECASE
+)
+_PARAM = re.compile(r';\s*([A-Za-z0-9*-]+)\s*=\s*(?:"([^"]*)"|([^;\s]+))')
+
+_STATS: Dict[str, int] = {
+    "plain": 0,
+    "html": 0,
+    "mime": 0,
+    "byte_budget_hit": 0,
+    "part_budget_hit": 0,
+    "depth_budget_hit": 0,
+    "time_budget_hit": 0,
+}
+
+
+def looks_like_mime(text: str) -> bool:
+    """Return True if *text* starts with an RFC 822 header block."""
+
+    head = text[:8192].replace("\r\n", "\n")
+    end = head.find("\n\n")
+    if end <= 0 or not _HEADER_LINE.match(head):
+        return False
+    names = {match.group(1).lower() for match in _HEADER_LINE.finditer(head[:end])}
+    return bool(names & _MIME_HEADERS) or len(names & _KNOWN_HEADERS) >= 2
+
+
+class _HTMLText(HTMLParser):
+    """Collect the visible text of an HTML document fed in arbitrary chunks."""
+
+    _SKIP = frozenset({"script", "style"})
+    _BREAKS = frozenset({"br", "p", "div", "tr", "td", "li", "h1", "h2", "h3", "table"})
+
+    def __init__(self, emit: Callable[[str], None]) -> None:
+        super().__init__(convert_charrefs=True)
+        self._emit = emit
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):  # type: ignore[override]
+        if tag in self._SKIP:
+            self._skip_depth += 1
+        elif tag in self._BREAKS:
+            self._emit(" ")
+
+    def handle_endtag(self, tag):  # type: ignore[override]
+        if tag in self._SKIP and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag in self._BREAKS:
+            self._emit(" ")
+
+    def handle_data(self, data):  # type: ignore[override]
+        if not self._skip_depth:
+            self._emit(data)
+
+
+class _TextPart:
+    """Incrementally decode one text/* MIME part into the output."""
+
+    def __init__(
+        self, encoding: str, charset: str, html: bool, emit: Callable[[str], None]
+    ) -> None:
+        self.encoding = encoding
+        try:
+            self._decoder = codecs.getincrementaldecoder(charset)(errors="replace")
+        except LookupError:
+            self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._html = _HTMLText(emit) if html else None
+        self._emit = emit
+        self._b64_rest = b""
+
+    def feed(self, line: bytes) -> None:
+        if self.encoding == "base64":
+            chunk = self._b64_rest + line.strip()
+            usable = len(chunk) // 4 * 4
+            self._b64_rest = chunk[usable:]
+            try:
+                data = binascii.a2b_base64(chunk[:usable])
+            except binascii.Error:
+                return
+        elif self.encoding == "quoted-printable":
+            data = binascii.a2b_qp(line)
+        else:
+            data = line
+        self._text(self._decoder.decode(data))
+
+    def close(self) -> None:
+        self._text(self._decoder.decode(b"", final=True))
+        if self._html is not None:
+            self._html.close()
+
+    def _text(self, text: str) -> None:
+        if not text:
+            return
+        if self._html is not None:
+            self._html.feed(text)
+        else:
+            self._emit(text)
+
+
+def _parse_content_type(value: str) -> Tuple[str, Dict[str, str]]:
+    content_type = value.split(";", 1)[0].strip().lower() or "text/plain"
+    params = {
+        match.group(1).lower(): match.group(2)
+        if match.group(2) is not None
+        else match.group(3)
+        for match in _PARAM.finditer(value)
+    }
+    return content_type, params
+
+
+def _decode_header_value(value: str) -> str:
+    try:
+        return str(make_header(decode_header(value)))
+    except (LookupError, ValueError, UnicodeDecodeError):
+        return value
+
+
+class _Extractor:
+    """Single pass over a raw message, line by line.
+
+    Headers are parsed per part; text/plain and text/html bodies are decoded
+    as they are read; every other part (attachments, images, ...) is skipped
+    without being decoded or buffered.  Within ``multipart/alternative`` only
+    the first text rendering is kept.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        max_parts: int = MAX_MIME_PARTS,
+        max_depth: int = MAX_MIME_DEPTH,
+        max_seconds: float | None = None,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.max_parts = max_parts
+        self.max_depth = max_depth
+        self.deadline = (
+            time.perf_counter() + max_seconds if max_seconds is not None else None
+        )
+        self.parts = 0
+        self.stopped = False
+        self.out: List[str] = []
+        self.out_len = 0
+        # Each open multipart: [boundary, is_alternative, emitted_text]
+        self.multiparts: List[list] = []
+        self.headers: List[bytes] = []
+        self.in_headers = True
+        self.is_message_headers = True
+        self.part: _TextPart | None = None
+
+    def run(self, data: bytes) -> str:
+        consumed = 0
+        for index, line in enumerate(io.BytesIO(data)):
+            consumed += len(line)
+            if consumed > self.max_bytes:
+                _STATS["byte_budget_hit"] += 1
+                break
+            if (
+                self.deadline is not None
+                and index & 63 == 0
+                and time.perf_counter() > self.deadline
+            ):
+                _STATS["time_budget_hit"] += 1
+                break
+            self._line(line)
+            if self.stopped:
+                break
+        if self.in_headers and self.headers:
+            self._end_headers()
+        self._close_part()
+        return "".join(self.out).strip()
+
+    def _emit(self, text: str) -> None:
+        room = self.max_bytes - self.out_len
+        if room <= 0:
+            return
+        text = text[:room]
+        self.out.append(text)
+        self.out_len += len(text)
+
+    def _close_part(self) -> None:
+        if self.part is not None:
+            self.part.close()
+            self.part = None
+            self._emit("\n")
+
+    def _line(self, line: bytes) -> None:
+        if self.multiparts and line.startswith(b"--"):
+            marker = line.rstrip()
+            for depth in range(len(self.multiparts) - 1, -1, -1):
+                boundary = b"--" + self.multiparts[depth][0]
+                if marker == boundary or marker == boundary + b"--":
+                    self._close_part()
+                    del self.multiparts[depth + 1 :]
+                    if marker == boundary:
+                        self.parts += 1
+                        if self.parts > self.max_parts:
+                            _STATS["part_budget_hit"] += 1
+                            self.stopped = True
+                            return
+                        self.in_headers = True
+                        self.is_message_headers = False
+                        self.headers = []
+                    else:
+                        self.multiparts.pop()
+                        self.in_headers = False
+                    return
+
+        if self.in_headers:
+            stripped = line.rstrip(b"\r\n")
+            if not stripped:
+                self._end_headers()
+            elif stripped[:1] in (b" ", b"\t") and self.headers:
+                self.headers[-1] += b" " + stripped.strip()
+            else:
+                self.headers.append(stripped)
+            return
+
+        if self.part is not None:
+            self.part.feed(line)
+
+    def _end_headers(self) -> None:
+        headers: Dict[str, str] = {}
+        for raw in self.headers:
+            name, _, value = raw.decode("utf-8", errors="replace").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        self.headers = []
+        self.in_headers = False
+
+        if self.is_message_headers and headers.get("subject"):
+            self._emit(_decode_header_value(headers["subject"]) + "\n")
+
+        content_type, params = _parse_content_type(
+            headers.get("content-type", "text/plain")
+        )
+        encoding = headers.get("content-transfer-encoding", "7bit").lower()
+        attachment = (
+            headers.get("content-disposition", "").lower().startswith("attachment")
+        )
+
+        if content_type.startswith("multipart/") and params.get("boundary"):
+            if len(self.multiparts) >= self.max_depth:
+                # Without its boundary, the nested body is skipped as opaque.
+                _STATS["depth_budget_hit"] += 1
+                return
+            boundary = params["boundary"].encode("latin-1", errors="ignore")
+            self.multiparts.append(
+                [boundary, content_type == "multipart/alternative", False]
+            )
+            return
+
+        if content_type == "message/rfc822":
+            self.in_headers = True
+            self.is_message_headers = True
+            return
+
+        if attachment or content_type not in {"text/plain", "text/html"}:
+            return
+
+        if self.multiparts and self.multiparts[-1][1]:
+            if self.multiparts[-1][2]:
+                return
+            self.multiparts[-1][2] = True
+
+        self.part = _TextPart(
+            encoding,
+            params.get("charset", "utf-8"),
+            html=content_type == "text/html",
+            emit=self._emit,
+        )
+
+
+def _strip_html(text: str) -> str:
+    pieces: List[str] = []
+    parser = _HTMLText(pieces.append)
+    parser.feed(text)
+    parser.close()
+    return "".join(pieces).strip()
+
+
+def extract_text(
+    raw: str | bytes,
+    max_bytes: int = MAX_MESSAGE_BYTES,
+    max_seconds: float | None = None,
+) -> str:
+    """Return the human-readable text of *raw*, which may be a full MIME email.
+
+    Plain text is returned unchanged (up to *max_bytes*), HTML is reduced to
+    its visible text, and MIME messages are reduced to their subject plus
+    decoded text parts.  *max_seconds* bounds MIME extraction by wall-clock
+    time; leave it unset wherever the output must be reproducible.
+    """
+
+    if isinstance(raw, bytes):
+        head = raw[:8192].decode("latin-1")
+        if looks_like_mime(head):
+            _STATS["mime"] += 1
+            return _Extractor(max_bytes, max_seconds=max_seconds).run(raw)
+        text = raw[:max_bytes].decode("utf-8", errors="replace")
+    else:
+        if looks_like_mime(raw):
+            _STATS["mime"] += 1
+            data = raw.encode("utf-8", errors="surrogateescape")
+            return _Extractor(max_bytes, max_seconds=max_seconds).run(data)
+        text = raw[:max_bytes]
+
+    if "<" in text and _HTML_HINT.search(text):
+        _STATS["html"] += 1
+        return _strip_html(text)
+
+    _STATS["plain"] += 1
+    return text
+
+
+metrics.register_source("preprocess", lambda: dict(_STATS))
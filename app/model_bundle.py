@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import json
+import struct
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+# Single-file model bundle: serving reads one file instead of model.onnx plus
+# metadata.json.  Layout:
+#
+#   MAGIC (8 bytes) | metadata length (uint32 LE) | metadata JSON | ONNX bytes
+
+BUNDLE_FILENAME = "model.bundle"
+MAGIC = b"SPMBNDL1"
+_HEADER = struct.Struct("<8sI")
+
+
+def write_bundle(path: Path, onnx_bytes: bytes, metadata: Dict[str, Any]) -> None:
+    """Write *onnx_bytes* and *metadata* to a bundle file at *path*."""
+
+    meta_bytes = json.dumps(metadata, separators=(",", ":")).encode("utf-8")
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with tmp_path.open("wb") as bundle_file:
+        bundle_file.write(_HEADER.pack(MAGIC, len(meta_bytes)))
+        bundle_file.write(meta_bytes)
+        bundle_file.write(onnx_bytes)
+    tmp_path.replace(path)
+
+
+def read_bundle(path: Path) -> Tuple[bytes, Dict[str, Any]]:
+    """Return ``(onnx_bytes, metadata)`` from the bundle at *path*."""
+
+    raw = path.read_bytes()
+    if len(raw) < _HEADER.size:
+        raise ValueError(f"Model bundle {path} is truncated")
+
+    magic, meta_len = _HEADER.unpack_from(raw)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a model bundle")
+
+    meta_end = _HEADER.size + meta_len
+    metadata = json.loads(raw[_HEADER.size : meta_end].decode("utf-8"))
+    return raw[meta_end:], metadata
@@ -1,6 +1,10 @@
 from __future__ import annotations
 
-from datetime import datetime
+import hashlib
+import secrets
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
 
 from .extensions import db
 from .security import hash_password, verify_password
@@ -24,3 +28,251 @@ class User(db.Model):
 
     def check_password(self, raw_password: str) -> bool:
         return verify_password(raw_password, self.password)
+
+
+class AuditLog(db.Model):
+    """Append-only record of security-relevant and administrative actions."""
+
+    __tablename__ = "audit_logs"
+    __table_args__ = (
+        db.Index("ix_audit_logs_user_id_created_at", "user_id", "created_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
+    action = db.Column(db.String(64), nullable=False)
+    detail = db.Column(db.Text, nullable=True)
+    ip_address = db.Column(db.String(45), nullable=True)
+    created_at = db.Column(
+        db.DateTime, nullable=False, default=datetime.utcnow, index=True
+    )
+
+    @classmethod
+    def record(
+        cls,
+        action: str,
+        user_id: int | None = None,
+        detail: str | None = None,
+        ip_address: str | None = None,
+    ) -> "AuditLog":
+        """Add an entry for *action*; the caller commits."""
+
+        entry = cls(
+            user_id=user_id,
+            action=action,
+            detail=detail,
+            ip_address=ip_address[:45] if ip_address else None,
+        )
+        db.session.add(entry)
+        return entry
+
+
+class ApiKey(db.Model):
+    """API key for programmatic access; only a SHA-256 digest of the key is stored."""
+
+    __tablename__ = "api_keys"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("users.id"), nullable=False, index=True
+    )
+    name = db.Column(db.String(100), nullable=False)
+    key_prefix = db.Column(db.String(12), nullable=False)
+    key_hash = db.Column(db.String(64), nullable=False, unique=True, index=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, nullable=True)
+    revoked_at = db.Column(db.DateTime, nullable=True)
+
+    @staticmethod
+    def hash_key(raw_key: str) -> str:
+        # Keys are random and high-entropy, so a fast digest is sufficient and
+        # keeps per-request lookups cheap (unlike bcrypt for passwords).
+        return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def issue(cls, user_id: int, name: str) -> tuple["ApiKey", str]:
+        """Create a new key for *user_id*; return the model and the raw key."""
+
+        raw_key = "smc_" + secrets.token_urlsafe(32)
+        api_key = cls(
+            user_id=user_id,
+            name=name,
+            key_prefix=raw_key[:12],
+            key_hash=cls.hash_key(raw_key),
+        )
+        return api_key, raw_key
+
+    @classmethod
+    def find_active(cls, raw_key: str) -> "ApiKey | None":
+        return cls.query.filter_by(
+            key_hash=cls.hash_key(raw_key), revoked_at=None
+        ).first()
+
+    def touch(self, resolution: float = 60.0) -> bool:
+        """Update ``last_used_at``; return True if it changed and needs a commit.
+
+        Within *resolution* seconds of the last update nothing is written, so
+        a busy key costs at most one UPDATE per interval.
+        """
+
+        now = datetime.utcnow()
+        if self.last_used_at is not None and now - self.last_used_at < timedelta(
+            seconds=resolution
+        ):
+            return False
+        self.last_used_at = now
+        return True
+
+
+class LabelFeedback(db.Model):
+    """A user-corrected label for a message, consumed by ``ml/incremental.py``.
+
+    There is one row per distinct text, keyed by its SHA-256 digest, so
+    resubmitting a text updates its label instead of adding a duplicate.
+    ``updated_at`` is the incremental trainer's watermark.
+    """
+
+    __tablename__ = "label_feedback"
+
+    id = db.Column(db.Integer, primary_key=True)
+    text_hash = db.Column(db.String(64), nullable=False, unique=True, index=True)
+    text = db.Column(db.Text, nullable=False)
+    label = db.Column(db.SmallInteger, nullable=False)
+    predicted_label = db.Column(db.SmallInteger, nullable=True)
+    model_version = db.Column(db.String(64), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(
+        db.DateTime, nullable=False, default=datetime.utcnow, index=True
+    )
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def record(
+        cls,
+        text: str,
+        label: int,
+        predicted_label: int | None = None,
+        model_version: str | None = None,
+        user_id: int | None = None,
+    ) -> "LabelFeedback":
+        """Insert or update the feedback row for *text*; the caller commits."""
+
+        text_hash = cls.hash_text(text)
+        values = {
+            "label": label,
+            "predicted_label": predicted_label,
+            "model_version": model_version,
+            "user_id": user_id,
+            "updated_at": datetime.utcnow(),
+        }
+        feedback = cls.query.filter_by(text_hash=text_hash).first()
+        if feedback is None:
+            try:
+                with db.session.begin_nested():
+                    feedback = cls(text_hash=text_hash, text=text, **values)
+                    db.session.add(feedback)
+                return feedback
+            except IntegrityError:
+                # A concurrent submission of the same text inserted it first.
+                feedback = cls.query.filter_by(text_hash=text_hash).one()
+        for key, value in values.items():
+            setattr(feedback, key, value)
+        return feedback
+
+
+class ScoringJob(db.Model):
+    """An asynchronous batch scoring job (``POST /api/jobs``), run by :mod:`app.jobs`.
+
+    A worker owns a running job only while its lease (``lease_owner`` until
+    ``lease_expires_at``) is current and renews it after every batch.  A job
+    whose lease ran out is claimed again, up to ``JOBS_MAX_ATTEMPTS`` times,
+    and resumes after the last batch that was committed.
+    """
+
+    __tablename__ = "scoring_jobs"
+    __table_args__ = (
+        db.Index(
+            "ix_scoring_jobs_status_priority_created_at",
+            "status",
+            "priority",
+            "created_at",
+        ),
+    )
+
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("users.id"), nullable=True, index=True
+    )
+    status = db.Column(db.String(16), nullable=False)
+    priority = db.Column(db.SmallInteger, nullable=False, default=0)
+    # Input file relative to JOBS_INPUT_DIR; None when the texts came inline.
+    source = db.Column(db.String(255), nullable=True)
+    total = db.Column(db.Integer, nullable=True)
+    processed = db.Column(db.Integer, nullable=False, default=0)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    lease_owner = db.Column(db.String(64), nullable=True)
+    lease_expires_at = db.Column(db.DateTime, nullable=True)
+    error = db.Column(db.String(255), nullable=True)
+    model_version = db.Column(db.String(64), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True, index=True)
+
+
+class ScoringJobItem(db.Model):
+    """One message of a :class:`ScoringJob` and, once scored, its spam probability.
+
+    ``position`` is the index in the submitted ``texts``, or the line number
+    for file jobs.  Lines that could not be parsed are stored with ``error``
+    instead of ``text``.
+    """
+
+    __tablename__ = "scoring_job_items"
+
+    job_id = db.Column(
+        db.String(32), db.ForeignKey("scoring_jobs.id"), primary_key=True
+    )
+    position = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    text = db.Column(db.Text, nullable=True)
+    probability = db.Column(db.Float, nullable=True)
+    error = db.Column(db.String(100), nullable=True)
+
+
+class PredictionHistory(db.Model):
+    """One ``/predict`` submission by a signed-in user, written by :mod:`app.history`.
+
+    Pages are read newest first with keyset pagination on
+    ``(created_at, id)``; ``(user_id, text_hash, created_at)`` finds a
+    user's recent result for the same text.
+    """
+
+    __tablename__ = "prediction_history"
+    __table_args__ = (
+        db.Index(
+            "ix_prediction_history_user_id_created_at_id", "user_id", "created_at", "id"
+        ),
+        db.Index(
+            "ix_prediction_history_user_id_text_hash_created_at",
+            "user_id",
+            "text_hash",
+            "created_at",
+        ),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    text_hash = db.Column(db.String(64), nullable=False)
+    text = db.Column(db.Text, nullable=False)
+    probability = db.Column(db.Float, nullable=False)
+    model_version = db.Column(db.String(64), nullable=True)
+    # Identifies the exact model that scored the row (see app.spam.model_key).
+    model_digest = db.Column(db.String(64), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from flask import current_app
+
+from . import metrics
+
+NUM_PERMUTATIONS = 32
+BANDS = 8
+ROWS = NUM_PERMUTATIONS // BANDS
+
+# Universal hash family h(x) = (a * x + b) mod p over 32-bit feature hashes.
+# a, b < 2**31 keeps a * x + b below 2**64, so uint64 arithmetic is exact.
+_PRIME = 4_294_967_291
+_HASH_PARAMS: Any = None
+
+_STATS: Dict[str, int] = {
+    "lookups": 0,
+    "hits": 0,
+    "inserts": 0,
+    "evicted_ttl": 0,
+    "evicted_size": 0,
+}
+
+_INDEX: "NearDuplicateIndex | None" = None
+
+
+def shingles(processed_text: str) -> set[str]:
+    """Word 1- and 2-grams, with every token containing a digit collapsed to ``#``.
+
+    Links, reference numbers and amounts are what usually changes between
+    campaign variants, so collapsing them keeps variants similar.
+    """
+
+    words = [
+        "#" if any(char.isdigit() for char in word) else word
+        for word in processed_text.split()
+    ]
+    return set(words) | {f"{first} {second}" for first, second in zip(words, words[1:])}
+
+
+def minhash(processed_text: str) -> bytes:
+    """MinHash signature (``NUM_PERMUTATIONS`` uint32s) of ``transform_text`` output.
+
+    The fraction of equal positions in two signatures estimates the Jaccard
+    similarity of the texts' feature sets.  Features are hashed with CRC32
+    rather than ``hash()``, which is salted per process, so signatures (and
+    which variants match) are the same in every worker and every run.
+    """
+
+    global _HASH_PARAMS
+
+    import numpy as np  # noqa: WPS433 (deferred heavy import)
+
+    if _HASH_PARAMS is None:
+        rng = np.random.default_rng(0x5EED)
+        _HASH_PARAMS = (
+            rng.integers(1, 2**31, NUM_PERMUTATIONS, dtype=np.uint64),
+            rng.integers(0, 2**31, NUM_PERMUTATIONS, dtype=np.uint64),
+        )
+    a, b = _HASH_PARAMS
+
+    features = shingles(processed_text)
+    hashes = np.fromiter(
+        (zlib.crc32(feature.encode("utf-8")) for feature in features),
+        dtype=np.uint64,
+        count=len(features),
+    )
+    if not len(hashes):
+        return bytes(4 * NUM_PERMUTATIONS)
+    permuted = (hashes[:, None] * a + b) % _PRIME
+    return permuted.min(axis=0).astype(np.uint32).tobytes()
+
+
+def similarity(first: bytes, second: bytes) -> float:
+    """Estimated Jaccard similarity of two :func:`minhash` signatures."""
+
+    import numpy as np  # noqa: WPS433 (deferred heavy import)
+
+    return float(
+        np.mean(
+            np.frombuffer(first, dtype=np.uint32)
+            == np.frombuffer(second, dtype=np.uint32)
+        )
+    )
+
+
+class NearDuplicateIndex:
+    """Bounded, expiring MinHash LSH index from signatures to spam probabilities.
+
+    Signatures are split into ``BANDS`` bands of ``ROWS`` values.  Messages
+    whose signatures agree on a whole band become candidates, which happens
+    with probability ``1 - (1 - J**ROWS)**BANDS`` for Jaccard similarity J:
+    about 98% at J = 0.8, but under 2% at J = 0.3.  Each candidate is then
+    checked against *threshold*.
+
+    Each bucket only remembers the most recent entry, which is enough to reuse
+    a campaign's result and keeps memory at roughly 1 KB per entry.  Entries
+    expire after *ttl* seconds, and the oldest are dropped once there are more
+    than *max_entries*.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        max_entries: int = 20_000,
+        ttl: float = 3600.0,
+        confidence: float = 0.95,
+        min_tokens: int = 8,
+    ) -> None:
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.confidence = confidence
+        self.min_tokens = min_tokens
+
+        self._buckets: List[Dict[bytes, int]] = [{} for _ in range(BANDS)]
+        # entry id -> (signature, probability, expires_at); insertion order is age order
+        self._entries: "OrderedDict[int, Tuple[bytes, float, float]]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _keys(signature: bytes) -> List[bytes]:
+        width = 4 * ROWS
+        return [signature[band * width : (band + 1) * width] for band in range(BANDS)]
+
+    def _remove_oldest(self) -> None:
+        entry_id, (signature, _, _) = self._entries.popitem(last=False)
+        for buckets, key in zip(self._buckets, self._keys(signature)):
+            if buckets.get(key) == entry_id:
+                del buckets[key]
+
+    def _evict(self, now: float) -> None:
+        while self._entries and next(iter(self._entries.values()))[2] <= now:
+            self._remove_oldest()
+            _STATS["evicted_ttl"] += 1
+        while len(self._entries) > self.max_entries:
+            self._remove_oldest()
+            _STATS["evicted_size"] += 1
+
+    def eligible(self, processed_text: str) -> bool:
+        # Very short messages collide too easily to be trusted.
+        return processed_text.count(" ") + 1 >= self.min_tokens
+
+    def lookup(self, signature: bytes, now: float | None = None) -> float | None:
+        """Return the probability of a live near-duplicate of *signature*, if any."""
+
+        now = time.monotonic() if now is None else now
+        _STATS["lookups"] += 1
+        with self._lock:
+            seen = set()
+            for buckets, key in zip(self._buckets, self._keys(signature)):
+                entry_id = buckets.get(key)
+                if entry_id is None or entry_id in seen:
+                    continue
+                seen.add(entry_id)
+                stored, proba, expires_at = self._entries[entry_id]
+                if expires_at > now and similarity(stored, signature) >= self.threshold:
+                    _STATS["hits"] += 1
+                    return proba
+        return None
+
+    def add(self, signature: bytes, proba: float, now: float | None = None) -> bool:
+        """Remember a confident result; False if *proba* isn't confident enough."""
+
+        if max(proba, 1.0 - proba) < self.confidence:
+            return False
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (signature, proba, now + self.ttl)
+            for buckets, key in zip(self._buckets, self._keys(signature)):
+                buckets[key] = entry_id
+            self._evict(now)
+        _STATS["inserts"] += 1
+        return True
+
+    def score(
+        self, processed_texts: Sequence[str], infer: Callable[[List[str]], Any]
+    ) -> Any:
+        """Return spam probabilities; *infer* runs only for texts without a near-dup."""
+
+        import numpy as np  # noqa: WPS433 (deferred heavy import)
+
+        probabilities = np.zeros(len(processed_texts), dtype=np.float64)
+        signatures: Dict[int, bytes] = {}
+        misses: List[int] = []
+        for index, text in enumerate(processed_texts):
+            if self.eligible(text):
+                signatures[index] = minhash(text)
+                proba = self.lookup(signatures[index])
+                if proba is not None:
+                    probabilities[index] = proba
+                    continue
+            misses.append(index)
+
+        if misses:
+            inferred = infer([processed_texts[index] for index in misses])
+            probabilities[misses] = inferred
+            for index, proba in zip(misses, inferred.tolist()):
+                if index in signatures:
+                    self.add(signatures[index], proba)
+        return probabilities
+
+
+def get_index() -> NearDuplicateIndex | None:
+    """Return the process-wide index if ``NEARDUP_ENABLED``, creating it lazily."""
+
+    global _INDEX
+
+    config = current_app.config
+    if not config.get("NEARDUP_ENABLED", False):
+        return None
+    if _INDEX is None:
+        _INDEX = NearDuplicateIndex(
+            threshold=config.get("NEARDUP_THRESHOLD", 0.8),
+            max_entries=config.get("NEARDUP_MAX_ENTRIES", 20_000),
+            ttl=config.get("NEARDUP_TTL_SECONDS", 3600.0),
+            confidence=config.get("NEARDUP_CONFIDENCE", 0.95),
+            min_tokens=config.get("NEARDUP_MIN_TOKENS", 8),
+        )
+    return _INDEX
+
+
+def reset() -> None:
+    """Drop all remembered results, e.g. after a new model is loaded."""
+
+    global _INDEX
+
+    _INDEX = None
+
+
+def _snapshot() -> Dict[str, Any]:
+    return {**_STATS, "entries": len(_INDEX) if _INDEX is not None else 0}
+
+
+metrics.register_source("neardup", _snapshot)
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import cProfile
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List
+
+from flask import Flask, Response, current_app, g, request
+
+from . import metrics
+
+PROFILE_HEADER = "X-Profile"
+FORMATS = ("pstats", "collapsed")
+
+_STATS: Dict[str, int] = {
+    "profiled": 0,
+    "requested": 0,
+    "sampled": 0,
+    "skipped_busy": 0,
+    "files_removed": 0,
+}
+
+
+class StackSampler:
+    """Sampling profiler for one thread that produces collapsed stacks.
+
+    A background thread records the target thread's Python stack every
+    *interval* seconds.  :meth:`collapsed` returns one ``root;...;leaf count``
+    line per distinct stack, the input format of ``flamegraph.pl`` and
+    speedscope.  While CPU-bound Python code runs, samples can't be taken
+    more often than the interpreter's switch interval (5 ms by default).
+    """
+
+    def __init__(self, interval: float = 0.001) -> None:
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        self._target = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="profile-sampler", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack: List[str] = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.samples.most_common()
+        )
+
+
+def init_app(app: Flask) -> None:
+    """Register the profiling hooks if ``PROFILE_ENABLED``.
+
+    When disabled nothing is registered, so requests don't pay for a single
+    extra function call.
+    """
+
+    if not app.config.get("PROFILE_ENABLED", False):
+        return
+    app.before_request(_start)
+    app.after_request(_finish)
+    app.teardown_request(_teardown)
+
+
+def _privileged() -> bool:
+    expected = current_app.config.get("ADMIN_TOKEN") or ""
+    supplied = request.headers.get("X-Admin-Token", "")
+    return bool(expected) and hmac.compare_digest(supplied, expected)
+
+
+def _start() -> None:
+    config = current_app.config
+    if request.path not in config.get("PROFILE_PATHS", ()):
+        return
+
+    requested = request.headers.get(PROFILE_HEADER)
+    if requested and _privileged():
+        _STATS["requested"] += 1
+    elif random.random() < config.get("PROFILE_SAMPLE_RATE", 0.0):
+        _STATS["sampled"] += 1
+        requested = None
+    else:
+        return
+
+    profile_format = (
+        requested if requested in FORMATS else config.get("PROFILE_FORMAT", "pstats")
+    )
+    if profile_format == "collapsed":
+        profiler: Any = StackSampler(config.get("PROFILE_INTERVAL_MS", 1.0) / 1000)
+        profiler.start()
+    else:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Only one deterministic profiler can be active per process.
+            _STATS["skipped_busy"] += 1
+            return
+    g.profile = (profiler, profile_format, time.time())
+
+
+def _stop_and_write() -> str | None:
+    active = g.pop("profile", None)
+    if active is None:
+        return None
+    profiler, profile_format, started = active
+
+    directory = Path(current_app.config.get("PROFILE_DIR", "profiles"))
+    directory.mkdir(parents=True, exist_ok=True)
+    endpoint = request.path.strip("/").replace("/", "_") or "root"
+    suffix = "collapsed" if profile_format == "collapsed" else "prof"
+    stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(started))
+    name = f"{stamp}-{os.getpid()}-{endpoint}-{uuid.uuid4().hex[:8]}.{suffix}"
+
+    if profile_format == "collapsed":
+        profiler.stop()
+        (directory / name).write_text(profiler.collapsed(), encoding="utf-8")
+    else:
+        profiler.disable()
+        profiler.dump_stats(str(directory / name))
+    _STATS["profiled"] += 1
+    _prune(directory, current_app.config.get("PROFILE_MAX_FILES", 200))
+    return name
+
+
+def _prune(directory: Path, keep: int) -> None:
+    # Other workers prune the same directory, so any file may vanish between
+    # listing and stat(); those are skipped rather than failing the request.
+    dated = []
+    for path in directory.iterdir():
+        if path.suffix not in (".prof", ".collapsed"):
+            continue
+        try:
+            dated.append((path.stat().st_mtime, path))
+        except OSError:
+            continue
+    profiles = [path for _, path in sorted(dated)]
+    for path in profiles[: max(0, len(profiles) - keep)]:
+        try:
+            path.unlink()
+            _STATS["files_removed"] += 1
+        except OSError:
+            pass
+
+
+def _finish(response: Response) -> Response:
+    name = _stop_and_write()
+    if name is not None:
+        response.headers["X-Profile-File"] = name
+    return response
+
+
+def _teardown(exc: BaseException | None) -> None:
+    # after_request doesn't run when a view raises; still stop the profiler.
+    _stop_and_write()
+
+
+metrics.register_source("profiling", lambda: dict(_STATS))
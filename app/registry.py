@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import json
+import random
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Sequence, Tuple
+
+from flask import current_app
+
+from . import metrics
+from .model_bundle import BUNDLE_FILENAME
+from .spam import load_model
+
+# Version directory names as written by ml/train.py and ml/incremental.py
+# (e.g. "v1.0", "v1.0+ft.20260101T000000").  Anything else, in particular
+# path separators and "..", is rejected before touching the filesystem.
+_VERSION_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._+-]{0,63}$")
+
+# An InferenceSession holds the model's initializers plus the graph and
+# allocator state; twice the file size is a conservative estimate.
+_SESSION_SIZE_FACTOR = 2
+
+VERSION_HEADER = "X-Model-Version"
+VERSION_PARAM = "model_version"
+
+_STATS: Dict[str, int] = {"hits": 0, "loads": 0, "evictions": 0, "load_errors": 0}
+
+_REGISTRY: "ModelRegistry | None" = None
+_REGISTRY_LOCK = threading.Lock()
+
+
+class UnknownModelVersion(LookupError):
+    """Raised when a requested version has no model under ``MODEL_DIR``."""
+
+
+class ModelRegistry:
+    """LRU pool of ONNX sessions for the versions under ``MODEL_DIR/<version>/``.
+
+    Sessions are loaded on first use and kept until the estimated size of all
+    loaded sessions exceeds *max_bytes*; the least recently used unpinned
+    version is then dropped.  *pinned* versions are never evicted and are
+    loaded up front by :meth:`preload`.  Requests already holding an evicted
+    session keep it alive until they finish.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        max_bytes: int,
+        pinned: Sequence[str] = (),
+        loader: Callable[[Path], Tuple[Any, Dict[str, Any]]] = load_model,
+    ) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.pinned = frozenset(pinned)
+        self._loader = loader
+        # version -> (session, metadata, estimated bytes); most recently used last
+        self._entries: "OrderedDict[str, Tuple[Any, Dict[str, Any], int]]" = (
+            OrderedDict()
+        )
+        self._loading: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def loaded_bytes(self) -> int:
+        return sum(size for _, _, size in self._entries.values())
+
+    def version_dir(self, version: str) -> Path:
+        if not _VERSION_PATTERN.match(version):
+            raise UnknownModelVersion(version)
+        version_dir = self.root / version
+        if not (
+            (version_dir / BUNDLE_FILENAME).exists()
+            or (version_dir / "model.onnx").exists()
+        ):
+            raise UnknownModelVersion(version)
+        return version_dir
+
+    def versions(self) -> List[str]:
+        """Names of the version directories that contain a servable model."""
+
+        if not self.root.is_dir():
+            return []
+        return sorted(
+            path.name
+            for path in self.root.iterdir()
+            if path.is_dir()
+            and _VERSION_PATTERN.match(path.name)
+            and ((path / BUNDLE_FILENAME).exists() or (path / "model.onnx").exists())
+        )
+
+    def get(self, version: str) -> Tuple[Any, Dict[str, Any]]:
+        """Return ``(session, metadata)`` for *version*, loading it if needed."""
+
+        with self._lock:
+            entry = self._entries.get(version)
+            if entry is not None:
+                self._entries.move_to_end(version)
+                _STATS["hits"] += 1
+                return entry[0], entry[1]
+
+        # Checked before a load lock exists, so bogus versions leave nothing behind.
+        version_dir = self.version_dir(version)
+        with self._lock:
+            load_lock = self._loading.setdefault(version, threading.Lock())
+
+        # Loading takes a while; only requests for the same version wait on it.
+        try:
+            with load_lock:
+                with self._lock:
+                    entry = self._entries.get(version)
+                    if entry is not None:
+                        self._entries.move_to_end(version)
+                        _STATS["hits"] += 1
+                        return entry[0], entry[1]
+
+                try:
+                    session, metadata = self._loader(version_dir)
+                except Exception:
+                    _STATS["load_errors"] += 1
+                    raise
+                metadata = {**metadata, "version": metadata.get("version") or version}
+                size = _estimate_size(version_dir)
+
+                with self._lock:
+                    self._entries[version] = (session, metadata, size)
+                    _STATS["loads"] += 1
+                    self._evict(keep=version)
+        finally:
+            with self._lock:
+                if self._loading.get(version) is load_lock:
+                    del self._loading[version]
+        return session, metadata
+
+    def _evict(self, keep: str) -> None:
+        total = self.loaded_bytes
+        for version in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            if version == keep or version in self.pinned:
+                continue
+            total -= self._entries.pop(version)[2]
+            _STATS["evictions"] += 1
+
+    def preload(self) -> List[str]:
+        """Load every pinned version; returns the versions that failed to load."""
+
+        failed = []
+        for version in sorted(self.pinned):
+            try:
+                self.get(version)
+            except Exception:
+                failed.append(version)
+        return failed
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            loaded = {version: size for version, (_, _, size) in self._entries.items()}
+        return {
+            "loaded": list(loaded),
+            "pinned": sorted(self.pinned),
+            "loaded_bytes": sum(loaded.values()),
+            "max_bytes": self.max_bytes,
+        }
+
+
+def _estimate_size(version_dir: Path) -> int:
+    for name in (BUNDLE_FILENAME, "model.onnx"):
+        path = version_dir / name
+        if path.exists():
+            return path.stat().st_size * _SESSION_SIZE_FACTOR
+    return 0
+
+
+class Route:
+    """A ``MODEL_ROUTES`` rule mapping matching requests to a model version.
+
+    ``{"header": "X-Tenant", "equals": "acme", "version": "v2.0"}`` matches a
+    header value exactly, ``"prefix"`` matches its start (useful for
+    ``Accept-Language``), and ``{"percent": 5, "version": "v2.1"}`` sends a
+    share of traffic to a canary.  Canary assignment hashes the ``"key"``
+    header (``X-API-Key`` by default) so each client stays on one version.
+    """
+
+    def __init__(self, rule: Mapping[str, Any]) -> None:
+        self.version = str(rule["version"])
+        self.header = rule.get("header")
+        self.equals = rule.get("equals")
+        self.prefix = rule.get("prefix")
+        self.percent = rule.get("percent")
+        self.key = rule.get("key", "X-API-Key")
+
+    def matches(self, headers: Mapping[str, str]) -> bool:
+        if self.header is not None:
+            value = headers.get(self.header)
+            if value is None:
+                return False
+            if self.equals is not None and value != self.equals:
+                return False
+            if self.prefix is not None and not value.lower().startswith(
+                str(self.prefix).lower()
+            ):
+                return False
+        if self.percent is not None:
+            key = headers.get(self.key)
+            bucket = (
+                zlib.crc32(key.encode("utf-8")) % 100 if key else random.randrange(100)
+            )
+            if bucket >= float(self.percent):
+                return False
+        return True
+
+
+def parse_routes(raw: str | None) -> List[Route]:
+    """Parse ``MODEL_ROUTES``: a JSON list of rules, tried in order."""
+
+    if not raw:
+        return []
+    return [Route(rule) for rule in json.loads(raw)]
+
+
+def select_version(headers: Mapping[str, str], args: Mapping[str, str]) -> str | None:
+    """Return the version a request asks for, or ``None`` for the default model.
+
+    An explicit ``X-Model-Version`` header wins over the ``model_version``
+    query parameter, which wins over the first matching ``MODEL_ROUTES`` rule.
+    """
+
+    version = headers.get(VERSION_HEADER) or args.get(VERSION_PARAM)
+    if version:
+        return version
+    routes = current_app.extensions.get("model_routes")
+    if routes is None:
+        routes = current_app.extensions["model_routes"] = parse_routes(
+            current_app.config.get("MODEL_ROUTES")
+        )
+    for route in routes:
+        if route.matches(headers):
+            return route.version
+    return None
+
+
+def get_registry() -> ModelRegistry:
+    """Return the process-wide registry for ``MODEL_DIR``, creating it on first use."""
+
+    global _REGISTRY
+
+    if _REGISTRY is None:
+        with _REGISTRY_LOCK:
+            if _REGISTRY is None:
+                config = current_app.config
+                _REGISTRY = ModelRegistry(
+                    Path(config.get("MODEL_DIR", "model")),
+                    max_bytes=int(config.get("MODEL_POOL_MAX_MB", 512) * 1024 * 1024),
+                    pinned=[
+                        version
+                        for version in config.get("MODEL_PINNED_VERSIONS", [])
+                        if version
+                    ],
+                )
+    return _REGISTRY
+
+
+def _snapshot() -> Dict[str, Any]:
+    pool = _REGISTRY.snapshot() if _REGISTRY is not None else {}
+    return {**_STATS, **pool}
+
+
+metrics.register_source("models", _snapshot)
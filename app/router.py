@@ -0,0 +1,446 @@
+from __future__ import annotations
+
+import bisect
+import hmac
+import itertools
+import re
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from flask import Blueprint, Flask, Response, abort, current_app, jsonify, request
+
+from spam_client.errors import TransportError
+from spam_client.transport import ConnectionPool
+from spam_client.transport import Response as BackendResponse
+
+from . import codecs
+from .config import Config, get_config
+from .neardup import shingles
+
+# Cache-affine routing for several instances of this app.  The router is a
+# separate, model-free Flask app (router_wsgi.py) that forwards prediction
+# requests so that the same and nearly the same messages land on the same
+# backend, where that backend's near-duplicate index and other per-process
+# caches can answer them.  Backends are placed on a consistent-hash ring, so
+# when one joins or leaves only the keys it owns move.
+
+_TOKEN_PATTERN = re.compile(r"\b\w+\b")
+_MINHASH_SEEDS = (0x9E3779B9, 0x85EBCA6B)
+
+FORWARDED_HEADERS = (
+    "Content-Type",
+    "Accept",
+    "X-API-Key",
+    "X-Model-Version",
+    "X-Request-Deadline",
+)
+RELAYED_HEADERS = ("Content-Type", "Retry-After", "X-Model-Version", "Vary")
+BACKEND_HEADER = "X-Backend"
+STRATEGIES = ("hash", "round_robin")
+
+router_bp = Blueprint("router", __name__)
+
+
+def fingerprint(text: str) -> int:
+    """32-bit routing key for *text*: two MinHash values of its word bigrams.
+
+    Bigrams come from :func:`app.neardup.shingles` over lowercased, unstemmed
+    tokens, with tokens containing digits collapsed.  Campaign variants that
+    differ only in names, links or numbers therefore usually share the key.
+    Two messages share it with probability about J**2, where J is the Jaccard
+    similarity of their bigram sets.  That is about 0.9 for J = 0.95.
+    Requiring two minima rather than one keeps unrelated messages that share
+    boilerplate from piling onto one backend.  Identical messages always
+    share the key.
+    """
+
+    features = shingles(" ".join(_TOKEN_PATTERN.findall(text.lower())))
+    grams = [feature.encode("utf-8") for feature in features if " " in feature]
+    grams = grams or [feature.encode("utf-8") for feature in features]
+    if not grams:
+        return zlib.crc32(text.encode("utf-8"))
+    minima = [
+        min(grams, key=lambda gram, seed=seed: zlib.crc32(gram, seed))
+        for seed in _MINHASH_SEEDS
+    ]
+    return zlib.crc32(b"\0".join(minima))
+
+
+class HashRing:
+    """Consistent-hash ring with *replicas* virtual points per node."""
+
+    def __init__(self, nodes: Iterable[str], replicas: int = 128) -> None:
+        self.nodes = sorted(set(nodes))
+        points = sorted(
+            (zlib.crc32(f"{node}#{replica}".encode("utf-8")), node)
+            for node in self.nodes
+            for replica in range(replicas)
+        )
+        self._hashes = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def candidates(self, key: int) -> Iterator[str]:
+        """Distinct nodes clockwise from *key*: the owner first, then failover order."""
+
+        if not self._hashes:
+            return
+        start = bisect.bisect(self._hashes, key)
+        seen = set()
+        for offset in range(len(self._owners)):
+            node = self._owners[(start + offset) % len(self._owners)]
+            if node not in seen:
+                seen.add(node)
+                yield node
+                if len(seen) == len(self.nodes):
+                    return
+
+
+class Router:
+    """Forwards requests to healthy backends chosen by *strategy*.
+
+    ``"hash"`` routes by the consistent-hash ring over the healthy backends;
+    ``"round_robin"`` ignores the key (useful as a baseline).  A backend that
+    fails at the connection level is taken off the ring at once and the
+    request moves on to the next candidate; the health checker puts it back
+    when ``health_path`` answers 200 again.
+    """
+
+    def __init__(
+        self,
+        backends: Sequence[str],
+        strategy: str = "hash",
+        replicas: int = 128,
+        timeout: float = 10.0,
+        pool_size: int = 16,
+        health_interval: float = 5.0,
+        health_path: str = "/api/health",
+        max_attempts: int = 2,
+    ) -> None:
+        if strategy not in STRATEGIES:
+            raise ValueError(
+                f"Unknown routing strategy {strategy!r}; expected one of {STRATEGIES}"
+            )
+        self.strategy = strategy
+        self.replicas = replicas
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.health_interval = health_interval
+        self.health_path = health_path
+        self.max_attempts = max_attempts
+        self.membership_changes = 0
+
+        self._lock = threading.Lock()
+        self._pools: Dict[str, ConnectionPool] = {}
+        self._healthy: set = set()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._ring = HashRing([], replicas)
+        self._turn = itertools.count()
+        self._checker: threading.Thread | None = None
+        self.set_backends(backends)
+
+    def set_backends(self, backends: Sequence[str]) -> None:
+        """Replace the backend set; new backends are healthy until a check fails."""
+
+        wanted = [backend.rstrip("/") for backend in backends]
+        with self._lock:
+            for backend in set(self._pools) - set(wanted):
+                self._pools.pop(backend).close()
+                self._healthy.discard(backend)
+            for backend in wanted:
+                if backend not in self._pools:
+                    self._pools[backend] = ConnectionPool(
+                        backend, size=self.pool_size, timeout=self.timeout
+                    )
+                    self._stats.setdefault(
+                        backend, {"requests": 0, "failures": 0, "ejected": 0}
+                    )
+                    self._healthy.add(backend)
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        self._ring = HashRing(self._healthy, self.replicas)
+        self.membership_changes += 1
+
+    def mark(self, backend: str, healthy: bool) -> None:
+        with self._lock:
+            if backend not in self._pools or (backend in self._healthy) == healthy:
+                return
+            if healthy:
+                self._healthy.add(backend)
+            else:
+                self._healthy.discard(backend)
+                self._stats[backend]["ejected"] += 1
+            self._rebuild()
+
+    def candidates(self, key: int) -> List[str]:
+        with self._lock:
+            ring, healthy, configured = (
+                self._ring,
+                sorted(self._healthy),
+                sorted(self._pools),
+            )
+        if not healthy:
+            # Nothing known to be up: try everything rather than fail outright.
+            return configured[: self.max_attempts]
+        if self.strategy == "round_robin":
+            turn = next(self._turn) % len(healthy)
+            ordered = healthy[turn:] + healthy[:turn]
+        else:
+            ordered = list(ring.candidates(key))
+        return ordered[: self.max_attempts]
+
+    def forward(
+        self, key: int, path: str, body: bytes, headers: Dict[str, str]
+    ) -> Tuple[str, BackendResponse]:
+        """POST *body* to the backend owning *key*; fail over on connection errors."""
+
+        last_error: Exception | None = None
+        for backend in self.candidates(key):
+            pool = self._pools.get(backend)
+            if pool is None:
+                continue
+            self._stats[backend]["requests"] += 1
+            try:
+                return backend, pool.request("POST", path, body, headers)
+            except TransportError as exc:
+                self._stats[backend]["failures"] += 1
+                self.mark(backend, False)
+                last_error = exc
+        raise TransportError(f"no backend could serve {path}: {last_error}")
+
+    def check_health(self) -> None:
+        with self._lock:
+            pools = list(self._pools.items())
+        for backend, pool in pools:
+            try:
+                healthy = pool.request("GET", self.health_path, b"", {}).status == 200
+            except TransportError:
+                healthy = False
+            self.mark(backend, healthy)
+
+    def start(self) -> None:
+        """Start the background health checker (once, in the serving process)."""
+
+        if self._checker is not None or self.health_interval <= 0:
+            return
+        with self._lock:
+            if self._checker is not None:
+                return
+            self._checker = threading.Thread(
+                target=self._check_forever, name="router-health", daemon=True
+            )
+            self._checker.start()
+
+    def _check_forever(self) -> None:
+        while True:
+            time.sleep(self.health_interval)
+            self.check_health()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "strategy": self.strategy,
+                "healthy": sorted(self._healthy),
+                "membership_changes": self.membership_changes,
+                "backends": {
+                    backend: dict(stats)
+                    for backend, stats in self._stats.items()
+                    if backend in self._pools
+                },
+            }
+
+
+def get_router() -> Router:
+    return current_app.extensions["router"]
+
+
+def _require_admin() -> None:
+    expected = current_app.config.get("ADMIN_TOKEN") or ""
+    supplied = request.headers.get("X-Admin-Token", "")
+    if not expected or not hmac.compare_digest(supplied, expected):
+        abort(403)
+
+
+def _decode() -> Dict[str, Any]:
+    request.get_data()  # keep the raw body cached for forwarding
+    try:
+        data = codecs.decode_request(request)
+    except codecs.UnsupportedMediaType:
+        abort(415)
+    return data if isinstance(data, dict) else {}
+
+
+def _forward_headers() -> Dict[str, str]:
+    return {
+        name: request.headers[name]
+        for name in FORWARDED_HEADERS
+        if name in request.headers
+    }
+
+
+def _relay(backend: str, upstream: BackendResponse) -> Response:
+    response = Response(upstream.body, status=upstream.status)
+    for name in RELAYED_HEADERS:
+        if name.lower() in upstream.headers:
+            response.headers[name] = upstream.headers[name.lower()]
+    response.headers[BACKEND_HEADER] = backend
+    return response
+
+
+@router_bp.route("/api/predict", methods=["POST"])
+def predict():
+    text = _decode().get("text")
+    if not isinstance(text, str) or not text.strip():
+        return codecs.error(
+            request, "Field 'text' is required and must be a non-empty string.", 400
+        )
+    try:
+        backend, upstream = get_router().forward(
+            fingerprint(text), "/api/predict", request.get_data(), _forward_headers()
+        )
+    except TransportError:
+        return codecs.error(request, "No backend is available.", 502)
+    return _relay(backend, upstream)
+
+
+@router_bp.route("/api/predict/batch", methods=["POST"])
+def predict_batch():
+    """Split a batch by owning backend, score parts in parallel, reassemble in order."""
+
+    data = _decode()
+    texts = data.get("texts")
+    if (
+        not isinstance(texts, list)
+        or not texts
+        or not all(isinstance(text, str) for text in texts)
+    ):
+        return codecs.error(
+            request, "Field 'texts' is required and must be a non-empty list.", 400
+        )
+
+    router = get_router()
+    groups: Dict[str, List[int]] = {}
+    keys: Dict[str, int] = {}
+    for index, text in enumerate(texts):
+        key = fingerprint(text)
+        owners = router.candidates(key)
+        owner = owners[0] if owners else ""
+        groups.setdefault(owner, []).append(index)
+        keys.setdefault(owner, key)
+
+    headers = {
+        **_forward_headers(),
+        "Content-Type": codecs.JSON_MIMETYPE,
+        "Accept": codecs.JSON_MIMETYPE,
+    }
+    extra = {name: value for name, value in data.items() if name != "texts"}
+
+    bodies = {
+        owner: codecs.encode(
+            {**extra, "texts": [texts[index] for index in indexes]},
+            codecs.JSON_MIMETYPE,
+        )
+        for owner, indexes in groups.items()
+    }
+
+    def send(owner: str) -> Tuple[str, BackendResponse]:
+        return router.forward(keys[owner], "/api/predict/batch", bodies[owner], headers)
+
+    try:
+        if len(groups) == 1:
+            results = [send(next(iter(groups)))]
+        else:
+            with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+                results = list(executor.map(send, groups))
+    except TransportError:
+        return codecs.error(request, "No backend is available.", 502)
+
+    for backend, upstream in results:
+        if upstream.status != 200:
+            return _relay(backend, upstream)
+
+    predictions: List[Any] = [None] * len(texts)
+    probabilities: List[Any] = [None] * len(texts)
+    explanations: List[Any] = [None] * len(texts)
+    payload: Dict[str, Any] = {}
+    for owner, (_, upstream) in zip(groups, results):
+        part = codecs.loads_json(upstream.body)
+        for position, index in enumerate(groups[owner]):
+            predictions[index] = part["predictions"][position]
+            probabilities[index] = part["probabilities"][position]
+            if "explanations" in part:
+                explanations[index] = part["explanations"][position]
+        payload.setdefault("model_version", part.get("model_version"))
+        if "explanations" in part:
+            payload["explanations"] = explanations
+    payload.update(predictions=predictions, probabilities=probabilities)
+    return codecs.respond(
+        request,
+        payload,
+        headers={BACKEND_HEADER: ",".join(backend for backend, _ in results)},
+    )
+
+
+@router_bp.route("/api/health", methods=["GET"])
+def health():
+    snapshot = get_router().snapshot()
+    status = 200 if snapshot["healthy"] else 503
+    return (
+        jsonify(
+            {
+                "status": "ok" if status == 200 else "no healthy backends",
+                "healthy": len(snapshot["healthy"]),
+            }
+        ),
+        status,
+    )
+
+
+@router_bp.route("/api/router", methods=["GET"])
+def router_state():
+    _require_admin()
+    return jsonify(get_router().snapshot())
+
+
+@router_bp.route("/api/router/backends", methods=["POST"])
+def router_backends():
+    """Replace the backend list (admin only); the ring is rebuilt at once."""
+
+    _require_admin()
+    backends = (request.get_json(silent=True) or {}).get("backends")
+    if not isinstance(backends, list) or not all(
+        isinstance(backend, str) for backend in backends
+    ):
+        return jsonify({"error": "Field 'backends' must be a list of base URLs."}), 400
+    router = get_router()
+    router.set_backends(backends)
+    router.check_health()
+    return jsonify(router.snapshot())
+
+
+def create_router(config_class: type[Config] | None = None) -> Flask:
+    """Application factory for router mode (see ``router_wsgi.py``).
+
+    Backends come from ``ROUTER_BACKENDS``.  The router loads no model and
+    has no database.
+    """
+
+    app = Flask(__name__)
+    app.config.from_object(config_class or get_config())
+    config = app.config
+    app.extensions["router"] = Router(
+        config.get("ROUTER_BACKENDS", []),
+        strategy=config.get("ROUTER_STRATEGY", "hash"),
+        replicas=config.get("ROUTER_REPLICAS", 128),
+        timeout=config.get("ROUTER_TIMEOUT", 10.0),
+        pool_size=config.get("ROUTER_POOL_SIZE", 16),
+        health_interval=config.get("ROUTER_HEALTH_INTERVAL", 5.0),
+    )
+    app.register_blueprint(router_bp)
+    # Started on the first request so that it runs in each gunicorn worker,
+    # not in a master process that forks afterwards.
+    app.before_request(app.extensions["router"].start)
+    return app
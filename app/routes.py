@@ -1,11 +1,59 @@
 from __future__ import annotations
 
-from flask import Blueprint, flash, jsonify, redirect, render_template, request, session, url_for
-
-from .extensions import db
+import hmac
+import os
+import random
+import time
+from pathlib import Path
+
+from flask import (
+    Blueprint,
+    abort,
+    current_app,
+    flash,
+    jsonify,
+    make_response,
+    Response,
+    redirect,
+    render_template,
+    request,
+    session,
+    stream_with_context,
+    url_for,
+)
+
+from . import (
+    codecs,
+    explain,
+    history,
+    jobs,
+    memory,
+    metrics,
+    shadow,
+    sketches,
+    streaming,
+)
+from .admission import (
+    DeadlineExceeded,
+    Overloaded,
+    admit,
+    check_deadline,
+    parse_deadline,
+)
+from .caching import cached_page
+from .extensions import csrf, db
 from .forms import LoginForm, PredictForm, RegistrationForm
-from .models import User
-from .spam import get_pipeline_and_metadata, predict_spam_label
+from .models import ApiKey, AuditLog, LabelFeedback, ScoringJob, User
+from .registry import UnknownModelVersion, get_registry, select_version
+from .spam import (
+    get_pipeline_and_metadata,
+    label_for,
+    load_model,
+    model_key,
+    predict_spam_label,
+    prepare_served_text,
+    score_texts,
+)
 
 
 main_bp = Blueprint("main", __name__)
@@ -17,13 +65,40 @@ def _require_login() -> bool:
     return bool(session.get("user_id"))
 
 
+def _require_admin() -> None:
+    """Abort with 403 unless the request carries the configured admin token."""
+
+    expected = current_app.config.get("ADMIN_TOKEN") or ""
+    supplied = request.headers.get("X-Admin-Token", "")
+    if not expected or not hmac.compare_digest(supplied, expected):
+        abort(403)
+
+
+@main_bp.app_errorhandler(Overloaded)
+def handle_overloaded(exc: Overloaded):
+    headers = {"Retry-After": str(exc.retry_after)}
+    if request.path.startswith("/api/"):
+        return codecs.error(
+            request, "Server is overloaded. Please retry later.", 503, headers
+        )
+    return "Server is overloaded. Please retry later.", 503, headers
+
+
+@main_bp.app_errorhandler(DeadlineExceeded)
+def handle_deadline_exceeded(exc: DeadlineExceeded):
+    if request.path.startswith("/api/"):
+        return codecs.error(request, "Request deadline exceeded.", 504)
+    return "Request deadline exceeded.", 504
+
+
 @main_bp.route("/")
+@cached_page
 def home() -> str:
     return render_template("home.html")
 
 
-
 @main_bp.route("/about")
+@cached_page
 def about() -> str:
     return render_template("about.html")
 
@@ -47,8 +122,53 @@ def predict() -> str:
         flash("Please provide a valid message.", "error")
         return render_template("index.html", form=form), 400
 
-    label, confidence = predict_spam_label(form.message.data)
-    return render_template("result.html", prediction=label, confidence=confidence)
+    text = form.message.data
+    user_id = session["user_id"]
+    metadata = _serving_metadata() if history.enabled() else None
+    serving_key = model_key(metadata) if metadata is not None else None
+    confidence = (
+        history.lookup(user_id, text, serving_key) if serving_key is not None else None
+    )
+    from_history = confidence is not None
+    if from_history:
+        label = label_for(confidence)
+    else:
+        with admit(parse_deadline(request.headers)):
+            label, confidence = predict_spam_label(text)
+
+    response = make_response(
+        render_template(
+            "result.html",
+            prediction=label,
+            confidence=confidence,
+            from_history=from_history,
+        ),
+    )
+    if history.enabled() and not from_history:
+        history.record(
+            response, user_id, text, confidence, metadata.get("version"), serving_key
+        )
+    return response
+
+
+@main_bp.route("/history", methods=["GET"])
+def prediction_history() -> str:
+    """The signed-in user's ``/predict`` submissions, newest first, a keyset page."""
+
+    if not _require_login():
+        return redirect(url_for("main.signin"))
+
+    try:
+        entries, next_cursor = history.page(
+            session["user_id"],
+            before=request.args.get("before"),
+            limit=current_app.config.get("HISTORY_PAGE_SIZE", 20),
+        )
+    except ValueError:
+        abort(400)
+    return render_template(
+        "history.html", entries=entries, next_cursor=next_cursor, label_for=label_for
+    )
 
 
 @main_bp.route("/signup", methods=["GET", "POST"])
@@ -63,6 +183,8 @@ def signup() -> str:
         )
         user.set_password(form.password.data)
         db.session.add(user)
+        db.session.flush()
+        AuditLog.record("user.signup", user.id, ip_address=request.remote_addr)
         db.session.commit()
         flash("Registration successful. Please sign in.", "success")
         return redirect(url_for("main.signin"))
@@ -77,6 +199,8 @@ def signin() -> str:
         email = form.email.data.strip().lower()
         user = User.query.filter_by(email=email).first()
         if user and user.check_password(form.password.data):
+            AuditLog.record("user.signin", user.id, ip_address=request.remote_addr)
+            db.session.commit()
             session["user_id"] = user.id
             session["user_email"] = user.email
             session["user_name"] = user.full_name
@@ -86,6 +210,13 @@ def signin() -> str:
             flash("Signed in successfully.", "success")
             return redirect(url_for("main.index"))
 
+        AuditLog.record(
+            "user.signin_failed",
+            user.id if user else None,
+            detail=email[:254],
+            ip_address=request.remote_addr,
+        )
+        db.session.commit()
         flash("Invalid email or password.", "error")
 
     return render_template("signin.html", form=form)
@@ -93,58 +224,615 @@ def signin() -> str:
 
 @main_bp.route("/logout")
 def logout() -> str:
+    if session.get("user_id"):
+        AuditLog.record(
+            "user.logout", session["user_id"], ip_address=request.remote_addr
+        )
+        db.session.commit()
     session.clear()
     flash("You have been logged out.", "success")
     return redirect(url_for("main.home"))
 
 
-from .extensions import db, csrf
+MAX_TEXT_LENGTH = 10_000
+_EXPLAIN_MAX_TOP_K = 50
+
+
+def _load_metadata_or_error():
+    """Return ``(metadata, None)``, or ``(None, error_response)`` if loading fails."""
+
+    try:
+        _, metadata = get_pipeline_and_metadata()
+    except FileNotFoundError:
+        return None, codecs.error(
+            request,
+            "Model is not available yet. Train the model or contact an administrator.",
+            503,
+        )
+    except Exception:
+        return None, codecs.error(
+            request, "Model could not be loaded. Please try again later.", 500
+        )
+    return metadata, None
+
+
+def _serving_metadata() -> dict | None:
+    """Return the default model's metadata, or ``None`` if it won't load."""
+
+    try:
+        _, metadata = get_pipeline_and_metadata()
+    except Exception:
+        # Scoring will fail the same way and report it.
+        return None
+    return metadata
+
+
+def _resolve_model():
+    """Return ``(session, metadata, model_dir, error_response)`` for the request.
+
+    ``session`` is ``None`` when the default model in ``MODEL_DIR`` serves the
+    request; other versions come from :mod:`app.registry`.
+    """
+
+    default_dir = Path(current_app.config.get("MODEL_DIR", "model"))
+    version = select_version(request.headers, request.args)
+    metadata, error_response = _load_metadata_or_error()
+    if version is None or (metadata is not None and metadata.get("version") == version):
+        return None, metadata, default_dir, error_response
+
+    try:
+        session, metadata = get_registry().get(version)
+    except UnknownModelVersion:
+        return (
+            None,
+            None,
+            None,
+            codecs.error(request, f"Unknown model version '{version}'.", 404),
+        )
+    except Exception:
+        current_app.logger.exception("Model version %s could not be loaded", version)
+        return (
+            None,
+            None,
+            None,
+            codecs.error(
+                request, "Model could not be loaded. Please try again later.", 500
+            ),
+        )
+    return session, metadata, default_dir / version, None
+
+
+def _explain_top_k(data: dict) -> int | None:
+    """Return how many tokens to explain if the request asked for ``explain=true``."""
+
+    flag = request.args.get("explain", data.get("explain"))
+    if flag not in (True, "1", "true", "yes"):
+        return None
+    top_k = request.args.get(
+        "top_k", data.get("top_k", current_app.config.get("EXPLAIN_TOP_K", 10))
+    )
+    try:
+        top_k = int(top_k)
+    except (TypeError, ValueError):
+        top_k = 0
+    return min(max(top_k, 1), _EXPLAIN_MAX_TOP_K)
+
+
+def _explanations(model_dir: Path, texts, processed, top_k: int):
+    """Explain scored *texts*, preprocessing only those the cascade answered."""
+
+    table = explain.load_table(model_dir)
+    processed = [
+        item if item is not None else prepare_served_text(text)
+        for text, item in zip(texts, processed)
+    ]
+    return table.explain(processed, top_k)
+
+
+def _explain_unavailable(model_dir: Path, metadata: dict):
+    if explain.load_table(model_dir) is not None:
+        return None
+    return codecs.error(
+        request,
+        "Explanations are not available for model version "
+        f"'{metadata.get('version', 'unknown')}'.",
+        404,
+    )
+
+
+def _with_version(response: Response, metadata: dict) -> Response:
+    response.headers["X-Model-Version"] = str(metadata.get("version", "unknown"))
+    return response
+
+
+def _decode_payload() -> dict:
+    try:
+        data = codecs.decode_request(request)
+    except codecs.UnsupportedMediaType:
+        abort(415)
+    return data if isinstance(data, dict) else {}
+
 
 @main_bp.route("/api/predict", methods=["POST"])
 @csrf.exempt
 def api_predict():
-    """JSON prediction endpoint.
+    """Prediction endpoint.
 
-    Expects a JSON body of the form ``{"text": "..."}`` and returns
+    Expects a body of the form ``{"text": "..."}`` and returns
     ``{"prediction": "spam"|"ham", "probability": float, "model_version": str}``.
+    An optional ``"sender"`` (e.g. the envelope address) is only counted by
+    the traffic statistics.  Requests and responses may be JSON or
+    MessagePack (``application/msgpack``), selected by ``Content-Type`` and
+    ``Accept``.
     """
 
-    data = request.get_json(silent=True) or {}
+    deadline = parse_deadline(request.headers)
+    check_deadline(deadline)
+
+    data = _decode_payload()
     text = data.get("text")
+    sender = data.get("sender")
 
     if not isinstance(text, str) or not text.strip():
-        return jsonify({"error": "Field 'text' is required and must be a non-empty string."}), 400
+        return codecs.error(
+            request, "Field 'text' is required and must be a non-empty string.", 400
+        )
 
-    if len(text) > 10_000:
-        return jsonify({"error": "Text too long. Maximum length is 10,000 characters."}), 400
+    if len(text) > MAX_TEXT_LENGTH:
+        return codecs.error(
+            request, "Text too long. Maximum length is 10,000 characters.", 400
+        )
 
-    try:
-        _, metadata = get_pipeline_and_metadata()
-    except FileNotFoundError:
-        return (
-            jsonify(
-                {
-                    "error": "Model is not available yet. Train the model or contact an administrator.",
-                }
-            ),
-            503,
+    if sender is not None and not isinstance(sender, str):
+        return codecs.error(request, "Field 'sender' must be a string.", 400)
+
+    model_session, metadata, model_dir, error_response = _resolve_model()
+    if error_response is not None:
+        return error_response
+
+    top_k = _explain_top_k(data)
+    if top_k is not None:
+        error_response = _explain_unavailable(model_dir, metadata)
+        if error_response is not None:
+            return error_response
+
+    start = time.perf_counter()
+    with admit(deadline):
+        if top_k is None:
+            prediction_label, proba = predict_spam_label(text, session=model_session)
+        else:
+            probabilities, processed = score_texts([text], session=model_session)
+            proba = float(probabilities[0])
+            prediction_label = label_for(proba)
+    latency = time.perf_counter() - start
+    version = metadata.get("version", "unknown")
+    if sender and model_session is None:
+        sketches.observe_sender(sender)
+
+    payload = {
+        "prediction": prediction_label,
+        "probability": proba,
+        "model_version": version,
+    }
+    if top_k is not None:
+        payload["explanation"] = _explanations(model_dir, [text], processed, top_k)[0]
+    response = _with_version(codecs.respond(request, payload), metadata)
+    if model_session is not None:
+        return response
+    return shadow.attach(response, [text], [proba], latency)
+
+
+@main_bp.route("/api/predict/batch", methods=["POST"])
+@csrf.exempt
+def api_predict_batch():
+    """Batch prediction endpoint.
+
+    Expects ``{"texts": ["...", ...]}`` and returns column-oriented results,
+    ``{"predictions": [...], "probabilities": [...], "model_version": str}``,
+    so encoding cost does not grow with a per-item object.
+    """
+
+    deadline = parse_deadline(request.headers)
+    check_deadline(deadline)
+
+    data = _decode_payload()
+    texts = data.get("texts")
+    max_items = current_app.config.get("BATCH_MAX_ITEMS", 1000)
+
+    if not isinstance(texts, list) or not texts:
+        return codecs.error(
+            request, "Field 'texts' is required and must be a non-empty list.", 400
         )
-    except Exception:
-        return (
-            jsonify({"error": "Model could not be loaded. Please try again later."}),
-            500,
+
+    if len(texts) > max_items:
+        return codecs.error(
+            request, f"Too many texts. Maximum batch size is {max_items}.", 400
         )
 
-    prediction_label, proba = predict_spam_label(text)
-    version = metadata.get("version", "unknown")
+    for text in texts:
+        if not isinstance(text, str) or not text.strip():
+            return codecs.error(
+                request, "Every item in 'texts' must be a non-empty string.", 400
+            )
+        if len(text) > MAX_TEXT_LENGTH:
+            return codecs.error(
+                request, "Text too long. Maximum length is 10,000 characters.", 400
+            )
+
+    model_session, metadata, model_dir, error_response = _resolve_model()
+    if error_response is not None:
+        return error_response
+
+    top_k = _explain_top_k(data)
+    if top_k is not None:
+        error_response = _explain_unavailable(model_dir, metadata)
+        if error_response is not None:
+            return error_response
+
+    start = time.perf_counter()
+    with admit(deadline):
+        probabilities, processed = score_texts(texts, session=model_session)
+    latency = time.perf_counter() - start
+
+    payload = {
+        "predictions": [label_for(proba) for proba in probabilities.tolist()],
+        "probabilities": probabilities,
+        "model_version": metadata.get("version", "unknown"),
+    }
+    if top_k is not None:
+        payload["explanations"] = _explanations(model_dir, texts, processed, top_k)
+    response = _with_version(codecs.respond(request, payload), metadata)
+    if model_session is not None:
+        return response
+    return shadow.attach(response, texts, probabilities.tolist(), latency)
+
+
+@main_bp.route("/api/predict/stream", methods=["POST"])
+@csrf.exempt
+def api_predict_stream():
+    """Streaming bulk prediction over newline-delimited JSON.
+
+    The request body is read incrementally from ``request.stream`` and scored
+    in batches of ``STREAM_BATCH_SIZE``; results stream back as NDJSON using
+    chunked transfer encoding.  See :func:`app.streaming.score_stream`.
+    """
+
+    deadline = parse_deadline(request.headers)
+    check_deadline(deadline)
+
+    model_session, metadata, _, error_response = _resolve_model()
+    if error_response is not None:
+        return error_response
+
+    results = streaming.score_stream(
+        request.stream,
+        batch_size=current_app.config.get("STREAM_BATCH_SIZE", 256),
+        max_line_bytes=current_app.config.get("STREAM_MAX_LINE_BYTES", 65_536),
+        max_text_length=MAX_TEXT_LENGTH,
+        deadline=deadline,
+        session=model_session,
+    )
+    return _with_version(
+        Response(stream_with_context(results), mimetype=streaming.NDJSON_MIMETYPE),
+        metadata,
+    )
+
+
+_LABELS = {"spam": 1, "1": 1, "ham": 0, "not spam": 0, "0": 0}
+
+
+def _parse_label(value) -> int | None:
+    if isinstance(value, bool) or value in (0, 1):
+        return int(value)
+    if isinstance(value, str):
+        return _LABELS.get(value.strip().lower())
+    return None
+
+
+def _request_user_id() -> int | None:
+    """Return the submitting user's id from the session or an ``X-API-Key`` header."""
+
+    if session.get("user_id"):
+        return session["user_id"]
+    raw_key = request.headers.get("X-API-Key")
+    if raw_key:
+        api_key = ApiKey.find_active(raw_key)
+        if api_key is not None:
+            if api_key.touch(current_app.config.get("API_KEY_TOUCH_SECONDS", 60.0)):
+                db.session.commit()
+            return api_key.user_id
+    return None
+
+
+@main_bp.route("/api/feedback", methods=["POST"])
+@csrf.exempt
+def api_feedback():
+    """Record a corrected label for a previously classified message.
+
+    Expects ``{"text": "...", "label": "spam"|"ham"}`` plus the optional
+    ``predicted_label`` and ``model_version`` the client was shown.  Requires a
+    signed-in session or an ``X-API-Key``.  Feedback is folded into the model
+    by ``python -m ml.incremental``.
+    """
+
+    user_id = _request_user_id()
+    if user_id is None:
+        return codecs.error(request, "Authentication required.", 401)
+
+    data = _decode_payload()
+    text = data.get("text")
+    label = _parse_label(data.get("label"))
+
+    if not isinstance(text, str) or not text.strip():
+        return codecs.error(
+            request, "Field 'text' is required and must be a non-empty string.", 400
+        )
+    if len(text) > MAX_TEXT_LENGTH:
+        return codecs.error(
+            request, "Text too long. Maximum length is 10,000 characters.", 400
+        )
+    if label is None:
+        return codecs.error(request, "Field 'label' must be 'spam' or 'ham'.", 400)
+
+    model_version = data.get("model_version")
+    feedback = LabelFeedback.record(
+        text,
+        label,
+        predicted_label=_parse_label(data.get("predicted_label")),
+        model_version=str(model_version)[:64] if model_version is not None else None,
+        user_id=user_id,
+    )
+    db.session.commit()
+
+    return codecs.respond(
+        request, {"id": feedback.id, "label": "spam" if label else "ham"}, status=201
+    )
+
+
+@main_bp.route("/api/jobs", methods=["POST"])
+@csrf.exempt
+def api_jobs_submit():
+    """Queue an asynchronous scoring job and return its id at once (``202``).
+
+    Expects ``{"texts": [...]}`` or ``{"file": "name"}`` (a file in
+    ``JOBS_INPUT_DIR``: NDJSON like ``/api/predict/stream``, or one message
+    per line), plus an optional ``priority`` from 0 to 9 (higher runs first).
+    Requires a signed-in session or an ``X-API-Key``.  Jobs are run by
+    ``scripts/job_workers.py``.
+    """
+
+    user_id = _request_user_id()
+    if user_id is None:
+        return codecs.error(request, "Authentication required.", 401)
+
+    data = _decode_payload()
+    texts = data.get("texts")
+    source = data.get("file")
+    priority = data.get("priority", jobs.MIN_PRIORITY)
+    max_texts = current_app.config.get("JOBS_MAX_TEXTS", 100_000)
+
+    if (
+        isinstance(priority, bool)
+        or not isinstance(priority, int)
+        or not jobs.MIN_PRIORITY <= priority <= jobs.MAX_PRIORITY
+    ):
+        return codecs.error(
+            request,
+            f"Field 'priority' must be an integer from {jobs.MIN_PRIORITY} "
+            f"to {jobs.MAX_PRIORITY}.",
+            400,
+        )
+    if (texts is None) == (source is None):
+        return codecs.error(request, "Provide either 'texts' or 'file'.", 400)
+
+    if texts is not None:
+        if not isinstance(texts, list) or not texts:
+            return codecs.error(request, "Field 'texts' must be a non-empty list.", 400)
+        if len(texts) > max_texts:
+            return codecs.error(
+                request, f"Too many texts. Maximum job size is {max_texts}.", 400
+            )
+        for text in texts:
+            if not isinstance(text, str) or not text.strip():
+                return codecs.error(
+                    request, "Every item in 'texts' must be a non-empty string.", 400
+                )
+            if len(text) > MAX_TEXT_LENGTH:
+                return codecs.error(
+                    request, "Text too long. Maximum length is 10,000 characters.", 400
+                )
+    else:
+        if not isinstance(source, str) or not source.strip():
+            return codecs.error(
+                request, "Field 'file' must be a non-empty string.", 400
+            )
+        try:
+            jobs.resolve_input(source)
+        except jobs.JobInputError as exc:
+            return codecs.error(request, str(exc), 400)
+
+    job = jobs.submit(texts=texts, source=source, priority=priority, user_id=user_id)
+    db.session.commit()
+
+    return codecs.respond(
+        request,
+        jobs.describe(job),
+        status=202,
+        headers={"Location": url_for("main.api_job_status", job_id=job.id)},
+    )
+
+
+def _owned_job(job_id: str) -> ScoringJob:
+    """Return the caller's job, or abort with 404 (also for other users' jobs)."""
+
+    job = db.session.get(ScoringJob, job_id)
+    if job is None or job.user_id != _request_user_id():
+        abort(404)
+    return job
+
+
+@main_bp.route("/api/jobs/<job_id>", methods=["GET"])
+def api_job_status(job_id: str):
+    """Status and progress of a job submitted by the caller."""
+
+    if _request_user_id() is None:
+        return codecs.error(request, "Authentication required.", 401)
+    return codecs.respond(request, jobs.describe(_owned_job(job_id)))
+
+
+@main_bp.route("/api/jobs/<job_id>/results", methods=["GET"])
+def api_job_results(job_id: str):
+    """One page of a job's results, ordered by position.
+
+    ``?after=<index>`` continues from the previous page's ``next_after``;
+    ``?limit=`` is capped at ``JOBS_PAGE_SIZE``.  Results appear as batches
+    finish, so a running job can be read while it is still being scored.
+    """
+
+    if _request_user_id() is None:
+        return codecs.error(request, "Authentication required.", 401)
+    job = _owned_job(job_id)
+
+    page_size = current_app.config.get("JOBS_PAGE_SIZE", 1000)
+    after = request.args.get("after", -1, type=int)
+    limit = min(max(request.args.get("limit", page_size, type=int), 1), page_size)
+    page = jobs.results(job, after, limit)
+    key = "line" if job.source is not None else "index"
+
+    return codecs.respond(
+        request,
+        {
+            "id": job.id,
+            "status": job.status,
+            "results": page,
+            "next_after": page[-1][key] if len(page) == limit else None,
+        },
+    )
+
+
+@main_bp.route("/api/health", methods=["GET"])
+def api_health():
+    """Liveness check for load balancers and the router (app/router.py)."""
+
+    return jsonify({"status": "ok"})
+
+
+@main_bp.route("/api/metrics", methods=["GET"])
+def api_metrics():
+    """Process-local operational metrics (requires ``X-Admin-Token``)."""
+
+    _require_admin()
+    return jsonify(metrics.snapshot()), 200
+
+
+@main_bp.route("/api/traffic", methods=["GET"])
+def api_traffic():
+    """Traffic statistics merged across workers, with drift against the training data.
+
+    ``?window=previous`` reports the last complete window instead of the
+    current one; ``?top=`` bounds the heavy-hitter lists (requires
+    ``X-Admin-Token``).  See :mod:`app.sketches`.
+    """
+
+    _require_admin()
+    window = request.args.get("window", "current")
+    top = request.args.get("top", type=int) or current_app.config.get("STATS_TOP_K", 20)
+    if window not in ("current", "previous") or not 0 < top <= sketches.HEAVY_HITTERS:
+        return codecs.error(
+            request,
+            "'window' must be current or previous and "
+            f"'top' 1-{sketches.HEAVY_HITTERS}.",
+            400,
+        )
+    return jsonify(sketches.report(previous=window == "previous", top=top)), 200
+
+
+_MEMORY_BURST_TEXTS = (
+    "Congratulations! You have won a free prize, click here to claim it",
+    "Hi team, the quarterly report is attached. Let me know if you have questions.",
+    "Your account has been suspended. Verify your password immediately.",
+    "Are we still on for lunch tomorrow at noon?",
+)
+_MEMORY_BURST_MAX = 10_000
+
+
+@main_bp.route("/api/memory", methods=["GET"])
+def api_memory():
+    """Memory report for the worker serving the request (requires ``X-Admin-Token``).
+
+    See :func:`app.memory.report`.  Behind gunicorn each request reaches one
+    worker; the ``pid`` field tells them apart.
+    """
+
+    _require_admin()
+    return jsonify(memory.report()), 200
+
+
+@main_bp.route("/api/memory/diff", methods=["POST"])
+@csrf.exempt
+def api_memory_diff():
+    """Run a burst of predictions under tracemalloc and report what stayed allocated.
+
+    Expects an optional ``{"predictions": int, "top": int}``.  The burst runs
+    the in-process model on every message, bypassing the sidecar, the cascade
+    and the near-duplicate index, so it measures inference rather than
+    lookups.  With ``INFERENCE_BACKEND=sidecar`` the model is loaded into this
+    worker for the burst.  Tracing slows the worker down while the burst runs,
+    so this is an admin-only tool.
+    """
+
+    _require_admin()
+    data = _decode_payload()
+    count = data.get("predictions", 200)
+    top = data.get("top", 15)
+    if (
+        isinstance(count, bool)
+        or not isinstance(count, int)
+        or not 0 < count <= _MEMORY_BURST_MAX
+        or isinstance(top, bool)
+        or not isinstance(top, int)
+        or top < 1
+    ):
+        return codecs.error(
+            request,
+            f"'predictions' must be 1-{_MEMORY_BURST_MAX} and 'top' positive.",
+            400,
+        )
+
+    _, error_response = _load_metadata_or_error()
+    if error_response is not None:
+        return error_response
+    session, _ = get_pipeline_and_metadata()
+    if session is None:
+        # The sidecar serves this worker; a burst through it would only trace
+        # socket I/O.
+        try:
+            session, _ = load_model(Path(current_app.config.get("MODEL_DIR", "model")))
+        except FileNotFoundError:
+            return codecs.error(
+                request, "No local model to run the burst against.", 409
+            )
+
+    # Texts that differ in their words, not just a number, so preprocessing
+    # does real work on each one.
+    rng = random.Random(count)
+    vocabulary = " ".join(_MEMORY_BURST_TEXTS).split()
+    texts = [" ".join(rng.choices(vocabulary, k=16)) for _ in range(count)]
+
+    def burst() -> None:
+        for start in range(0, count, 100):
+            score_texts(texts[start : start + 100], session)
+
+    # Warm up first so lazy imports and one-off caches don't read as growth.
+    score_texts(texts[:1], session)
 
     return (
         jsonify(
             {
-                "prediction": prediction_label,
-                "probability": proba,
-                "model_version": version,
-            },
+                "pid": os.getpid(),
+                "predictions": count,
+                **memory.allocation_diff(burst, top),
+            }
         ),
         200,
     )
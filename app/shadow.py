@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import queue
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from flask import Flask, Response, current_app
+
+from . import metrics
+from .admission import get_limiter
+from .spam import label_for, load_model, prepare_served_text, spam_probabilities
+
+_STATS: Dict[str, Any] = {
+    "offered": 0,
+    "sampled": 0,
+    "shed_busy": 0,
+    "shed_queue": 0,
+    "scored": 0,
+    "errors": 0,
+    "agreements": 0,
+    "abs_delta_sum": 0.0,
+    "abs_delta_max": 0.0,
+    "primary_latency_sum": 0.0,
+    "shadow_latency_sum": 0.0,
+}
+# Request threads and shadow workers both update _STATS.
+_STATS_LOCK = threading.Lock()
+
+# False until the first lookup; None afterwards when shadow mode is off.
+_SCORER: "ShadowScorer | None | bool" = False
+_SCORER_LOCK = threading.Lock()
+
+_Job = Tuple[List[str], List[float], float]
+
+
+class ShadowScorer:
+    """Score sampled live traffic with a candidate model off the request path.
+
+    The candidate session is created by *load* on a background thread, so no
+    request waits for it; until it is ready no traffic is sampled.  Jobs are
+    queued after the primary response has been sent and handled by *workers*
+    daemon threads.  The queue is bounded: when it is full, or when the
+    admission limiter shows the server is busy, shadow work is dropped before
+    any primary request is affected.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[], Any],
+        version: str,
+        sample_rate: float = 0.1,
+        workers: int = 1,
+        max_queue: int = 256,
+        busy_fraction: float = 0.5,
+        app: Flask | None = None,
+    ) -> None:
+        self.session: Any = None
+        self.version = version
+        self.sample_rate = sample_rate
+        self.busy_fraction = busy_fraction
+        self.app = app
+        self._loaded = threading.Event()
+        self._queue: "queue.Queue[_Job]" = queue.Queue(maxsize=max_queue)
+        self._threads = [
+            threading.Thread(target=self._work, name=f"shadow-{index}", daemon=True)
+            for index in range(workers)
+        ]
+        threading.Thread(
+            target=self._load, args=(load,), name="shadow-loader", daemon=True
+        ).start()
+
+    def _load(self, load: Callable[[], Any]) -> None:
+        try:
+            self.session = load()
+        except Exception:
+            if self.app is not None:
+                self.app.logger.exception(
+                    "Shadow model %s could not be loaded; shadow mode is off",
+                    self.version,
+                )
+            return
+        finally:
+            self._loaded.set()
+        for thread in self._threads:
+            thread.start()
+
+    def wait_loaded(self, timeout: float | None = None) -> bool:
+        """Wait for the candidate session; return True if it loaded."""
+
+        self._loaded.wait(timeout)
+        return self.session is not None
+
+    def sample(self) -> bool:
+        if self.session is None:
+            return False
+        with _STATS_LOCK:
+            _STATS["offered"] += 1
+        return random.random() < self.sample_rate
+
+    def busy(self, limiter: Any) -> bool:
+        return (
+            limiter is not None
+            and limiter.inflight >= self.busy_fraction * limiter.limit
+        )
+
+    def submit(
+        self, texts: List[str], primary: List[float], primary_latency: float
+    ) -> bool:
+        try:
+            self._queue.put_nowait((texts, primary, primary_latency))
+        except queue.Full:
+            with _STATS_LOCK:
+                _STATS["shed_queue"] += 1
+            return False
+        with _STATS_LOCK:
+            _STATS["sampled"] += 1
+        return True
+
+    def join(self) -> None:
+        """Block until every queued job has been scored (used by tests and tooling)."""
+
+        self._queue.join()
+
+    def _work(self) -> None:
+        while True:
+            texts, primary, primary_latency = self._queue.get()
+            try:
+                self._score(texts, primary, primary_latency)
+            except Exception:  # pragma: no cover - shadow failures must never surface
+                with _STATS_LOCK:
+                    _STATS["errors"] += 1
+            finally:
+                self._queue.task_done()
+
+    def _score(
+        self, texts: Sequence[str], primary: Sequence[float], primary_latency: float
+    ) -> None:
+        start = time.perf_counter()
+        shadow = spam_probabilities(
+            self.session, [prepare_served_text(text) for text in texts]
+        ).tolist()
+        latency = time.perf_counter() - start
+
+        deltas = [
+            abs(candidate - baseline) for candidate, baseline in zip(shadow, primary)
+        ]
+        agreements = sum(
+            label_for(candidate) == label_for(baseline)
+            for candidate, baseline in zip(shadow, primary)
+        )
+        with _STATS_LOCK:
+            _STATS["scored"] += len(texts)
+            _STATS["agreements"] += agreements
+            _STATS["abs_delta_sum"] += sum(deltas)
+            _STATS["abs_delta_max"] = max([_STATS["abs_delta_max"], *deltas])
+            # Both sums are per job; dividing by "scored" gives per-message
+            # latencies that compare across single and batch requests.
+            _STATS["primary_latency_sum"] += primary_latency
+            _STATS["shadow_latency_sum"] += latency
+
+
+def get_scorer() -> ShadowScorer | None:
+    """Return the shadow scorer for ``SHADOW_MODEL_VERSION``, if there is one.
+
+    The scorer is created on first use in each worker process (threads do not
+    survive a fork) and loads its model in the background.
+    """
+
+    global _SCORER
+
+    if _SCORER is False:
+        with _SCORER_LOCK:
+            if _SCORER is False:
+                _SCORER = _create_scorer()
+    return _SCORER  # type: ignore[return-value]
+
+
+def _create_scorer() -> ShadowScorer | None:
+    config = current_app.config
+    version = config.get("SHADOW_MODEL_VERSION")
+    if not version:
+        return None
+
+    version_dir = Path(config.get("MODEL_DIR", "model")) / version
+    return ShadowScorer(
+        lambda: load_model(version_dir, intra_op_threads=1)[0],
+        version,
+        sample_rate=config.get("SHADOW_SAMPLE_RATE", 0.1),
+        workers=config.get("SHADOW_WORKERS", 1),
+        max_queue=config.get("SHADOW_MAX_QUEUE", 256),
+        busy_fraction=config.get("SHADOW_BUSY_FRACTION", 0.5),
+        app=current_app._get_current_object(),
+    )
+
+
+def attach(
+    response: Response,
+    texts: Sequence[str],
+    probabilities: Sequence[float],
+    latency: float,
+) -> Response:
+    """Schedule shadow scoring of a sample of *texts* once *response* has been sent.
+
+    *latency* is the primary model's wall time for the whole request.
+    """
+
+    scorer = get_scorer()
+    if scorer is None or not scorer.sample():
+        return response
+    if scorer.busy(get_limiter()):
+        with _STATS_LOCK:
+            _STATS["shed_busy"] += 1
+        return response
+
+    job_texts = list(texts)
+    job_primary = [float(proba) for proba in probabilities]
+    response.call_on_close(lambda: scorer.submit(job_texts, job_primary, latency))
+    return response
+
+
+def _snapshot() -> Dict[str, Any]:
+    scorer = _SCORER if isinstance(_SCORER, ShadowScorer) else None
+    with _STATS_LOCK:
+        stats = dict(_STATS)
+    scored = stats["scored"]
+    return {
+        "active": scorer is not None and scorer.session is not None,
+        "version": scorer.version if scorer is not None else None,
+        "sample_rate": scorer.sample_rate if scorer is not None else 0.0,
+        "queued": scorer._queue.qsize() if scorer is not None else 0,
+        **{key: value for key, value in stats.items() if not key.endswith("_sum")},
+        "agreement_rate": stats["agreements"] / scored if scored else None,
+        "mean_abs_delta": stats["abs_delta_sum"] / scored if scored else None,
+        "primary_latency_ms_per_message": stats["primary_latency_sum"] / scored * 1000
+        if scored
+        else None,
+        "shadow_latency_ms_per_message": stats["shadow_latency_sum"] / scored * 1000
+        if scored
+        else None,
+    }
+
+
+metrics.register_source("shadow", _snapshot)
@@ -0,0 +1,601 @@
+from __future__ import annotations
+
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from typing import Any, Dict, List, Sequence, Tuple
+
+from flask import Flask, current_app
+
+from . import metrics
+
+# Host-wide inference sidecar.  With INFERENCE_BACKEND=sidecar, web workers
+# don't load the model: app/spam.py sends raw texts over a Unix domain socket
+# to scripts/inference_sidecar.py, the one process on the host that holds the
+# ONNX session, the cascade, preprocessing and the near-duplicate index.  The
+# sidecar merges concurrent requests from every worker into batches of up to
+# SIDECAR_MAX_BATCH texts.  A worker that can't reach it scores in-process
+# (loading its own copy of the model) for SIDECAR_RETRY_SECONDS, then tries
+# the sidecar again.  Other model versions (app/registry.py) stay in-process.
+#
+# Protocol: every message is a frame, a 4-byte big-endian body length and the
+# body.  A request body is ``op:u8 count:u32`` followed by ``kind:u8 len:u32``
+# and the UTF-8 text (kind 0) or raw MIME bytes (kind 1) for each message.  A
+# response body starts with ``status:u8``.  Scores follow as ``count:u32`` and
+# big-endian float64 probabilities; OP_SCORE_PROCESSED then adds ``len:i32``
+# and the preprocessed text for each message (-1 when the cascade answered
+# without preprocessing).  OP_METADATA and OP_STATS answer with JSON, and
+# errors with a UTF-8 message.  Connections are kept open and reused.
+
+OP_SCORE = 1
+OP_SCORE_PROCESSED = 2
+OP_METADATA = 3
+OP_STATS = 4
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+_FRAME = struct.Struct(">I")
+_REQUEST = struct.Struct(">BI")
+_ITEM = struct.Struct(">BI")
+_COUNT = struct.Struct(">I")
+_PROCESSED = struct.Struct(">i")
+_MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+_CLIENT_STATS: Dict[str, int] = {
+    "requests": 0,
+    "texts": 0,
+    "failures": 0,
+    "reconnects": 0,
+    "fallbacks": 0,
+    "errors": 0,
+}
+
+
+class ProtocolError(ValueError):
+    """A frame that doesn't follow the sidecar protocol."""
+
+
+class SidecarError(RuntimeError):
+    """The sidecar answered with an error status."""
+
+
+def _read_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("sidecar connection closed mid-frame")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def read_frame(sock: socket.socket) -> bytes | None:
+    """Read one frame body; ``None`` if the peer closed the connection cleanly."""
+
+    header = sock.recv(_FRAME.size)
+    if not header:
+        return None
+    if len(header) < _FRAME.size:
+        header += _read_exact(sock, _FRAME.size - len(header))
+    (length,) = _FRAME.unpack(header)
+    if length > _MAX_FRAME_BYTES:
+        raise ProtocolError(f"frame of {length} bytes exceeds {_MAX_FRAME_BYTES}")
+    return _read_exact(sock, length)
+
+
+def write_frame(sock: socket.socket, body: bytes) -> None:
+    sock.sendall(_FRAME.pack(len(body)) + body)
+
+
+def encode_request(op: int, texts: Sequence[str | bytes] = ()) -> bytes:
+    parts = [_REQUEST.pack(op, len(texts))]
+    for text in texts:
+        data, kind = (
+            (text.encode("utf-8"), 0) if isinstance(text, str) else (bytes(text), 1)
+        )
+        parts.append(_ITEM.pack(kind, len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+
+def decode_request(body: bytes) -> Tuple[int, List[str | bytes]]:
+    try:
+        op, count = _REQUEST.unpack_from(body)
+        offset = _REQUEST.size
+        texts: List[str | bytes] = []
+        for _ in range(count):
+            kind, length = _ITEM.unpack_from(body, offset)
+            offset += _ITEM.size
+            data = body[offset : offset + length]
+            if len(data) != length:
+                raise ProtocolError("truncated request")
+            texts.append(data.decode("utf-8") if kind == 0 else data)
+            offset += length
+    except (struct.error, UnicodeDecodeError) as exc:
+        raise ProtocolError(str(exc)) from exc
+    return op, texts
+
+
+def encode_scores(
+    probabilities: Any, processed: Sequence[str | None] | None = None
+) -> bytes:
+    import numpy as np  # noqa: WPS433 (deferred heavy import)
+
+    parts = [
+        bytes([STATUS_OK]),
+        _COUNT.pack(len(probabilities)),
+        np.asarray(probabilities, dtype=">f8").tobytes(),
+    ]
+    for text in processed or ():
+        if text is None:
+            parts.append(_PROCESSED.pack(-1))
+        else:
+            data = text.encode("utf-8")
+            parts.append(_PROCESSED.pack(len(data)))
+            parts.append(data)
+    return b"".join(parts)
+
+
+def decode_scores(
+    body: bytes, with_processed: bool = False
+) -> Tuple[Any, List[str | None] | None]:
+    import numpy as np  # noqa: WPS433
+
+    (count,) = _COUNT.unpack_from(body, 1)
+    offset = 1 + _COUNT.size
+    probabilities = np.frombuffer(body, dtype=">f8", count=count, offset=offset).astype(
+        np.float64
+    )
+    if not with_processed:
+        return probabilities, None
+    offset += 8 * count
+    processed: List[str | None] = []
+    for _ in range(count):
+        (length,) = _PROCESSED.unpack_from(body, offset)
+        offset += _PROCESSED.size
+        if length < 0:
+            processed.append(None)
+        else:
+            processed.append(body[offset : offset + length].decode("utf-8"))
+            offset += length
+    return probabilities, processed
+
+
+def _encode_json(payload: Dict[str, Any]) -> bytes:
+    return bytes([STATUS_OK]) + json.dumps(payload).encode("utf-8")
+
+
+def _encode_error(message: str) -> bytes:
+    return bytes([STATUS_ERROR]) + message.encode("utf-8")
+
+
+class _Pending:
+    __slots__ = ("texts", "done", "probabilities", "processed", "error")
+
+    def __init__(self, texts: List[str | bytes]) -> None:
+        self.texts = texts
+        self.done = threading.Event()
+        self.probabilities: Any = None
+        self.processed: List[str | None] = []
+        self.error: Exception | None = None
+
+
+class Batcher:
+    """One scoring thread fed by every connection.
+
+    The thread takes the oldest waiting request together with every request
+    that queued up while the previous batch was scored, up to ``max_batch``
+    texts, and scores them with one :func:`app.spam.score_texts` call.  So
+    batches grow with load but a lone request is never held back.  A
+    ``wait`` above zero additionally holds each batch open for that many
+    seconds.  A single request larger than ``max_batch`` is scored on its own.
+    If scoring a batch fails, its requests are retried one by one so that the
+    error only reaches the request that caused it.
+    """
+
+    def __init__(self, app: Flask, max_batch: int, wait: float) -> None:
+        self.app = app
+        self.max_batch = max_batch
+        self.wait = wait
+        self.stats = {
+            "requests": 0,
+            "texts": 0,
+            "batches": 0,
+            "largest_batch": 0,
+            "errors": 0,
+        }
+        self._queue: "queue.Queue[_Pending | None]" = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name="sidecar-batcher", daemon=True
+        )
+        self._thread.start()
+
+    def score(self, texts: List[str | bytes]) -> Tuple[Any, List[str | None]]:
+        pending = _Pending(texts)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.probabilities, pending.processed
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        from .spam import score_texts  # noqa: WPS433 (spam imports this module)
+
+        with self.app.app_context():
+            while True:
+                first = self._queue.get()
+                if first is None:
+                    return
+                batch = [first]
+                size = len(first.texts)
+                deadline = time.monotonic() + self.wait
+                while size < self.max_batch:
+                    try:
+                        remaining = deadline - time.monotonic()
+                        pending = (
+                            self._queue.get(timeout=remaining)
+                            if remaining > 0
+                            else self._queue.get_nowait()
+                        )
+                    except queue.Empty:
+                        break
+                    if pending is None:
+                        self._queue.put(None)
+                        break
+                    batch.append(pending)
+                    size += len(pending.texts)
+
+                if len(batch) == 1:
+                    self._score_alone(first, score_texts)
+                    continue
+                texts = [text for pending in batch for text in pending.texts]
+                try:
+                    probabilities, processed = score_texts(texts)
+                except Exception:  # noqa: BLE001 - isolate the failing request
+                    for pending in batch:
+                        self._score_alone(pending, score_texts)
+                    continue
+                self._count(batch, size)
+                start = 0
+                for pending in batch:
+                    end = start + len(pending.texts)
+                    pending.probabilities = probabilities[start:end]
+                    pending.processed = processed[start:end]
+                    pending.done.set()
+                    start = end
+
+    def _score_alone(self, pending: _Pending, score_texts: Any) -> None:
+        try:
+            pending.probabilities, pending.processed = score_texts(pending.texts)
+        except Exception as exc:  # noqa: BLE001 - reported to the caller
+            self.stats["errors"] += 1
+            pending.error = exc
+        else:
+            self._count([pending], len(pending.texts))
+        pending.done.set()
+
+    def _count(self, batch: List[_Pending], size: int) -> None:
+        self.stats["requests"] += len(batch)
+        self.stats["texts"] += size
+        self.stats["batches"] += 1
+        self.stats["largest_batch"] = max(self.stats["largest_batch"], size)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    server: "SidecarServer"
+
+    def handle(self) -> None:
+        self.server.connections += 1
+        while True:
+            try:
+                body = read_frame(self.request)
+            except (OSError, ProtocolError):
+                return
+            if body is None:
+                return
+            try:
+                response = self.server.respond(body)
+            except ProtocolError as exc:
+                write_frame(self.request, _encode_error(f"bad request: {exc}"))
+                return
+            try:
+                write_frame(self.request, response)
+            except OSError:
+                return
+
+
+class SidecarServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Threaded Unix-socket server: a thread per connection, one :class:`Batcher`."""
+
+    daemon_threads = True
+
+    def __init__(self, path: str, app: Flask) -> None:
+        # The sidecar is the in-process backend that web workers delegate to.
+        app.config["INFERENCE_BACKEND"] = "local"
+        self.app = app
+        self.connections = 0
+        self.batcher = Batcher(
+            app,
+            app.config.get("SIDECAR_MAX_BATCH", 256),
+            app.config.get("SIDECAR_BATCH_WAIT_MS", 0.0) / 1000,
+        )
+        _remove_stale_socket(path)
+        super().__init__(path, _Handler)
+        os.chmod(path, 0o660)
+
+    def respond(self, body: bytes) -> bytes:
+        from .spam import get_pipeline_and_metadata  # noqa: WPS433
+
+        op, texts = decode_request(body)
+        try:
+            if op in (OP_SCORE, OP_SCORE_PROCESSED):
+                probabilities, processed = (
+                    self.batcher.score(texts) if texts else ([], [])
+                )
+                return encode_scores(
+                    probabilities, processed if op == OP_SCORE_PROCESSED else None
+                )
+            if op == OP_METADATA:
+                with self.app.app_context():
+                    return _encode_json(get_pipeline_and_metadata()[1])
+            if op == OP_STATS:
+                return _encode_json(
+                    {
+                        **self.batcher.stats,
+                        "connections": self.connections,
+                        "pid": os.getpid(),
+                    }
+                )
+        except Exception as exc:  # noqa: BLE001 - the worker falls back and logs it
+            return _encode_error(f"{type(exc).__name__}: {exc}")
+        raise ProtocolError(f"unknown op {op}")
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.batcher.close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+
+def _remove_stale_socket(path: str) -> None:
+    if not os.path.exists(path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError:
+        os.unlink(path)
+    else:
+        raise RuntimeError(f"an inference sidecar is already listening on {path}")
+    finally:
+        probe.close()
+
+
+class SidecarClient:
+    """Pooled connections from one worker process to the sidecar.
+
+    After a connection failure the client reports itself unavailable for
+    ``retry_seconds``, so requests go straight to the in-process fallback
+    instead of waiting on a dead socket each time.  A scoring error reply only
+    sends that one request to the fallback; the sidecar itself is fine.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        timeout: float,
+        retry_seconds: float,
+        pool_size: int,
+        metadata_seconds: float,
+    ) -> None:
+        self.path = path
+        self.timeout = timeout
+        self.retry_seconds = retry_seconds
+        self.pool_size = pool_size
+        self.metadata_seconds = metadata_seconds
+        self._idle: "queue.LifoQueue[socket.socket]" = queue.LifoQueue()
+        self._down_until = 0.0
+        self._metadata: Tuple[float, Dict[str, Any]] | None = None
+
+    def available(self) -> bool:
+        return time.monotonic() >= self._down_until
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def _exchange(self, sock: socket.socket, body: bytes) -> bytes:
+        try:
+            write_frame(sock, body)
+            response = read_frame(sock)
+            if response is None:
+                raise ConnectionError("sidecar closed the connection")
+        except Exception:
+            sock.close()
+            raise
+        return response
+
+    def call(self, body: bytes) -> bytes:
+        """Send one request frame and return the response body, minus the status."""
+
+        try:
+            sock = self._idle.get_nowait()
+        except queue.Empty:
+            sock = self._connect()
+            response = self._exchange(sock, body)
+        else:
+            try:
+                response = self._exchange(sock, body)
+            except TimeoutError:
+                raise
+            except OSError:
+                # The pooled connection may predate a sidecar restart.
+                _CLIENT_STATS["reconnects"] += 1
+                sock = self._connect()
+                response = self._exchange(sock, body)
+        if self._idle.qsize() < self.pool_size:
+            self._idle.put(sock)
+        else:
+            sock.close()
+        if response[:1] != bytes([STATUS_OK]):
+            raise SidecarError(response[1:].decode("utf-8", "replace"))
+        return response
+
+    def _failed(self, exc: Exception) -> None:
+        _CLIENT_STATS["failures"] += 1
+        self._down_until = time.monotonic() + self.retry_seconds
+        current_app.logger.warning(
+            "Inference sidecar at %s unavailable, scoring in-process: %s",
+            self.path,
+            exc,
+        )
+
+    def score(
+        self, texts: Sequence[str | bytes], with_processed: bool = False
+    ) -> Tuple[Any, List[str | None] | None] | None:
+        if not self.available():
+            _CLIENT_STATS["fallbacks"] += 1
+            return None
+        op = OP_SCORE_PROCESSED if with_processed else OP_SCORE
+        try:
+            response = self.call(encode_request(op, texts))
+        except SidecarError as exc:
+            _CLIENT_STATS["errors"] += 1
+            _CLIENT_STATS["fallbacks"] += 1
+            current_app.logger.warning(
+                "Inference sidecar failed to score a request, scoring it "
+                "in-process: %s",
+                exc,
+            )
+            return None
+        except (OSError, ProtocolError) as exc:
+            self._failed(exc)
+            _CLIENT_STATS["fallbacks"] += 1
+            return None
+        _CLIENT_STATS["requests"] += 1
+        _CLIENT_STATS["texts"] += len(texts)
+        return decode_scores(response, with_processed)
+
+    def _json(self, op: int) -> Dict[str, Any] | None:
+        try:
+            return json.loads(self.call(encode_request(op))[1:])
+        except (OSError, SidecarError, ProtocolError, ValueError) as exc:
+            self._failed(exc)
+            return None
+
+    def server_stats(self) -> Dict[str, Any] | None:
+        return self._json(OP_STATS) if self.available() else None
+
+    def metadata(self) -> Dict[str, Any] | None:
+        """The sidecar model's metadata, refreshed every ``metadata_seconds``.
+
+        ``None`` if the sidecar is unavailable.
+        """
+
+        if not self.available():
+            return None
+        now = time.monotonic()
+        if self._metadata is None or now - self._metadata[0] >= self.metadata_seconds:
+            metadata = self._json(OP_METADATA)
+            if metadata is None:
+                return None
+            self._metadata = (now, metadata)
+        return self._metadata[1]
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_CLIENT: SidecarClient | None = None
+_CLIENT_PID = 0
+
+
+def get_client() -> SidecarClient | None:
+    """The process's client when ``INFERENCE_BACKEND`` is ``sidecar``, else ``None``."""
+
+    global _CLIENT, _CLIENT_PID
+
+    config = current_app.config
+    if config.get("INFERENCE_BACKEND", "local") != "sidecar":
+        return None
+    path = config.get("SIDECAR_SOCKET", "")
+    # Sockets must not be shared with a forked parent (e.g. gunicorn --preload).
+    if _CLIENT is None or _CLIENT.path != path or _CLIENT_PID != os.getpid():
+        _CLIENT = SidecarClient(
+            path,
+            timeout=config.get("SIDECAR_TIMEOUT", 5.0),
+            retry_seconds=config.get("SIDECAR_RETRY_SECONDS", 5.0),
+            pool_size=config.get("SIDECAR_POOL_SIZE", 8),
+            metadata_seconds=config.get("MODEL_RELOAD_SECONDS", 30.0),
+        )
+        _CLIENT_PID = os.getpid()
+    return _CLIENT
+
+
+def score(
+    texts: Sequence[str | bytes], with_processed: bool = False
+) -> Tuple[Any, List[str | None] | None] | None:
+    """Score *texts* on the sidecar; ``None`` means "use the in-process model"."""
+
+    client = get_client()
+    if client is None or not texts:
+        return None
+    return client.score(texts, with_processed)
+
+
+def serve(app: Flask, path: str, stop: threading.Event | None = None) -> None:
+    """Run the sidecar on *path* until *stop* is set (or forever)."""
+
+    from .spam import get_pipeline_and_metadata  # noqa: WPS433
+
+    server = SidecarServer(path, app)
+    with app.app_context():
+        # Load the model before accepting connections, and fail fast without one.
+        get_pipeline_and_metadata()
+    app.logger.info("Inference sidecar listening on %s", path)
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.2}, daemon=True
+    )
+    thread.start()
+    try:
+        (stop or threading.Event()).wait()
+    finally:
+        server.shutdown()
+        thread.join()
+        server.server_close()
+
+
+def _snapshot() -> Dict[str, Any]:
+    snapshot: Dict[str, Any] = dict(_CLIENT_STATS)
+    client = _CLIENT
+    if client is not None:
+        snapshot["available"] = client.available()
+        snapshot["idle_connections"] = client._idle.qsize()
+        snapshot["server"] = client.server_stats()
+    return snapshot
+
+
+metrics.register_source("sidecar", _snapshot)
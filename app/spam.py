@@ -1,21 +1,86 @@
 from __future__ import annotations
 
+import hashlib
 import json
 import re
 import string
+import time
 from pathlib import Path
-from typing import Any, Dict, Tuple
+from typing import Any, Callable, Dict, List, Sequence, Tuple
 
-import numpy as np
-import onnxruntime as rt
 from flask import current_app
-from nltk.stem import PorterStemmer
+
+from . import cascade, explain, memory, neardup, sidecar, sketches
+from .mime import MAX_MESSAGE_SECONDS, extract_text
+from .model_bundle import BUNDLE_FILENAME, read_bundle
+
+# NumPy, onnxruntime and NLTK are imported lazily so that importing this module
+# (and therefore creating the app) stays cheap on serverless cold starts.
 
 _TOKEN_PATTERN = re.compile(r"\b\w+\b")
-_ps = PorterStemmer()
+_STEM: Callable[[str], str] | None = None
 
 _SESSION = None
 _PIPELINE_METADATA: Dict[str, Any] | None = None
+_MODEL_STAMP: Tuple[float, ...] | None = None
+_MODEL_CHECKED_AT = 0.0
+
+
+def _get_stem() -> Callable[[str], str]:
+    global _STEM
+
+    if _STEM is None:
+        from nltk.stem import PorterStemmer  # noqa: WPS433 (deferred heavy import)
+
+        _STEM = PorterStemmer().stem
+    return _STEM
+
+
+def load_model(
+    base_dir: Path, intra_op_threads: int | None = None
+) -> Tuple[Any, Dict[str, Any]]:
+    """Load an ONNX InferenceSession and its metadata from *base_dir*.
+
+    A prebuilt ``model.bundle`` (see :mod:`app.model_bundle`) is preferred since
+    it is a single file read; otherwise ``model.onnx`` and ``metadata.json`` are
+    loaded separately.  *intra_op_threads* caps the session's thread pool
+    (onnxruntime's default is one thread per core).  The metadata gains a
+    ``model_digest``, the SHA-256 of the ONNX model, which unlike ``version``
+    changes with every publish.
+    """
+
+    bundle_path = base_dir / BUNDLE_FILENAME
+    model_path = base_dir / "model.onnx"
+    metadata_path = base_dir / "metadata.json"
+
+    metadata: Dict[str, Any] = {}
+    if bundle_path.exists():
+        model_source: Any
+        model_source, metadata = read_bundle(bundle_path)
+    elif model_path.exists():
+        model_source = model_path.read_bytes()
+        if metadata_path.exists():
+            with metadata_path.open(encoding="utf-8") as meta_file:
+                metadata = json.load(meta_file)
+    else:
+        raise FileNotFoundError(f"Model pipeline file not found at {model_path}")
+    metadata = {**metadata, "model_digest": hashlib.sha256(model_source).hexdigest()}
+
+    import onnxruntime as rt  # noqa: WPS433 (deferred heavy import)
+
+    session_kwargs: Dict[str, Any] = {"providers": ["CPUExecutionProvider"]}
+    if intra_op_threads is not None:
+        options = rt.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        session_kwargs["sess_options"] = options
+
+    try:
+        with memory.track("onnx_session_load"):
+            session = rt.InferenceSession(model_source, **session_kwargs)
+    except Exception as exc:  # pragma: no cover - defensive guard
+        raise RuntimeError("Failed to load model pipeline.") from exc
+
+    return session, metadata
 
 
 def get_pipeline_and_metadata() -> Tuple[Any, Dict[str, Any]]:
@@ -24,31 +89,69 @@ def get_pipeline_and_metadata() -> Tuple[Any, Dict[str, Any]]:
     The model and a companion ``metadata.json`` file are expected to live in
     the directory configured by ``MODEL_DIR`` (see :mod:`app.config`).  This is
     used by the JSON ``/api/predict`` endpoint.
+
+    With ``INFERENCE_BACKEND=sidecar`` the session is ``None`` and the
+    metadata is the sidecar's, so the worker never loads the model unless the
+    sidecar is unreachable (see :mod:`app.sidecar`).
     """
 
-    global _SESSION, _PIPELINE_METADATA
+    global _SESSION, _PIPELINE_METADATA, _MODEL_STAMP, _MODEL_CHECKED_AT
+
+    client = sidecar.get_client()
+    if client is not None:
+        metadata = client.metadata()
+        if metadata is not None:
+            return None, metadata
 
+    base_dir = Path(current_app.config.get("MODEL_DIR", "model"))
     if _SESSION is None or _PIPELINE_METADATA is None:
-        base_dir = Path(current_app.config.get("MODEL_DIR", "model"))
-        model_path = base_dir / "model.onnx"
-        metadata_path = base_dir / "metadata.json"
+        _MODEL_STAMP = _model_stamp(base_dir)
+        _SESSION, _PIPELINE_METADATA = load_model(base_dir)
+        _MODEL_CHECKED_AT = time.monotonic()
+        return _SESSION, _PIPELINE_METADATA
 
-        if not model_path.exists():
-            raise FileNotFoundError(f"Model pipeline file not found at {model_path}")
+    # Pick up models published into MODEL_DIR (e.g. by ml/incremental.py)
+    # without a restart; at most one stat() per file per interval.
+    interval = current_app.config.get("MODEL_RELOAD_SECONDS", 0)
+    now = time.monotonic()
+    if interval > 0 and now - _MODEL_CHECKED_AT >= interval:
+        _MODEL_CHECKED_AT = now
+        stamp = _model_stamp(base_dir)
+        if stamp != _MODEL_STAMP:
+            try:
+                session, metadata = load_model(base_dir)
+            except Exception:  # pragma: no cover - keep serving the old model
+                current_app.logger.exception(
+                    "Reloading the model from %s failed", base_dir
+                )
+            else:
+                _SESSION, _PIPELINE_METADATA, _MODEL_STAMP = session, metadata, stamp
+                # Everything derived from the previous model goes with it.
+                neardup.reset()
+                cascade.reset()
+                explain.reset()
 
-        try:
-            _SESSION = rt.InferenceSession(str(model_path), providers=["CPUExecutionProvider"])
-        except Exception as exc:  # pragma: no cover - defensive guard
-            raise RuntimeError("Failed to load model pipeline.") from exc
+    return _SESSION, _PIPELINE_METADATA
 
-        metadata: Dict[str, Any] = {}
-        if metadata_path.exists():
-            with metadata_path.open(encoding="utf-8") as meta_file:
-                metadata = json.load(meta_file)
 
-        _PIPELINE_METADATA = metadata
+def model_key(metadata: Dict[str, Any]) -> str | None:
+    """Return what identifies the model behind *metadata* for reusing its results.
 
-    return _SESSION, _PIPELINE_METADATA
+    This is the content digest from :func:`load_model`; ``version`` alone is not
+    enough because ``ml/train.py`` writes the same version on every run.
+    """
+
+    return metadata.get("model_digest") or metadata.get("version")
+
+
+def _model_stamp(base_dir: Path) -> Tuple[float, ...]:
+    stamp = []
+    for name in (BUNDLE_FILENAME, "model.onnx", "metadata.json"):
+        try:
+            stamp.append((base_dir / name).stat().st_mtime)
+        except OSError:
+            stamp.append(0.0)
+    return tuple(stamp)
 
 
 def transform_text(text: str) -> str:
@@ -56,39 +159,171 @@ def transform_text(text: str) -> str:
 
     text = text.lower()
     tokens = _TOKEN_PATTERN.findall(text)
+    stem = _STEM or _get_stem()
 
     filtered_tokens = []
     for token in tokens:
         if token.isalnum() and token not in string.punctuation:
-            filtered_tokens.append(_ps.stem(token))
+            filtered_tokens.append(stem(token))
 
     return " ".join(filtered_tokens)
 
 
-def predict_spam_label(text: str) -> Tuple[str, float]:
-    """Return ``("Spam" / "Not Spam", confidence_probability)`` for the given email *text*."""
+def prepare_text(text: str | bytes) -> str:
+    """Full preprocessing shared by training and serving.
+
+    Extracts readable text from raw MIME/HTML input (see :mod:`app.mime`), then
+    normalizes and stems it with :func:`transform_text`.  The output depends
+    only on *text*, so it is safe to cache.
+    """
+
+    return transform_text(extract_text(text))
+
+
+def prepare_served_text(text: str | bytes) -> str:
+    """:func:`prepare_text` with the serving-only ``MAX_MESSAGE_SECONDS`` budget.
+
+    A pathological message cannot hold up a request, at the cost of scoring
+    only the text extracted in time.  Training never uses this.
+    """
+
+    return transform_text(extract_served_text(text))
+
+
+def extract_served_text(text: str | bytes) -> str:
+    """``extract_text`` with the serving-only ``MAX_MESSAGE_SECONDS`` budget."""
+
+    return extract_text(text, max_seconds=MAX_MESSAGE_SECONDS)
+
+
+def spam_probabilities(session: Any, processed_texts: Sequence[str]) -> Any:
+    """Run *session* on already-preprocessed texts; return spam probabilities."""
+
+    import numpy as np  # noqa: WPS433 (deferred heavy import)
 
-    session, metadata = get_pipeline_and_metadata()
-    
-    # Preprocess text
-    processed_text = transform_text(text)
-    
     # Prepare inputs for ONNX runtime
     input_name = session.get_inputs()[0].name
     label_name = session.get_outputs()[0].name
     proba_name = session.get_outputs()[1].name
-    
+
     # Run inference
-    inputs = {input_name: np.array([[processed_text]], dtype=object)}
-    pred_onx = session.run([label_name, proba_name], inputs)
-    
+    inputs = {input_name: np.array(processed_texts, dtype=object).reshape(-1, 1)}
+    # onnxruntime sizes its CPU arena during the first run of a session.
+    with memory.track_once(id(session), "onnx_first_inference"):
+        pred_onx = session.run([label_name, proba_name], inputs)
+
     # ONNX probabilities output can be a dictionary or a numpy array depending on zipmap
-    proba_data = pred_onx[1][0]
-    
-    if isinstance(proba_data, dict):
-        proba = float(proba_data.get(1, 0.0))
+    proba_data = pred_onx[1]
+
+    if len(proba_data) and isinstance(proba_data[0], dict):
+        return np.array(
+            [float(row.get(1, 0.0)) for row in proba_data], dtype=np.float64
+        )
+
+    proba_array = np.asarray(proba_data, dtype=np.float64)
+    if proba_array.ndim < 2 or proba_array.shape[1] < 2:
+        return np.zeros(len(processed_texts), dtype=np.float64)
+    return np.ascontiguousarray(proba_array[:, 1])
+
+
+def label_for(proba: float) -> str:
+    return "Spam" if proba > 0.5 else "Not Spam"
+
+
+def predict_spam_probabilities(texts: Sequence[str], session: Any = None) -> Any:
+    """Return a NumPy array of spam probabilities for a batch of raw *texts*.
+
+    With ``CASCADE_ENABLED``, texts the first stage is confident about skip
+    stemming and ONNX inference (see :mod:`app.cascade`).  Passing a *session*
+    (another version from :mod:`app.registry`) scores every text with it; the
+    cascade and near-duplicate index belong to the default model and are
+    skipped.  With ``INFERENCE_BACKEND=sidecar``, the default model is run
+    by the host's inference sidecar (see :mod:`app.sidecar`).
+    """
+
+    if session is None:
+        remote = sidecar.score(texts)
+        if remote is not None:
+            return remote[0]
+    return score_texts(texts, session)[0]
+
+
+def score_texts(
+    texts: Sequence[str], session: Any = None
+) -> Tuple[Any, List[str | None]]:
+    """Like :func:`predict_spam_probabilities`, but also return the preprocessed texts.
+
+    The preprocessed text is ``None`` for messages the cascade answered
+    without preprocessing.  :mod:`app.explain` reuses the rest instead of
+    stemming every message twice.
+    """
+
+    if session is not None:
+        processed = [prepare_served_text(text) for text in texts]
+        return spam_probabilities(session, processed), list(processed)
+
+    remote = sidecar.score(texts, with_processed=True)
+    if remote is not None:
+        return remote[0], remote[1]
+
+    # Extracted once: stage 1 tokenizes it and stage 2 stems it.
+    extracted = [extract_served_text(text) for text in texts]
+    decided, remaining = cascade.split(extracted)
+    if len(remaining) == len(texts):
+        processed_by_index: List[str | None] = [
+            transform_text(text) for text in extracted
+        ]
+        probabilities = _score_processed(processed_by_index)
     else:
-        proba = float(proba_data[1]) if len(proba_data) > 1 else 0.0
-    
-    label = "Spam" if proba > 0.5 else "Not Spam"
-    return label, proba
+        import numpy as np  # noqa: WPS433 (deferred heavy import)
+
+        probabilities = np.array(
+            [proba if proba is not None else 0.0 for proba in decided], dtype=np.float64
+        )
+        processed_by_index = [None] * len(texts)
+        if remaining:
+            processed = [transform_text(extracted[index]) for index in remaining]
+            probabilities[remaining] = _score_processed(processed)
+            for index, text in zip(remaining, processed):
+                processed_by_index[index] = text
+    sketches.observe(texts, probabilities, processed_by_index)
+    return probabilities, processed_by_index
+
+
+def _score_processed(processed_texts: Sequence[str]) -> Any:
+    """Run ONNX inference, reusing near-duplicate results when ``NEARDUP_ENABLED``."""
+
+    session, _ = get_pipeline_and_metadata()
+    index = neardup.get_index()
+    if index is None:
+        return spam_probabilities(session, processed_texts)
+    return index.score(
+        processed_texts, lambda misses: spam_probabilities(session, misses)
+    )
+
+
+def predict_spam_label(text: str, session: Any = None) -> Tuple[str, float]:
+    """Return ``("Spam" / "Not Spam", confidence_probability)`` for email *text*."""
+
+    if session is not None:
+        proba = float(spam_probabilities(session, [prepare_served_text(text)])[0])
+        return label_for(proba), proba
+
+    remote = sidecar.score([text])
+    if remote is not None:
+        proba = float(remote[0][0])
+        return label_for(proba), proba
+
+    # Confidently ham or spam messages are answered by the cheap first stage.
+    extracted = extract_served_text(text)
+    proba = cascade.split([extracted])[0][0]
+    if proba is not None:
+        sketches.observe([text], [proba], [None])
+        return label_for(proba), proba
+
+    # Preprocess text
+    processed_text = transform_text(extracted)
+
+    proba = float(_score_processed([processed_text])[0])
+    sketches.observe([text], [proba], [processed_text])
+    return label_for(proba), proba
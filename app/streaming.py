@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import time
+from typing import IO, Any, Dict, Iterator, List, NamedTuple, Tuple
+
+from . import codecs, metrics
+from .admission import DeadlineExceeded, Overloaded, admit, check_deadline
+from .spam import label_for, predict_spam_probabilities
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+# How long a bulk stream waits before retrying a batch the admission
+# controller shed, doubling after each attempt.  A short back-off lets bulk
+# scoring yield to interactive traffic (while waiting we stop reading the
+# upload, which pushes back on the client through TCP flow control), but a
+# stream never holds its worker thread for long: after _OVERLOAD_MAX_ATTEMPTS
+# tries the batch's lines are answered with a 503 error record and the stream
+# moves on.  Waits never run past the request deadline, which ends the stream.
+_OVERLOAD_BACKOFF_SECONDS = 0.05
+_OVERLOAD_MAX_ATTEMPTS = 3
+
+_DEADLINE_EXCEEDED_LINE = b'{"error":"Request deadline exceeded."}\n'
+_OVERLOADED_ERROR = "Server is overloaded. Please retry later."
+
+_STATS: Dict[str, int] = {
+    "streams_started": 0,
+    "streams_completed": 0,
+    "streams_cancelled": 0,
+    "items_scored": 0,
+    "items_invalid": 0,
+    "batches_delayed": 0,
+    "batches_shed": 0,
+}
+
+
+class _Entry(NamedTuple):
+    line: int
+    item_id: Any
+    text: str | None
+    error: str | None
+
+
+def iter_lines(
+    stream: IO[bytes], max_line_bytes: int
+) -> Iterator[Tuple[int, bytes | None]]:
+    """Yield ``(line_number, raw_line)`` from *stream* without buffering the body.
+
+    Blank lines are skipped.  Lines longer than *max_line_bytes* are drained and
+    reported with ``raw_line=None``.
+    """
+
+    line_number = 0
+    while True:
+        line = stream.readline(max_line_bytes + 1)
+        if not line:
+            return
+        line_number += 1
+
+        if len(line) > max_line_bytes and not line.endswith(b"\n"):
+            while line and not line.endswith(b"\n"):
+                line = stream.readline(max_line_bytes)
+            yield line_number, None
+            continue
+
+        line = line.strip()
+        if line:
+            yield line_number, line
+
+
+def parse_line(line_number: int, raw: bytes | None, max_text_length: int) -> _Entry:
+    """Parse one NDJSON line: a JSON string, or an object with ``text`` and ``id``.
+
+    The ``id`` is optional.
+    """
+
+    if raw is None:
+        return _Entry(line_number, None, None, "Line too long.")
+
+    try:
+        item = codecs.loads_json(raw)
+    except ValueError:
+        return _Entry(line_number, None, None, "Invalid JSON.")
+
+    item_id = None
+    if isinstance(item, dict):
+        item_id = item.get("id")
+        text = item.get("text")
+    else:
+        text = item
+
+    if not isinstance(text, str) or not text.strip():
+        return _Entry(
+            line_number,
+            item_id,
+            None,
+            "Field 'text' is required and must be a non-empty string.",
+        )
+    if len(text) > max_text_length:
+        return _Entry(line_number, item_id, None, "Text too long.")
+    return _Entry(line_number, item_id, text, None)
+
+
+def _score(
+    texts: List[str], session: Any = None, deadline: float | None = None
+) -> List[float]:
+    """Score *texts*, backing off while the admission controller sheds them.
+
+    Raises :class:`DeadlineExceeded` once *deadline* has passed and
+    :class:`Overloaded` after ``_OVERLOAD_MAX_ATTEMPTS`` shed attempts.
+    """
+
+    delay = _OVERLOAD_BACKOFF_SECONDS
+    for attempt in range(1, _OVERLOAD_MAX_ATTEMPTS + 1):
+        try:
+            with admit(deadline):
+                return predict_spam_probabilities(texts, session=session).tolist()
+        except Overloaded:
+            if attempt == _OVERLOAD_MAX_ATTEMPTS:
+                raise
+        _STATS["batches_delayed"] += 1
+        if deadline is not None:
+            delay = min(delay, max(0.0, deadline - time.time()))
+        time.sleep(delay)
+        check_deadline(deadline)
+        delay *= 2
+    raise Overloaded()
+
+
+def _flush(
+    entries: List[_Entry], session: Any = None, deadline: float | None = None
+) -> bytes:
+    texts = [entry.text for entry in entries if entry.text is not None]
+    try:
+        probabilities = iter(_score(texts, session, deadline)) if texts else iter(())
+    except Overloaded:
+        # Still shed after the back-off: fail this batch's lines so the client
+        # can resend them, rather than holding the worker any longer.
+        probabilities = None
+        _STATS["batches_shed"] += 1
+
+    chunk = []
+    for entry in entries:
+        result: Dict[str, Any] = {"line": entry.line}
+        if entry.item_id is not None:
+            result["id"] = entry.item_id
+        if entry.error is not None:
+            result["error"] = entry.error
+            _STATS["items_invalid"] += 1
+        elif probabilities is None:
+            result["error"] = _OVERLOADED_ERROR
+            result["status"] = 503
+        else:
+            proba = next(probabilities)
+            result["prediction"] = label_for(proba)
+            result["probability"] = proba
+            _STATS["items_scored"] += 1
+        chunk.append(codecs.encode(result, codecs.JSON_MIMETYPE))
+        chunk.append(b"\n")
+    return b"".join(chunk)
+
+
+def score_stream(
+    stream: IO[bytes],
+    batch_size: int,
+    max_line_bytes: int,
+    max_text_length: int,
+    deadline: float | None = None,
+    session: Any = None,
+) -> Iterator[bytes]:
+    """Score NDJSON from *stream*, yielding one NDJSON chunk per internal batch.
+
+    Each input line is either a JSON string or an object with ``text`` and an
+    optional ``id``.  Output lines carry the input ``line`` number (and ``id``)
+    with either ``prediction``/``probability`` or ``error``.  At most
+    *batch_size* items are held in memory at once.  If the client disconnects,
+    the server closes this generator and the remaining input is never read or
+    scored.  *session* selects a model version as in
+    :func:`app.spam.predict_spam_probabilities`.  Lines of a batch the server
+    is still too overloaded to score get an ``error`` with ``"status": 503``.
+    Once *deadline* passes, the stream ends with an ``error`` line.
+    """
+
+    _STATS["streams_started"] += 1
+    completed = False
+    try:
+        entries: List[_Entry] = []
+        valid = 0
+        for line_number, raw in iter_lines(stream, max_line_bytes):
+            entry = parse_line(line_number, raw, max_text_length)
+            entries.append(entry)
+            valid += entry.error is None
+            if valid >= batch_size or len(entries) >= batch_size * 4:
+                yield _flush(entries, session, deadline)
+                entries, valid = [], 0
+
+        if entries:
+            yield _flush(entries, session, deadline)
+        completed = True
+    except DeadlineExceeded:
+        yield _DEADLINE_EXCEEDED_LINE
+    finally:
+        _STATS["streams_completed" if completed else "streams_cancelled"] += 1
+
+
+metrics.register_source("streaming", lambda: dict(_STATS))
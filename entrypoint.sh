@@ -8,21 +8,19 @@ if [ -z "$FLASK_ENV" ]; then
   export FLASK_ENV=production
 fi
 
-echo "[entrypoint] Running database migrations (db.create_all)..."
-python - << 'PYCODE'
-from app import create_app
-from app.extensions import db
-from app import models  # noqa: F401
-
-app = create_app()
-with app.app_context():
-    db.create_all()
-PYCODE
+echo "[entrypoint] Running database migrations..."
+python scripts/migrate_db.py
 
 if [ -f "scripts/migrate_passwords.py" ]; then
   echo "[entrypoint] Running password migration script (if needed)..."
   python scripts/migrate_passwords.py || echo "[entrypoint] Password migration script failed or not needed."
 fi
 
-echo "[entrypoint] Starting gunicorn on 0.0.0.0:8000..."
-exec gunicorn -b 0.0.0.0:8000 wsgi:app
+# Threaded workers, so that each worker runs several requests at once and the
+# admission limiter (app/admission.py) can shed load.  With sync workers a
+# worker never has more than one request in flight.  gunicorn reads the
+# worker count from WEB_CONCURRENCY.
+GUNICORN_THREADS="${GUNICORN_THREADS:-8}"
+
+echo "[entrypoint] Starting gunicorn on 0.0.0.0:8000 (gthread, $GUNICORN_THREADS threads per worker)..."
+exec gunicorn -b 0.0.0.0:8000 --worker-class gthread --threads "$GUNICORN_THREADS" wsgi:app
@@ -0,0 +1,366 @@
+"""Training scalability benchmark on synthetic corpora (see ml/synthetic.py).
+
+Usage:
+    python -m ml.benchmark [--sizes 5000,50000,500000] [--vocab-size 20000]
+        [--onnx-vocab-sizes 1000,10000,100000] [--onnx-docs 20000]
+        [--skip grid_search] [--output-dir reports/] [--in-process]
+
+For each corpus size the stages of ``ml/train.py`` run one after another:
+
+- ``preprocess``: :func:`app.spam.prepare_text` over every message (no cache),
+- ``tfidf_fit``: fitting the TF-IDF vectorizer,
+- ``classifier_fit``: fitting the logistic regression on those features,
+- ``grid_search``: ``ml.train.PARAM_GRID`` with 3-fold CV on preprocessed text,
+  i.e. what training costs once the preprocess cache is warm,
+- ``onnx_export``: :func:`ml.pipeline.to_onnx_bytes`, the export done by
+  ``scripts/convert_to_onnx.py``.
+
+A second sweep holds the corpus size at ``--onnx-docs`` and varies the
+vocabulary to show how export time and model size grow with the number of
+TF-IDF features.
+
+Each stage records wall time, peak RSS and RSS growth over the stage's
+starting point.  Every corpus runs in a fresh child process so that memory
+freed by one size doesn't flatter the next.  Results are written to
+``benchmark_training.json`` (with per-stage log-log scaling exponents) and
+``benchmark_training.csv``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence
+
+import numpy as np
+from sklearn.model_selection import GridSearchCV
+from sklearn.pipeline import Pipeline
+
+from app.spam import prepare_text
+
+from .pipeline import build_pipeline, to_onnx_bytes
+from .synthetic import generate_corpus
+from .train import PARAM_GRID, REPORTS_DIR
+
+STAGES = (
+    "generate",
+    "preprocess",
+    "tfidf_fit",
+    "classifier_fit",
+    "grid_search",
+    "onnx_export",
+)
+_CSV_FIELDS = (
+    "sweep",
+    "docs",
+    "vocab_size",
+    "features",
+    "stage",
+    "seconds",
+    "peak_rss_mb",
+    "rss_growth_mb",
+    "output_bytes",
+    "error",
+)
+_SAMPLE_INTERVAL = 0.01
+_MB = 1024 * 1024
+
+
+def _current_rss() -> int:
+    try:
+        with open("/proc/self/statm", encoding="ascii") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:  # pragma: no cover - not Linux
+        return _max_rss()
+
+
+def _max_rss() -> int:
+    import resource  # noqa: WPS433 (POSIX only)
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class PeakRss:
+    """Track the peak resident set size while the ``with`` block runs.
+
+    A background thread samples the current RSS; if the process-wide maximum
+    (``ru_maxrss``) rose during the block, that value is the block's peak even
+    when the sampler missed it, e.g. while C code held the GIL.
+    """
+
+    def __init__(self) -> None:
+        self.start = 0
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self) -> None:
+        while not self._stop.wait(_SAMPLE_INTERVAL):
+            self.peak = max(self.peak, _current_rss())
+
+    def __enter__(self) -> "PeakRss":
+        self.start = self.peak = _current_rss()
+        self._max_before = _max_rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _current_rss())
+        max_after = _max_rss()
+        if max_after > self._max_before:
+            self.peak = max(self.peak, max_after)
+
+
+def measure(
+    stage: str, func: Callable[[], Any], results: Dict[str, Dict[str, Any]]
+) -> Any:
+    """Run *func*, store its timing and memory under ``results[stage]``, return it."""
+
+    with PeakRss() as rss:
+        start = time.perf_counter()
+        value = func()
+        seconds = time.perf_counter() - start
+    results[stage] = {
+        "seconds": seconds,
+        "peak_rss_mb": rss.peak / _MB,
+        "rss_growth_mb": (rss.peak - rss.start) / _MB,
+    }
+    return value
+
+
+def _export(tfidf: Any, classifier: Any, results: Dict[str, Dict[str, Any]]) -> None:
+    try:
+        import skl2onnx  # noqa: F401,WPS433 (export-only dependency)
+    except ImportError:
+        results["onnx_export"] = {"error": "skl2onnx is not installed"}
+        return
+    exported = Pipeline([("tfidf", tfidf), ("clf", classifier)])
+    onnx_bytes = measure("onnx_export", lambda: to_onnx_bytes(exported), results)
+    results["onnx_export"]["output_bytes"] = len(onnx_bytes)
+
+
+def run_scale(
+    docs: int, vocab_size: int, skip: Sequence[str] = (), seed: int = 0
+) -> Dict[str, Any]:
+    """Run every training stage on a *docs*-message corpus; return the measurements."""
+
+    stages: Dict[str, Dict[str, Any]] = {}
+    texts, labels = measure(
+        "generate",
+        lambda: generate_corpus(docs, vocab_size=vocab_size, seed=seed),
+        stages,
+    )
+    processed = measure(
+        "preprocess", lambda: [prepare_text(text) for text in texts], stages
+    )
+
+    template = build_pipeline(model_type="logreg")
+    tfidf, classifier = template.named_steps["tfidf"], template.named_steps["clf"]
+    features = measure("tfidf_fit", lambda: tfidf.fit_transform(processed), stages)
+    measure("classifier_fit", lambda: classifier.fit(features, labels), stages)
+
+    if "grid_search" not in skip:
+        unfitted = build_pipeline(model_type="logreg")
+        grid = GridSearchCV(
+            Pipeline(
+                [
+                    ("tfidf", unfitted.named_steps["tfidf"]),
+                    ("clf", unfitted.named_steps["clf"]),
+                ]
+            ),
+            param_grid=PARAM_GRID,
+            cv=3,
+            scoring="f1",
+            n_jobs=1,
+        )
+        measure("grid_search", lambda: grid.fit(processed, labels), stages)
+    if "onnx_export" not in skip:
+        _export(tfidf, classifier, stages)
+
+    return {
+        "sweep": "scale",
+        "docs": docs,
+        "vocab_size": vocab_size,
+        "features": features.shape[1],
+        "stages": stages,
+    }
+
+
+def run_onnx(docs: int, vocab_size: int, seed: int = 0) -> Dict[str, Any]:
+    """Fit on a *vocab_size*-word corpus and measure only the ONNX export."""
+
+    texts, labels = generate_corpus(docs, vocab_size=vocab_size, seed=seed)
+    pipeline = build_pipeline(model_type="logreg")
+    tfidf, classifier = pipeline.named_steps["tfidf"], pipeline.named_steps["clf"]
+    features = tfidf.fit_transform([prepare_text(text) for text in texts])
+    classifier.fit(features, labels)
+
+    stages: Dict[str, Dict[str, Any]] = {}
+    _export(tfidf, classifier, stages)
+    return {
+        "sweep": "onnx",
+        "docs": docs,
+        "vocab_size": vocab_size,
+        "features": features.shape[1],
+        "stages": stages,
+    }
+
+
+def scaling_exponents(
+    runs: Sequence[Dict[str, Any]], key: str = "seconds"
+) -> Dict[str, float]:
+    """Log-log slope of *key* against corpus size per stage (1.0 = linear)."""
+
+    exponents: Dict[str, float] = {}
+    for stage in STAGES:
+        points = [
+            (run["docs"], run["stages"][stage][key])
+            for run in runs
+            if key in run["stages"].get(stage, {}) and run["stages"][stage][key] > 0
+        ]
+        if len({docs for docs, _ in points}) >= 2:
+            sizes, values = zip(*points)
+            exponents[stage] = float(np.polyfit(np.log(sizes), np.log(values), 1)[0])
+    return exponents
+
+
+def csv_rows(runs: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    rows = []
+    for run in runs:
+        for stage, result in run["stages"].items():
+            rows.append(
+                {
+                    "sweep": run["sweep"],
+                    "docs": run["docs"],
+                    "vocab_size": run["vocab_size"],
+                    "features": run["features"],
+                    "stage": stage,
+                    **{field: result.get(field, "") for field in _CSV_FIELDS[5:]},
+                },
+            )
+    return rows
+
+
+def _run_isolated(
+    func: Callable[..., Dict[str, Any]], *args: Any, in_process: bool = False
+) -> Dict[str, Any]:
+    if in_process:
+        return func(*args)
+    method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+    with multiprocessing.get_context(method).Pool(1) as pool:
+        return pool.apply(func, args)
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Measure how training time and memory scale with corpus size."
+    )
+    parser.add_argument(
+        "--sizes",
+        type=_int_list,
+        default=[2000, 10000, 50000],
+        help="Comma-separated corpus sizes.",
+    )
+    parser.add_argument("--vocab-size", type=int, default=20000)
+    parser.add_argument(
+        "--onnx-vocab-sizes", type=_int_list, default=[1000, 10000, 50000]
+    )
+    parser.add_argument("--onnx-docs", type=int, default=10000)
+    parser.add_argument(
+        "--skip", action="append", default=[], choices=["grid_search", "onnx_export"]
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output-dir", type=Path, default=REPORTS_DIR)
+    parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="Don't fork a fresh process per corpus.",
+    )
+    args = parser.parse_args()
+
+    runs = []
+    for docs in args.sizes:
+        print(f"scale: {docs} messages, {args.vocab_size} words ...", flush=True)
+        runs.append(
+            _run_isolated(
+                run_scale,
+                docs,
+                args.vocab_size,
+                args.skip,
+                args.seed,
+                in_process=args.in_process,
+            )
+        )
+    if "onnx_export" not in args.skip:
+        for vocab_size in args.onnx_vocab_sizes:
+            print(
+                f"onnx: {args.onnx_docs} messages, {vocab_size} words ...", flush=True
+            )
+            runs.append(
+                _run_isolated(
+                    run_onnx,
+                    args.onnx_docs,
+                    vocab_size,
+                    args.seed,
+                    in_process=args.in_process,
+                )
+            )
+
+    scale_runs = [run for run in runs if run["sweep"] == "scale"]
+    report = {
+        "config": {
+            key: value for key, value in vars(args).items() if key != "output_dir"
+        },
+        "runs": runs,
+        "scaling": {
+            "seconds": scaling_exponents(scale_runs, "seconds"),
+            "rss_growth_mb": scaling_exponents(scale_runs, "rss_growth_mb"),
+        },
+    }
+
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    json_path = args.output_dir / "benchmark_training.json"
+    csv_path = args.output_dir / "benchmark_training.csv"
+    json_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    with csv_path.open("w", newline="", encoding="utf-8") as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=_CSV_FIELDS)
+        writer.writeheader()
+        writer.writerows(csv_rows(runs))
+
+    print(
+        f"{'sweep':<6} {'docs':>8} {'features':>9} {'stage':<15} "
+        f"{'seconds':>9} {'peak MB':>9} {'+MB':>8}"
+    )
+    for row in csv_rows(runs):
+        if row["error"]:
+            print(
+                f"{row['sweep']:<6} {row['docs']:>8} {row['features']:>9} "
+                f"{row['stage']:<15} {row['error']}"
+            )
+            continue
+        print(
+            f"{row['sweep']:<6} {row['docs']:>8} {row['features']:>9} "
+            f"{row['stage']:<15} {row['seconds']:>9.3f} "
+            f"{row['peak_rss_mb']:>9.1f} {row['rss_growth_mb']:>8.1f}",
+        )
+    print("time scaling exponents:", json.dumps(report["scaling"]["seconds"]))
+    print(f"Wrote {json_path} and {csv_path}")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
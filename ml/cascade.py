@@ -0,0 +1,139 @@
+"""Training and calibration of the cascade's cheap first stage (see app/cascade.py).
+
+Stage 1 is an L1-regularized logistic regression over binary unstemmed-token
+features, pruned to the ``max_features`` tokens with the largest weights.
+Its thresholds are calibrated on data the model was not fitted on: ``high``
+is the lowest probability above which at least ``target_precision`` of
+messages are spam, and ``low`` is the highest probability below which at
+least ``target_precision`` are ham.  Everything in between goes to stage 2.
+A side with fewer than ``MIN_SUPPORT`` qualifying samples never exits.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.linear_model import LogisticRegression
+
+from app.cascade import FirstStage, tokens
+
+TARGET_PRECISION = 0.995
+MAX_FEATURES = 2000
+# Never exit on fewer calibration samples than this on either side.
+MIN_SUPPORT = 20
+
+
+def _analyzer(text: str) -> List[str]:
+    return list(tokens(text))
+
+
+def train_first_stage(
+    texts: Sequence[str],
+    labels: Sequence[int],
+    max_features: int = MAX_FEATURES,
+    C: float = 1.0,
+) -> FirstStage:
+    """Fit and prune the stage-1 model; thresholds start at "never exit"."""
+
+    vectorizer = CountVectorizer(analyzer=_analyzer, binary=True)
+    features = vectorizer.fit_transform(list(texts))
+    model = LogisticRegression(penalty="l1", solver="liblinear", C=C)
+    model.fit(features, list(labels))
+
+    coefficients = model.coef_[0]
+    keep = np.argsort(-np.abs(coefficients))[:max_features]
+    vocabulary = vectorizer.get_feature_names_out()
+    weights = {
+        str(vocabulary[index]): float(coefficients[index])
+        for index in keep
+        if coefficients[index] != 0.0
+    }
+    return FirstStage(weights, float(model.intercept_[0]), low=-1.0, high=2.0)
+
+
+def calibrate(
+    stage: FirstStage,
+    texts: Sequence[str],
+    labels: Sequence[int],
+    target_precision: float = TARGET_PRECISION,
+) -> FirstStage:
+    """Set ``stage.low``/``stage.high`` from held-out ``(texts, labels)``."""
+
+    probabilities = np.array([stage.probability(text) for text in texts])
+    targets = np.asarray(labels)
+    order = np.argsort(probabilities)
+    sorted_probabilities = probabilities[order]
+    sorted_targets = targets[order]
+
+    # Spam side: scan thresholds from the top; precision of {p >= t}.
+    spam_counts = np.cumsum(sorted_targets[::-1])
+    stage.high = 2.0
+    for count in range(len(sorted_targets), MIN_SUPPORT - 1, -1):
+        if spam_counts[count - 1] / count >= target_precision:
+            stage.high = float(sorted_probabilities[::-1][count - 1])
+            break
+
+    # Ham side: precision of {p <= t}.
+    ham_counts = np.cumsum(1 - sorted_targets)
+    stage.low = -1.0
+    for count in range(len(sorted_targets), MIN_SUPPORT - 1, -1):
+        if ham_counts[count - 1] / count >= target_precision:
+            stage.low = float(sorted_probabilities[count - 1])
+            break
+
+    if stage.low >= stage.high:
+        # On nearly separable data each side's threshold can reach past the
+        # other's.  Splitting them at the decision boundary lets every message
+        # exit, so keep the split only if both sides still meet the target on
+        # the calibration data, and otherwise never exit.
+        low, high = min(stage.low, 0.5), max(stage.high, 0.5)
+        ham_side = 1 - targets[probabilities <= low]
+        spam_side = targets[probabilities >= high]
+        if _meets(ham_side, target_precision) and _meets(spam_side, target_precision):
+            stage.low, stage.high = low, high
+        else:
+            stage.low, stage.high = -1.0, 2.0
+    return stage
+
+
+def _meets(hits: Any, target_precision: float) -> bool:
+    return not len(hits) or float(np.mean(hits)) >= target_precision
+
+
+def evaluate_cascade(
+    stage: FirstStage,
+    stage2_probabilities: Sequence[float],
+    texts: Sequence[str],
+    labels: Sequence[int],
+) -> Dict[str, Any]:
+    """Compare the cascade with stage 2 alone on ``(texts, labels)``."""
+
+    targets = np.asarray(labels)
+    full = np.asarray(stage2_probabilities, dtype=float)
+    decided = [stage.decide(text) for text in texts]
+    exits = np.array([proba is not None for proba in decided])
+    combined = np.array(
+        [
+            proba if proba is not None else full[index]
+            for index, proba in enumerate(decided)
+        ]
+    )
+
+    full_accuracy = float(np.mean((full > 0.5) == targets))
+    cascade_accuracy = float(np.mean((combined > 0.5) == targets))
+    return {
+        "low": stage.low,
+        "high": stage.high,
+        "features": len(stage.weights),
+        "exit_rate": float(exits.mean()) if len(exits) else 0.0,
+        "stage1_exit_accuracy": float(
+            np.mean((combined[exits] > 0.5) == targets[exits])
+        )
+        if exits.any()
+        else None,
+        "stage2_accuracy": full_accuracy,
+        "cascade_accuracy": cascade_accuracy,
+        "accuracy_cost": full_accuracy - cascade_accuracy,
+    }
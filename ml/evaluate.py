@@ -1,12 +1,11 @@
 from __future__ import annotations
 
-import csv
 from pathlib import Path
 from typing import List, Tuple
 
 from sklearn.metrics import classification_report, confusion_matrix, roc_auc_score
 
-from .pipeline import build_pipeline
+from .pipeline import enable_preprocess_cache
 
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -27,6 +26,7 @@ def evaluate() -> None:
         raise FileNotFoundError(f"Dataset not found at {data_path}")
 
     texts, labels = _load_dataset(data_path)
+    enable_preprocess_cache()
 
     version_dir = MODEL_ROOT / MODEL_VERSION
     model_path = version_dir / "model.pkl"
@@ -0,0 +1,386 @@
+"""Fold user label feedback into the current model without a full retrain.
+
+Usage (e.g. hourly from cron):
+    python -m ml.incremental [--model-dir model/] [--min-new 50] [--epochs 5]
+        [--tolerance 0.01] [--dry-run]
+
+The current pipeline (``MODEL_DIR/model.pkl``) keeps its fitted TF-IDF
+vocabulary.  Its classifier is updated with ``partial_fit`` on the feedback
+that arrived since the model was built, mixed with an equal-sized replay sample
+of the base dataset so the model doesn't drift towards the feedback alone.
+``LogisticRegression`` models from ``ml/train.py`` are first converted to an
+equivalent ``SGDClassifier`` seeded with the same weights.
+
+The candidate is validated against the base dataset's held-out split (the
+same split ``ml/train.py`` uses) and a hash-selected slice of the feedback that
+is never trained on.  The model is only published when the F1 score on the
+held-out split drops by no more than ``--tolerance`` and accuracy on the
+held-out feedback does not drop; with neither validation set available
+nothing is published.  Publishing writes a new version directory
+and then atomically replaces the top-level artifacts; running workers reload
+them within ``MODEL_RELOAD_SECONDS``.
+
+Words that never appeared in the original training data are outside the
+TF-IDF vocabulary, so the incremental model can't use them.  Periodic full
+retrains with ``ml/train.py`` still refresh the vocabulary.
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import json
+import os
+import pickle
+import random
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import accuracy_score, f1_score, roc_auc_score
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+
+from app.explain import EXPLAIN_FILENAME
+from app.model_bundle import BUNDLE_FILENAME, write_bundle
+
+from .pipeline import contribution_table, enable_preprocess_cache, to_onnx_bytes
+from .train import DATA_DIR, MODEL_ROOT, _load_dataset
+
+# Roughly 20% of feedback (selected by text hash, so stable across runs) is
+# held out for validation and never trained on.
+_FEEDBACK_HOLDOUT_BELOW = 51
+
+
+class Feedback(NamedTuple):
+    text_hash: str
+    text: str
+    label: int
+
+
+def load_feedback(since: str | None) -> Tuple[List[Feedback], str | None]:
+    """Return feedback updated after the ISO timestamp *since* and the new watermark."""
+
+    from app import create_app  # noqa: WPS433 (only the CLI needs the database)
+    from app.models import LabelFeedback  # noqa: WPS433
+
+    application = create_app()
+    with application.app_context():
+        query = LabelFeedback.query.order_by(LabelFeedback.updated_at, LabelFeedback.id)
+        if since:
+            query = query.filter(
+                LabelFeedback.updated_at > datetime.fromisoformat(since)
+            )
+        rows = [(row.text_hash, row.text, row.label, row.updated_at) for row in query]
+
+    feedback = [
+        Feedback(text_hash, text, int(label)) for text_hash, text, label, _ in rows
+    ]
+    watermark = rows[-1][3].isoformat() if rows else since
+    return feedback, watermark
+
+
+def split_feedback(
+    feedback: Sequence[Feedback],
+) -> Tuple[List[Feedback], List[Feedback]]:
+    """Split *feedback* into ``(train, holdout)`` deterministically by text hash."""
+
+    train: List[Feedback] = []
+    holdout: List[Feedback] = []
+    for item in feedback:
+        (
+            holdout if int(item.text_hash[:2], 16) < _FEEDBACK_HOLDOUT_BELOW else train
+        ).append(item)
+    return train, holdout
+
+
+def to_incremental(pipeline: Pipeline, learning_rate: float = 0.01) -> Pipeline:
+    """Return a copy of *pipeline* whose classifier supports ``partial_fit``."""
+
+    pipeline = copy.deepcopy(pipeline)
+    classifier = pipeline.named_steps["clf"]
+    if hasattr(classifier, "partial_fit"):
+        return pipeline
+
+    sgd = SGDClassifier(
+        loss="log_loss",
+        fit_intercept=classifier.fit_intercept,
+        learning_rate="constant",
+        eta0=learning_rate,
+    )
+    # partial_fit continues from existing coefficients, so seeding them makes
+    # the first update start from the trained LogisticRegression.
+    sgd.coef_ = classifier.coef_.copy()
+    sgd.intercept_ = np.atleast_1d(
+        np.asarray(classifier.intercept_, dtype=float)
+    ).copy()
+    pipeline.steps[-1] = ("clf", sgd)
+    return pipeline
+
+
+def update(
+    pipeline: Pipeline,
+    texts: Sequence[str],
+    labels: Sequence[int],
+    epochs: int = 5,
+    seed: int = 42,
+) -> Pipeline:
+    """Apply *epochs* shuffled ``partial_fit`` passes of ``(texts, labels)``."""
+
+    features = pipeline[:-1].transform(list(texts))
+    targets = np.asarray(labels)
+    classifier = pipeline.named_steps["clf"]
+    rng = np.random.default_rng(seed)
+    for _ in range(epochs):
+        order = rng.permutation(len(targets))
+        classifier.partial_fit(
+            features[order], targets[order], classes=np.array([0, 1])
+        )
+    return pipeline
+
+
+def score(
+    pipeline: Pipeline, texts: Sequence[str], labels: Sequence[int]
+) -> Dict[str, float]:
+    if not texts:
+        return {}
+    predictions = pipeline.predict(list(texts))
+    scores = {
+        "accuracy": float(accuracy_score(labels, predictions)),
+        "f1": float(f1_score(labels, predictions, zero_division=0)),
+    }
+    if len(set(labels)) > 1:
+        scores["roc_auc"] = float(
+            roc_auc_score(labels, pipeline.predict_proba(list(texts))[:, 1])
+        )
+    return scores
+
+
+def passes(
+    baseline: Dict[str, Dict[str, float]],
+    candidate: Dict[str, Dict[str, float]],
+    tolerance: float,
+) -> bool:
+    """Return True if *candidate* is good enough to replace *baseline*.
+
+    Without any validation scores there is nothing to compare, so the
+    candidate is refused rather than published unchecked.
+    """
+
+    if not baseline:
+        return False
+    if (
+        "holdout" in baseline
+        and candidate["holdout"]["f1"] < baseline["holdout"]["f1"] - tolerance
+    ):
+        return False
+    if (
+        "feedback" in baseline
+        and candidate["feedback"]["accuracy"] < baseline["feedback"]["accuracy"]
+    ):
+        return False
+    return True
+
+
+def _replace(path: Path, data: bytes) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def publish(pipeline: Pipeline, metadata: Dict[str, Any], model_dir: Path) -> Path:
+    """Write a new version directory and atomically swap in the top-level artifacts."""
+
+    version_dir = model_dir / metadata["version"]
+    version_dir.mkdir(parents=True, exist_ok=True)
+
+    onnx_bytes = to_onnx_bytes(pipeline)
+    metadata_bytes = json.dumps(metadata, indent=2).encode("utf-8")
+    (version_dir / "model.pkl").write_bytes(pickle.dumps(pipeline))
+    (version_dir / "model.onnx").write_bytes(onnx_bytes)
+    (version_dir / "metadata.json").write_bytes(metadata_bytes)
+    table = contribution_table(pipeline)
+    explain_bytes = json.dumps(table).encode("utf-8") if table is not None else None
+    if explain_bytes is not None:
+        (version_dir / EXPLAIN_FILENAME).write_bytes(explain_bytes)
+
+    shutil.copy2(version_dir / "model.pkl", model_dir / "model.pkl.tmp")
+    os.replace(model_dir / "model.pkl.tmp", model_dir / "model.pkl")
+    _replace(model_dir / "model.onnx", onnx_bytes)
+    _replace(model_dir / "metadata.json", metadata_bytes)
+    if explain_bytes is not None:
+        _replace(model_dir / EXPLAIN_FILENAME, explain_bytes)
+    else:
+        # A stale table would explain the previous model's coefficients.
+        (model_dir / EXPLAIN_FILENAME).unlink(missing_ok=True)
+    if (model_dir / BUNDLE_FILENAME).exists():
+        # The app prefers the bundle, so a stale one would shadow the update.
+        write_bundle(model_dir / BUNDLE_FILENAME, onnx_bytes, metadata)
+    return version_dir
+
+
+def refresh(
+    model_dir: Path,
+    feedback: Sequence[Feedback],
+    base_texts: Sequence[str],
+    base_labels: Sequence[int],
+    watermark: str | None = None,
+    epochs: int = 5,
+    learning_rate: float = 0.01,
+    tolerance: float = 0.01,
+    dry_run: bool = False,
+) -> Dict[str, Any]:
+    """Update the model in *model_dir* with *feedback*; return a summary of the run."""
+
+    with (model_dir / "model.pkl").open("rb") as model_file:
+        current = pickle.load(model_file)
+    metadata_path = model_dir / "metadata.json"
+    current_metadata = (
+        json.loads(metadata_path.read_text(encoding="utf-8"))
+        if metadata_path.exists()
+        else {}
+    )
+
+    train_feedback, holdout_feedback = split_feedback(feedback)
+    train_texts: List[str] = []
+    train_labels: List[int] = []
+    holdout_texts: List[str] = []
+    holdout_labels: List[int] = []
+    if len(set(base_labels)) > 1 and len(base_texts) >= 10:
+        train_texts, holdout_texts, train_labels, holdout_labels = train_test_split(
+            list(base_texts),
+            list(base_labels),
+            test_size=0.2,
+            random_state=42,
+            stratify=list(base_labels),
+        )
+
+    # Replay as many base rows as there are feedback rows.
+    replay = random.Random(42).sample(
+        range(len(train_texts)), min(len(train_texts), len(train_feedback))
+    )
+    texts = [item.text for item in train_feedback] + [
+        train_texts[index] for index in replay
+    ]
+    labels = [item.label for item in train_feedback] + [
+        train_labels[index] for index in replay
+    ]
+
+    candidate = update(
+        to_incremental(current, learning_rate), texts, labels, epochs=epochs
+    )
+
+    def evaluate(pipeline: Pipeline) -> Dict[str, Dict[str, float]]:
+        results = {}
+        if holdout_texts:
+            results["holdout"] = score(pipeline, holdout_texts, holdout_labels)
+        if holdout_feedback:
+            results["feedback"] = score(
+                pipeline,
+                [item.text for item in holdout_feedback],
+                [item.label for item in holdout_feedback],
+            )
+        return results
+
+    baseline_scores = evaluate(current)
+    candidate_scores = evaluate(candidate)
+    accepted = passes(baseline_scores, candidate_scores, tolerance)
+
+    base_version = current_metadata.get("base_version") or current_metadata.get(
+        "version", "unknown"
+    )
+    version = f"{base_version}+ft.{datetime.utcnow():%Y%m%dT%H%M%S}"
+    summary: Dict[str, Any] = {
+        "version": version,
+        "accepted": accepted,
+        "published": False,
+        "feedback_rows": len(feedback),
+        "trained_rows": len(texts),
+        "baseline": baseline_scores,
+        "candidate": candidate_scores,
+    }
+
+    if accepted and not dry_run:
+        metadata = {
+            **current_metadata,
+            "version": version,
+            "base_version": base_version,
+            "created_at": datetime.utcnow().isoformat() + "Z",
+            "classifier": type(candidate.named_steps["clf"]).__name__,
+            "feedback_watermark": watermark,
+            "incremental": {
+                key: summary[key]
+                for key in ("feedback_rows", "trained_rows", "candidate")
+            },
+        }
+        publish(candidate, metadata, model_dir)
+        summary["published"] = True
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Fold label feedback into the current model."
+    )
+    parser.add_argument(
+        "--model-dir", type=Path, default=Path(os.getenv("MODEL_DIR", MODEL_ROOT))
+    )
+    parser.add_argument("--data", type=Path, default=DATA_DIR / "spam_dataset.csv")
+    parser.add_argument(
+        "--min-new",
+        type=int,
+        default=50,
+        help="Skip the run below this many new labels.",
+    )
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--learning-rate", type=float, default=0.01)
+    parser.add_argument(
+        "--tolerance", type=float, default=0.01, help="Allowed drop in held-out F1."
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Validate but don't publish."
+    )
+    args = parser.parse_args()
+
+    metadata_path = args.model_dir / "metadata.json"
+    since = None
+    if metadata_path.exists():
+        since = json.loads(metadata_path.read_text(encoding="utf-8")).get(
+            "feedback_watermark"
+        )
+
+    feedback, watermark = load_feedback(since)
+    if len(feedback) < args.min_new:
+        print(
+            f"{len(feedback)} new labels since {since or 'the start'}; "
+            f"need {args.min_new}. Nothing to do."
+        )
+        return
+
+    base_texts: List[str] = []
+    base_labels: List[int] = []
+    if args.data.exists():
+        base_texts, base_labels = _load_dataset(args.data)
+
+    enable_preprocess_cache()
+    summary = refresh(
+        args.model_dir,
+        feedback,
+        base_texts,
+        base_labels,
+        watermark=watermark,
+        epochs=args.epochs,
+        learning_rate=args.learning_rate,
+        tolerance=args.tolerance,
+        dry_run=args.dry_run,
+    )
+    print(json.dumps(summary, indent=2))
+    if not summary["accepted"]:
+        raise SystemExit("Candidate model failed validation; not published.")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
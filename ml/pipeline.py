@@ -1,29 +1,60 @@
 from __future__ import annotations
 
-from typing import List, Sequence
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
 
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 from sklearn.naive_bayes import MultinomialNB
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import FunctionTransformer
 
-from app.spam import transform_text
+from app.spam import prepare_text
+
+from .preprocess_cache import PreprocessCache
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_CACHE_DIR = BASE_DIR / ".cache" / "preprocess"
+
+_CACHE: PreprocessCache | None = None
+
+
+def enable_preprocess_cache(root: Path | None = None) -> PreprocessCache | None:
+    """Route :func:`_preprocess_texts` through an on-disk :class:`PreprocessCache`.
+
+    The location defaults to ``$PREPROCESS_CACHE_DIR`` or ``.cache/preprocess``;
+    setting ``PREPROCESS_CACHE_DIR=off`` disables caching.
+    """
+
+    global _CACHE
+
+    if root is None:
+        configured = os.getenv("PREPROCESS_CACHE_DIR", "")
+        if configured.lower() in {"off", "0", "false"}:
+            _CACHE = None
+            return None
+        root = Path(configured) if configured else DEFAULT_CACHE_DIR
+    _CACHE = PreprocessCache(root)
+    return _CACHE
 
 
 def _preprocess_texts(texts: Sequence[str]) -> List[str]:
-    """Apply app.transform_text to a sequence of raw texts."""
+    """Apply app.spam.prepare_text (MIME/HTML extraction, transform_text) to texts."""
 
-    return [transform_text(text) for text in texts]
+    if _CACHE is not None:
+        return _CACHE.transform(texts)
+    return [prepare_text(text) for text in texts]
 
 
 def build_pipeline(model_type: str = "logreg", **classifier_kwargs) -> Pipeline:
     """Return a scikit-learn Pipeline for spam classification.
 
     Steps:
-      - Preprocessor: wraps :func:`app.spam.transform_text` via FunctionTransformer
+      - Preprocessor: wraps :func:`app.spam.prepare_text` via FunctionTransformer
       - TF-IDF vectorizer
-      - Classifier: LogisticRegression (default) or MultinomialNB
+      - Classifier: LogisticRegression (default), MultinomialNB or, for models
+        that ml/incremental.py updates with ``partial_fit``, SGDClassifier
     """
 
     preprocessor = FunctionTransformer(_preprocess_texts, validate=False)
@@ -31,9 +62,15 @@ def build_pipeline(model_type: str = "logreg", **classifier_kwargs) -> Pipeline:
 
     if model_type == "nb":
         classifier = MultinomialNB(**classifier_kwargs)
+    elif model_type == "sgd":
+        classifier = SGDClassifier(
+            loss="log_loss", fit_intercept=False, **classifier_kwargs
+        )
     else:
         # Default to LogisticRegression with sane defaults for text
-        classifier = LogisticRegression(max_iter=1000, fit_intercept=False, **classifier_kwargs)
+        classifier = LogisticRegression(
+            max_iter=1000, fit_intercept=False, **classifier_kwargs
+        )
 
     pipeline = Pipeline(
         [
@@ -44,3 +81,58 @@ def build_pipeline(model_type: str = "logreg", **classifier_kwargs) -> Pipeline:
     )
 
     return pipeline
+
+
+def to_onnx_bytes(pipeline: Pipeline) -> bytes:
+    """Export the ``tfidf`` and ``clf`` steps of *pipeline* as a serialized ONNX model.
+
+    The preprocess step is Python code and stays outside the graph; the app
+    applies :func:`app.spam.prepare_text` before inference.  Mirrors
+    ``scripts/convert_to_onnx.py``.
+    """
+
+    from skl2onnx import to_onnx  # noqa: WPS433 (export-only dependency)
+    from skl2onnx.common.data_types import StringTensorType  # noqa: WPS433
+
+    exported = Pipeline(
+        [("tfidf", pipeline.named_steps["tfidf"]), ("clf", pipeline.named_steps["clf"])]
+    )
+    onx = to_onnx(
+        exported,
+        initial_types=[("input", StringTensorType([None, 1]))],
+        options={id(exported): {"zipmap": False}},
+    )
+    return onx.SerializeToString()
+
+
+def contribution_table(pipeline: Pipeline) -> Dict[str, Any] | None:
+    """Return the per-token contribution table that :mod:`app.explain` serves.
+
+    Only linear classifiers over the default word analyzer can be explained
+    exactly; for anything else (e.g. ``MultinomialNB``) this returns ``None``
+    and the model is served without explanations.
+    """
+
+    vectorizer = pipeline.named_steps["tfidf"]
+    classifier = pipeline.named_steps["clf"]
+    if (
+        not hasattr(classifier, "coef_")
+        or vectorizer.analyzer != "word"
+        or vectorizer.tokenizer is not None
+    ):
+        return None
+
+    intercept = getattr(classifier, "intercept_", 0.0)
+    return {
+        "vocabulary": vectorizer.get_feature_names_out().tolist(),
+        "idf": vectorizer.idf_.tolist(),
+        "coef": classifier.coef_[0].tolist(),
+        "intercept": float(intercept[0])
+        if hasattr(intercept, "__len__")
+        else float(intercept),
+        "ngram_range": list(vectorizer.ngram_range),
+        "token_pattern": vectorizer.token_pattern,
+        "lowercase": vectorizer.lowercase,
+        "sublinear_tf": vectorizer.sublinear_tf,
+        "norm": vectorizer.norm,
+    }
@@ -0,0 +1,213 @@
+"""Persistent, content-addressed cache of preprocessed (stemmed) training text.
+
+Entries are keyed by a hash of the raw text and live in a directory named
+after a *fingerprint* of the preprocessing code: the source of
+:mod:`app.mime` and :func:`app.spam.transform_text` plus the NLTK version.
+Changing any of them starts a fresh cache instead of serving stale stems.
+
+On disk a cache is an append-only token vocabulary (``vocab.txt``, one token
+per line; the line number is the token id) plus segments of three NumPy arrays:
+
+    seg-NNNNNN.keys.npy     uint8  (n, 16)  text hashes
+    seg-NNNNNN.offsets.npy  int64  (n + 1,) start of each row in ``tokens``
+    seg-NNNNNN.tokens.npy   uint32 (m,)     token ids
+
+Segments are memory-mapped on read, so opening a large cache only costs the
+key index.  Each :meth:`PreprocessCache.transform` call that finds new texts
+writes one new segment; :meth:`PreprocessCache.compact` merges them.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import inspect
+import os
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from app import mime, spam
+from app.spam import prepare_text
+
+KEY_BYTES = 16
+
+# Segments are merged once this many accumulate (e.g. after a month of
+# nightly retrains on a growing dataset).
+MAX_SEGMENTS = 32
+
+
+def fingerprint() -> str:
+    """Return a short hash identifying the current preprocessing behaviour."""
+
+    import nltk  # noqa: WPS433 (only needed for its version)
+
+    digest = hashlib.sha256()
+    for part in (
+        inspect.getsource(mime),
+        inspect.getsource(spam.transform_text),
+        inspect.getsource(spam.prepare_text),
+        spam._TOKEN_PATTERN.pattern,
+        nltk.__version__,
+    ):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+def text_key(text: str | bytes) -> bytes:
+    data = (
+        text
+        if isinstance(text, bytes)
+        else text.encode("utf-8", errors="surrogatepass")
+    )
+    return hashlib.blake2b(data, digest_size=KEY_BYTES).digest()
+
+
+def _save(path: Path, array: np.ndarray) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("wb") as handle:
+        np.save(handle, array)
+    os.replace(tmp_path, path)
+
+
+class PreprocessCache:
+    """Map raw texts to ``prepare_text`` output, preprocessing only unseen texts."""
+
+    def __init__(self, root: Path, version: str | None = None) -> None:
+        self.directory = Path(root) / (version or fingerprint())
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+        self._vocab_path = self.directory / "vocab.txt"
+        self._vocab: List[str] = []
+        if self._vocab_path.exists():
+            self._vocab = self._vocab_path.read_text(encoding="utf-8").split("\n")[:-1]
+        self._token_ids: Dict[str, int] = {
+            token: index for index, token in enumerate(self._vocab)
+        }
+
+        # key -> (segment index, row)
+        self._index: Dict[bytes, Tuple[int, int]] = {}
+        self._segments: List[Tuple[np.ndarray, np.ndarray]] = []
+        for keys_path in sorted(self.directory.glob("seg-*.keys.npy")):
+            self._load_segment(keys_path.name[: -len(".keys.npy")])
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    @property
+    def segment_count(self) -> int:
+        return len(self._segments)
+
+    def _load_segment(self, name: str) -> None:
+        keys = np.load(self.directory / f"{name}.keys.npy", mmap_mode="r")
+        offsets = np.load(self.directory / f"{name}.offsets.npy", mmap_mode="r")
+        tokens = np.load(self.directory / f"{name}.tokens.npy", mmap_mode="r")
+        segment = len(self._segments)
+        self._segments.append((offsets, tokens))
+        raw_keys = keys.tobytes()
+        for row in range(len(keys)):
+            self._index[raw_keys[row * KEY_BYTES : (row + 1) * KEY_BYTES]] = (
+                segment,
+                row,
+            )
+
+    def _lookup(self, key: bytes) -> str:
+        segment, row = self._index[key]
+        offsets, tokens = self._segments[segment]
+        vocab = self._vocab
+        return " ".join(
+            vocab[token] for token in tokens[offsets[row] : offsets[row + 1]].tolist()
+        )
+
+    def _encode(self, processed: str) -> List[int]:
+        ids = []
+        for token in processed.split():
+            token_id = self._token_ids.get(token)
+            if token_id is None:
+                token_id = len(self._vocab)
+                self._vocab.append(token)
+                self._token_ids[token] = token_id
+            ids.append(token_id)
+        return ids
+
+    def _write_segment(
+        self, keys: List[bytes], rows: List[List[int]], vocab_start: int
+    ) -> None:
+        # The vocabulary is appended before the segment that references it, and
+        # the keys file is written last: a segment only counts once its keys
+        # exist, so an interrupted write leaves the cache consistent.
+        if len(self._vocab) > vocab_start:
+            with self._vocab_path.open("a", encoding="utf-8") as vocab_file:
+                vocab_file.write(
+                    "".join(token + "\n" for token in self._vocab[vocab_start:])
+                )
+
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum([len(row) for row in rows], out=offsets[1:])
+        tokens = np.fromiter(
+            (token for row in rows for token in row),
+            dtype=np.uint32,
+            count=int(offsets[-1]),
+        )
+        key_array = np.frombuffer(b"".join(keys), dtype=np.uint8).reshape(-1, KEY_BYTES)
+
+        existing = sorted(self.directory.glob("seg-*.keys.npy"))
+        number = int(existing[-1].name[4:10]) + 1 if existing else 1
+        name = f"seg-{number:06d}"
+        _save(self.directory / f"{name}.tokens.npy", tokens)
+        _save(self.directory / f"{name}.offsets.npy", offsets)
+        _save(self.directory / f"{name}.keys.npy", key_array)
+        self._load_segment(name)
+
+    def transform(self, texts: Sequence[str | bytes]) -> List[str]:
+        """Return ``prepare_text(text)`` for every text, computing only cache misses."""
+
+        keys = [text_key(text) for text in texts]
+        new_keys: List[bytes] = []
+        new_rows: List[List[int]] = []
+        pending: Dict[bytes, str] = {}
+        vocab_start = len(self._vocab)
+
+        for key, text in zip(keys, texts):
+            if key in self._index or key in pending:
+                continue
+            processed = prepare_text(text)
+            pending[key] = processed
+            new_keys.append(key)
+            new_rows.append(self._encode(processed))
+
+        self.misses += len(new_keys)
+        self.hits += len(keys) - len(new_keys)
+        if new_keys:
+            self._write_segment(new_keys, new_rows, vocab_start)
+            if len(self._segments) > MAX_SEGMENTS:
+                self.compact()
+
+        return [self._lookup(key) for key in keys]
+
+    def compact(self) -> None:
+        """Merge all segments into one."""
+
+        if len(self._segments) <= 1:
+            return
+
+        old_names = sorted(
+            path.name[: -len(".keys.npy")]
+            for path in self.directory.glob("seg-*.keys.npy")
+        )
+        keys = list(self._index)
+        rows = []
+        for key in keys:
+            segment, row = self._index[key]
+            offsets, tokens = self._segments[segment]
+            rows.append(tokens[offsets[row] : offsets[row + 1]].tolist())
+
+        self._segments = []
+        self._index = {}
+        self._write_segment(keys, rows, len(self._vocab))
+        for name in old_names:
+            for suffix in ("keys", "offsets", "tokens"):
+                (self.directory / f"{name}.{suffix}.npy").unlink(missing_ok=True)
@@ -2,6 +2,8 @@ from __future__ import annotations
 
 from pathlib import Path
 
+from .pipeline import enable_preprocess_cache
+
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 MODEL_ROOT = BASE_DIR / "model"
@@ -10,10 +12,13 @@ MODEL_ROOT = BASE_DIR / "model"
 def main() -> None:
     model_path = MODEL_ROOT / "model.pkl"
     if not model_path.exists():
-        raise FileNotFoundError(f"Model file not found at {model_path}. Run ml/train.py first.")
+        raise FileNotFoundError(
+            f"Model file not found at {model_path}. Run ml/train.py first."
+        )
 
     import pickle
 
+    enable_preprocess_cache()
     with model_path.open("rb") as model_file:
         pipeline = pickle.load(model_file)
 
@@ -0,0 +1,283 @@
+"""Offline bulk scoring of mail archives (mbox files, Maildir trees, .eml directories).
+
+Usage:
+    python -m ml.score_archive SOURCE [SOURCE ...] --output scores.jsonl
+        [--format jsonl|csv] [--processes N] [--batch-size 256]
+        [--checkpoint scores.checkpoint.json] [--model-dir model/]
+
+Messages are read lazily and scored in batches by a process pool; each
+worker holds its own ONNX session.  At most ``2 * processes`` batches are in
+flight, so memory stays bounded however large the archive is.  Results are
+written in input order, which lets an interrupted run resume from the
+checkpoint by skipping the messages already written.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from app.spam import label_for, load_model, prepare_text, spam_probabilities
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+MODEL_ROOT = BASE_DIR / "model"
+
+Message = Tuple[str, bytes]
+Result = Tuple[str, str, float]
+
+_WORKER_SESSION: Any = None
+
+
+def _iter_mbox(path: Path) -> Iterator[Message]:
+    """Stream messages from an mbox file without building a table of contents."""
+
+    index = 0
+    lines: List[bytes] = []
+    previous_blank = True
+    with path.open("rb") as mbox_file:
+        for line in mbox_file:
+            if line.startswith(b"From ") and previous_blank:
+                if lines:
+                    yield f"{path}#{index}", b"".join(lines)
+                    index += 1
+                lines = []
+            else:
+                # mboxrd quoting: ">From " inside bodies
+                if line.startswith(b">") and line.lstrip(b">").startswith(b"From "):
+                    line = line[1:]
+                lines.append(line)
+            previous_blank = line in (b"\n", b"\r\n")
+    if lines:
+        yield f"{path}#{index}", b"".join(lines)
+
+
+def _iter_files(paths: Iterable[Path]) -> Iterator[Message]:
+    for file_path in paths:
+        yield str(file_path), file_path.read_bytes()
+
+
+def _iter_maildir(path: Path) -> Iterator[Message]:
+    for sub in ("cur", "new"):
+        directory = path / sub
+        if directory.is_dir():
+            # Sorted so that resuming from a checkpoint sees the same order.
+            yield from _iter_files(
+                sorted(p for p in directory.iterdir() if p.is_file())
+            )
+
+
+def _is_mbox(path: Path) -> bool:
+    with path.open("rb") as handle:
+        return handle.read(5) == b"From "
+
+
+def iter_messages(sources: Iterable[Path]) -> Iterator[Message]:
+    """Yield ``(key, raw_message)`` for every message in *sources*, in stable order."""
+
+    for source in sources:
+        if source.is_dir():
+            if (source / "cur").is_dir() or (source / "new").is_dir():
+                yield from _iter_maildir(source)
+            else:
+                yield from _iter_files(sorted(source.rglob("*.eml")))
+        elif _is_mbox(source):
+            yield from _iter_mbox(source)
+        else:
+            yield from _iter_files([source])
+
+
+def _init_worker(model_dir: str) -> None:
+    global _WORKER_SESSION
+
+    _WORKER_SESSION, _ = load_model(Path(model_dir))
+
+
+def _score_batch(batch: List[Message]) -> List[Result]:
+    keys = [key for key, _ in batch]
+    processed = [prepare_text(raw) for _, raw in batch]
+    probabilities = spam_probabilities(_WORKER_SESSION, processed).tolist()
+    return [(key, label_for(proba), proba) for key, proba in zip(keys, probabilities)]
+
+
+def _batched(messages: Iterator[Message], batch_size: int) -> Iterator[List[Message]]:
+    batch: List[Message] = []
+    for message in messages:
+        batch.append(message)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def score_batches(
+    batches: Iterator[List[Message]], model_dir: Path, processes: int
+) -> Iterator[List[Result]]:
+    """Score *batches* in order, with at most ``2 * processes`` in flight."""
+
+    if processes <= 0:
+        _init_worker(str(model_dir))
+        for batch in batches:
+            yield _score_batch(batch)
+        return
+
+    with Pool(processes, initializer=_init_worker, initargs=(str(model_dir),)) as pool:
+        pending: deque = deque()
+        for batch in batches:
+            pending.append(pool.apply_async(_score_batch, (batch,)))
+            if len(pending) >= 2 * processes:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+class _Writer:
+    def __init__(self, handle: io.TextIOBase, fmt: str) -> None:
+        self.handle = handle
+        self.fmt = fmt
+        self._csv = csv.writer(handle) if fmt == "csv" else None
+
+    def header(self) -> None:
+        if self._csv is not None:
+            self._csv.writerow(["key", "prediction", "probability"])
+
+    def write(self, results: List[Result]) -> None:
+        if self._csv is not None:
+            self._csv.writerows(results)
+        else:
+            self.handle.writelines(
+                json.dumps({"key": key, "prediction": label, "probability": proba})
+                + "\n"
+                for key, label, proba in results
+            )
+
+
+def _load_checkpoint(path: Path | None, sources: List[Path]) -> Dict[str, Any]:
+    if path is None or not path.exists():
+        return {"processed": 0, "output_bytes": 0}
+    with path.open(encoding="utf-8") as checkpoint_file:
+        checkpoint = json.load(checkpoint_file)
+    if checkpoint.get("sources") != [str(s) for s in sources]:
+        raise ValueError(f"Checkpoint {path} was written for different sources")
+    return checkpoint
+
+
+def _save_checkpoint(
+    path: Path, sources: List[Path], processed: int, output_bytes: int
+) -> None:
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with tmp_path.open("w", encoding="utf-8") as checkpoint_file:
+        json.dump(
+            {
+                "sources": [str(s) for s in sources],
+                "processed": processed,
+                "output_bytes": output_bytes,
+            },
+            checkpoint_file,
+        )
+    tmp_path.replace(path)
+
+
+def score_archive(
+    sources: List[Path],
+    output: Path,
+    fmt: str = "jsonl",
+    model_dir: Path = MODEL_ROOT,
+    processes: int = 0,
+    batch_size: int = 256,
+    checkpoint: Path | None = None,
+    report_every: float = 10.0,
+) -> int:
+    """Score every message in *sources* into *output*; return the number written."""
+
+    state = _load_checkpoint(checkpoint, sources)
+    skip = state["processed"]
+    if skip and (not output.exists() or output.stat().st_size < state["output_bytes"]):
+        # The rows the checkpoint counts are gone; skipping them would leave
+        # them out of the new output.
+        print(
+            f"{output} is missing or shorter than the checkpoint says; "
+            "scoring from the start",
+            file=sys.stderr,
+        )
+        skip = 0
+
+    # Drop anything written after the last checkpoint so a resumed run doesn't
+    # duplicate rows from a partially written batch.
+    mode = "r+" if skip else "w"
+    with output.open(mode, newline="", encoding="utf-8") as handle:
+        writer = _Writer(handle, fmt)
+        if mode == "r+":
+            handle.seek(state["output_bytes"])
+            handle.truncate()
+        else:
+            writer.header()
+
+        messages = iter_messages(sources)
+        for _ in range(skip):
+            if next(messages, None) is None:
+                break
+
+        processed = skip
+        started = last_report = time.perf_counter()
+        for results in score_batches(
+            _batched(messages, batch_size), model_dir, processes
+        ):
+            writer.write(results)
+            processed += len(results)
+            if checkpoint is not None:
+                handle.flush()
+                os.fsync(handle.fileno())
+                _save_checkpoint(checkpoint, sources, processed, handle.tell())
+
+            now = time.perf_counter()
+            if now - last_report >= report_every:
+                rate = (processed - skip) / (now - started)
+                print(
+                    f"{processed} messages scored ({rate:.0f} msg/s)", file=sys.stderr
+                )
+                last_report = now
+
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    print(
+        f"Done: {processed} messages, {(processed - skip) / elapsed:.0f} msg/s",
+        file=sys.stderr,
+    )
+    return processed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Score mbox, Maildir and .eml archives."
+    )
+    parser.add_argument("sources", nargs="+", type=Path)
+    parser.add_argument("--output", type=Path, required=True)
+    parser.add_argument("--format", choices=("jsonl", "csv"), default="jsonl")
+    parser.add_argument("--model-dir", type=Path, default=MODEL_ROOT)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--checkpoint", type=Path)
+    args = parser.parse_args()
+
+    score_archive(
+        args.sources,
+        args.output,
+        fmt=args.format,
+        model_dir=args.model_dir,
+        processes=args.processes,
+        batch_size=args.batch_size,
+        checkpoint=args.checkpoint,
+    )
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
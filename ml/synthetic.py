@@ -0,0 +1,150 @@
+"""Synthetic labelled email corpora for scalability benchmarks (see ml/benchmark.py).
+
+Word frequencies follow a Zipf distribution over a generated vocabulary of
+pronounceable pseudo-words (with English suffixes, so stemming does real
+work).  Each class also draws a share of its words from its own small set of
+signal words, which keeps the classification task learnable without making
+it trivial.  Generation is deterministic for a given seed.
+"""
+
+from __future__ import annotations
+
+import csv
+import random
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+_ONSETS = (
+    "b c d f g h j k l m n p r s t v w z bl br ch cl cr dr fl gr pl pr sh st th tr"
+).split()
+_VOWELS = "a e i o u ai ea ee oo ou".split()
+_SUFFIXES = ["", "", "", "s", "ed", "ing", "er", "ly", "ness", "ation"]
+
+# Signal words are drawn from this rank range: common enough to recur, but
+# outside the handful of "function words" at the head of the distribution.
+_SIGNAL_RANKS = (20, 2000)
+
+_CAMPAIGN_WORDS = (
+    "account bank claim click congratulations dear delivery exclusive gift hello "
+    "invoice limited meeting offer order package payment prize receive reward "
+    "selected store today verify winner"
+).split()
+_NAMES = ["John", "Maria", "Alex", "Chen", "Priya", "Olu", "Sven", "Ana"]
+
+
+def vocabulary(size: int, seed: int = 0) -> List[str]:
+    """Return *size* distinct pseudo-words, most frequent (shortest-ish) first."""
+
+    rng = np.random.default_rng(seed)
+    syllables = [onset + vowel for onset in _ONSETS for vowel in _VOWELS]
+    words: List[str] = []
+    seen = set()
+    while len(words) < size:
+        batch = 2 * (size - len(words)) + 16
+        lengths = 1 + np.minimum(rng.exponential(1.0, batch).astype(np.int64), 4)
+        parts = rng.integers(len(syllables), size=(batch, 5))
+        suffixes = rng.integers(len(_SUFFIXES), size=batch)
+        for length, row, suffix in zip(
+            lengths.tolist(), parts.tolist(), suffixes.tolist()
+        ):
+            word = (
+                "".join(syllables[index] for index in row[:length]) + _SUFFIXES[suffix]
+            )
+            if word not in seen:
+                seen.add(word)
+                words.append(word)
+                if len(words) == size:
+                    break
+    # Shorter words are more frequent in natural text.
+    words.sort(key=len)
+    return words
+
+
+def generate_corpus(
+    size: int,
+    vocab_size: int = 20_000,
+    zipf_exponent: float = 1.1,
+    spam_ratio: float = 0.3,
+    mean_words: int = 80,
+    signal_words: int = 100,
+    signal_rate: float = 0.05,
+    seed: int = 0,
+) -> Tuple[List[str], List[int]]:
+    """Return ``(texts, labels)`` with *size* messages (1 = spam, 0 = ham).
+
+    Message lengths are log-normal around *mean_words*.  A fraction
+    *signal_rate* of each message's words comes from its class's
+    *signal_words* signal vocabulary; the rest is drawn from the shared Zipf
+    distribution with exponent *zipf_exponent*.
+    """
+
+    rng = np.random.default_rng(seed)
+    words = np.array(vocabulary(vocab_size, seed), dtype=object)
+
+    ranks = np.arange(1, vocab_size + 1, dtype=np.float64)
+    weights = ranks**-zipf_exponent
+    weights /= weights.sum()
+
+    low, high = _SIGNAL_RANKS
+    high = max(min(high, vocab_size), 1)
+    low = min(low, high - 1)
+    pool = rng.permutation(np.arange(low, high))
+    per_class = max(1, min(signal_words, len(pool) // 2))
+    signal = (
+        pool[:per_class],
+        pool[per_class : 2 * per_class] if len(pool) > 1 else pool[:per_class],
+    )
+
+    labels = (rng.random(size) < spam_ratio).astype(np.int64)
+    lengths = np.maximum(
+        3, rng.lognormal(np.log(mean_words), 0.5, size).astype(np.int64)
+    )
+    drawn = rng.choice(vocab_size, size=int(lengths.sum()), p=weights)
+    from_signal = rng.random(len(drawn)) < signal_rate
+
+    texts: List[str] = []
+    start = 0
+    for label, length in zip(labels.tolist(), lengths.tolist()):
+        end = start + length
+        indices = drawn[start:end].copy()
+        mask = from_signal[start:end]
+        indices[mask] = rng.choice(signal[label], size=int(mask.sum()))
+        texts.append(" ".join(words[indices]))
+        start = end
+    return texts, labels.tolist()
+
+
+def write_csv(path: Path, texts: List[str], labels: List[int]) -> None:
+    """Write a corpus in the ``text,label`` format that ml/train.py reads."""
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", newline="", encoding="utf-8") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["text", "label"])
+        writer.writerows(zip(texts, ["spam" if label else "ham" for label in labels]))
+
+
+def campaign_messages(campaigns: int, variants: int, seed: int = 0) -> List[str]:
+    """Shuffled campaign traffic: *variants* copies of each of *campaigns* templates.
+
+    Variants differ only in the recipient's name, a tracking link and a
+    reference number, the way real campaigns do, so they are near-duplicates
+    of each other (used by the near-duplicate and router benchmarks).
+    """
+
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(campaigns):
+        template = " ".join(
+            rng.choice(_CAMPAIGN_WORDS) for _ in range(rng.randint(25, 60))
+        )
+        for _ in range(variants):
+            messages.append(
+                f"Dear {rng.choice(_NAMES)}, {template} "
+                f"https://t.example/{rng.getrandbits(40):x} "
+                f"ref {rng.randint(0, 10**6)}",
+            )
+    rng.shuffle(messages)
+    return messages
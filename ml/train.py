@@ -17,7 +17,13 @@ from sklearn.metrics import (
 )
 from sklearn.model_selection import GridSearchCV, train_test_split
 
-from .pipeline import build_pipeline
+from app.cascade import CASCADE_FILENAME
+from app.explain import EXPLAIN_FILENAME
+from app.model_bundle import BUNDLE_FILENAME
+from app.sketches import BASELINE_FILENAME, build_baseline
+
+from .cascade import calibrate, evaluate_cascade, train_first_stage
+from .pipeline import build_pipeline, contribution_table, enable_preprocess_cache
 
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -27,6 +33,13 @@ REPORTS_DIR = BASE_DIR / "reports"
 
 MODEL_VERSION = "v1.0"
 
+# Hyperparameter grid searched by train(); ml/benchmark.py times the same grid.
+PARAM_GRID: Dict[str, List[Any]] = {
+    "tfidf__ngram_range": [(1, 1), (1, 2)],
+    "tfidf__min_df": [1, 2],
+    "clf__C": [0.5, 1.0, 2.0],
+}
+
 
 def _load_dataset(path: Path) -> Tuple[List[str], List[int]]:
     """Load dataset from CSV with columns `text,label`.
@@ -69,6 +82,10 @@ def train() -> None:
 
     X, y = _load_dataset(data_path)
 
+    # Grid search re-runs the preprocess step for every fold and candidate;
+    # with the cache each distinct text is stemmed once, ever.
+    cache = enable_preprocess_cache()
+
     X_train, X_test, y_train, y_test = train_test_split(
         X,
         y,
@@ -79,15 +96,9 @@ def train() -> None:
 
     pipeline = build_pipeline(model_type="logreg")
 
-    param_grid = {
-        "tfidf__ngram_range": [(1, 1), (1, 2)],
-        "tfidf__min_df": [1, 2],
-        "clf__C": [0.5, 1.0, 2.0],
-    }
-
     grid = GridSearchCV(
         pipeline,
-        param_grid=param_grid,
+        param_grid=PARAM_GRID,
         cv=3,
         scoring="f1",
         n_jobs=1,
@@ -107,6 +118,21 @@ def train() -> None:
     cm = confusion_matrix(y_test, y_pred).tolist()
     report = classification_report(y_test, y_pred, output_dict=True)
 
+    # Cascade first stage: fit on part of the training split, calibrate its
+    # exit thresholds on the rest, then measure it in front of the full model
+    # on the untouched test split.
+    X_stage1, X_calibration, y_stage1, y_calibration = train_test_split(
+        X_train,
+        y_train,
+        test_size=0.25,
+        random_state=42,
+        stratify=y_train,
+    )
+    first_stage = calibrate(
+        train_first_stage(X_stage1, y_stage1), X_calibration, y_calibration
+    )
+    cascade_metrics = evaluate_cascade(first_stage, y_proba, X_test, y_test)
+
     metrics: Dict[str, Any] = {
         "precision": precision,
         "recall": recall,
@@ -114,6 +140,7 @@ def train() -> None:
         "roc_auc": auc,
         "confusion_matrix": cm,
         "classification_report": report,
+        "cascade": cascade_metrics,
     }
 
     version_dir = MODEL_ROOT / MODEL_VERSION
@@ -123,6 +150,28 @@ def train() -> None:
 
     model_path = version_dir / "model.pkl"
     metadata_path = version_dir / "metadata.json"
+    cascade_path = version_dir / CASCADE_FILENAME
+    explain_path = version_dir / EXPLAIN_FILENAME
+    baseline_path = version_dir / BASELINE_FILENAME
+
+    with cascade_path.open("w", encoding="utf-8") as cascade_file:
+        json.dump(first_stage.to_dict(), cascade_file)
+
+    # Token contributions for explain=true on the prediction API.
+    table = contribution_table(best_pipeline)
+    if table is not None:
+        with explain_path.open("w", encoding="utf-8") as explain_file:
+            json.dump(table, explain_file)
+
+    # Reference sketches of the training data for drift reports (GET /api/traffic).
+    baseline = build_baseline(
+        X_train,
+        best_pipeline.named_steps["preprocess"].transform(X_train),
+        best_pipeline.predict_proba(X_train)[:, 1].tolist(),
+        best_pipeline.named_steps["tfidf"],
+    )
+    with baseline_path.open("w", encoding="utf-8") as baseline_file:
+        json.dump(baseline, baseline_file)
 
     # Persist the trained pipeline
     import pickle
@@ -145,6 +194,15 @@ def train() -> None:
     # Also write/overwrite top-level "current" model and metadata
     shutil.copy2(model_path, MODEL_ROOT / "model.pkl")
     shutil.copy2(metadata_path, MODEL_ROOT / "metadata.json")
+    shutil.copy2(cascade_path, MODEL_ROOT / CASCADE_FILENAME)
+    if table is not None:
+        shutil.copy2(explain_path, MODEL_ROOT / EXPLAIN_FILENAME)
+    shutil.copy2(baseline_path, MODEL_ROOT / BASELINE_FILENAME)
+
+    # A bundle from the previous run would keep serving the old model; the
+    # next scripts/convert_to_onnx.py run writes a new one.
+    for model_dir in (version_dir, MODEL_ROOT):
+        (model_dir / BUNDLE_FILENAME).unlink(missing_ok=True)
 
     # Write evaluation report
     report_path = REPORTS_DIR / f"report_{MODEL_VERSION}.json"
@@ -159,6 +217,16 @@ def train() -> None:
             indent=2,
         )
 
+    if cache is not None:
+        print(
+            f"Preprocess cache: {cache.misses} texts preprocessed, "
+            f"{cache.hits} reused ({cache.directory})"
+        )
+    print(
+        "Cascade stage 1: {exit_rate:.1%} of test traffic short-circuited, "
+        "accuracy {stage2_accuracy:.4f} -> {cascade_accuracy:.4f} "
+        "(cost {accuracy_cost:+.4f})".format(**cascade_metrics),
+    )
     print(f"Saved model to {model_path}")
     print(f"Saved metadata to {metadata_path}")
     print(f"Saved report to {report_path}")
@@ -0,0 +1,7 @@
+from __future__ import annotations
+
+from app.router import create_router
+
+# Router mode: forwards /api/predict and /api/predict/batch to ROUTER_BACKENDS
+# (see app/router.py), e.g. ``gunicorn -k gthread -b 0.0.0.0:8080 router_wsgi:app``.
+app = create_router()
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+"""Compare ``spam_client`` with naive per-call requests against the app.
+
+Usage:
+    python scripts/benchmark_client.py [--messages 2000] [--concurrency 16]
+        [--url http://localhost:8000] [--api-key KEY]
+
+Without ``--url`` the app is created here and served by a threaded
+Werkzeug server on a free local port; it shares this process's GIL with the
+clients, so run it against gunicorn (``--url``) for numbers that reflect a
+deployment.  Each scenario scores the same messages from ``--concurrency``
+threads (tasks for the asyncio client):
+
+- ``naive``: ``urllib.request`` POST to ``/api/predict`` per message, a new
+  connection every time (what a ``requests.post`` loop does);
+- ``pooled``: ``SpamClient.predict``, one request per message over pooled
+  keep-alive connections;
+- ``batched``: ``SpamClient.classify``, coalesced into batch requests;
+- ``async batched``: ``AsyncSpamClient.classify`` from asyncio tasks.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from spam_client import AsyncSpamClient, SpamClient  # noqa: E402
+
+_TEMPLATES = [
+    "Congratulations {n}! You have been selected for a limited-time reward, "
+    "click to claim your prize",
+    "Hi team, the meeting about invoice {n} moved to Thursday, agenda attached",
+    "URGENT: verify your bank account {n} today or it will be suspended",
+    "Your package {n} is out for delivery, track it in the store app",
+]
+
+
+def _messages(count: int) -> List[str]:
+    return [
+        _TEMPLATES[index % len(_TEMPLATES)].format(n=index) for index in range(count)
+    ]
+
+
+def _serve_local() -> str:
+    from werkzeug.serving import make_server  # noqa: WPS433
+
+    from app import create_app  # noqa: WPS433
+
+    server = make_server("127.0.0.1", 0, create_app(), threaded=True)
+    threading.Thread(
+        target=server.serve_forever, name="benchmark-server", daemon=True
+    ).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def _naive(url: str, api_key: str | None) -> Callable[[str], Any]:
+    headers = {"Content-Type": "application/json"}
+    if api_key:
+        headers["X-API-Key"] = api_key
+
+    def call(text: str) -> Any:
+        request = urllib.request.Request(
+            f"{url}/api/predict", json.dumps({"text": text}).encode("utf-8"), headers
+        )
+        with urllib.request.urlopen(
+            request, timeout=30
+        ) as response:  # noqa: S310 - local benchmark URL
+            return json.loads(response.read())
+
+    return call
+
+
+def _run_threads(
+    call: Callable[[str], Any], messages: List[str], concurrency: int
+) -> Dict[str, float]:
+    latencies: List[float] = []
+
+    def timed(text: str) -> None:
+        start = time.perf_counter()
+        call(text)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed, messages))
+    return _summary(time.perf_counter() - start, latencies)
+
+
+async def _run_async(
+    client: AsyncSpamClient, messages: List[str], concurrency: int
+) -> Dict[str, float]:
+    latencies: List[float] = []
+    cursor = iter(messages)
+
+    async def worker() -> None:
+        for text in cursor:
+            start = time.perf_counter()
+            await client.classify(text)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return _summary(time.perf_counter() - start, latencies)
+
+
+def _summary(elapsed: float, latencies: List[float]) -> Dict[str, float]:
+    ordered = sorted(latencies)
+    return {
+        "messages_per_s": len(latencies) / elapsed,
+        "p50_ms": statistics.median(ordered) * 1000,
+        "p99_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the Python client against naive requests."
+    )
+    parser.add_argument(
+        "--url", help="Base URL of a running app; default is an in-process server."
+    )
+    parser.add_argument("--api-key")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-delay-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    url = (args.url or _serve_local()).rstrip("/")
+    messages = _messages(args.messages)
+    options = {
+        "api_key": args.api_key,
+        "pool_size": args.concurrency,
+        "max_batch_size": args.max_batch_size,
+        "max_delay": args.max_delay_ms / 1000,
+    }
+
+    results: Dict[str, Dict[str, float]] = {}
+    with SpamClient(url, **options) as client:
+        try:
+            client.predict(messages[0])
+        except Exception as exc:  # noqa: BLE001 - e.g. no model on this machine
+            sys.exit(f"{url} cannot score messages: {exc}")
+        results["naive"] = _run_threads(
+            _naive(url, args.api_key), messages, args.concurrency
+        )
+
+    with SpamClient(url, **options) as client:
+        results["pooled"] = _run_threads(client.predict, messages, args.concurrency)
+        results["pooled"]["connections"] = client.pool.opened
+        results["pooled"]["requests"] = client.stats["requests"]
+
+    with SpamClient(url, **options) as client:
+        results["batched"] = _run_threads(client.classify, messages, args.concurrency)
+        results["batched"]["connections"] = client.pool.opened
+        results["batched"]["requests"] = client.stats["requests"]
+
+    async def run_async() -> Dict[str, float]:
+        async with AsyncSpamClient(url, **options) as client:
+            summary = await _run_async(client, messages, args.concurrency)
+            summary["connections"] = client.pool.opened
+            summary["requests"] = client.stats["requests"]
+            return summary
+
+    results["async batched"] = asyncio.run(run_async())
+    results["naive"]["connections"] = results["naive"]["requests"] = len(messages)
+
+    baseline = results["naive"]["messages_per_s"]
+    print(f"{len(messages)} messages, concurrency {args.concurrency}, {url}")
+    print(
+        f"{'scenario':<16} {'msg/s':>9} {'speedup':>8} {'p50 ms':>8} {'p99 ms':>8} "
+        f"{'requests':>9} {'conns':>6}"
+    )
+    for name, result in results.items():
+        print(
+            f"{name:<16} {result['messages_per_s']:>9.0f} "
+            f"{result['messages_per_s'] / baseline:>7.1f}x "
+            f"{result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+            f"{result['requests']:>9.0f} {result['connections']:>6.0f}",
+        )
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+"""Compare encode/decode cost per message for the prediction API formats.
+
+Usage:
+    python scripts/benchmark_codecs.py [--batch-size 500] [--repeat 200]
+
+For each available codec (stdlib json, orjson, MessagePack) this times:
+
+- a single ``/api/predict`` response,
+- a ``/api/predict/batch`` request body,
+- a batch response in the column-oriented layout the API uses, and the
+  row-oriented (one dict per item) layout it avoids.
+
+Results are reported in microseconds per message (per item for batches).
+"""
+
+import argparse
+import json
+import random
+import timeit
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+Codec = Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]
+
+
+def _codecs() -> Dict[str, Codec]:
+    def _default(value: Any) -> Any:
+        return value.tolist()
+
+    codecs: Dict[str, Codec] = {
+        "json": (
+            lambda obj: json.dumps(obj, default=_default, separators=(",", ":")).encode(
+                "utf-8"
+            ),
+            json.loads,
+        ),
+    }
+    try:
+        import orjson
+
+        codecs["orjson"] = (
+            lambda obj: orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY),
+            orjson.loads,
+        )
+    except ImportError:
+        print("orjson not installed; skipping")
+    try:
+        import msgpack
+
+        codecs["msgpack"] = (
+            lambda obj: msgpack.packb(obj, default=_default, use_bin_type=True),
+            lambda raw: msgpack.unpackb(raw, raw=False),
+        )
+    except ImportError:
+        print("msgpack not installed; skipping")
+    return codecs
+
+
+def _payloads(batch_size: int) -> Dict[str, Tuple[Any, int]]:
+    rng = random.Random(0)
+    words = [
+        "free",
+        "prize",
+        "meeting",
+        "invoice",
+        "click",
+        "tomorrow",
+        "offer",
+        "report",
+    ]
+    texts = [
+        " ".join(rng.choice(words) for _ in range(rng.randint(20, 120)))
+        for _ in range(batch_size)
+    ]
+    probabilities = np.random.default_rng(0).random(batch_size)
+    labels = ["Spam" if p > 0.5 else "Not Spam" for p in probabilities]
+
+    return {
+        "single response": (
+            {"prediction": "Spam", "probability": 0.93, "model_version": "v1.0"},
+            1,
+        ),
+        "batch request": ({"texts": texts}, batch_size),
+        "batch response (columnar)": (
+            {
+                "predictions": labels,
+                "probabilities": probabilities,
+                "model_version": "v1.0",
+            },
+            batch_size,
+        ),
+        "batch response (row dicts)": (
+            {
+                "results": [
+                    {"prediction": label, "probability": float(proba)}
+                    for label, proba in zip(labels, probabilities)
+                ],
+                "model_version": "v1.0",
+            },
+            batch_size,
+        ),
+    }
+
+
+def run(batch_size: int, repeat: int) -> List[Dict[str, Any]]:
+    rows = []
+    for payload_name, (payload, messages) in _payloads(batch_size).items():
+        for codec_name, (encode, decode) in _codecs().items():
+            encoded = encode(payload)
+            encode_s = (
+                min(timeit.repeat(lambda: encode(payload), number=repeat, repeat=3))
+                / repeat
+            )
+            decode_s = (
+                min(timeit.repeat(lambda: decode(encoded), number=repeat, repeat=3))
+                / repeat
+            )
+            rows.append(
+                {
+                    "payload": payload_name,
+                    "codec": codec_name,
+                    "bytes": len(encoded),
+                    "encode_us_per_msg": encode_s / messages * 1e6,
+                    "decode_us_per_msg": decode_s / messages * 1e6,
+                },
+            )
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark prediction API codecs.")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(
+        f"{'payload':<28} {'codec':<8} {'bytes':>9} "
+        f"{'encode us/msg':>14} {'decode us/msg':>14}"
+    )
+    for row in run(args.batch_size, args.repeat):
+        print(
+            f"{row['payload']:<28} {row['codec']:<8} {row['bytes']:>9} "
+            f"{row['encode_us_per_msg']:>14.3f} {row['decode_us_per_msg']:>14.3f}",
+        )
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
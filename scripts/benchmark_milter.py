@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+"""Simulate an MTA against the milter daemon and measure decision latency.
+
+Usage:
+    python scripts/benchmark_milter.py [--connections 20] [--messages 50]
+        [--target HOST:PORT] [--json]
+
+Without ``--target`` this starts the daemon (app/milter.py, with the model
+in ``MODEL_DIR``) in a child process on a free port.  ``--connections``
+simulated MTA connections then each deliver ``--messages`` messages in turn,
+the way smtpd processes do, over one long-lived milter connection.  The
+traffic is synthetic (``ml.synthetic``): ham and spam from
+``generate_corpus`` mixed with near-duplicate campaign spam.
+
+Reported: decisions per second, the latency from end of body to the final
+reply (p50/p90/p99/max), how many messages were rejected or let through,
+and the daemon's own counters (batches, fail-open cases) when it was
+started here.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app import milter  # noqa: E402
+from ml.synthetic import campaign_messages, generate_corpus  # noqa: E402
+
+
+def _serve(ports: Any, results: Any) -> None:
+    from app import create_app  # noqa: WPS433
+
+    async def run() -> None:
+        stop = asyncio.Event()
+        started = asyncio.get_running_loop().create_future()
+        task = asyncio.create_task(milter.serve(app, "127.0.0.1", 0, stop, started))
+        ports.put(await started)
+        # The parent sends on the pipe when it is done; stop and report the counters.
+        await asyncio.get_running_loop().run_in_executor(None, results.recv)
+        stop.set()
+        await task
+
+    app = create_app()
+    asyncio.run(run())
+    results.send(milter.stats())
+
+
+def _messages(count: int, seed: int) -> List[Tuple[str, str]]:
+    texts, _ = generate_corpus(count, mean_words=60, seed=seed)
+    texts += campaign_messages(max(1, count // 60), 20, seed=seed)[: count // 3]
+    random.Random(seed).shuffle(texts)
+    return [
+        (f"sender{index % 97}@example.org", text)
+        for index, text in enumerate(texts[:count])
+    ]
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    ordered = sorted(latencies)
+
+    def percentile(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {
+        "p50_ms": percentile(0.5),
+        "p90_ms": percentile(0.9),
+        "p99_ms": percentile(0.99),
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+async def _connection(
+    host: str,
+    port: int,
+    messages: List[Tuple[str, str]],
+    latencies: List[float],
+    outcomes: Dict[str, int],
+) -> None:
+    client = await milter.MtaClient.connect(host, port)
+    try:
+        for index, (sender, text) in enumerate(messages):
+            headers = [
+                ("From", sender),
+                ("To", "user@example.com"),
+                ("Subject", f"Message {index}"),
+            ]
+            start = time.perf_counter()
+            reply, modifications = await client.deliver(
+                sender, headers, text.encode("utf-8")
+            )
+            latencies.append(time.perf_counter() - start)
+            if reply == milter.SMFIR_REPLYCODE:
+                outcomes["rejected"] += 1
+            elif modifications:
+                outcomes["tagged"] += 1
+            else:
+                outcomes["unscored"] += 1
+    finally:
+        await client.close()
+
+
+async def _simulate(host: str, port: int, args: argparse.Namespace) -> Dict[str, Any]:
+    traffic = _messages(args.connections * args.messages, args.seed)
+    # One warm-up message so the model load isn't counted.
+    warmup = await milter.MtaClient.connect(host, port)
+    await warmup.deliver(
+        "warmup@example.org", [("Subject", "warm up")], b"warm up the model"
+    )
+    await warmup.close()
+
+    latencies: List[float] = []
+    outcomes = {"rejected": 0, "tagged": 0, "unscored": 0}
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            _connection(
+                host, port, traffic[index :: args.connections], latencies, outcomes
+            )
+            for index in range(args.connections)
+        ),
+    )
+    elapsed = time.perf_counter() - start
+    return {
+        "connections": args.connections,
+        "messages": len(latencies),
+        "decisions_per_s": len(latencies) / elapsed,
+        **summarize(latencies),
+        **outcomes,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Milter decision latency under concurrent MTA connections."
+    )
+    parser.add_argument("--connections", type=int, default=20)
+    parser.add_argument(
+        "--messages", type=int, default=50, help="Messages per connection."
+    )
+    parser.add_argument(
+        "--target",
+        default=None,
+        help="HOST:PORT of a running daemon (default: start one).",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    process = None
+    if args.target:
+        host, _, port = args.target.rpartition(":")
+        port = int(port)
+    else:
+        ports: Any = multiprocessing.Queue()
+        parent_end, child_end = multiprocessing.Pipe()
+        process = multiprocessing.Process(
+            target=_serve, args=(ports, child_end), daemon=True
+        )
+        process.start()
+        host, port = "127.0.0.1", ports.get(timeout=120)
+
+    try:
+        result = asyncio.run(_simulate(host, port, args))
+    except Exception as exc:  # noqa: BLE001 - e.g. no model on this machine
+        sys.exit(f"milter benchmark failed: {exc}")
+    finally:
+        if process is not None:
+            parent_end.send(None)
+            daemon_stats = parent_end.recv() if parent_end.poll(30) else None
+            process.join(timeout=30)
+    if process is not None:
+        result["daemon"] = daemon_stats
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{result['messages']} messages over {result['connections']} connections")
+    print(f"{result['decisions_per_s']:.0f} decisions/s")
+    print(
+        f"latency: p50 {result['p50_ms']:.1f} ms, p90 {result['p90_ms']:.1f} ms, "
+        f"p99 {result['p99_ms']:.1f} ms, max {result['max_ms']:.1f} ms",
+    )
+    print(
+        f"rejected {result['rejected']}, tagged {result['tagged']}, "
+        f"let through unscored {result['unscored']}"
+    )
+    if result.get("daemon"):
+        print(f"daemon: {result['daemon']}")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
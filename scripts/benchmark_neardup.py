@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+"""Compare near-duplicate lookup cost with full ONNX inference.
+
+Usage:
+    python scripts/benchmark_neardup.py [--campaigns 50] [--variants 40]
+        [--model-dir model/]
+
+Generates spam-campaign variants (same template, different names, links and
+reference numbers) and reports, per message:
+
+- ``transform_text`` (paid on both paths),
+- MinHash signature + index lookup,
+- ONNX inference, if a model can be loaded from ``--model-dir``,
+
+plus the index hit rate over the generated traffic.
+"""
+
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.neardup import NearDuplicateIndex, minhash  # noqa: E402
+from app.spam import load_model, spam_probabilities, transform_text  # noqa: E402
+from ml.synthetic import campaign_messages  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark near-duplicate lookups against ONNX inference."
+    )
+    parser.add_argument("--campaigns", type=int, default=50)
+    parser.add_argument("--variants", type=int, default=40)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument(
+        "--model-dir",
+        type=Path,
+        default=Path(__file__).resolve().parent.parent / "model",
+    )
+    args = parser.parse_args()
+
+    messages = campaign_messages(args.campaigns, args.variants)
+    processed = [transform_text(message) for message in messages]
+    count = len(messages)
+
+    stem_s = timeit.timeit(
+        lambda: [transform_text(message) for message in messages], number=1
+    )
+
+    index = NearDuplicateIndex(threshold=args.threshold, max_entries=count)
+    hits = 0
+    for text in processed:
+        signature = minhash(text)
+        if index.lookup(signature) is not None:
+            hits += 1
+        else:
+            index.add(signature, 0.99)
+    lookup_s = min(
+        timeit.repeat(
+            lambda: [index.lookup(minhash(text)) for text in processed],
+            number=1,
+            repeat=3,
+        ),
+    )
+
+    print(f"{count} messages ({args.campaigns} campaigns x {args.variants} variants)")
+    print(f"{'transform_text':<28} {stem_s / count * 1e6:>10.1f} us/msg")
+    print(f"{'minhash + lookup':<28} {lookup_s / count * 1e6:>10.1f} us/msg")
+
+    try:
+        session, _ = load_model(args.model_dir)
+    except Exception as exc:  # pragma: no cover - depends on the environment
+        print(f"{'onnx inference':<28} {'n/a':>10} ({exc})")
+    else:
+        infer_single_s = min(
+            timeit.repeat(
+                lambda: [
+                    spam_probabilities(session, [text]) for text in processed[:500]
+                ],
+                number=1,
+                repeat=3,
+            ),
+        )
+        infer_batch_s = min(
+            timeit.repeat(
+                lambda: spam_probabilities(session, processed), number=1, repeat=3
+            )
+        )
+        print(
+            f"{'onnx inference (single)':<28} "
+            f"{infer_single_s / min(count, 500) * 1e6:>10.1f} us/msg"
+        )
+        print(
+            f"{'onnx inference (batch)':<28} "
+            f"{infer_batch_s / count * 1e6:>10.1f} us/msg"
+        )
+
+    print(
+        f"index hit rate: {hits / count:.1%} "
+        "(first message of each campaign always misses)"
+    )
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
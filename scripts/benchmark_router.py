@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+"""Measure cache hit ratio and throughput behind the router with 1..N backends.
+
+Usage:
+    python scripts/benchmark_router.py [--max-backends 4] [--campaigns 100]
+        [--variants 30]
+        [--concurrency 16] [--strategies hash,round_robin]
+
+For every backend count and routing strategy this starts that many backend
+processes (this app with ``NEARDUP_ENABLED``, each on Werkzeug's threaded
+server) and a router process in front of them, then sends near-duplicate
+campaign traffic (``ml.synthetic.campaign_messages``) through the router
+from ``--concurrency`` client threads.  Every run starts with cold caches.
+
+Reported per run: messages per second, the near-duplicate hit ratio summed
+over the backends' ``GET /api/metrics`` (the best possible ratio is
+``1 - campaigns / messages``: each campaign's first message must miss on
+the backend that owns it), and how requests spread over the backends.
+"""
+
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from ml.synthetic import campaign_messages  # noqa: E402
+from spam_client import SpamClient  # noqa: E402
+
+_TOKEN = "router-benchmark"
+
+
+def _serve_backend(ports: Any, confidence: float) -> None:
+    from werkzeug.serving import make_server  # noqa: WPS433
+
+    from app import create_app  # noqa: WPS433
+    from app.config import get_config  # noqa: WPS433
+
+    class BackendConfig(get_config()):  # type: ignore[misc,valid-type]
+        SQLALCHEMY_DATABASE_URI = "sqlite://"
+        NEARDUP_ENABLED = True
+        NEARDUP_CONFIDENCE = confidence
+        ADMIN_TOKEN = _TOKEN
+        MODEL_RELOAD_SECONDS = 0.0
+        PROFILE_ENABLED = False
+
+    server = make_server("127.0.0.1", 0, create_app(BackendConfig), threaded=True)
+    ports.put(server.server_port)
+    server.serve_forever()
+
+
+def _serve_router(ports: Any, backends: List[str], strategy: str) -> None:
+    from werkzeug.serving import make_server  # noqa: WPS433
+
+    from app.config import get_config  # noqa: WPS433
+    from app.router import create_router  # noqa: WPS433
+
+    class RouterConfig(get_config()):  # type: ignore[misc,valid-type]
+        ROUTER_BACKENDS = backends
+        ROUTER_STRATEGY = strategy
+        ROUTER_HEALTH_INTERVAL = 0.0
+
+    server = make_server("127.0.0.1", 0, create_router(RouterConfig), threaded=True)
+    ports.put(server.server_port)
+    server.serve_forever()
+
+
+def _metrics(url: str) -> Dict[str, Any]:
+    request = urllib.request.Request(
+        f"{url}/api/metrics", headers={"X-Admin-Token": _TOKEN}
+    )
+    with urllib.request.urlopen(
+        request, timeout=30
+    ) as response:  # noqa: S310 - local benchmark URL
+        return json.loads(response.read())
+
+
+def _run(
+    backend_count: int, strategy: str, messages: List[str], args: argparse.Namespace
+) -> Dict[str, Any]:
+    ports: Any = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(
+            target=_serve_backend, args=(ports, args.confidence), daemon=True
+        )
+        for _ in range(backend_count)
+    ]
+    try:
+        for process in processes:
+            process.start()
+        backends = [f"http://127.0.0.1:{ports.get(timeout=120)}" for _ in processes]
+        router = multiprocessing.Process(
+            target=_serve_router, args=(ports, backends, strategy), daemon=True
+        )
+        processes.append(router)
+        router.start()
+        router_url = f"http://127.0.0.1:{ports.get(timeout=60)}"
+
+        with SpamClient(router_url, pool_size=args.concurrency, timeout=60) as client:
+            client.predict(
+                messages[0]
+            )  # loads the model on one backend; fails fast if there is none
+            for backend in backends:
+                with SpamClient(backend, timeout=60) as warmup:
+                    warmup.predict("warm up the model")
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                list(executor.map(client.predict, messages[1:]))
+            elapsed = time.perf_counter() - start
+
+        lookups = hits = 0
+        spread = []
+        for backend in backends:
+            neardup = _metrics(backend).get("neardup", {})
+            lookups += neardup.get("lookups", 0)
+            hits += neardup.get("hits", 0)
+            spread.append(neardup.get("lookups", 0))
+        return {
+            "backends": backend_count,
+            "strategy": strategy,
+            "messages_per_s": (len(messages) - 1) / elapsed,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "lookups_per_backend": spread,
+        }
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Cache hit ratio and throughput behind the router."
+    )
+    parser.add_argument("--max-backends", type=int, default=4)
+    parser.add_argument("--campaigns", type=int, default=100)
+    parser.add_argument("--variants", type=int, default=30)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--strategies", default="hash,round_robin")
+    parser.add_argument(
+        "--confidence",
+        type=float,
+        default=0.95,
+        help="NEARDUP_CONFIDENCE for the backends.",
+    )
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    messages = campaign_messages(args.campaigns, args.variants)
+    results = []
+    for backend_count in range(1, args.max_backends + 1):
+        for strategy in args.strategies.split(","):
+            try:
+                results.append(_run(backend_count, strategy, messages, args))
+            except Exception as exc:  # noqa: BLE001 - e.g. no model on this machine
+                sys.exit(f"{backend_count} backends, {strategy}: {exc}")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(
+        f"{len(messages)} messages ({args.campaigns} campaigns x "
+        f"{args.variants} variants), concurrency {args.concurrency}"
+    )
+    print(f"best possible hit ratio: {1 - args.campaigns / len(messages):.1%}")
+    print(
+        f"{'backends':>8} {'strategy':<12} {'msg/s':>8} {'hit ratio':>10}  "
+        "lookups per backend"
+    )
+    for result in results:
+        print(
+            f"{result['backends']:>8} {result['strategy']:<12} "
+            f"{result['messages_per_s']:>8.0f} "
+            f"{result['hit_ratio']:>9.1%}  {result['lookups_per_backend']}",
+        )
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
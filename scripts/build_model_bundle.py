@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+"""Pack ``model.onnx`` and ``metadata.json`` into a single ``model.bundle`` file.
+
+Usage:
+    python scripts/build_model_bundle.py [MODEL_DIR]
+
+Serving prefers the bundle when present, so a cold start reads one file
+instead of two.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.model_bundle import BUNDLE_FILENAME, write_bundle  # noqa: E402
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+MODEL_ROOT = BASE_DIR / "model"
+
+
+def build(model_dir: Path) -> Path:
+    model_path = model_dir / "model.onnx"
+    metadata_path = model_dir / "metadata.json"
+    if not model_path.exists():
+        raise FileNotFoundError(
+            f"ONNX model not found at {model_path}. Run convert_to_onnx.py first."
+        )
+
+    metadata = {}
+    if metadata_path.exists():
+        with metadata_path.open(encoding="utf-8") as meta_file:
+            metadata = json.load(meta_file)
+
+    bundle_path = model_dir / BUNDLE_FILENAME
+    write_bundle(bundle_path, model_path.read_bytes(), metadata)
+    return bundle_path
+
+
+if __name__ == "__main__":  # pragma: no cover
+    target = Path(sys.argv[1]) if len(sys.argv) > 1 else MODEL_ROOT
+    print(f"Wrote {build(target)}")
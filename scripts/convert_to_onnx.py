@@ -1,21 +1,29 @@
 import pickle
 import json
 import shutil
+import sys
 from pathlib import Path
 from sklearn.pipeline import Pipeline
 from skl2onnx import to_onnx
 from skl2onnx.common.data_types import StringTensorType
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.explain import EXPLAIN_FILENAME  # noqa: E402
+from app.model_bundle import BUNDLE_FILENAME, write_bundle  # noqa: E402
+from ml.pipeline import contribution_table  # noqa: E402
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 MODEL_ROOT = BASE_DIR / "model"
 MODEL_VERSION = "v1.0"
 VERSION_DIR = MODEL_ROOT / MODEL_VERSION
 
+
 def convert():
     model_path = VERSION_DIR / "model.pkl"
     if not model_path.exists():
         model_path = MODEL_ROOT / "model.pkl"
-    
+
     if not model_path.exists():
         print(f"Error: Could not find {model_path}")
         return
@@ -25,22 +33,21 @@ def convert():
         pipe = pickle.load(f)
 
     print("Extracting TfidfVectorizer and LogisticRegression...")
-    # The original pipeline has: FunctionTransformer -> TfidfVectorizer -> LogisticRegression
-    # We strip the FunctionTransformer out because skl2onnx cannot export arbitrary Python code.
+    # The original pipeline has:
+    #   FunctionTransformer -> TfidfVectorizer -> LogisticRegression
+    # We strip the FunctionTransformer out because skl2onnx cannot export
+    # arbitrary Python code.
     tfidf = pipe.named_steps["tfidf"]
     clf = pipe.named_steps["clf"]
 
-    new_pipe = Pipeline([
-        ("tfidf", tfidf),
-        ("clf", clf)
-    ])
+    new_pipe = Pipeline([("tfidf", tfidf), ("clf", clf)])
 
     print("Converting to ONNX...")
     # TfidfVectorizer takes an array of strings
-    initial_type = [('input', StringTensorType([None, 1]))]
-    
+    initial_type = [("input", StringTensorType([None, 1]))]
+
     # We must provide options for TfidfVectorizer to preserve the token pattern
-    options = {id(new_pipe): {'zipmap': False}}
+    options = {id(new_pipe): {"zipmap": False}}
     onx = to_onnx(new_pipe, initial_types=initial_type, options=options)
 
     onnx_path_version = VERSION_DIR / "model.onnx"
@@ -51,7 +58,28 @@ def convert():
     onnx_path_root = MODEL_ROOT / "model.onnx"
     print(f"Copying to {onnx_path_root}")
     shutil.copy2(onnx_path_version, onnx_path_root)
+
+    # The app prefers model.bundle, so it must always match the new export.
+    for model_dir in (VERSION_DIR, MODEL_ROOT):
+        metadata = {}
+        metadata_path = model_dir / "metadata.json"
+        if metadata_path.exists():
+            with metadata_path.open(encoding="utf-8") as f:
+                metadata = json.load(f)
+        bundle_path = model_dir / BUNDLE_FILENAME
+        print(f"Writing model bundle to {bundle_path}")
+        write_bundle(bundle_path, onx.SerializeToString(), metadata)
+
+    # Precomputed token contributions for explain=true (see app/explain.py)
+    table = contribution_table(new_pipe)
+    if table is not None:
+        explain_path = VERSION_DIR / EXPLAIN_FILENAME
+        print(f"Saving token contribution table to {explain_path}")
+        with explain_path.open("w", encoding="utf-8") as f:
+            json.dump(table, f)
+        shutil.copy2(explain_path, MODEL_ROOT / EXPLAIN_FILENAME)
     print("Done!")
 
+
 if __name__ == "__main__":
     convert()
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+"""Run the host's shared inference sidecar (see app/sidecar.py).
+
+Usage:
+    python scripts/inference_sidecar.py [--socket PATH]   # default: SIDECAR_SOCKET
+
+The sidecar loads the model from ``MODEL_DIR`` once and serves every web
+worker on the host that runs with ``INFERENCE_BACKEND=sidecar``, batching
+their requests together.  Start it before (or alongside) gunicorn; workers
+that can't reach it score in-process until it is up.
+
+On SIGTERM or Ctrl-C it stops accepting requests and removes its socket.
+"""
+
+import argparse
+import signal
+import sys
+import threading
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app import create_app, sidecar  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the shared inference sidecar.")
+    parser.add_argument(
+        "--socket", default=None, help="Unix socket path (default: SIDECAR_SOCKET)"
+    )
+    args = parser.parse_args()
+
+    stop = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stop.set())
+
+    app = create_app()
+    sidecar.serve(app, args.socket or app.config["SIDECAR_SOCKET"], stop)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
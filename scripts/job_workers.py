@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+"""Run the worker processes for asynchronous scoring jobs (see app/jobs.py).
+
+Usage:
+    python scripts/job_workers.py [--processes N]   # default: JOBS_WORKERS
+    python scripts/job_workers.py --drain           # one worker, exit when idle
+
+Jobs are submitted with ``POST /api/jobs`` and stored in the database given by
+``DATABASE_URL``, as for the app itself.  Each worker process loads the model
+once and claims jobs in priority order.  Workers that die are replaced, and
+their jobs are resumed by the next free worker.
+
+On SIGTERM or Ctrl-C, each worker stops after the batch it is scoring.  Its
+job goes back to the queue.
+"""
+
+import argparse
+import multiprocessing
+import signal
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app import create_app, jobs  # noqa: E402
+from app.config import get_config  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run scoring job workers.")
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=None,
+        help="worker processes (default: JOBS_WORKERS)",
+    )
+    parser.add_argument(
+        "--drain",
+        action="store_true",
+        help="run one worker in this process until the queue is empty",
+    )
+    args = parser.parse_args()
+
+    stop = multiprocessing.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stop.set())
+
+    if args.drain:
+        completed = jobs.run_worker(create_app(), stop, exit_when_idle=True)
+        print(f"Completed {completed} jobs.")
+        return
+    jobs.run_pool(args.processes or get_config().JOBS_WORKERS, stop=stop)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+"""Issue, list and revoke API keys (see ``ApiKey`` in app/models.py).
+
+Usage:
+    python scripts/manage_api_keys.py issue USER NAME   # USER: username or email
+    python scripts/manage_api_keys.py list [USER]
+    python scripts/manage_api_keys.py revoke KEY_ID
+
+The raw key is printed once when it is issued; only its SHA-256 digest is
+stored.  Issuing and revoking keys is recorded in ``audit_logs``.  The
+database is taken from ``DATABASE_URL`` as for the app itself.
+"""
+
+import argparse
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import List, Tuple
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app import create_app  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.models import ApiKey, AuditLog, User  # noqa: E402
+
+
+def _find_user(identifier: str) -> User:
+    user = User.query.filter(
+        (User.username == identifier) | (User.email == identifier.lower())
+    ).first()
+    if user is None:
+        raise SystemExit(f"No user {identifier!r}")
+    return user
+
+
+def issue_key(identifier: str, name: str) -> Tuple[ApiKey, str]:
+    """Issue a key named *name* for the user; return the model and the raw key."""
+
+    user = _find_user(identifier)
+    api_key, raw_key = ApiKey.issue(user.id, name)
+    db.session.add(api_key)
+    db.session.flush()
+    AuditLog.record(
+        "api_key.issued", user.id, detail=f"{api_key.id} {api_key.key_prefix} {name}"
+    )
+    db.session.commit()
+    return api_key, raw_key
+
+
+def list_keys(identifier: str | None = None) -> List[ApiKey]:
+    query = ApiKey.query
+    if identifier is not None:
+        query = query.filter_by(user_id=_find_user(identifier).id)
+    return query.order_by(ApiKey.id).all()
+
+
+def revoke_key(key_id: int) -> ApiKey:
+    api_key = db.session.get(ApiKey, key_id)
+    if api_key is None:
+        raise SystemExit(f"No API key {key_id}")
+    if api_key.revoked_at is None:
+        api_key.revoked_at = datetime.utcnow()
+        AuditLog.record(
+            "api_key.revoked",
+            api_key.user_id,
+            detail=f"{api_key.id} {api_key.key_prefix} {api_key.name}",
+        )
+        db.session.commit()
+    return api_key
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Manage API keys.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    issue = commands.add_parser("issue", help="issue a new key")
+    issue.add_argument("user", help="username or email")
+    issue.add_argument("name", help="what the key is for")
+    listing = commands.add_parser("list", help="list keys")
+    listing.add_argument("user", nargs="?", default=None)
+    revoke = commands.add_parser("revoke", help="revoke a key")
+    revoke.add_argument("key_id", type=int)
+    args = parser.parse_args()
+
+    app = create_app()
+
+    with app.app_context():
+        if args.command == "issue":
+            api_key, raw_key = issue_key(args.user, args.name)
+            print(f"Issued key {api_key.id} ({api_key.name}): {raw_key}")
+            print("Store it now; it cannot be shown again.")
+        elif args.command == "list":
+            for api_key in list_keys(args.user):
+                status = "revoked" if api_key.revoked_at else "active"
+                print(
+                    f"{api_key.id:>5} {api_key.key_prefix}... user={api_key.user_id} "
+                    f"{status} last_used={api_key.last_used_at or '-'} {api_key.name}"
+                )
+        else:
+            api_key = revoke_key(args.key_id)
+            print(f"Revoked key {api_key.id} ({api_key.name})")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
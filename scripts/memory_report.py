@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+"""Report what a serving worker's memory is made of.
+
+Usage:
+    python scripts/memory_report.py [--diff 500] [--json]
+    python scripts/memory_report.py --url http://localhost:8000 --token $ADMIN_TOKEN
+        [--requests 32] [--diff 500] [--json]
+
+Without ``--url`` the script plays a worker's startup in this process and
+charges each step's RSS growth to it: importing NumPy, onnxruntime and NLTK,
+creating the app, loading the ONNX session and the first predictions.  The
+full report from ``app.memory`` follows.
+
+With ``--url`` it asks a running deployment's ``GET /api/memory`` several
+times; the requests spread over the workers, and the report has one row per
+worker ``pid``.  ``--diff N`` runs N predictions between two tracemalloc
+snapshots (``POST /api/memory/diff`` remotely) and lists the allocations
+that survived; run it more than once to tell warm-up from a leak.
+"""
+
+import argparse
+import json
+import sys
+import urllib.request
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app import memory  # noqa: E402
+
+_MB = 1024 * 1024
+
+
+def _local_steps() -> List[Tuple[str, Callable[[], Any]]]:
+    def import_numpy() -> None:
+        import numpy  # noqa: F401,WPS433
+
+    def import_onnxruntime() -> None:
+        import onnxruntime  # noqa: F401,WPS433
+
+    def import_nltk() -> None:
+        from nltk.stem import PorterStemmer  # noqa: F401,WPS433
+
+    state: Dict[str, Any] = {}
+
+    def create() -> None:
+        from app import create_app  # noqa: WPS433
+
+        state["app"] = create_app()
+        state["context"] = state["app"].app_context()
+        state["context"].push()
+
+    def load_model() -> None:
+        from app.spam import get_pipeline_and_metadata  # noqa: WPS433
+
+        get_pipeline_and_metadata()
+
+    def predict() -> None:
+        from app.spam import predict_spam_probabilities  # noqa: WPS433
+
+        predict_spam_probabilities(
+            [f"Claim your free prize number {index} now" for index in range(100)]
+        )
+
+    return [
+        ("import numpy", import_numpy),
+        ("import onnxruntime", import_onnxruntime),
+        ("import nltk stemmer", import_nltk),
+        ("create_app", create),
+        ("load ONNX session + metadata", load_model),
+        ("first 100 predictions", predict),
+    ]
+
+
+def _local(diff: int, as_json: bool) -> None:
+    steps = []
+    for name, step in _local_steps():
+        before = memory.current_rss()
+        try:
+            step()
+        except Exception as exc:  # noqa: BLE001 - report and keep going
+            steps.append({"step": name, "error": str(exc)})
+            continue
+        steps.append({"step": name, "rss_growth": memory.current_rss() - before})
+
+    result: Dict[str, Any] = {"steps": steps, "report": memory.report()}
+    if diff:
+        from app.spam import predict_spam_probabilities  # noqa: WPS433
+
+        texts = [f"Meeting moved to {index} pm, see agenda" for index in range(diff)]
+        try:
+            result["diff"] = memory.allocation_diff(
+                lambda: predict_spam_probabilities(texts)
+            )
+        except Exception as exc:  # noqa: BLE001 - e.g. no model on this machine
+            result["diff"] = {"error": str(exc)}
+
+    if as_json:
+        print(json.dumps(result, indent=2))
+        return
+    for step in steps:
+        growth = (
+            f"{step['rss_growth'] / _MB:8.1f} MB"
+            if "rss_growth" in step
+            else f"failed: {step['error']}"
+        )
+        print(f"{step['step']:<32} {growth}")
+    print()
+    _print_report(result["report"])
+    if diff:
+        _print_diff(result["diff"])
+
+
+def _request(
+    url: str, token: str, body: Dict[str, Any] | None = None
+) -> Dict[str, Any]:
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    request = urllib.request.Request(
+        url,
+        data=data,
+        headers={"X-Admin-Token": token, "Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(
+        request, timeout=60
+    ) as response:  # noqa: S310 - operator-supplied URL
+        return json.loads(response.read())
+
+
+def _remote(url: str, token: str, requests: int, diff: int, as_json: bool) -> None:
+    workers: Dict[int, Dict[str, Any]] = {}
+    for _ in range(requests):
+        report = _request(f"{url.rstrip('/')}/api/memory", token)
+        workers[report["pid"]] = report
+    result: Dict[str, Any] = {"workers": workers}
+    if diff:
+        result["diff"] = _request(
+            f"{url.rstrip('/')}/api/memory/diff", token, {"predictions": diff}
+        )
+
+    if as_json:
+        print(json.dumps(result, indent=2))
+        return
+    print(
+        f"{'pid':>8} {'rss MB':>8} {'uss MB':>8} {'shared MB':>10} "
+        f"{'pss MB':>8} {'arena MB':>9}"
+    )
+    for pid, report in sorted(workers.items()):
+        process = report["process"]
+        arena = sum(report["onnx"]["arena_estimate"]) / _MB
+        print(
+            f"{pid:>8} {process.get('rss', 0) / _MB:>8.1f} "
+            f"{process.get('uss', 0) / _MB:>8.1f} "
+            f"{process.get('shared', 0) / _MB:>10.1f} "
+            f"{process.get('pss', 0) / _MB:>8.1f} {arena:>9.1f}",
+        )
+    total_pss = sum(report["process"].get("pss", 0) for report in workers.values())
+    print(f"{len(workers)} workers seen, {total_pss / _MB:.1f} MB PSS in total")
+    if diff:
+        _print_diff(result["diff"])
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    for key, value in report["process"].items():
+        print(f"{key:<32} {value / _MB:8.1f} MB")
+    for label, key in (
+        ("onnx session loads", "session_loads"),
+        ("onnx arena estimate", "arena_estimate"),
+    ):
+        sizes = [round(size / _MB, 1) for size in report["onnx"][key]]
+        print(f"{label:<32} {sizes} MB")
+    heap = report["python_heap"]
+    print(f"{'python allocated blocks':<32} {heap['allocated_blocks']:>8}")
+    print(f"{'gc-tracked objects':<32} {heap['gc_objects']:>8}")
+    print("resident mapped files:")
+    for name, size in report["libraries"].items():
+        print(f"  {name:<30} {size / _MB:8.1f} MB")
+
+
+def _print_diff(diff: Dict[str, Any]) -> None:
+    print()
+    if "error" in diff:
+        print(f"allocation diff failed: {diff['error']}")
+        return
+    print(
+        f"after burst: rss {diff['rss_growth'] / _MB:+.2f} MB, "
+        f"traced {diff['traced_growth'] / 1024:+.1f} KiB"
+    )
+    for entry in diff["top"]:
+        print(
+            f"  {entry['size_diff'] / 1024:+9.1f} KiB {entry['count_diff']:+7d}  "
+            f"{entry['location']}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-worker memory accounting.")
+    parser.add_argument(
+        "--url", help="Base URL of a running deployment; default is to measure locally."
+    )
+    parser.add_argument("--token", default="", help="ADMIN_TOKEN of the deployment.")
+    parser.add_argument(
+        "--requests",
+        type=int,
+        default=32,
+        help="Reports to fetch to reach every worker.",
+    )
+    parser.add_argument(
+        "--diff", type=int, default=0, help="Predictions to run under tracemalloc."
+    )
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    if args.url:
+        _remote(args.url, args.token, args.requests, args.diff, args.json)
+    else:
+        _local(args.diff, args.json)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
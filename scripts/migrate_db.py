@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+"""Apply versioned schema migrations (see app/migrations.py).
+
+Usage:
+    python scripts/migrate_db.py            # upgrade to the latest version
+    python scripts/migrate_db.py --target 1 # upgrade up to a specific version
+    python scripts/migrate_db.py --current  # print the applied version
+
+The database is taken from ``DATABASE_URL`` as for the app itself.
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+# Migrations are applied explicitly below, not as a side effect of create_app.
+# This must be set before app.config is imported.
+os.environ["SCHEMA_AUTO_MIGRATE"] = "false"
+
+from app import create_app, migrations  # noqa: E402
+from app.extensions import db  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Apply schema migrations.")
+    parser.add_argument("--target", type=int, default=None)
+    parser.add_argument(
+        "--current", action="store_true", help="only print the applied version"
+    )
+    args = parser.parse_args()
+
+    app = create_app()
+
+    with app.app_context():
+        if args.current:
+            print(
+                f"Schema version: {migrations.current_version(db.engine)} "
+                f"(head: {migrations.HEAD})"
+            )
+            return
+
+        applied = migrations.upgrade(db.engine, target=args.target)
+        for version in applied:
+            description = next(
+                m.description for m in migrations.MIGRATIONS if m.version == version
+            )
+            print(f"Applied migration {version}: {description}")
+        print(f"Schema version: {migrations.current_version(db.engine)}")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    os.environ.setdefault("FLASK_ENV", "production")
+    main()
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+"""Run the milter daemon that scores mail at SMTP time (see app/milter.py).
+
+Usage:
+    python scripts/milter_daemon.py [--host 127.0.0.1] [--port 8894]
+
+The address defaults to ``MILTER_HOST`` and ``MILTER_PORT``.
+
+Point Postfix (``smtpd_milters = inet:127.0.0.1:8894``) or Sendmail
+(``INPUT_MAIL_FILTER``) at it.  Messages scoring at or above
+``MILTER_REJECT_THRESHOLD`` are rejected with a 550; the rest get an
+``X-Spam-Probability`` header.  With ``INFERENCE_BACKEND=sidecar`` the
+daemon scores through the host's inference sidecar like the web workers.
+
+On SIGTERM or Ctrl-C it stops accepting connections and logs its counters.
+"""
+
+import argparse
+import asyncio
+import signal
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app import create_app, milter  # noqa: E402
+
+
+async def _run(app, host: str, port: int) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+    await milter.serve(app, host, port, stop)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the SMTP-time milter daemon.")
+    parser.add_argument(
+        "--host", default=None, help="Address to listen on (default: MILTER_HOST)"
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=None,
+        help="Port to listen on (default: MILTER_PORT)",
+    )
+    args = parser.parse_args()
+
+    app = create_app()
+    host = args.host or app.config["MILTER_HOST"]
+    port = app.config["MILTER_PORT"] if args.port is None else args.port
+    asyncio.run(_run(app, host, port))
+    app.logger.info("Milter stopped: %s", milter.stats())
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
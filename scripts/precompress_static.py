@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+"""Write a gzip copy (``<file>.gz``) next to every compressible static asset.
+
+Usage:
+    python scripts/precompress_static.py [STATIC_DIR]
+
+``app/caching.py`` serves the ``.gz`` file to clients that accept gzip, as
+long as it is not older than the original, so assets are compressed once
+at build time (at the highest level) rather than on every request.  Files
+that don't shrink are skipped.
+"""
+
+import gzip
+import sys
+from pathlib import Path
+from typing import List
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+STATIC_ROOT = BASE_DIR / "app" / "static"
+COMPRESSIBLE_SUFFIXES = (".css", ".js", ".html", ".svg", ".json", ".txt")
+
+
+def precompress(static_dir: Path) -> List[Path]:
+    written = []
+    for path in sorted(static_dir.rglob("*")):
+        if not path.is_file() or path.suffix not in COMPRESSIBLE_SUFFIXES:
+            continue
+        data = path.read_bytes()
+        # mtime=0 makes the output reproducible between builds.
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        target = path.with_name(f"{path.name}.gz")
+        if len(compressed) >= len(data):
+            target.unlink(missing_ok=True)
+            continue
+        target.write_bytes(compressed)
+        written.append(target)
+    return written
+
+
+if __name__ == "__main__":  # pragma: no cover
+    target_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else STATIC_ROOT
+    for path in precompress(target_dir):
+        print(f"Wrote {path} ({path.stat().st_size} bytes)")
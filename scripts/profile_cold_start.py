@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+"""Report import-time cost and time to first response for the serverless entry point.
+
+Usage:
+    python scripts/profile_cold_start.py [--top 25] [--output reports/cold_start.json]
+                                         [--baseline reports/cold_start_baseline.json]
+
+Each measurement runs in a fresh interpreter so module caches don't hide cold
+start cost.  With ``--baseline`` the script exits non-zero when total import
+time or time to first response regresses by more than ``--tolerance``.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+REPORTS_DIR = BASE_DIR / "reports"
+
+_FIRST_RESPONSE_SNIPPET = """
+import json, time
+t0 = time.perf_counter()
+from api.index import app
+t_import = time.perf_counter()
+client = app.test_client()
+home = client.get("/")
+t_home = time.perf_counter()
+predict = client.post("/api/predict", json={"text": "win a free prize now"})
+t_predict = time.perf_counter()
+print(json.dumps({
+    "import_app_ms": (t_import - t0) * 1000,
+    "first_page_ms": (t_home - t0) * 1000,
+    "first_page_status": home.status_code,
+    "first_prediction_ms": (t_predict - t0) * 1000,
+    "first_prediction_status": predict.status_code,
+}))
+"""
+
+
+def _run(args: List[str]) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=BASE_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def import_profile(top: int) -> Dict[str, Any]:
+    """Parse ``python -X importtime`` output for ``import api.index``."""
+
+    result = _run(["-X", "importtime", "-c", "import api.index"])
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|", 2)
+        modules.append(
+            {
+                "module": name.strip(),
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+                # Nested imports are indented by two extra spaces per level.
+                "top_level": not name[1:].startswith(" "),
+            },
+        )
+
+    top_level = [m for m in modules if m["top_level"]]
+    heavy = sorted(modules, key=lambda m: m["cumulative_ms"], reverse=True)[:top]
+    return {
+        "total_import_ms": sum(m["cumulative_ms"] for m in top_level),
+        "module_count": len(modules),
+        "heavy_modules": [
+            {k: v for k, v in m.items() if k != "top_level"} for m in heavy
+        ],
+        "loaded_numpy": any(m["module"] == "numpy" for m in modules),
+        "loaded_onnxruntime": any(m["module"] == "onnxruntime" for m in modules),
+        "loaded_nltk": any(m["module"] == "nltk" for m in modules),
+    }
+
+
+def first_response_profile() -> Dict[str, Any]:
+    result = _run(["-c", _FIRST_RESPONSE_SNIPPET])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _regressions(
+    report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    checks = [
+        (
+            "imports.total_import_ms",
+            report["imports"]["total_import_ms"],
+            baseline["imports"]["total_import_ms"],
+        ),
+        (
+            "first_response.first_page_ms",
+            report["first_response"]["first_page_ms"],
+            baseline["first_response"]["first_page_ms"],
+        ),
+    ]
+    return [
+        f"{name}: {current:.1f} ms vs baseline {previous:.1f} ms"
+        for name, current, previous in checks
+        if current > previous * (1 + tolerance)
+    ]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0] if __doc__ else None
+    )
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--output", type=Path, default=REPORTS_DIR / "cold_start.json")
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    report = {
+        "imports": import_profile(args.top),
+        "first_response": first_response_profile(),
+    }
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with args.output.open("w", encoding="utf-8") as report_file:
+        json.dump(report, report_file, indent=2)
+
+    print(f"Total import time: {report['imports']['total_import_ms']:.1f} ms")
+    print(f"Time to first page: {report['first_response']['first_page_ms']:.1f} ms")
+    print(
+        "Time to first prediction: "
+        f"{report['first_response']['first_prediction_ms']:.1f} ms"
+    )
+    print(f"Saved report to {args.output}")
+
+    if args.baseline is not None:
+        with args.baseline.open(encoding="utf-8") as baseline_file:
+            regressions = _regressions(report, json.load(baseline_file), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
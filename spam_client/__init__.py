@@ -0,0 +1,29 @@
+"""Python client for the spam classifier's prediction API.
+
+Standard library only, so services can vendor or install it without
+pulling in the server's dependencies::
+
+    from spam_client import SpamClient
+
+    with SpamClient("http://localhost:8000", api_key="...") as client:
+        prediction = client.classify("Claim your free prize now")
+        print(prediction.label, prediction.probability)
+
+See ``docs/client.md``.
+"""
+
+from .aio import AsyncSpamClient
+from .client import MAX_TEXT_LENGTH, Prediction, SpamClient
+from .errors import APIError, SpamClientError, TransportError
+from .retry import RetryPolicy
+
+__all__ = [
+    "APIError",
+    "AsyncSpamClient",
+    "MAX_TEXT_LENGTH",
+    "Prediction",
+    "RetryPolicy",
+    "SpamClient",
+    "SpamClientError",
+    "TransportError",
+]
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Any, Dict, List, Sequence, Set, Tuple
+
+from .client import BaseClient, Prediction, check_text
+from .errors import SpamClientError, TransportError
+from .retry import RetryPolicy
+from .transport import AsyncConnectionPool
+
+
+class AsyncSpamClient(BaseClient):
+    """asyncio version of :class:`spam_client.SpamClient`.
+
+    ``await client.classify(text)`` from many tasks is coalesced into batch
+    requests: the first pending text starts a *max_delay* timer, and the
+    batch is sent when the timer fires or *max_batch_size* texts are waiting.
+    Create the client inside the running event loop it will be used from.
+    """
+
+    def __init__(
+        self,
+        base_url: str = "http://localhost:8000",
+        *,
+        api_key: str | None = None,
+        model_version: str | None = None,
+        timeout: float = 10.0,
+        pool_size: int = 10,
+        retry: RetryPolicy | None = None,
+        max_batch_size: int = 64,
+        max_delay: float = 0.005,
+    ) -> None:
+        super().__init__(
+            base_url, api_key, model_version, timeout, retry, max_batch_size, max_delay
+        )
+        self.pool = AsyncConnectionPool(base_url, size=pool_size, timeout=timeout)
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._closed = False
+
+    async def _post(self, path: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        data = json.dumps(body).encode("utf-8")
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                response = await self.pool.request(
+                    "POST", path, data, self._request_headers()
+                )
+            except TransportError:
+                if attempt >= self.retry.attempts:
+                    raise
+                self._count("retries")
+                await asyncio.sleep(self.retry.delay(attempt))
+                continue
+            payload, error, retry = self._outcome(response, attempt)
+            if payload is not None:
+                return payload
+            if not retry:
+                raise error
+            self._count("retries")
+            await asyncio.sleep(self.retry.delay(attempt, error.retry_after))
+
+    async def predict(self, text: str) -> Prediction:
+        return self._single(
+            await self._post("/api/predict", {"text": check_text(text)})
+        )
+
+    async def predict_batch(self, texts: Sequence[str]) -> List[Prediction]:
+        chunks = self._chunks(texts)
+        payloads = await asyncio.gather(
+            *(self._post("/api/predict/batch", {"texts": chunk}) for chunk in chunks)
+        )
+        return [
+            prediction
+            for payload, chunk in zip(payloads, chunks)
+            for prediction in self._batch(payload, len(chunk))
+        ]
+
+    async def classify(self, text: str) -> Prediction:
+        """Score *text*, sharing a batch request with concurrently waiting tasks."""
+
+        check_text(text)
+        if self._closed:
+            raise SpamClientError("client is closed")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        self._count("batches")
+        self._count("batched_texts", len(batch))
+        try:
+            payload = await self._post(
+                "/api/predict/batch", {"texts": [text for text, _ in batch]}
+            )
+            predictions = self._batch(payload, len(batch))
+        except Exception as exc:  # noqa: BLE001 - handed to every waiting caller
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for (_, future), prediction in zip(batch, predictions):
+            if not future.done():
+                future.set_result(prediction)
+
+    async def aclose(self) -> None:
+        """Send what is still pending, wait for in-flight batches, close connections."""
+
+        self._closed = True
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.pool.close()
+
+    async def __aenter__(self) -> "AsyncSpamClient":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
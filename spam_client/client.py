@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Sequence, Tuple
+
+from .errors import APIError, SpamClientError, TransportError
+from .retry import RetryPolicy, parse_retry_after
+from .transport import ConnectionPool, Response
+
+# Same limit the server enforces (app.routes.MAX_TEXT_LENGTH); checking it
+# here keeps one bad text from failing the whole coalesced batch.
+MAX_TEXT_LENGTH = 10_000
+
+
+class Prediction(NamedTuple):
+    label: str
+    probability: float
+    model_version: str
+
+
+def check_text(text: Any) -> str:
+    if not isinstance(text, str) or not text.strip():
+        raise ValueError("text must be a non-empty string")
+    if len(text) > MAX_TEXT_LENGTH:
+        raise ValueError(f"text is longer than {MAX_TEXT_LENGTH} characters")
+    return text
+
+
+class BaseClient:
+    """Request building, response decoding and statistics shared by both clients."""
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str | None,
+        model_version: str | None,
+        timeout: float,
+        retry: RetryPolicy | None,
+        max_batch_size: int,
+        max_delay: float,
+    ) -> None:
+        self.base_url = base_url
+        self.timeout = timeout
+        self.retry = retry or RetryPolicy()
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.stats: Dict[str, int] = {
+            "requests": 0,
+            "retries": 0,
+            "batches": 0,
+            "batched_texts": 0,
+        }
+        self._headers = {
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+        }
+        if api_key:
+            self._headers["X-API-Key"] = api_key
+        if model_version:
+            self._headers["X-Model-Version"] = model_version
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        self.stats[key] += amount
+
+    def _request_headers(self) -> Dict[str, str]:
+        # The server drops requests whose deadline passed while they queued,
+        # instead of doing work nobody is waiting for any more.
+        deadline_ms = int((time.time() + self.timeout) * 1000)
+        return {**self._headers, "X-Request-Deadline": str(deadline_ms)}
+
+    def _outcome(
+        self, response: Response, attempt: int
+    ) -> Tuple[Dict[str, Any] | None, APIError | None, bool]:
+        """``(payload, error, retry)`` for one response."""
+
+        self._count("requests")
+        if response.status == 200:
+            return json.loads(response.body), None, False
+        try:
+            message = json.loads(response.body).get("error", "")
+        except (ValueError, AttributeError):
+            message = response.body[:200].decode("utf-8", "replace")
+        error = APIError(
+            response.status,
+            message,
+            parse_retry_after(response.headers.get("retry-after")),
+        )
+        retry = attempt < self.retry.attempts and self.retry.retryable(response.status)
+        return None, error, retry
+
+    @staticmethod
+    def _single(payload: Dict[str, Any]) -> Prediction:
+        return Prediction(
+            payload["prediction"],
+            float(payload["probability"]),
+            payload.get("model_version", ""),
+        )
+
+    @staticmethod
+    def _batch(payload: Dict[str, Any], expected: int) -> List[Prediction]:
+        if (
+            len(payload["predictions"]) != expected
+            or len(payload["probabilities"]) != expected
+        ):
+            # Pairing a short answer with the texts would misattribute results
+            # and leave the unmatched callers waiting forever.
+            raise SpamClientError(
+                f"server returned {len(payload['predictions'])} predictions "
+                f"for {expected} texts"
+            )
+        version = payload.get("model_version", "")
+        return [
+            Prediction(label, float(probability), version)
+            for label, probability in zip(
+                payload["predictions"], payload["probabilities"]
+            )
+        ]
+
+    def _chunks(self, texts: Sequence[str]) -> List[List[str]]:
+        checked = [check_text(text) for text in texts]
+        return [
+            checked[start : start + self.max_batch_size]
+            for start in range(0, len(checked), self.max_batch_size)
+        ]
+
+
+class SpamClient(BaseClient):
+    """Synchronous client for the prediction API.
+
+    Connections are kept alive in a pool of *pool_size*.  :meth:`classify`
+    (and :meth:`submit`) queue single texts; a background thread sends them
+    as ``/api/predict/batch`` requests of up to *max_batch_size* texts,
+    waiting at most *max_delay* seconds for a batch to fill.  Concurrent
+    callers therefore share requests, and a single caller can pipeline with
+    :meth:`submit`.  Failed requests are retried according to *retry*.
+    """
+
+    def __init__(
+        self,
+        base_url: str = "http://localhost:8000",
+        *,
+        api_key: str | None = None,
+        model_version: str | None = None,
+        timeout: float = 10.0,
+        pool_size: int = 10,
+        retry: RetryPolicy | None = None,
+        max_batch_size: int = 64,
+        max_delay: float = 0.005,
+    ) -> None:
+        super().__init__(
+            base_url, api_key, model_version, timeout, retry, max_batch_size, max_delay
+        )
+        self.pool = ConnectionPool(base_url, size=pool_size, timeout=timeout)
+        self._queue: queue.Queue[Tuple[str, Future] | None] = queue.Queue()
+        self._senders = ThreadPoolExecutor(
+            max_workers=pool_size, thread_name_prefix="spam-client"
+        )
+        self._batcher: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        # Sender threads finish batches concurrently.
+        with self._lock:
+            super()._count(key, amount)
+
+    def _post(self, path: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        data = json.dumps(body).encode("utf-8")
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                response = self.pool.request(
+                    "POST", path, data, self._request_headers()
+                )
+            except TransportError:
+                if attempt >= self.retry.attempts:
+                    raise
+                self._count("retries")
+                time.sleep(self.retry.delay(attempt))
+                continue
+            payload, error, retry = self._outcome(response, attempt)
+            if payload is not None:
+                return payload
+            if not retry:
+                raise error
+            self._count("retries")
+            time.sleep(self.retry.delay(attempt, error.retry_after))
+
+    def predict(self, text: str) -> Prediction:
+        """Score one text with its own ``/api/predict`` request."""
+
+        return self._single(self._post("/api/predict", {"text": check_text(text)}))
+
+    def predict_batch(self, texts: Sequence[str]) -> List[Prediction]:
+        """Score *texts* with ``/api/predict/batch``, *max_batch_size* per request."""
+
+        results: List[Prediction] = []
+        for chunk in self._chunks(texts):
+            results.extend(
+                self._batch(
+                    self._post("/api/predict/batch", {"texts": chunk}), len(chunk)
+                )
+            )
+        return results
+
+    def submit(self, text: str) -> Future:
+        """Queue *text* for the next coalesced batch.
+
+        The returned future resolves to a :class:`Prediction`.
+        """
+
+        check_text(text)
+        future: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise SpamClientError("client is closed")
+            if self._batcher is None:
+                self._batcher = threading.Thread(
+                    target=self._collect, name="spam-client-batcher", daemon=True
+                )
+                self._batcher.start()
+            self._queue.put((text, future))
+        return future
+
+    def classify(self, text: str) -> Prediction:
+        """Score *text*, sharing a batch request with concurrent callers."""
+
+        return self.submit(text).result()
+
+    def _collect(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = (
+                        self._queue.get(timeout=remaining)
+                        if remaining > 0
+                        else self._queue.get_nowait()
+                    )
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._senders.submit(self._send, batch)
+                    return
+                batch.append(item)
+            self._senders.submit(self._send, batch)
+
+    def _send(self, batch: List[Tuple[str, Future]]) -> None:
+        self._count("batches")
+        self._count("batched_texts", len(batch))
+        try:
+            payload = self._post(
+                "/api/predict/batch", {"texts": [text for text, _ in batch]}
+            )
+            predictions = self._batch(payload, len(batch))
+        except Exception as exc:  # noqa: BLE001 - handed to every waiting caller
+            for _, future in batch:
+                future.set_exception(exc)
+            return
+        for (_, future), prediction in zip(batch, predictions):
+            future.set_result(prediction)
+
+    def close(self) -> None:
+        """Send what is still queued, then close the pooled connections."""
+
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            batcher = self._batcher
+        if batcher is not None:
+            self._queue.put(None)
+            batcher.join()
+        self._senders.shutdown(wait=True)
+        self.pool.close()
+
+    def __enter__(self) -> "SpamClient":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
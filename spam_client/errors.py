@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+
+class SpamClientError(Exception):
+    """Base class for every error raised by :mod:`spam_client`."""
+
+
+class TransportError(SpamClientError):
+    """The request could not be sent or no complete response came back."""
+
+
+class APIError(SpamClientError):
+    """The server answered with a non-200 status."""
+
+    def __init__(
+        self, status: int, message: str, retry_after: float | None = None
+    ) -> None:
+        super().__init__(f"{status}: {message}")
+        self.status = status
+        self.message = message
+        self.retry_after = retry_after
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Collection
+
+# 503 is what the server's admission control sheds with (plus Retry-After);
+# 429/502/504 come from proxies and rate limiters in front of it.
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Seconds to wait from a ``Retry-After`` header (delta-seconds or HTTP date)."""
+
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class RetryPolicy:
+    """Capped exponential backoff with full jitter that honours ``Retry-After``.
+
+    Attempt *n* (1-based) waits a uniformly random time in
+    ``[0, min(max_backoff, backoff * 2 ** (n - 1))]``, so clients that failed
+    together don't retry together.  When the server sent ``Retry-After`` the
+    wait is at least that long, plus up to 10% spread, capped at
+    *max_retry_after*.
+    """
+
+    def __init__(
+        self,
+        attempts: int = 4,
+        backoff: float = 0.05,
+        max_backoff: float = 2.0,
+        max_retry_after: float = 30.0,
+        statuses: Collection[int] = RETRY_STATUSES,
+        rng: Callable[[], float] = random.random,
+    ) -> None:
+        self.attempts = max(1, attempts)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self.statuses = frozenset(statuses)
+        self._rng = rng
+
+    def retryable(self, status: int) -> bool:
+        return status in self.statuses
+
+    def delay(self, attempt: int, retry_after: float | None = None) -> float:
+        jittered = self._rng() * min(
+            self.max_backoff, self.backoff * 2 ** (attempt - 1)
+        )
+        if retry_after is None:
+            return jittered
+        return min(
+            self.max_retry_after, max(jittered, retry_after * (1 + 0.1 * self._rng()))
+        )
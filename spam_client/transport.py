@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import asyncio
+import http.client
+import ssl
+import threading
+from typing import Dict, List, NamedTuple, Tuple
+from urllib.parse import urlsplit
+
+from .errors import TransportError
+
+# Keep-alive connection pools on the standard library only: http.client for
+# the synchronous client and asyncio streams for the asyncio one.  A pooled
+# connection the server has closed while idle fails on reuse; that request
+# is resent once on a fresh connection before it counts as a failure.
+
+
+class Response(NamedTuple):
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+
+
+def split_url(base_url: str) -> Tuple[str, str, int, str]:
+    """``(scheme, host, port, path prefix)`` of *base_url*."""
+
+    parts = urlsplit(base_url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError(f"Unsupported base URL: {base_url!r}")
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    return parts.scheme, parts.hostname, port, parts.path.rstrip("/")
+
+
+class ConnectionPool:
+    """Thread-safe pool of at most *size* keep-alive connections to one server."""
+
+    def __init__(self, base_url: str, size: int = 10, timeout: float = 10.0) -> None:
+        self.scheme, self.host, self.port, self.prefix = split_url(base_url)
+        self.timeout = timeout
+        self.opened = 0
+        self._idle: List[http.client.HTTPConnection] = []
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        self.opened += 1
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(
+                self.host, self.port, timeout=self.timeout
+            )
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def request(
+        self, method: str, path: str, body: bytes, headers: Dict[str, str]
+    ) -> Response:
+        with self._slots:
+            with self._lock:
+                connection = self._idle.pop() if self._idle else None
+            reused = connection is not None
+            if connection is None:
+                connection = self._connect()
+            while True:
+                try:
+                    connection.request(
+                        method, self.prefix + path, body=body, headers=headers
+                    )
+                    raw = connection.getresponse()
+                    data = raw.read()
+                except (OSError, http.client.HTTPException) as exc:
+                    connection.close()
+                    if reused:
+                        reused = False
+                        connection = self._connect()
+                        continue
+                    raise TransportError(f"{method} {path} failed: {exc}") from exc
+                break
+            if raw.will_close:
+                connection.close()
+            else:
+                with self._lock:
+                    self._idle.append(connection)
+            return Response(
+                raw.status,
+                {name.lower(): value for name, value in raw.getheaders()},
+                data,
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+class AsyncConnectionPool:
+    """asyncio counterpart of :class:`ConnectionPool` (HTTP/1.1 over streams)."""
+
+    def __init__(self, base_url: str, size: int = 10, timeout: float = 10.0) -> None:
+        self.scheme, self.host, self.port, self.prefix = split_url(base_url)
+        self.timeout = timeout
+        self.opened = 0
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._slots = asyncio.Semaphore(size)
+
+    async def _connect(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        self.opened += 1
+        context = ssl.create_default_context() if self.scheme == "https" else None
+        return await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=context),
+            self.timeout,
+        )
+
+    async def request(
+        self, method: str, path: str, body: bytes, headers: Dict[str, str]
+    ) -> Response:
+        head = [
+            f"{method} {self.prefix + path} HTTP/1.1",
+            f"Host: {self.host}:{self.port}",
+            f"Content-Length: {len(body)}",
+        ]
+        head.extend(f"{name}: {value}" for name, value in headers.items())
+        message = ("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body
+
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else None
+            reused = connection is not None
+            while True:
+                try:
+                    if connection is None:
+                        connection = await self._connect()
+                    reader, writer = connection
+                    writer.write(message)
+                    await writer.drain()
+                    response, keep_alive = await asyncio.wait_for(
+                        _read_response(reader), self.timeout
+                    )
+                except (
+                    OSError,
+                    asyncio.IncompleteReadError,
+                    asyncio.TimeoutError,
+                    ValueError,
+                ) as exc:
+                    if connection is not None:
+                        connection[1].close()
+                    connection = None
+                    if reused:
+                        reused = False
+                        continue
+                    raise TransportError(f"{method} {path} failed: {exc!r}") from exc
+                break
+            if keep_alive:
+                self._idle.append(connection)
+            else:
+                connection[1].close()
+            return response
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+        for _, writer in idle:
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+
+async def _read_response(reader: asyncio.StreamReader) -> Tuple[Response, bool]:
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError("connection closed before a response")
+    version, status, _ = status_line.decode("latin-1").split(" ", 2)
+    headers: Dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    keep_alive = (
+        version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+    )
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        body = b"".join(chunks)
+    elif "content-length" in headers:
+        body = await reader.readexactly(int(headers["content-length"]))
+    else:
+        body = await reader.read()
+        keep_alive = False
+    return Response(int(status), headers, body), keep_alive
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import numpy as np
+
+from app import jobs as jobs_module
+from app import routes as routes_module
+from app import spam as spam_module
+
+
+class FakeSession:
+    """Stand-in for ``onnxruntime.InferenceSession`` with the exported model's I/O.
+
+    Any input containing one of the spam keywords scores 0.9, everything else
+    0.2, so tests stay deterministic without a real model on disk.
+    """
+
+    SPAM_WORDS = ("spam", "win", "free", "prize")
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def get_inputs(self) -> List[Any]:
+        return [SimpleNamespace(name="input")]
+
+    def get_outputs(self) -> List[Any]:
+        return [SimpleNamespace(name="label"), SimpleNamespace(name="probabilities")]
+
+    def run(self, output_names, inputs: Dict[str, Any]):  # type: ignore[override]
+        self.calls += 1
+        texts = [row[0] for row in inputs["input"]]
+        probas = np.array(
+            [
+                [0.1, 0.9]
+                if any(word in text for word in self.SPAM_WORDS)
+                else [0.8, 0.2]
+                for text in texts
+            ],
+            dtype=np.float32,
+        )
+        labels = (probas[:, 1] > 0.5).astype(np.int64)
+        return [labels, probas]
+
+
+def install_fake_model(
+    monkeypatch, metadata: Dict[str, Any] | None = None
+) -> FakeSession:
+    """Patch :mod:`app.spam` so inference runs against a :class:`FakeSession`."""
+
+    session = FakeSession()
+    meta = {"version": "mock"} if metadata is None else metadata
+
+    def fake_get_pipeline_and_metadata():  # type: ignore[override]
+        return session, meta
+
+    monkeypatch.setattr(
+        spam_module, "get_pipeline_and_metadata", fake_get_pipeline_and_metadata
+    )
+    monkeypatch.setattr(
+        routes_module, "get_pipeline_and_metadata", fake_get_pipeline_and_metadata
+    )
+    monkeypatch.setattr(
+        jobs_module, "get_pipeline_and_metadata", fake_get_pipeline_and_metadata
+    )
+    return session
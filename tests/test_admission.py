@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+from flask import Flask
+
+from app import admission
+from app.admission import AdaptiveLimiter
+from tests.fixtures.fake_model import install_fake_model
+
+
+@pytest.fixture(autouse=True)
+def _reset_limiter(monkeypatch) -> None:
+    monkeypatch.setattr(admission, "_LIMITER", None)
+
+
+def test_aimd_limiter_backs_off_on_slow_requests_and_grows_when_busy() -> None:
+    limiter = AdaptiveLimiter(
+        initial_limit=10, max_limit=20, algorithm="aimd", latency_target_ms=100
+    )
+
+    assert limiter.try_acquire()
+    limiter.release(0.5)
+    assert limiter.limit == 9
+
+    for _ in range(9):
+        assert limiter.try_acquire()
+    limiter.release(0.01)
+    assert limiter.limit == 10
+
+
+def test_gradient_limiter_shrinks_when_latency_rises() -> None:
+    limiter = AdaptiveLimiter(initial_limit=16, algorithm="gradient", tolerance=1.0)
+
+    for _ in range(16):
+        limiter.try_acquire()
+    for _ in range(8):
+        limiter.release(0.01)
+    baseline = limiter.limit
+
+    for _ in range(8):
+        limiter.try_acquire()
+    for _ in range(8):
+        limiter.release(1.0)
+
+    assert limiter.limit < baseline
+
+
+def test_limiter_sheds_when_full() -> None:
+    limiter = AdaptiveLimiter(initial_limit=1, max_limit=1)
+
+    assert limiter.try_acquire()
+    assert not limiter.try_acquire()
+    assert limiter.snapshot()["shed"] == 1
+
+
+def test_expired_deadline_is_rejected_before_inference(monkeypatch, client) -> None:
+    session = install_fake_model(monkeypatch)
+    expired = str(int((time.time() - 5) * 1000))
+
+    response = client.post(
+        "/api/predict",
+        json={"text": "win a free prize"},
+        headers={"X-Request-Deadline": expired},
+    )
+
+    assert response.status_code == 504
+    assert session.calls == 0
+
+
+def test_future_deadline_is_served(monkeypatch, client) -> None:
+    install_fake_model(monkeypatch)
+    future = str(int((time.time() + 30) * 1000))
+
+    response = client.post(
+        "/api/predict",
+        json={"text": "win a free prize"},
+        headers={"X-Request-Deadline": future},
+    )
+
+    assert response.status_code == 200
+    assert response.get_json()["prediction"] == "Spam"
+
+
+def test_overloaded_request_gets_fast_503(monkeypatch, client) -> None:
+    install_fake_model(monkeypatch)
+    full = AdaptiveLimiter(initial_limit=1, max_limit=1)
+    full.try_acquire()
+    monkeypatch.setattr(admission, "_LIMITER", full)
+
+    response = client.post("/api/predict", json={"text": "hello"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_metrics_endpoint_requires_admin_token(monkeypatch, client, app: Flask) -> None:
+    install_fake_model(monkeypatch)
+    app.config["ADMIN_TOKEN"] = "secret"
+
+    assert client.get("/api/metrics").status_code == 403
+
+    client.post("/api/predict", json={"text": "hello"})
+    response = client.get("/api/metrics", headers={"X-Admin-Token": "secret"})
+
+    assert response.status_code == 200
+    state = response.get_json()["admission"]
+    assert state["active"] is True
+    assert state["admitted"] == 1
+    assert state["inflight"] == 0
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from flask import Flask
+
+from app.extensions import db
+from app.models import ApiKey, AuditLog, User
+from scripts.manage_api_keys import issue_key, list_keys, revoke_key
+
+
+def _create_user(app: Flask) -> int:
+    with app.app_context():
+        user = User(
+            full_name="Integrator",
+            username="integrator",
+            email="i@example.com",
+            phone="1234567",
+        )
+        user.set_password("Password123")
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def _actions(app: Flask) -> list:
+    with app.app_context():
+        return [entry.action for entry in AuditLog.query.order_by(AuditLog.id)]
+
+
+def test_keys_are_issued_used_and_revoked(app: Flask, client) -> None:
+    user_id = _create_user(app)
+    with app.app_context():
+        api_key, raw_key = issue_key("integrator", "mail-client")
+        key_id = api_key.id
+        assert api_key.user_id == user_id and api_key.last_used_at is None
+        assert [key.id for key in list_keys("i@example.com")] == [key_id]
+
+    headers = {"X-API-Key": raw_key}
+    body = {"text": "hi", "label": "ham"}
+    assert client.post("/api/feedback", json=body, headers=headers).status_code == 201
+    with app.app_context():
+        assert db.session.get(ApiKey, key_id).last_used_at is not None
+        revoke_key(key_id)
+
+    assert client.post("/api/feedback", json=body, headers=headers).status_code == 401
+    assert _actions(app) == ["api_key.issued", "api_key.revoked"]
+
+
+def test_last_used_is_written_at_most_once_per_interval(app: Flask) -> None:
+    key = ApiKey(last_used_at=None)
+
+    assert key.touch(60.0)
+    first = key.last_used_at
+    assert not key.touch(60.0) and key.last_used_at == first
+
+    key.last_used_at = datetime.utcnow() - timedelta(seconds=61)
+    assert key.touch(60.0)
+
+
+def test_sign_in_attempts_are_audited(app: Flask, client) -> None:
+    user_id = _create_user(app)
+    app.config["WTF_CSRF_ENABLED"] = False
+
+    client.post("/signin", data={"email": "i@example.com", "password": "wrong"})
+    client.post("/signin", data={"email": "i@example.com", "password": "Password123"})
+    client.get("/logout")
+
+    assert _actions(app) == ["user.signin_failed", "user.signin", "user.logout"]
+    with app.app_context():
+        assert {entry.user_id for entry in AuditLog.query} == {user_id}
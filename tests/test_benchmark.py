@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import pytest
+
+from ml.benchmark import PeakRss, csv_rows, run_scale, scaling_exponents
+from ml.synthetic import generate_corpus, vocabulary
+
+
+def test_corpus_is_deterministic_and_labelled() -> None:
+    texts, labels = generate_corpus(400, vocab_size=500, spam_ratio=0.25, seed=3)
+
+    assert (texts, labels) == generate_corpus(
+        400, vocab_size=500, spam_ratio=0.25, seed=3
+    )
+    assert len(texts) == len(labels) == 400
+    assert 0.15 < sum(labels) / len(labels) < 0.35
+    assert set(" ".join(texts).split()) <= set(vocabulary(500, seed=3))
+
+
+def test_vocabulary_is_distinct() -> None:
+    words = vocabulary(3000)
+    assert len(set(words)) == 3000
+
+
+def test_run_scale_measures_each_stage() -> None:
+    run = run_scale(150, vocab_size=400, skip=["grid_search"])
+
+    assert run["docs"] == 150 and run["features"] > 0
+    assert {
+        "generate",
+        "preprocess",
+        "tfidf_fit",
+        "classifier_fit",
+        "onnx_export",
+    } <= set(run["stages"])
+    preprocess = run["stages"]["preprocess"]
+    assert preprocess["seconds"] > 0
+    assert preprocess["peak_rss_mb"] >= preprocess["rss_growth_mb"] >= 0
+    assert {row["stage"] for row in csv_rows([run])} == set(run["stages"])
+
+
+def test_peak_rss_sees_allocations_inside_the_block() -> None:
+    with PeakRss() as rss:
+        block = bytearray(64 * 1024 * 1024)
+        block[::4096] = b"x" * len(block[::4096])
+        del block
+
+    assert rss.peak - rss.start >= 32 * 1024 * 1024
+
+
+def test_scaling_exponents_fit_log_log_slope() -> None:
+    runs = [
+        {
+            "docs": docs,
+            "stages": {
+                "tfidf_fit": {"seconds": docs * 1e-5},
+                "grid_search": {"seconds": (docs / 100) ** 2},
+            },
+        }
+        for docs in (100, 1000, 10000)
+    ]
+    exponents = scaling_exponents(runs)
+
+    assert exponents["tfidf_fit"] == pytest.approx(1.0)
+    assert exponents["grid_search"] == pytest.approx(2.0)
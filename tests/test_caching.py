@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import gzip
+import re
+import shutil
+
+from app import caching
+from scripts.precompress_static import precompress
+
+
+def _static_url(client, name: str) -> str:
+    html = client.get("/").get_data(as_text=True)
+    return re.search(rf'"(/static/{re.escape(name)}\?v=[0-9a-f]+)"', html).group(1)
+
+
+def test_home_is_cached_compressed_and_revalidated(client, app) -> None:
+    first = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert first.status_code == 200
+    assert first.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in first.headers["Vary"]
+    assert first.headers["Last-Modified"]
+    assert b"Spam Email Classification" in gzip.decompress(first.data)
+
+    hits = caching._STATS["page_hits"]
+    plain = client.get("/")
+    assert "Content-Encoding" not in plain.headers
+    assert plain.data == gzip.decompress(first.data)
+    assert plain.headers["ETag"] != first.headers["ETag"]
+    assert caching._STATS["page_hits"] == hits + 1
+    assert "/" in app.extensions["page_cache"]
+
+    revalidated = client.get(
+        "/", headers={"Accept-Encoding": "gzip", "If-None-Match": first.headers["ETag"]}
+    )
+    assert revalidated.status_code == 304
+    assert revalidated.data == b""
+
+
+def test_pending_flash_bypasses_page_cache(client) -> None:
+    client.get("/about")
+    with client.session_transaction() as sess:
+        sess["_flashes"] = [("success", "You have been logged out.")]
+
+    response = client.get("/about")
+
+    assert b"You have been logged out." in response.data
+    assert b"You have been logged out." not in client.get("/about").data
+
+
+def test_rendered_pages_compressed_above_threshold(client, app) -> None:
+    app.config["COMPRESS_MIN_BYTES"] = 100
+    identity = client.get("/signin")
+    compressed = client.get("/signin", headers={"Accept-Encoding": "gzip"})
+
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(compressed.data) == identity.data
+    assert (
+        client.get(
+            "/signin", headers={"If-None-Match": identity.headers["ETag"]}
+        ).status_code
+        == 304
+    )
+
+    app.config["COMPRESS_MIN_BYTES"] = 10**6
+    assert (
+        "Content-Encoding"
+        not in client.get("/signin", headers={"Accept-Encoding": "gzip"}).headers
+    )
+
+
+def test_fingerprinted_static_is_immutable(client) -> None:
+    url = _static_url(client, "styles.css")
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert "immutable" in response.headers["Cache-Control"]
+    assert "max-age=31536000" in response.headers["Cache-Control"]
+    response.close()
+
+    stale = client.get("/static/styles.css?v=000000000000")
+    assert "immutable" not in stale.headers.get("Cache-Control", "")
+    stale.close()
+
+
+def test_precompressed_static_served_to_gzip_clients(client, app, tmp_path) -> None:
+    shutil.copy(f"{app.static_folder}/styles.css", tmp_path / "styles.css")
+    written = precompress(tmp_path)
+    assert [path.name for path in written] == ["styles.css.gz"]
+    app.static_folder = str(tmp_path)
+
+    response = client.get("/static/styles.css", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.mimetype == "text/css"
+    assert gzip.decompress(response.data) == (tmp_path / "styles.css").read_bytes()
+    response.close()
+
+    plain = client.get("/static/styles.css")
+    assert "Content-Encoding" not in plain.headers
+    assert plain.data == (tmp_path / "styles.css").read_bytes()
+    plain.close()
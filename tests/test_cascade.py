@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import json
+import random
+
+import pytest
+from flask import Flask
+
+from app import cascade, spam
+from app.cascade import CASCADE_FILENAME, FirstStage
+from app.mime import MAX_MESSAGE_SECONDS
+from ml.cascade import calibrate, evaluate_cascade, train_first_stage
+from tests.fixtures.fake_model import install_fake_model
+
+
+def _corpus(count: int, seed: int) -> tuple[list[str], list[int]]:
+    rng = random.Random(seed)
+    spam_words = ["winner", "prize", "cash", "claim", "offer", "free"]
+    ham_words = ["meeting", "lunch", "report", "project", "family", "weekend"]
+    shared = ["today", "please", "thanks", "the", "you", "now"]
+    texts, labels = [], []
+    for index in range(count):
+        label = index % 2
+        words = spam_words if label else ham_words
+        # A few ambiguous messages with words from both sides.
+        mixed = (
+            rng.sample(spam_words + ham_words, 4)
+            if index % 10 == 0
+            else rng.sample(words, 3)
+        )
+        texts.append(" ".join(mixed + rng.sample(shared, 3)))
+        labels.append(label)
+    return texts, labels
+
+
+@pytest.fixture()
+def cascade_model_dir(tmp_path, monkeypatch, app: Flask):
+    stage = FirstStage({"winner": 6.0, "meeting": -6.0}, bias=0.0, low=0.05, high=0.95)
+    (tmp_path / CASCADE_FILENAME).write_text(json.dumps(stage.to_dict()))
+    monkeypatch.setattr(cascade, "_FIRST_STAGE", False)
+    app.config.update(MODEL_DIR=tmp_path, CASCADE_ENABLED=True, ADMIN_TOKEN="secret")
+    return tmp_path
+
+
+def test_first_stage_is_calibrated_to_target_precision() -> None:
+    train_texts, train_labels = _corpus(400, seed=1)
+    calibration_texts, calibration_labels = _corpus(400, seed=2)
+    test_texts, test_labels = _corpus(400, seed=3)
+
+    stage = calibrate(
+        train_first_stage(train_texts, train_labels),
+        calibration_texts,
+        calibration_labels,
+    )
+    report = evaluate_cascade(
+        stage,
+        [0.99 if label else 0.01 for label in test_labels],
+        test_texts,
+        test_labels,
+    )
+
+    assert 0.0 < stage.low < stage.high < 1.0
+    assert report["exit_rate"] > 0.5
+    assert report["stage1_exit_accuracy"] >= 0.98
+    assert report["accuracy_cost"] <= 0.02
+    assert len(stage.weights) <= 2000
+
+
+def test_calibration_never_exits_without_enough_evidence() -> None:
+    stage = calibrate(FirstStage({}, 0.0, -1.0, 2.0), ["a", "b"], [0, 1])
+
+    assert (stage.low, stage.high) == (-1.0, 2.0)
+    assert stage.decide("anything") is None
+
+
+def test_calibration_never_exits_when_the_split_misses_the_target() -> None:
+    # Ham is so common that "everything is ham" meets the target, and the top
+    # of the range is all spam, so the two thresholds overlap.  Splitting them
+    # at 0.5 would send the "maybe" spam out as ham, so stage 1 must not exit.
+    stage = FirstStage({"winner": 8.0, "maybe": -0.6}, 0.4, -1.0, 2.0)
+    texts = ["hello"] * 20000 + ["maybe"] * 40 + ["winner"] * 20
+    labels = [0] * 20000 + [1] * 60
+
+    stage = calibrate(stage, texts, labels)
+
+    assert (stage.low, stage.high) == (-1.0, 2.0)
+    assert stage.decide("maybe") is None and stage.decide("winner") is None
+
+
+def test_serving_extracts_each_text_once_within_the_budget(
+    cascade_model_dir, monkeypatch, client
+) -> None:
+    install_fake_model(monkeypatch)
+    budgets = []
+    real_extract = spam.extract_text
+
+    def extract_text(text, max_seconds=None):
+        budgets.append(max_seconds)
+        return real_extract(text, max_seconds=max_seconds)
+
+    def unbudgeted(text):
+        raise AssertionError("stage 1 must reuse the served extraction")
+
+    monkeypatch.setattr(spam, "extract_text", extract_text)
+    monkeypatch.setattr(cascade, "extract_text", unbudgeted)
+
+    response = client.post(
+        "/api/predict/batch", json={"texts": ["winner winner", "hello"]}
+    )
+
+    assert response.status_code == 200
+    assert budgets == [MAX_MESSAGE_SECONDS, MAX_MESSAGE_SECONDS]
+
+
+def test_cascade_short_circuits_confident_texts(
+    cascade_model_dir, monkeypatch, client
+) -> None:
+    session = install_fake_model(monkeypatch)
+    before = dict(cascade._STATS)
+
+    response = client.post(
+        "/api/predict/batch",
+        json={"texts": ["winner winner", "meeting notes", "free prize", "hello"]},
+    )
+
+    body = response.get_json()
+    assert body["predictions"] == ["Spam", "Not Spam", "Spam", "Not Spam"]
+    assert body["probabilities"][0] > 0.99 and body["probabilities"][
+        2
+    ] == pytest.approx(0.9)
+    assert session.calls == 1
+    assert cascade._STATS["stage1_exits"] - before["stage1_exits"] == 2
+    assert cascade._STATS["stage2"] - before["stage2"] == 2
+
+    metrics = client.get("/api/metrics", headers={"X-Admin-Token": "secret"}).get_json()
+    assert 0.0 < metrics["cascade"]["exit_rate"] <= 1.0
+
+
+def test_cascade_answers_single_prediction_without_model(
+    cascade_model_dir, monkeypatch, client
+) -> None:
+    session = install_fake_model(monkeypatch)
+
+    response = client.post("/api/predict", json={"text": "Meeting moved"})
+
+    assert response.get_json()["prediction"] == "Not Spam"
+    assert session.calls == 0
+
+
+def test_cascade_disabled_by_default(app: Flask, monkeypatch) -> None:
+    monkeypatch.setattr(cascade, "_FIRST_STAGE", False)
+    with app.app_context():
+        assert cascade.get_first_stage() is None
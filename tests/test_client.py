@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from werkzeug.serving import make_server
+
+from app import routes as routes_module
+from app.admission import Overloaded
+from spam_client import (
+    APIError,
+    AsyncSpamClient,
+    RetryPolicy,
+    SpamClient,
+    SpamClientError,
+)
+from spam_client import client as client_module
+from spam_client.retry import parse_retry_after
+from tests.fixtures.fake_model import install_fake_model
+
+
+@pytest.fixture()
+def server_url(app, monkeypatch):
+    install_fake_model(monkeypatch)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    thread.join()
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    """Minimal keep-alive HTTP/1.1 server; Werkzeug's closes every connection."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self) -> None:  # noqa: N802 - http.server naming
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        texts = body.get("texts") or [body.get("text")]
+        payload = {
+            "predictions": ["Spam"] * len(texts),
+            "probabilities": [0.9] * len(texts),
+            "model_version": "stub",
+        }
+        if "text" in body:
+            payload = {
+                "prediction": "Spam",
+                "probability": 0.9,
+                "model_version": "stub",
+            }
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class _ShortBatchHandler(_KeepAliveHandler):
+    """Answers batch requests with one prediction too few."""
+
+    def do_POST(self) -> None:  # noqa: N802 - http.server naming
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        count = len(body["texts"]) - 1
+        data = json.dumps(
+            {
+                "predictions": ["Spam"] * count,
+                "probabilities": [0.9] * count,
+                "model_version": "stub",
+            }
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@contextlib.contextmanager
+def _stub_server(handler):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture()
+def keepalive_url():
+    with _stub_server(_KeepAliveHandler) as url:
+        yield url
+
+
+def test_predict_against_app(server_url) -> None:
+    with SpamClient(server_url) as client:
+        first = client.predict("win a free prize")
+        second = client.predict("lunch at noon?")
+        batch = client.predict_batch(["free prize", "see you soon", "win now"])
+
+    assert first.label == "Spam" and first.model_version == "mock"
+    assert second.label == "Not Spam"
+    assert [prediction.label for prediction in batch] == ["Spam", "Not Spam", "Spam"]
+
+
+def test_connections_are_reused(keepalive_url) -> None:
+    with SpamClient(keepalive_url, max_batch_size=2) as client:
+        for _ in range(3):
+            assert client.predict("anything").model_version == "stub"
+        assert len(client.predict_batch(["a", "b", "c"])) == 3
+        assert client.pool.opened == 1
+        assert client.stats["requests"] == 5
+
+    async def run():
+        async with AsyncSpamClient(keepalive_url) as client:
+            for _ in range(3):
+                await client.predict("anything")
+            return client.pool.opened
+
+    assert asyncio.run(run()) == 1
+
+
+def test_short_batch_responses_fail_every_caller() -> None:
+    with _stub_server(_ShortBatchHandler) as url:
+        with SpamClient(url, max_delay=0.05) as client:
+            futures = [client.submit(text) for text in ("a", "b", "c")]
+            for future in futures:
+                with pytest.raises(SpamClientError):
+                    future.result(timeout=5)
+            with pytest.raises(SpamClientError):
+                client.predict_batch(["a", "b"])
+
+
+def test_classify_coalesces_concurrent_calls(server_url) -> None:
+    texts = [
+        f"free prize {index}" if index % 2 else f"meeting {index}"
+        for index in range(24)
+    ]
+    with SpamClient(server_url, max_delay=0.05) as client:
+        with ThreadPoolExecutor(max_workers=len(texts)) as executor:
+            predictions = list(executor.map(client.classify, texts))
+
+        assert [prediction.label for prediction in predictions] == [
+            "Spam" if index % 2 else "Not Spam" for index in range(len(texts))
+        ]
+        assert client.stats["batched_texts"] == len(texts)
+        assert client.stats["requests"] < len(texts) / 2
+
+
+def test_async_classify_coalesces_tasks(server_url) -> None:
+    async def run():
+        async with AsyncSpamClient(
+            server_url, max_delay=0.02, max_batch_size=8
+        ) as client:
+            predictions = await asyncio.gather(
+                *(client.classify(f"win {index}") for index in range(20))
+            )
+            single = await client.predict("hello there")
+            return predictions, single, dict(client.stats)
+
+    predictions, single, stats = asyncio.run(run())
+
+    assert all(prediction.label == "Spam" for prediction in predictions)
+    assert single.label == "Not Spam"
+    assert stats["batches"] == 3  # 8 + 8 + 4
+
+
+def test_retries_honour_retry_after(server_url, monkeypatch) -> None:
+    shed = {"remaining": 2}
+    real_admit = routes_module.admit
+
+    @contextlib.contextmanager
+    def flaky_admit(deadline=None):
+        if shed["remaining"]:
+            shed["remaining"] -= 1
+            raise Overloaded(retry_after=3)
+        with real_admit(deadline):
+            yield
+
+    sleeps = []
+    monkeypatch.setattr(routes_module, "admit", flaky_admit)
+    monkeypatch.setattr(client_module.time, "sleep", sleeps.append)
+
+    with SpamClient(
+        server_url, retry=RetryPolicy(attempts=3, rng=lambda: 0.0)
+    ) as client:
+        assert client.predict("free prize").label == "Spam"
+        assert sleeps == [3.0, 3.0]
+        assert client.stats["retries"] == 2
+
+        shed["remaining"] = 5
+        with pytest.raises(APIError) as excinfo:
+            client.predict("free prize")
+        assert excinfo.value.status == 503
+        assert excinfo.value.retry_after == 3.0
+
+
+def test_client_errors_are_not_retried(server_url) -> None:
+    with SpamClient(server_url, model_version="missing") as client:
+        with pytest.raises(APIError) as excinfo:
+            client.predict("hello")
+        assert excinfo.value.status == 404
+        assert client.stats["retries"] == 0
+
+        with pytest.raises(ValueError):
+            client.classify("   ")
+
+
+def test_retry_policy_backoff_and_retry_after() -> None:
+    policy = RetryPolicy(
+        backoff=0.1, max_backoff=0.5, max_retry_after=10.0, rng=lambda: 1.0
+    )
+
+    assert [policy.delay(attempt) for attempt in (1, 2, 3, 4)] == pytest.approx(
+        [0.1, 0.2, 0.4, 0.5]
+    )
+    assert policy.delay(1, retry_after=2.0) == pytest.approx(2.2)
+    assert policy.delay(1, retry_after=60.0) == 10.0
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after(
+        formatdate(time.time() + 30, usegmt=True)
+    ) == pytest.approx(30, abs=2)
+    assert parse_retry_after("soon") is None
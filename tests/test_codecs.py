@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import pytest
+from flask import Flask
+
+from tests.fixtures.fake_model import install_fake_model
+
+msgpack = pytest.importorskip("msgpack")
+
+
+def test_batch_predict_returns_columnar_json(monkeypatch, client) -> None:
+    session = install_fake_model(monkeypatch)
+
+    response = client.post(
+        "/api/predict/batch", json={"texts": ["win a prize", "see you soon"]}
+    )
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["predictions"] == ["Spam", "Not Spam"]
+    assert body["probabilities"] == pytest.approx([0.9, 0.2])
+    assert body["model_version"] == "mock"
+    assert session.calls == 1
+
+
+def test_batch_predict_validates_items(monkeypatch, client, app: Flask) -> None:
+    install_fake_model(monkeypatch)
+    app.config["BATCH_MAX_ITEMS"] = 2
+
+    assert client.post("/api/predict/batch", json={"texts": []}).status_code == 400
+    assert (
+        client.post("/api/predict/batch", json={"texts": ["ok", ""]}).status_code == 400
+    )
+    assert (
+        client.post("/api/predict/batch", json={"texts": ["a", "b", "c"]}).status_code
+        == 400
+    )
+
+
+def test_msgpack_request_and_response(monkeypatch, client) -> None:
+    install_fake_model(monkeypatch)
+
+    response = client.post(
+        "/api/predict",
+        data=msgpack.packb({"text": "free spam offer"}),
+        headers={
+            "Content-Type": "application/msgpack",
+            "Accept": "application/msgpack",
+        },
+    )
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/msgpack"
+    body = msgpack.unpackb(response.data, raw=False)
+    assert body["prediction"] == "Spam"
+
+
+def test_json_remains_the_default(monkeypatch, client) -> None:
+    install_fake_model(monkeypatch)
+
+    response = client.post(
+        "/api/predict",
+        data=msgpack.packb({"text": "hello there"}),
+        headers={"Content-Type": "application/msgpack"},
+    )
+
+    assert response.mimetype == "application/json"
+    assert response.get_json()["prediction"] == "Not Spam"
+
+
+def test_stdlib_backend_encodes_numpy_batches(monkeypatch, client, app: Flask) -> None:
+    install_fake_model(monkeypatch)
+    app.config["JSON_BACKEND"] = "stdlib"
+
+    response = client.post("/api/predict/batch", json={"texts": ["win", "hi"]})
+
+    assert response.get_json()["probabilities"] == pytest.approx([0.9, 0.2])
+
+
+def test_malformed_msgpack_is_a_validation_error(monkeypatch, client) -> None:
+    install_fake_model(monkeypatch)
+
+    response = client.post(
+        "/api/predict",
+        data=b"\xc1",
+        headers={"Content-Type": "application/msgpack"},
+    )
+
+    assert response.status_code == 400
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import subprocess
+import sys
+
+import onnxruntime
+
+from app import create_app, migrations
+from app.config import TestingConfig
+from app.model_bundle import read_bundle, write_bundle
+from app.spam import load_model
+
+
+def test_model_bundle_roundtrip(tmp_path) -> None:  # type: ignore[override]
+    path = tmp_path / "model.bundle"
+    write_bundle(path, b"onnx-bytes", {"version": "v9"})
+
+    onnx_bytes, metadata = read_bundle(path)
+
+    assert onnx_bytes == b"onnx-bytes"
+    assert metadata == {"version": "v9"}
+
+
+def test_load_model_prefers_bundle(monkeypatch, tmp_path) -> None:
+    write_bundle(tmp_path / "model.bundle", b"from-bundle", {"version": "bundled"})
+    (tmp_path / "model.onnx").write_bytes(b"from-file")
+    (tmp_path / "metadata.json").write_text(json.dumps({"version": "file"}))
+
+    loaded_from = []
+    monkeypatch.setattr(
+        onnxruntime,
+        "InferenceSession",
+        lambda source, providers: loaded_from.append(source) or "session",
+    )
+
+    session, metadata = load_model(tmp_path)
+
+    assert session == "session"
+    assert loaded_from == [b"from-bundle"]
+    assert metadata["version"] == "bundled"
+    assert metadata["model_digest"] == hashlib.sha256(b"from-bundle").hexdigest()
+
+
+def test_schema_stamp_skips_version_check_on_warm_start(monkeypatch, tmp_path) -> None:
+    class StampedConfig(TestingConfig):
+        SCHEMA_STAMP_PATH = str(tmp_path / "schema.stamp")
+
+    calls = []
+    original = migrations.current_version
+    monkeypatch.setattr(
+        migrations,
+        "current_version",
+        lambda engine: calls.append(1) or original(engine),
+    )
+
+    create_app(StampedConfig)
+    assert calls
+    calls.clear()
+    create_app(StampedConfig)
+
+    assert calls == []
+    stamp = tmp_path / "schema.stamp"
+    uri = StampedConfig.SQLALCHEMY_DATABASE_URI
+    assert stamp.read_text() == (
+        f"{hashlib.sha256(uri.encode()).hexdigest()}#{migrations.HEAD}"
+    )
+    assert stamp.stat().st_mode & 0o777 == 0o600
+
+
+def test_schema_stamp_does_not_store_database_uri(tmp_path) -> None:
+    class StampedConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = "sqlite:///" + str(tmp_path / "secret-name.db")
+        SCHEMA_STAMP_PATH = str(tmp_path / "schema.stamp")
+
+    stamp = tmp_path / "schema.stamp"
+    stamp.write_text("stale")
+    stamp.chmod(0o644)
+
+    create_app(StampedConfig)
+
+    assert "secret-name" not in stamp.read_text()
+    assert stamp.stat().st_mode & 0o777 == 0o600
+
+
+def test_creating_app_does_not_import_inference_stack() -> None:
+    code = (
+        "import os, sys; os.environ['FLASK_ENV'] = 'testing'; "
+        "from app import create_app; create_app(); "
+        "print(','.join(m for m in ('numpy', 'onnxruntime', 'nltk') "
+        "if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+
+    assert result.stdout.strip() == ""
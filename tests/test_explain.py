@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+from flask import Flask
+
+from app.explain import EXPLAIN_FILENAME, ContributionTable, load_table
+from app.spam import prepare_text
+from ml.pipeline import build_pipeline, contribution_table
+from ml.synthetic import generate_corpus
+from tests.fixtures.fake_model import install_fake_model
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    texts, labels = generate_corpus(300, vocab_size=800, seed=1)
+    pipeline = build_pipeline(model_type="logreg", C=5.0)
+    pipeline.set_params(tfidf__ngram_range=(1, 2), tfidf__sublinear_tf=True)
+    pipeline.fit(texts, labels)
+    return pipeline, texts
+
+
+def test_contributions_add_up_to_the_model_score(fitted) -> None:
+    pipeline, texts = fitted
+    table = ContributionTable(contribution_table(pipeline))
+    sample = texts[:20]
+
+    explanations = table.explain([prepare_text(text) for text in sample], top_k=10_000)
+    logits = [
+        sum(item["contribution"] for item in explanation) + table.intercept
+        for explanation in explanations
+    ]
+
+    np.testing.assert_allclose(logits, pipeline.decision_function(sample), atol=1e-4)
+
+
+def test_top_k_is_ordered_by_absolute_contribution(fitted) -> None:
+    pipeline, texts = fitted
+    table = ContributionTable(contribution_table(pipeline))
+
+    explanation = table.explain([prepare_text(texts[0])], top_k=5)[0]
+    magnitudes = [abs(item["contribution"]) for item in explanation]
+
+    assert len(explanation) == 5
+    assert magnitudes == sorted(magnitudes, reverse=True)
+    assert table.explain(["", "zzzz qqqq"], top_k=5) == [[], []]
+
+
+def test_non_linear_models_have_no_table(sample_dataset) -> None:
+    texts, labels = sample_dataset
+    pipeline = build_pipeline(model_type="nb").fit(texts, labels)
+
+    assert contribution_table(pipeline) is None
+
+
+@pytest.fixture()
+def model_dir(monkeypatch, app: Flask, tmp_path: Path, fitted) -> Path:
+    install_fake_model(monkeypatch)
+    app.config["MODEL_DIR"] = tmp_path
+    (tmp_path / EXPLAIN_FILENAME).write_text(json.dumps(contribution_table(fitted[0])))
+    return tmp_path
+
+
+def test_predict_returns_explanation_on_request(
+    model_dir: Path, client, fitted
+) -> None:
+    text = fitted[1][3]
+
+    plain = client.post("/api/predict", json={"text": text}).get_json()
+    assert "explanation" not in plain
+
+    explained = client.post(
+        "/api/predict?explain=true&top_k=3", json={"text": text}
+    ).get_json()
+    assert explained["probability"] == plain["probability"]
+    assert len(explained["explanation"]) == 3
+    assert {"token", "contribution"} <= set(explained["explanation"][0])
+
+    batch = client.post(
+        "/api/predict/batch", json={"texts": fitted[1][:4], "explain": True}
+    ).get_json()
+    assert len(batch["explanations"]) == 4
+    assert all(len(items) == 10 for items in batch["explanations"])
+
+
+def test_explain_without_table_is_an_error(model_dir: Path, client) -> None:
+    (model_dir / EXPLAIN_FILENAME).unlink()
+
+    response = client.post("/api/predict?explain=1", json={"text": "win a prize"})
+    assert response.status_code == 404
+    assert load_table(model_dir) is None
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+import sqlalchemy as sa
+from flask import Flask
+
+from app.extensions import db
+from app.models import ApiKey, LabelFeedback, User
+
+
+def _create_user(app: Flask) -> int:
+    with app.app_context():
+        user = User(
+            full_name="Reviewer",
+            username="reviewer",
+            email="r@example.com",
+            phone="1234567",
+        )
+        user.set_password("Password123")
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def test_feedback_requires_authentication(client) -> None:
+    response = client.post(
+        "/api/feedback", json={"text": "win a prize", "label": "ham"}
+    )
+
+    assert response.status_code == 401
+
+
+def test_feedback_is_stored_once_per_text(app: Flask, client) -> None:
+    user_id = _create_user(app)
+    with client.session_transaction() as sess:
+        sess["user_id"] = user_id
+
+    first = client.post(
+        "/api/feedback",
+        json={
+            "text": "lunch at noon?",
+            "label": "spam",
+            "predicted_label": "Not Spam",
+            "model_version": "v1.0",
+        },
+    )
+    second = client.post(
+        "/api/feedback", json={"text": "lunch at noon?", "label": "ham"}
+    )
+
+    assert first.status_code == 201
+    assert second.get_json() == {"id": first.get_json()["id"], "label": "ham"}
+    with app.app_context():
+        rows = LabelFeedback.query.all()
+        assert len(rows) == 1
+        assert (rows[0].label, rows[0].predicted_label, rows[0].user_id) == (
+            0,
+            None,
+            user_id,
+        )
+
+
+def test_feedback_accepts_api_key_and_validates_input(app: Flask, client) -> None:
+    user_id = _create_user(app)
+    with app.app_context():
+        api_key, raw_key = ApiKey.issue(user_id, "mail-client")
+        db.session.add(api_key)
+        db.session.commit()
+    headers = {"X-API-Key": raw_key}
+
+    assert (
+        client.post(
+            "/api/feedback", json={"text": "hi", "label": 1}, headers=headers
+        ).status_code
+        == 201
+    )
+    assert (
+        client.post(
+            "/api/feedback", json={"text": "hi", "label": "maybe"}, headers=headers
+        ).status_code
+        == 400
+    )
+    assert (
+        client.post(
+            "/api/feedback", json={"text": " ", "label": "ham"}, headers=headers
+        ).status_code
+        == 400
+    )
+    assert (
+        client.post(
+            "/api/feedback",
+            json={"text": "hi", "label": "ham"},
+            headers={"X-API-Key": "nope"},
+        ).status_code
+        == 401
+    )
+
+
+def test_concurrent_first_feedback_updates_instead_of_failing(
+    monkeypatch, app: Flask
+) -> None:
+    with app.app_context():
+        # Another worker inserts the row between our lookup and our insert.
+        db.session.execute(
+            sa.insert(LabelFeedback),
+            {
+                "text_hash": LabelFeedback.hash_text("hi"),
+                "text": "hi",
+                "label": 1,
+                "updated_at": datetime.utcnow(),
+            },
+        )
+        db.session.commit()
+        lookups = []
+
+        class _MissFirstLookup:
+            def filter_by(self, **criteria):
+                lookups.append(criteria)
+                query = db.session.query(LabelFeedback).filter_by(**criteria)
+                return query.filter(sa.false()) if len(lookups) == 1 else query
+
+        monkeypatch.setattr(LabelFeedback, "query", _MissFirstLookup())
+
+        feedback = LabelFeedback.record("hi", 0, user_id=None)
+        db.session.commit()
+
+        assert len(lookups) == 2
+        rows = db.session.query(LabelFeedback).all()
+        assert [(row.id, row.label) for row in rows] == [(feedback.id, 0)]
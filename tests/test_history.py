@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+import sqlalchemy as sa
+from flask import Flask
+
+from app import history
+from app.extensions import db
+from app.models import PredictionHistory, User
+from tests.fixtures.fake_model import install_fake_model
+
+
+def _create_user(app: Flask, username: str) -> int:
+    with app.app_context():
+        user = User(
+            full_name=username.title(),
+            username=username,
+            email=f"{username}@example.com",
+            phone="1234567",
+        )
+        user.set_password("Password123")
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def _sign_in(app: Flask, client) -> int:
+    user_id = _create_user(app, "historian")
+    with client.session_transaction() as sess:
+        sess["user_id"] = user_id
+    return user_id
+
+
+def _history(app: Flask, user_id: int):
+    with app.app_context():
+        return [
+            (entry.text, entry.probability, entry.model_version)
+            for entry in PredictionHistory.query.filter_by(user_id=user_id).order_by(
+                PredictionHistory.id
+            )
+        ]
+
+
+def test_predictions_are_recorded_after_the_response(
+    monkeypatch, app: Flask, client
+) -> None:
+    install_fake_model(monkeypatch)
+    user_id = _sign_in(app, client)
+
+    response = client.post("/predict", data={"message": "win a free prize"})
+    assert response.status_code == 200 and b"Spam" in response.data
+    # Nothing is written while the response is being produced.
+    assert _history(app, user_id) == []
+
+    response.close()
+    with app.app_context():
+        history.get_writer().join()
+    assert _history(app, user_id) == [("win a free prize", pytest.approx(0.9), "mock")]
+
+
+def test_repeat_submission_is_answered_from_history(
+    monkeypatch, app: Flask, client
+) -> None:
+    session = install_fake_model(monkeypatch)
+    user_id = _sign_in(app, client)
+
+    client.post("/predict", data={"message": "lunch at noon?"}).close()
+    with app.app_context():
+        history.get_writer().join()
+    repeat = client.post("/predict", data={"message": "lunch at noon?"})
+    repeat.close()
+
+    assert session.calls == 1
+    assert (
+        b"Not Spam" in repeat.data and b"checked this message recently" in repeat.data
+    )
+    with app.app_context():
+        history.get_writer().join()
+    # The reused answer is not recorded a second time.
+    assert len(_history(app, user_id)) == 1
+
+    # A new model version scores the text again.
+    upgraded = install_fake_model(monkeypatch, metadata={"version": "v2"})
+    client.post("/predict", data={"message": "lunch at noon?"}).close()
+    assert upgraded.calls == 1
+
+
+def test_republished_model_with_the_same_version_is_not_reused(
+    monkeypatch, app: Flask, client
+) -> None:
+    first = install_fake_model(
+        monkeypatch, metadata={"version": "v1.0", "model_digest": "aaa"}
+    )
+    user_id = _sign_in(app, client)
+    client.post("/predict", data={"message": "lunch at noon?"}).close()
+    with app.app_context():
+        history.get_writer().join()
+    assert first.calls == 1
+
+    # ml/train.py writes "v1.0" again, but the model bytes differ.
+    retrained = install_fake_model(
+        monkeypatch, metadata={"version": "v1.0", "model_digest": "bbb"}
+    )
+    client.post("/predict", data={"message": "lunch at noon?"}).close()
+    with app.app_context():
+        history.get_writer().join()
+
+    assert retrained.calls == 1
+    assert [version for _, _, version in _history(app, user_id)] == ["v1.0", "v1.0"]
+
+
+def test_history_is_not_reused_across_users_or_after_expiry(app: Flask) -> None:
+    user_id, other_id = _create_user(app, "alice"), _create_user(app, "bob")
+    with app.app_context():
+        db.session.add(
+            PredictionHistory(
+                user_id=user_id,
+                text_hash=PredictionHistory.hash_text("hi"),
+                text="hi",
+                probability=0.3,
+                model_version="mock",
+                model_digest="mock",
+                created_at=datetime.utcnow() - timedelta(days=2),
+            ),
+        )
+        db.session.commit()
+
+        assert history.lookup(user_id, "hi", "mock") is None
+        app.config["HISTORY_REUSE_SECONDS"] = 3 * 86400
+        assert history.lookup(user_id, "hi", "mock") == 0.3
+        assert history.lookup(other_id, "hi", "mock") is None
+        assert history.lookup(user_id, "hi", "v2") is None
+
+
+def test_history_pages_with_keyset_cursor(app: Flask, client) -> None:
+    user_id = _sign_in(app, client)
+    other_id = _create_user(app, "other")
+    start = datetime(2026, 1, 1)
+    with app.app_context():
+        rows = []
+        for index in range(25):
+            # Pairs of rows share a timestamp, so the cursor needs the id too.
+            rows.append(
+                {
+                    "user_id": user_id,
+                    "text": f"message {index}",
+                    "created_at": start + timedelta(minutes=index // 2),
+                }
+            )
+            rows.append(
+                {
+                    "user_id": other_id,
+                    "text": f"other {index}",
+                    "created_at": start + timedelta(minutes=index),
+                }
+            )
+        db.session.execute(
+            sa.insert(PredictionHistory),
+            [
+                {
+                    **row,
+                    "text_hash": PredictionHistory.hash_text(row["text"]),
+                    "probability": 0.2,
+                }
+                for row in rows
+            ],
+        )
+        db.session.commit()
+
+        seen, cursor = [], None
+        while True:
+            entries, cursor = history.page(user_id, before=cursor, limit=10)
+            seen.extend(entry.text for entry in entries)
+            if cursor is None:
+                break
+        assert len(seen) == 25 and set(seen) == {
+            f"message {index}" for index in range(25)
+        }
+        assert seen[0] == "message 24"
+
+        plan = db.session.execute(
+            sa.text(
+                "EXPLAIN QUERY PLAN SELECT id FROM prediction_history "
+                "WHERE user_id = :user "
+                "AND created_at <= :at AND (created_at < :at OR id < :id) "
+                "ORDER BY created_at DESC, id DESC LIMIT 11",
+            ),
+            {"user": user_id, "at": start, "id": 10},
+        ).all()
+        assert "ix_prediction_history_user_id_created_at_id" in str(plan)
+
+    first = client.get("/history")
+    assert first.status_code == 200
+    assert b"message 24" in first.data and b"other" not in first.data
+    assert b"Older predictions" in first.data
+    assert client.get("/history?before=not-a-cursor").status_code == 400
+
+
+def test_history_requires_login(client) -> None:
+    response = client.get("/history", follow_redirects=False)
+
+    assert response.status_code in (301, 302)
+    assert "/signin" in (response.headers.get("Location") or "")
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import json
+import pickle
+
+import pytest
+
+from ml import incremental
+from ml.pipeline import build_pipeline
+
+SPAM = [
+    "win a free prize now",
+    "claim your free reward",
+    "cheap offer win cash",
+    "free prize claim now",
+]
+HAM = [
+    "meeting at noon tomorrow",
+    "lunch with the team",
+    "see you at the meeting",
+    "notes from lunch today",
+]
+
+
+@pytest.fixture()
+def model_dir(tmp_path, monkeypatch):
+    texts = (SPAM + HAM) * 3
+    labels = ([1] * len(SPAM) + [0] * len(HAM)) * 3
+    pipeline = build_pipeline("logreg").fit(texts, labels)
+    (tmp_path / "model.pkl").write_bytes(pickle.dumps(pipeline))
+    (tmp_path / "metadata.json").write_text(json.dumps({"version": "v1.0"}))
+    monkeypatch.setattr(incremental, "to_onnx_bytes", lambda pipeline: b"onnx")
+    return tmp_path, texts, labels
+
+
+def _feedback(text: str, label: int) -> incremental.Feedback:
+    from app.models import LabelFeedback
+
+    return incremental.Feedback(LabelFeedback.hash_text(text), text, label)
+
+
+def test_to_incremental_preserves_predictions(model_dir) -> None:
+    directory, texts, _ = model_dir
+    with (directory / "model.pkl").open("rb") as model_file:
+        pipeline = pickle.load(model_file)
+
+    converted = incremental.to_incremental(pipeline)
+
+    assert type(converted.named_steps["clf"]).__name__ == "SGDClassifier"
+    assert converted.predict_proba(texts) == pytest.approx(
+        pipeline.predict_proba(texts)
+    )
+
+
+def test_refresh_publishes_validated_model(model_dir) -> None:
+    directory, texts, labels = model_dir
+    feedback = [_feedback(f"free cash offer number {index}", 1) for index in range(20)]
+
+    summary = incremental.refresh(
+        directory, feedback, texts, labels, watermark="2026-01-01T00:00:00"
+    )
+
+    assert summary["accepted"] and summary["published"]
+    metadata = json.loads((directory / "metadata.json").read_text())
+    assert metadata["version"] == summary["version"]
+    assert metadata["version"].startswith("v1.0+ft.")
+    assert metadata["base_version"] == "v1.0"
+    assert metadata["feedback_watermark"] == "2026-01-01T00:00:00"
+    assert (directory / "model.onnx").read_bytes() == b"onnx"
+    assert (directory / summary["version"] / "model.pkl").exists()
+
+
+def test_refresh_rejects_regressions_and_dry_run_publishes_nothing(model_dir) -> None:
+    directory, texts, labels = model_dir
+    # Feedback that contradicts the training data.
+    feedback = [
+        _feedback(text + f" {index}", 1 - label)
+        for index, (text, label) in enumerate(zip(texts, labels))
+    ]
+
+    summary = incremental.refresh(
+        directory, feedback, texts, labels, epochs=50, learning_rate=1.0, tolerance=0.0
+    )
+
+    assert not summary["accepted"]
+    assert json.loads((directory / "metadata.json").read_text())["version"] == "v1.0"
+
+    dry = incremental.refresh(
+        directory, feedback[:2], texts, labels, epochs=1, dry_run=True
+    )
+    assert not dry["published"]
+    assert json.loads((directory / "metadata.json").read_text())["version"] == "v1.0"
+
+
+def test_refresh_refuses_to_publish_without_validation_data(model_dir) -> None:
+    directory, _, _ = model_dir
+    # Too little base data for a holdout split, and no held-out feedback.
+    feedback, _ = incremental.split_feedback(
+        [_feedback(f"free cash offer {index}", 1) for index in range(10)]
+    )
+
+    summary = incremental.refresh(directory, feedback, ["hi"], [0])
+
+    assert summary["baseline"] == {} and not summary["accepted"]
+    assert json.loads((directory / "metadata.json").read_text())["version"] == "v1.0"
+    assert not incremental.passes({}, {}, tolerance=1.0)
+
+
+def test_split_feedback_is_deterministic() -> None:
+    feedback = [_feedback(f"message {index}", index % 2) for index in range(200)]
+
+    train, holdout = incremental.split_feedback(feedback)
+
+    assert incremental.split_feedback(feedback) == (train, holdout)
+    assert 20 < len(holdout) < 60
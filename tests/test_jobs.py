@@ -0,0 +1,293 @@
+from __future__ import annotations
+
+import multiprocessing
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+
+from app import create_app, jobs
+from app.config import TestingConfig
+from app.extensions import db
+from app.models import ApiKey, ScoringJob, User
+from tests.fixtures.fake_model import install_fake_model
+
+
+class JobsConfig(TestingConfig):
+    ADMIN_TOKEN = "jobs-admin"
+    JOBS_BATCH_SIZE = 2
+    JOBS_MAX_ATTEMPTS = 2
+    JOBS_PAGE_SIZE = 3
+
+
+def _api_key(app: Flask, username: str = "batcher") -> dict:
+    with app.app_context():
+        user = User(
+            full_name="Batch User",
+            username=username,
+            email=f"{username}@example.com",
+            phone="1234567",
+        )
+        user.set_password("Password123")
+        db.session.add(user)
+        db.session.commit()
+        api_key, raw_key = ApiKey.issue(user.id, "jobs")
+        db.session.add(api_key)
+        db.session.commit()
+    return {"X-API-Key": raw_key}
+
+
+@pytest.fixture()
+def jobs_app(monkeypatch, tmp_path):
+    monkeypatch.setattr(JobsConfig, "JOBS_INPUT_DIR", str(tmp_path))
+    install_fake_model(monkeypatch)
+    application = create_app(JobsConfig)
+    yield application
+    with application.app_context():
+        db.drop_all()
+
+
+def _drain(app: Flask) -> int:
+    return jobs.run_worker(app, worker_id="test-worker", exit_when_idle=True)
+
+
+def test_submit_poll_and_page_through_results(jobs_app) -> None:
+    client = jobs_app.test_client()
+    headers = _api_key(jobs_app)
+    texts = [
+        "win a free prize",
+        "lunch at noon?",
+        "free entry",
+        "see you soon",
+        "prize draw",
+    ]
+
+    response = client.post("/api/jobs", json={"texts": texts}, headers=headers)
+    assert response.status_code == 202
+    job = response.get_json()
+    assert job["status"] == "queued" and job["total"] == 5
+    assert response.headers["Location"].endswith(f"/api/jobs/{job['id']}")
+
+    assert _drain(jobs_app) == 1
+
+    status = client.get(f"/api/jobs/{job['id']}", headers=headers).get_json()
+    assert (
+        status["status"],
+        status["processed"],
+        status["attempts"],
+        status["model_version"],
+    ) == ("done", 5, 1, "mock")
+
+    results, after = [], None
+    while True:
+        query = "" if after is None else f"?after={after}"
+        page = client.get(
+            f"/api/jobs/{job['id']}/results{query}", headers=headers
+        ).get_json()
+        results.extend(page["results"])
+        after = page["next_after"]
+        if after is None:
+            break
+    assert [result["index"] for result in results] == list(range(5))
+    assert [result["prediction"] for result in results] == [
+        "Spam",
+        "Not Spam",
+        "Spam",
+        "Not Spam",
+        "Spam",
+    ]
+
+
+def test_jobs_require_authentication_and_ownership(jobs_app) -> None:
+    client = jobs_app.test_client()
+    owner, other = _api_key(jobs_app, "owner"), _api_key(jobs_app, "other")
+    job_id = client.post(
+        "/api/jobs", json={"texts": ["hello"]}, headers=owner
+    ).get_json()["id"]
+
+    assert client.post("/api/jobs", json={"texts": ["hello"]}).status_code == 401
+    assert client.get(f"/api/jobs/{job_id}").status_code == 401
+    assert client.get(f"/api/jobs/{job_id}", headers=other).status_code == 404
+    assert client.get(f"/api/jobs/{job_id}/results", headers=other).status_code == 404
+    assert (
+        client.post(
+            "/api/jobs", json={"texts": ["a"], "priority": 10}, headers=owner
+        ).status_code
+        == 400
+    )
+    assert (
+        client.post(
+            "/api/jobs", json={"texts": ["a"], "file": "a.txt"}, headers=owner
+        ).status_code
+        == 400
+    )
+    assert (
+        client.post("/api/jobs", json={"texts": [" "]}, headers=owner).status_code
+        == 400
+    )
+    assert (
+        client.post(
+            "/api/jobs", json={"file": "../etc/passwd"}, headers=owner
+        ).status_code
+        == 400
+    )
+
+
+def test_file_jobs_report_invalid_lines(jobs_app, tmp_path) -> None:
+    (tmp_path / "batch.ndjson").write_text(
+        '"win a prize"\n\n{"text": "hello"}\nnot json\n{"id": 4}\n', encoding="utf-8"
+    )
+    client = jobs_app.test_client()
+    headers = _api_key(jobs_app)
+
+    job_id = client.post(
+        "/api/jobs", json={"file": "batch.ndjson"}, headers=headers
+    ).get_json()["id"]
+    _drain(jobs_app)
+
+    status = client.get(f"/api/jobs/{job_id}", headers=headers).get_json()
+    page = client.get(
+        f"/api/jobs/{job_id}/results?limit=10", headers=headers
+    ).get_json()
+    rest = client.get(
+        f"/api/jobs/{job_id}/results?after={page['next_after']}", headers=headers
+    ).get_json()
+    assert (status["status"], status["total"], status["processed"]) == ("done", 4, 4)
+    assert [result["line"] for result in page["results"] + rest["results"]] == [
+        1,
+        3,
+        4,
+        5,
+    ]  # limit capped at 3
+    assert page["results"][0]["prediction"] == "Spam"
+    assert page["results"][2]["error"] == "Invalid JSON."
+    assert rest["next_after"] is None
+
+
+def test_higher_priority_is_claimed_first(jobs_app) -> None:
+    with jobs_app.app_context():
+        low = jobs.submit(texts=["a"], priority=1).id
+        high = jobs.submit(texts=["b"], priority=7).id
+        db.session.commit()
+
+        assert jobs.claim("w1").id == high
+        assert jobs.claim("w2").id == low
+        assert jobs.claim("w3") is None
+
+
+def test_failed_batch_is_retried_from_last_commit(jobs_app, monkeypatch) -> None:
+    calls = []
+    real_predict = jobs.predict_spam_probabilities
+
+    def flaky(texts):
+        calls.append(list(texts))
+        if len(calls) == 2:
+            raise RuntimeError("worker ran out of memory")
+        return real_predict(texts)
+
+    monkeypatch.setattr(jobs, "predict_spam_probabilities", flaky)
+    with jobs_app.app_context():
+        job_id = jobs.submit(texts=["t0", "t1", "t2", "t3", "t4"]).id
+        db.session.commit()
+
+    assert _drain(jobs_app) == 1
+    with jobs_app.app_context():
+        job = db.session.get(ScoringJob, job_id)
+        assert (job.status, job.processed, job.attempts) == ("done", 5, 2)
+    # The first batch was committed before the failure and is not scored again.
+    assert calls == [["t0", "t1"], ["t2", "t3"], ["t2", "t3"], ["t4"]]
+
+
+def test_expired_lease_moves_job_to_another_worker(jobs_app) -> None:
+    lease = timedelta(seconds=JobsConfig.JOBS_LEASE_SECONDS + 1)
+    with jobs_app.app_context():
+        job_id = jobs.submit(texts=["win", "lose", "draw"]).id
+        db.session.commit()
+
+        crashed = jobs.claim("crashed")
+        assert jobs.claim("other") is None  # lease still held
+
+        resumed = jobs.claim("other", now=datetime.utcnow() + lease)
+        assert resumed.id == job_id and resumed.attempts == 2
+        assert (
+            jobs.run_job(crashed, "crashed") is False
+        )  # the stale worker can't commit
+        assert jobs.run_job(resumed, "other") is True
+
+        # With every attempt used up, an abandoned job fails instead of looping.
+        stuck = jobs.submit(texts=["x"]).id
+        db.session.commit()
+        jobs.claim("a")
+        jobs.claim("b", now=datetime.utcnow() + lease)
+        assert jobs.claim("c", now=datetime.utcnow() + 2 * lease) is None
+        assert db.session.get(ScoringJob, stuck).status == "failed"
+
+        # The pool supervisor expires a dead worker's lease so the job moves at once.
+        orphan = jobs.submit(texts=["y"]).id
+        db.session.commit()
+        jobs.claim("dead")
+        assert jobs.expire_leases("dead") == 1
+        assert jobs.claim("alive").id == orphan
+
+
+def test_metrics_report_throughput(jobs_app) -> None:
+    with jobs_app.app_context():
+        jobs.submit(texts=["a", "b", "c"])
+        jobs.submit(texts=["d"], priority=5)
+        db.session.commit()
+    jobs.run_worker(jobs_app, worker_id="w", exit_when_idle=True)
+
+    client = jobs_app.test_client()
+    section = client.get(
+        "/api/metrics", headers={"X-Admin-Token": "jobs-admin"}
+    ).get_json()["jobs"]
+    assert (
+        section["done"],
+        section["queued"],
+        section["jobs_completed"],
+        section["texts_completed"],
+    ) == (2, 0, 2, 4)
+    with jobs_app.app_context():
+        assert jobs.purge(datetime.utcnow() + timedelta(seconds=1)) == 2
+
+
+def test_worker_pool_processes_queue(monkeypatch, tmp_path) -> None:
+    class PoolConfig(JobsConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'jobs.db'}"
+        JOBS_POLL_SECONDS = 0.05
+
+    install_fake_model(monkeypatch)
+    app = create_app(PoolConfig)
+    with app.app_context():
+        job_ids = [
+            jobs.submit(texts=[f"free prize {index}", "hello"] * 3).id
+            for index in range(6)
+        ]
+        db.session.commit()
+
+    stop = multiprocessing.Event()
+    supervisor = threading.Thread(target=jobs.run_pool, args=(2, PoolConfig, stop))
+    supervisor.start()
+    try:
+        deadline = time.monotonic() + 60
+        with app.app_context():
+            while time.monotonic() < deadline:
+                statuses = [
+                    status
+                    for (status,) in db.session.query(ScoringJob.status).filter(
+                        ScoringJob.id.in_(job_ids)
+                    )
+                ]
+                db.session.rollback()
+                if statuses.count("done") == len(job_ids):
+                    break
+                time.sleep(0.1)
+            owners = {owner for (owner,) in db.session.query(ScoringJob.lease_owner)}
+    finally:
+        stop.set()
+        supervisor.join()
+
+    assert statuses.count("done") == len(job_ids)
+    assert owners == {None}
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import sys
+
+import pytest
+from flask import Flask
+
+from app import memory
+from app import routes as routes_module
+from tests.fixtures.fake_model import FakeSession, install_fake_model
+
+_LEAK: list = []
+
+linux_only = pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="reads /proc"
+)
+
+
+@linux_only
+def test_process_memory_breaks_down_rss() -> None:
+    process = memory.process_memory()
+
+    assert process["rss"] > 0
+    assert process["uss"] + process["shared"] > 0
+    assert process["peak_rss"] >= process["rss"]
+    assert memory.library_rss()
+
+
+def test_track_once_records_only_the_first_event() -> None:
+    key = object()
+    for _ in range(3):
+        with memory.track_once(key, "test_event"):
+            pass
+
+    assert len(memory.report()["events"]["test_event"]) == 1
+
+
+def test_allocation_diff_points_at_surviving_allocations() -> None:
+    def leaky_burst() -> None:
+        for _ in range(2000):
+            _LEAK.append(bytearray(512))
+
+    diff = memory.allocation_diff(leaky_burst)
+    _LEAK.clear()
+
+    assert diff["traced_growth"] > 2000 * 512
+    assert __file__ in diff["top"][0]["location"]
+
+
+def test_memory_endpoints_require_admin(client, app: Flask) -> None:
+    assert client.get("/api/memory").status_code == 403
+    app.config["ADMIN_TOKEN"] = "secret"
+    assert (
+        client.post("/api/memory/diff", headers={"X-Admin-Token": "nope"}).status_code
+        == 403
+    )
+
+
+def test_memory_report_and_diff_endpoints(monkeypatch, client, app: Flask) -> None:
+    session = install_fake_model(monkeypatch)
+    seen, run = [], session.run
+
+    def recording_run(output_names, inputs):
+        seen.extend(row[0] for row in inputs["input"])
+        return run(output_names, inputs)
+
+    session.run = recording_run
+    app.config["ADMIN_TOKEN"] = "secret"
+    headers = {"X-Admin-Token": "secret"}
+
+    report = client.get("/api/memory", headers=headers).get_json()
+    assert {"pid", "process", "python_heap", "libraries", "onnx"} <= set(report)
+
+    diff = client.post(
+        "/api/memory/diff", json={"predictions": 50, "top": 5}, headers=headers
+    )
+    assert diff.status_code == 200
+    assert diff.get_json()["predictions"] == 50
+    assert len(diff.get_json()["top"]) <= 5
+    # The warm-up and the burst both reach the model, with distinct texts.
+    assert session.calls == 2
+    assert len(set(seen[1:])) == 50
+
+    bad = client.post("/api/memory/diff", json={"predictions": 0}, headers=headers)
+    assert bad.status_code == 400
+    flag = client.post("/api/memory/diff", json={"predictions": True}, headers=headers)
+    assert flag.status_code == 400
+
+
+def test_memory_diff_loads_a_local_model_behind_the_sidecar(
+    monkeypatch, client, app: Flask
+) -> None:
+    session = FakeSession()
+    loaded = []
+
+    def load_model(model_dir):
+        loaded.append(model_dir)
+        return session, {"version": "mock"}
+
+    monkeypatch.setattr(
+        routes_module,
+        "get_pipeline_and_metadata",
+        lambda: (None, {"version": "sidecar"}),
+    )
+    monkeypatch.setattr(routes_module, "load_model", load_model)
+    app.config["ADMIN_TOKEN"] = "secret"
+
+    diff = client.post(
+        "/api/memory/diff",
+        json={"predictions": 10},
+        headers={"X-Admin-Token": "secret"},
+    )
+
+    assert diff.status_code == 200
+    assert len(loaded) == 1
+    # Scored in this worker, not sent to the sidecar.
+    assert session.calls == 2
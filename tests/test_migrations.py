@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import sqlalchemy as sa
+from flask import Flask
+
+from app import migrations
+from app.extensions import db
+from app.models import ApiKey, User
+
+
+def test_app_startup_brings_schema_to_head(app: Flask) -> None:
+    with app.app_context():
+        assert migrations.current_version(db.engine) == migrations.HEAD
+
+
+def test_upgrade_is_incremental_and_idempotent() -> None:
+    engine = sa.create_engine("sqlite://")
+
+    assert migrations.current_version(engine) == 0
+    assert migrations.upgrade(engine, target=1) == [1]
+    assert migrations.current_version(engine) == 1
+    assert migrations.upgrade(engine) == list(range(2, migrations.HEAD + 1))
+    assert migrations.upgrade(engine) == []
+
+
+def test_upgrade_tolerates_a_version_applied_concurrently(monkeypatch) -> None:
+    engine = sa.create_engine("sqlite://")
+    migrations.upgrade(engine)
+    # Another process applied HEAD after this one read the version.
+    versions = iter([migrations.HEAD - 1])
+    original = migrations.current_version
+    monkeypatch.setattr(
+        migrations,
+        "current_version",
+        lambda engine: next(versions, None) or original(engine),
+    )
+
+    assert migrations.upgrade(engine) == []
+    assert original(engine) == migrations.HEAD
+
+
+def test_migrated_schema_matches_models() -> None:
+    engine = sa.create_engine("sqlite://")
+    migrations.upgrade(engine)
+    inspector = sa.inspect(engine)
+
+    for table in db.metadata.sorted_tables:
+        migrated_columns = {
+            column["name"] for column in inspector.get_columns(table.name)
+        }
+        assert migrated_columns == set(table.columns.keys()), table.name
+
+        migrated_indexes = {
+            index["name"] for index in inspector.get_indexes(table.name)
+        }
+        model_indexes = {index.name for index in table.indexes}
+        assert model_indexes <= migrated_indexes, table.name
+
+
+def test_upgrade_adopts_legacy_database_with_existing_users() -> None:
+    engine = sa.create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(
+            sa.text(
+                "CREATE TABLE users (id INTEGER PRIMARY KEY, full_name VARCHAR(100), "
+                "username VARCHAR(50), email VARCHAR(254), phone VARCHAR(20), "
+                "password VARCHAR(128), created_at DATETIME)",
+            ),
+        )
+        conn.execute(sa.text("INSERT INTO users (id, full_name) VALUES (1, 'Legacy')"))
+
+    migrations.upgrade(engine)
+
+    with engine.connect() as conn:
+        assert conn.execute(sa.text("SELECT full_name FROM users")).scalar() == "Legacy"
+    assert "api_keys" in sa.inspect(engine).get_table_names()
+
+
+def test_api_key_is_stored_hashed_and_found_by_raw_key(app: Flask) -> None:
+    with app.app_context():
+        user = User(
+            full_name="Key Owner",
+            username="keyowner",
+            email="k@example.com",
+            phone="1234567",
+        )
+        user.set_password("Password123")
+        db.session.add(user)
+        db.session.commit()
+
+        api_key, raw_key = ApiKey.issue(user.id, "ci")
+        db.session.add(api_key)
+        db.session.commit()
+
+        assert raw_key not in api_key.key_hash
+        assert ApiKey.find_active(raw_key).id == api_key.id
+        assert ApiKey.find_active(raw_key + "x") is None
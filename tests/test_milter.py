@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+
+from app import create_app, milter, spam
+from app.config import TestingConfig
+from tests.fixtures.fake_model import install_fake_model
+
+
+class MilterConfig(TestingConfig):
+    MILTER_REJECT_THRESHOLD = 0.8  # the fake model scores spam 0.9 as float32
+    MILTER_TIMEOUT = 5.0
+    MILTER_DECISION_TIMEOUT = 5.0
+
+
+@pytest.fixture(autouse=True)
+def fresh_stats(monkeypatch):
+    monkeypatch.setattr(milter, "_STATS", dict.fromkeys(milter._STATS, 0))
+
+
+@pytest.fixture()
+def session(monkeypatch):
+    return install_fake_model(monkeypatch)
+
+
+def run_milter(scenario, config=MilterConfig):
+    """Run *scenario(port)* against a milter on a free port, then stop it."""
+
+    async def main():
+        stop = asyncio.Event()
+        started = asyncio.get_running_loop().create_future()
+        server = asyncio.create_task(
+            milter.serve(create_app(config), "127.0.0.1", 0, stop, started)
+        )
+        try:
+            return await scenario(await started)
+        finally:
+            stop.set()
+            await server
+
+    return asyncio.run(main())
+
+
+def test_spam_is_rejected_and_ham_is_tagged(session) -> None:
+    async def scenario(port):
+        client = await milter.MtaClient.connect("127.0.0.1", port)
+        spam_reply = await client.deliver(
+            "a@example.org", [("Subject", "You win")], b"claim your free prize"
+        )
+        ham_reply = await client.deliver(
+            "b@example.org", [("Subject", "Lunch")], b"see you at noon"
+        )
+        await client.close()
+        return client.protocol, spam_reply, ham_reply
+
+    protocol, spam_reply, ham_reply = run_milter(scenario)
+
+    assert protocol == milter.WANTED_PROTOCOL
+    assert spam_reply == (milter.SMFIR_REPLYCODE, [])
+    assert ham_reply == (
+        milter.SMFIR_CONTINUE,
+        [(milter.SMFIR_ADDHEADER, b"X-Spam-Probability\x000.2000\x00")],
+    )
+    stats = milter.stats()
+    assert (stats["messages"], stats["rejected"], stats["accepted"]) == (2, 1, 1)
+
+
+def test_mta_without_no_reply_flags_gets_a_reply_per_step(session) -> None:
+    async def scenario(port):
+        client = await milter.MtaClient.connect(
+            "127.0.0.1", port, protocol=milter.SMFIP_NOCONNECT
+        )
+        reply = await client.deliver("a@example.org", [("Subject", "hi")], b"x" * 70000)
+        await client.close()
+        return client.protocol, reply
+
+    protocol, (reply, modifications) = run_milter(scenario)
+    assert protocol == milter.SMFIP_NOCONNECT
+    assert reply == milter.SMFIR_CONTINUE and modifications
+
+
+def test_concurrent_connections_share_batches(session, monkeypatch) -> None:
+    # Hold the first batch long enough for the other connections' messages to queue up.
+    real_predict = spam.predict_spam_probabilities
+
+    def slow_predict(texts, session=None):
+        time.sleep(0.05)
+        return real_predict(texts, session)
+
+    monkeypatch.setattr(spam, "predict_spam_probabilities", slow_predict)
+
+    async def deliver(port, index):
+        client = await milter.MtaClient.connect("127.0.0.1", port)
+        replies = [
+            await client.deliver(
+                f"s{index}@example.org", [], b"free prize" if index % 2 else b"hello"
+            )
+            for _ in range(2)
+        ]
+        await client.close()
+        return replies
+
+    async def scenario(port):
+        return await asyncio.gather(*(deliver(port, index) for index in range(8)))
+
+    results = run_milter(scenario)
+
+    for index, replies in enumerate(results):
+        expected = milter.SMFIR_REPLYCODE if index % 2 else milter.SMFIR_CONTINUE
+        assert [reply for reply, _ in replies] == [expected, expected]
+    stats = milter.stats()
+    assert stats["messages"] == 16
+    assert stats["batches"] < 16
+
+
+def test_abort_discards_the_message_and_the_connection_is_reused(session) -> None:
+    async def scenario(port):
+        client = await milter.MtaClient.connect("127.0.0.1", port)
+        await client._send(milter.SMFIC_MAIL, b"<a@example.org>\0")
+        await client._send(milter.SMFIC_BODY, b"free prize")
+        await client.abort()
+        reply = await client.deliver("b@example.org", [], b"hello")
+        await client.close()
+        return reply
+
+    reply, _ = run_milter(scenario)
+    assert reply == milter.SMFIR_CONTINUE
+    assert milter.stats()["messages"] == 1 and session.calls == 1
+
+
+class SlowConfig(MilterConfig):
+    MILTER_DECISION_TIMEOUT = 0.05
+    MILTER_ADD_HEADER = False
+
+
+def test_fails_open_when_scoring_is_too_slow(session, monkeypatch) -> None:
+    monkeypatch.setattr(
+        spam, "predict_spam_probabilities", lambda texts, session=None: time.sleep(0.3)
+    )
+
+    async def scenario(port):
+        client = await milter.MtaClient.connect("127.0.0.1", port)
+        reply = await client.deliver("a@example.org", [], b"free prize")
+        await client.close()
+        return reply
+
+    assert run_milter(scenario, SlowConfig) == (milter.SMFIR_CONTINUE, [])
+    assert milter.stats()["fail_open_timeout"] == 1
+
+
+def test_fails_open_when_scoring_raises(session, monkeypatch) -> None:
+    def broken(texts, session=None):
+        raise RuntimeError("Failed to load model pipeline.")
+
+    monkeypatch.setattr(spam, "predict_spam_probabilities", broken)
+
+    async def scenario(port):
+        client = await milter.MtaClient.connect("127.0.0.1", port)
+        reply = await client.deliver("a@example.org", [], b"free prize")
+        await client.close()
+        return reply
+
+    assert run_milter(scenario)[0] == milter.SMFIR_CONTINUE
+    assert milter.stats()["fail_open_error"] == 1
+
+
+class IdleConfig(MilterConfig):
+    MILTER_TIMEOUT = 0.05
+
+
+def test_idle_connections_are_closed(session) -> None:
+    async def scenario(port):
+        client = await milter.MtaClient.connect("127.0.0.1", port)
+        return await asyncio.wait_for(client.reader.read(), 5)
+
+    assert run_milter(scenario, IdleConfig) == b""
+    assert milter.stats()["connections_timed_out"] == 1
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import base64
+import itertools
+from types import SimpleNamespace
+
+from app import mime
+from app.spam import prepare_text, transform_text
+
+
+def _multipart(*parts: str, subtype: str = "mixed", boundary: str = "XYZ") -> str:
+    body = "".join(f"--{boundary}\n{part}\n" for part in parts)
+    return (
+        "From: a@example.com\n"
+        "Subject: Hello there\n"
+        "MIME-Version: 1.0\n"
+        f'Content-Type: multipart/{subtype}; boundary="{boundary}"\n'
+        "\n"
+        f"{body}--{boundary}--\n"
+    )
+
+
+def test_plain_text_passes_through_unchanged() -> None:
+    text = "Congratulations: you won a FREE prize! Reply now."
+    assert mime.extract_text(text) == text
+    assert prepare_text(text) == transform_text(text)
+
+
+def test_html_is_reduced_to_visible_text() -> None:
+    html = (
+        "<html><head><style>p {color: red}</style>"
+        "<script>var x = 'hidden';</script></head>"
+    )
+    html += "<body><p>Claim&nbsp;your <b>prize</b></p></body></html>"
+
+    text = mime.extract_text(html)
+
+    assert "Claim" in text and "prize" in text
+    assert "hidden" not in text and "color" not in text and "<b>" not in text
+
+
+def test_multipart_alternative_keeps_one_rendering() -> None:
+    raw = _multipart(
+        "Content-Type: text/plain\n\nplain version",
+        "Content-Type: text/html\n\n<p>html version</p>",
+        subtype="alternative",
+    )
+
+    text = mime.extract_text(raw)
+
+    assert text.startswith("Hello there")
+    assert "plain version" in text
+    assert "html version" not in text
+
+
+def test_transfer_encodings_and_charsets_are_decoded() -> None:
+    encoded = base64.b64encode("Grüße aus Köln".encode("utf-8")).decode("ascii")
+    raw = _multipart(
+        "Content-Type: text/plain; charset=utf-8\n"
+        f"Content-Transfer-Encoding: base64\n\n{encoded}",
+        "Content-Type: text/plain; charset=iso-8859-1\n"
+        "Content-Transfer-Encoding: quoted-printable\n\nna=EFve caf=E9",
+    )
+
+    text = mime.extract_text(raw.encode("ascii"))
+
+    assert "Grüße aus Köln" in text
+    assert "naïve café" in text
+
+
+def test_attachments_and_non_text_parts_are_skipped() -> None:
+    raw = _multipart(
+        "Content-Type: text/plain\n\nsee attached",
+        "Content-Type: text/plain\n"
+        "Content-Disposition: attachment; filename=notes.txt\n\nsecret notes",
+        "Content-Type: image/png\nContent-Transfer-Encoding: base64\n\niVBORw0KGgo=",
+    )
+
+    text = mime.extract_text(raw)
+
+    assert "see attached" in text
+    assert "secret notes" not in text
+    assert "iVBOR" not in text
+
+
+def test_encoded_subject_and_html_part() -> None:
+    raw = (
+        "Subject: =?utf-8?q?Gro=C3=9Fer_Gewinn?=\n"
+        "Content-Type: text/html; charset=utf-8\n"
+        "\n"
+        "<div>Click <a href='http://x'>here</a></div>\n"
+    )
+
+    text = mime.extract_text(raw)
+
+    assert "Großer Gewinn" in text
+    assert "Click" in text and "here" in text and "href" not in text
+
+
+def test_byte_budget_truncates_large_messages() -> None:
+    before = mime._STATS["byte_budget_hit"]
+    raw = "Subject: big\nContent-Type: text/plain\n\n" + "word " * 2000 + "\nTAIL\n"
+
+    text = mime.extract_text(raw, max_bytes=1024)
+
+    assert "TAIL" not in text
+    assert len(text) <= 1024
+    assert mime._STATS["byte_budget_hit"] == before + 1
+
+
+def test_part_and_depth_limits_are_deterministic() -> None:
+    parts = [f"Content-Type: text/plain\n\npart{index}" for index in range(5)]
+    text = mime.extract_text(_multipart(*parts))
+    assert "part4" in text
+
+    before = mime._STATS["part_budget_hit"]
+    truncated = mime._Extractor(mime.MAX_MESSAGE_BYTES, max_parts=2).run(
+        _multipart(*parts).encode()
+    )
+    assert "part1" in truncated and "part2" not in truncated
+    assert mime._STATS["part_budget_hit"] == before + 1
+
+    nested = "Content-Type: text/plain\n\ndeepest"
+    for depth in range(mime.MAX_MIME_DEPTH + 1):
+        nested = (
+            f'Content-Type: multipart/mixed; boundary="b{depth}"\n\n'
+            f"--b{depth}\n{nested}\n--b{depth}--"
+        )
+    deep = "Subject: nested\nMIME-Version: 1.0\n" + nested
+    assert "deepest" not in mime.extract_text(deep)
+    assert mime.extract_text(deep) == mime.extract_text(deep)
+
+
+def test_time_budget_is_only_applied_when_requested(monkeypatch) -> None:
+    raw = _multipart("Content-Type: text/plain\n\nbody text")
+    clock = itertools.count()
+    monkeypatch.setattr(
+        mime, "time", SimpleNamespace(perf_counter=lambda: float(next(clock)))
+    )
+
+    assert "body text" in mime.extract_text(raw)
+    assert "body text" not in mime.extract_text(raw, max_seconds=0.5)
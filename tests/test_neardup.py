@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import random
+from pathlib import Path
+
+import numpy as np
+import pytest
+from flask import Flask
+
+from app import neardup
+from app.neardup import NearDuplicateIndex, minhash, similarity
+from app.spam import transform_text
+from tests.fixtures.fake_model import install_fake_model
+
+DATASET = Path(__file__).resolve().parent.parent / "data" / "spam_dataset.csv"
+
+_TEMPLATE = (
+    "Dear {name}, congratulations! You have been selected to receive a {amount} "
+    "dollar gift card from our store. Click {link} to claim your reward before it "
+    "expires tonight. Ref {ref}"
+)
+
+
+def _variant(rng: random.Random) -> str:
+    return transform_text(
+        _TEMPLATE.format(
+            name=rng.choice(["John", "Maria", "Alex", "Chen", "Priya"]),
+            amount=rng.choice([500, 1000]),
+            link=f"http://x.example/{rng.getrandbits(32):x}",
+            ref=rng.randint(0, 10**6),
+        ),
+    )
+
+
+def test_campaign_variants_match_and_unrelated_messages_do_not() -> None:
+    rng = random.Random(0)
+    index = NearDuplicateIndex()
+    assert index.add(minhash(_variant(rng)), 0.99)
+
+    assert all(index.lookup(minhash(_variant(rng))) == 0.99 for _ in range(20))
+    unrelated = transform_text(
+        "Hi team, the quarterly report is attached, please review it before "
+        "Friday's meeting"
+    )
+    assert index.lookup(minhash(unrelated)) is None
+    assert similarity(minhash(unrelated), minhash(_variant(rng))) < 0.3
+
+
+def test_only_confident_results_are_remembered() -> None:
+    index = NearDuplicateIndex(confidence=0.95)
+
+    assert not index.add(minhash(_variant(random.Random(1))), 0.7)
+    assert index.add(minhash(_variant(random.Random(1))), 0.02)
+    assert len(index) == 1
+
+
+def test_entries_expire_and_memory_is_bounded() -> None:
+    index = NearDuplicateIndex(max_entries=3, ttl=10.0)
+    signatures = [minhash(f"message number {i} " + "word " * i) for i in range(5)]
+
+    for i, signature in enumerate(signatures):
+        index.add(signature, 0.99, now=float(i))
+
+    assert len(index) == 3
+    assert index.lookup(signatures[0], now=5.0) is None
+    assert index.lookup(signatures[4], now=5.0) == 0.99
+    assert index.lookup(signatures[4], now=100.0) is None
+
+    index.add(minhash("something else entirely here"), 0.99, now=100.0)
+    assert len(index) == 1
+    assert all(len(buckets) == 1 for buckets in index._buckets)
+
+
+def test_prediction_reuses_near_duplicate_results(
+    monkeypatch, client, app: Flask
+) -> None:
+    session = install_fake_model(monkeypatch)
+    monkeypatch.setattr(neardup, "_INDEX", None)
+    app.config.update(NEARDUP_ENABLED=True, NEARDUP_CONFIDENCE=0.85)
+
+    prefix = "Win a free prize today, click http://x.example/"
+    first = prefix + "a1 to claim your reward now John"
+    second = prefix + "b2 to claim your reward now Maria"
+
+    client.post("/api/predict", json={"text": first})
+    response = client.post("/api/predict", json={"text": second})
+
+    assert response.get_json()["prediction"] == "Spam"
+    assert session.calls == 1
+    assert len(neardup._INDEX) == 1
+
+
+@pytest.mark.skipif(
+    not DATASET.exists(), reason="data/spam_dataset.csv is not available"
+)
+def test_false_match_rate_on_dataset() -> None:
+    from ml.train import _load_dataset
+
+    texts, labels = _load_dataset(DATASET)
+    rows = list(zip([transform_text(text) for text in texts], labels))
+    random.Random(0).shuffle(rows)
+    half = len(rows) // 2
+
+    index = NearDuplicateIndex(max_entries=len(rows))
+    for text, label in rows[:half]:
+        if index.eligible(text):
+            index.add(minhash(text), float(label))
+
+    matches = mismatches = 0
+    for text, label in rows[half:]:
+        if not index.eligible(text):
+            continue
+        proba = index.lookup(minhash(text))
+        if proba is not None:
+            matches += 1
+            mismatches += int(proba != label)
+
+    checked = sum(1 for text, _ in rows[half:] if index.eligible(text))
+    assert mismatches / max(checked, 1) < 0.01
+    assert mismatches <= max(1, int(0.05 * matches))
+
+
+def test_minhash_of_empty_text_is_stable() -> None:
+    assert minhash("") == bytes(4 * neardup.NUM_PERMUTATIONS)
+    assert np.frombuffer(minhash("a b c"), dtype=np.uint32).shape == (
+        neardup.NUM_PERMUTATIONS,
+    )
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from app.spam import prepare_text
+from ml import pipeline, preprocess_cache
+from ml.preprocess_cache import PreprocessCache
+
+TEXTS = [
+    "Win a FREE prize now!!!",
+    "Are we still meeting for lunch tomorrow?",
+    "<p>Claim your <b>prize</b></p>",
+    "",
+]
+
+
+@pytest.fixture()
+def counted(monkeypatch) -> list:
+    calls: list = []
+
+    def fake_prepare(text):
+        calls.append(text)
+        return prepare_text(text)
+
+    monkeypatch.setattr(preprocess_cache, "prepare_text", fake_prepare)
+    return calls
+
+
+def test_transform_matches_prepare_text_and_reuses_entries(tmp_path, counted) -> None:
+    cache = PreprocessCache(tmp_path, version="v")
+
+    assert cache.transform(TEXTS + TEXTS[:1]) == [
+        prepare_text(text) for text in TEXTS + TEXTS[:1]
+    ]
+    assert len(counted) == len(TEXTS)
+    assert (cache.misses, cache.hits) == (4, 1)
+
+    # A new process only preprocesses rows it has never seen.
+    reopened = PreprocessCache(tmp_path, version="v")
+    assert reopened.transform(TEXTS + ["brand new row"])[:-1] == [
+        prepare_text(text) for text in TEXTS
+    ]
+    assert counted[len(TEXTS) :] == ["brand new row"]
+    assert reopened.segment_count == 2
+
+
+def test_segments_are_compact_token_id_arrays(tmp_path) -> None:
+    cache = PreprocessCache(tmp_path, version="v")
+    cache.transform(["prize prize prize", "lunch"])
+
+    tokens = np.load(next(cache.directory.glob("*.tokens.npy")))
+    offsets = np.load(next(cache.directory.glob("*.offsets.npy")))
+
+    assert tokens.dtype == np.uint32
+    assert offsets.tolist() == [0, 3, 4]
+    assert len(set(tokens.tolist())) == 2
+
+
+def test_fingerprint_selects_separate_directory(tmp_path, counted) -> None:
+    PreprocessCache(tmp_path, version="old").transform(TEXTS)
+    PreprocessCache(tmp_path, version="new").transform(TEXTS)
+
+    assert len(counted) == 2 * len(TEXTS)
+    assert len(preprocess_cache.fingerprint()) == 16
+
+
+def test_compact_merges_segments(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(preprocess_cache, "MAX_SEGMENTS", 3)
+    cache = PreprocessCache(tmp_path, version="v")
+    for index in range(4):
+        cache.transform([f"message number {index}"])
+
+    assert cache.segment_count == 1
+    assert len(list(cache.directory.glob("seg-*.keys.npy"))) == 1
+    reopened = PreprocessCache(tmp_path, version="v")
+    assert reopened.transform(["message number 2"]) == [
+        prepare_text("message number 2")
+    ]
+    assert reopened.misses == 0
+
+
+def test_pipeline_uses_cache_when_enabled(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(pipeline, "_CACHE", None)
+    monkeypatch.setenv("PREPROCESS_CACHE_DIR", "off")
+    assert pipeline.enable_preprocess_cache() is None
+
+    monkeypatch.setenv("PREPROCESS_CACHE_DIR", str(tmp_path))
+    cache = pipeline.enable_preprocess_cache()
+
+    assert pipeline._preprocess_texts(TEXTS) == [prepare_text(text) for text in TEXTS]
+    assert cache is not None and cache.misses == len(TEXTS)
+    assert cache.directory.parent == tmp_path
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import pstats
+from pathlib import Path
+
+import pytest
+from flask import Flask
+
+from app import create_app, profiling
+from app.config import TestingConfig
+from app.extensions import db
+from tests.fixtures.fake_model import install_fake_model
+
+
+@pytest.fixture()
+def profiled_app(monkeypatch, tmp_path: Path):
+    class ProfilingConfig(TestingConfig):
+        PROFILE_ENABLED = True
+        PROFILE_DIR = tmp_path
+        PROFILE_MAX_FILES = 2
+        ADMIN_TOKEN = "secret"
+
+    install_fake_model(monkeypatch)
+    application = create_app(ProfilingConfig)
+    with application.app_context():
+        db.create_all()
+    return application
+
+
+def _predict(client, **headers):
+    return client.post(
+        "/api/predict", json={"text": "win a free prize"}, headers=headers
+    )
+
+
+def test_privileged_header_writes_pstats(profiled_app: Flask, tmp_path: Path) -> None:
+    response = _predict(
+        profiled_app.test_client(), **{"X-Profile": "1", "X-Admin-Token": "secret"}
+    )
+
+    assert response.status_code == 200
+    profile = tmp_path / response.headers["X-Profile-File"]
+    stats = pstats.Stats(str(profile))
+    assert any(name == "predict_spam_label" for _, _, name in stats.stats)
+
+
+def test_collapsed_stacks_for_flamegraphs(
+    profiled_app: Flask, tmp_path: Path, monkeypatch
+) -> None:
+    import app.routes as routes_module
+
+    original = routes_module.predict_spam_label
+
+    def slow_predict(text, session=None):
+        sum(range(5_000_000))
+        return original(text, session=session)
+
+    monkeypatch.setattr(routes_module, "predict_spam_label", slow_predict)
+    response = _predict(
+        profiled_app.test_client(),
+        **{"X-Profile": "collapsed", "X-Admin-Token": "secret"},
+    )
+
+    lines = (tmp_path / response.headers["X-Profile-File"]).read_text().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert any("slow_predict" in line for line in lines)
+
+
+def test_header_without_admin_token_is_ignored(
+    profiled_app: Flask, tmp_path: Path
+) -> None:
+    response = _predict(
+        profiled_app.test_client(), **{"X-Profile": "1", "X-Admin-Token": "wrong"}
+    )
+
+    assert "X-Profile-File" not in response.headers
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_sampled_traffic_and_file_limit(profiled_app: Flask, tmp_path: Path) -> None:
+    profiled_app.config["PROFILE_SAMPLE_RATE"] = 1.0
+    client = profiled_app.test_client()
+    for _ in range(3):
+        assert "X-Profile-File" in _predict(client).headers
+    client.get("/about")
+
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+def test_prune_skips_files_removed_by_another_worker(tmp_path: Path) -> None:
+    for index in range(4):
+        (tmp_path / f"{index}.prof").write_text("")
+
+    class RacingDirectory:
+        """Lists a profile that another worker deletes before it is stat()ed."""
+
+        def iterdir(self):
+            listed = list(tmp_path.iterdir())
+            (tmp_path / "0.prof").unlink()
+            return iter(listed)
+
+    profiling._prune(RacingDirectory(), keep=2)
+
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+def test_disabled_profiling_installs_no_hooks(app: Flask) -> None:
+    hooks = [func for funcs in app.before_request_funcs.values() for func in funcs]
+    assert profiling._start not in hooks
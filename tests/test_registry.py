@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+from flask import Flask
+
+from app import registry
+from app.registry import ModelRegistry, Route, UnknownModelVersion, parse_routes
+from tests.fixtures.fake_model import FakeSession, install_fake_model
+
+
+class HamOnlySession(FakeSession):
+    """A model version that never flags anything as spam."""
+
+    SPAM_WORDS = ()
+
+
+def _make_versions(root: Path, sizes: dict) -> None:
+    for version, size in sizes.items():
+        (root / version).mkdir(parents=True)
+        (root / version / "model.onnx").write_bytes(b"\0" * size)
+
+
+def _loader(version_dir: Path):
+    return HamOnlySession(), {"version": version_dir.name}
+
+
+def test_pool_evicts_least_recently_used_versions(tmp_path: Path) -> None:
+    _make_versions(tmp_path, {"a": 100, "b": 100, "c": 100})
+    pool = ModelRegistry(
+        tmp_path, max_bytes=450, loader=_loader
+    )  # sessions count as 2x file size
+
+    first, _ = pool.get("a")
+    pool.get("b")
+    assert pool.get("a")[0] is first  # cached, and now the most recently used
+    pool.get("c")
+
+    assert pool.snapshot()["loaded"] == ["a", "c"]
+    assert pool.loaded_bytes == 400
+    assert pool.versions() == ["a", "b", "c"]
+
+
+def test_pinned_versions_are_preloaded_and_never_evicted(tmp_path: Path) -> None:
+    _make_versions(tmp_path, {"pinned": 100, "b": 100, "c": 100})
+    pool = ModelRegistry(
+        tmp_path, max_bytes=250, pinned=["pinned", "missing"], loader=_loader
+    )
+
+    assert pool.preload() == ["missing"]
+    pool.get("b")
+    pool.get("c")
+
+    assert pool.snapshot()["loaded"] == ["pinned", "c"]
+
+
+@pytest.mark.parametrize("version", ["../model", "a/b", ".hidden", "", "nope"])
+def test_unknown_or_unsafe_versions_are_rejected(tmp_path: Path, version: str) -> None:
+    _make_versions(tmp_path, {"a": 10})
+    with pytest.raises(UnknownModelVersion):
+        ModelRegistry(tmp_path, max_bytes=1000, loader=_loader).get(version)
+
+
+def test_failed_lookups_leave_no_load_locks(tmp_path: Path) -> None:
+    _make_versions(tmp_path, {"a": 10, "broken": 10})
+
+    def loader(version_dir: Path):
+        if version_dir.name == "broken":
+            raise RuntimeError("corrupt model")
+        return _loader(version_dir)
+
+    pool = ModelRegistry(tmp_path, max_bytes=1000, loader=loader)
+    for index in range(1000):
+        with pytest.raises(UnknownModelVersion):
+            pool.get(f"bogus-{index}")
+    with pytest.raises(RuntimeError):
+        pool.get("broken")
+    pool.get("a")
+
+    assert pool._loading == {}
+
+
+def test_routes_match_headers_and_canary_share() -> None:
+    tenant, language, canary = parse_routes(
+        json.dumps(
+            [
+                {"header": "X-Tenant", "equals": "acme", "version": "acme-v1"},
+                {"header": "Accept-Language", "prefix": "de", "version": "de-v1"},
+                {"percent": 50, "version": "canary"},
+            ]
+        )
+    )
+
+    assert tenant.matches({"X-Tenant": "acme"}) and not tenant.matches(
+        {"X-Tenant": "other"}
+    )
+    assert language.matches(
+        {"Accept-Language": "de-CH,de;q=0.9"}
+    ) and not language.matches({})
+    assigned = [canary.matches({"X-API-Key": f"key-{index}"}) for index in range(200)]
+    assert 50 < sum(assigned) < 150
+    assert assigned == [
+        canary.matches({"X-API-Key": f"key-{index}"}) for index in range(200)
+    ]
+    assert Route({"percent": 0, "version": "off"}).matches({"X-API-Key": "k"}) is False
+
+
+@pytest.fixture()
+def versions(monkeypatch, app: Flask, tmp_path: Path) -> ModelRegistry:
+    install_fake_model(monkeypatch, metadata={"version": "v1"})
+    _make_versions(tmp_path, {"v1": 10, "v2": 10})
+    pool = ModelRegistry(tmp_path, max_bytes=1000, loader=_loader)
+    monkeypatch.setattr(registry, "_REGISTRY", pool)
+    return pool
+
+
+def test_request_selects_version_by_header_or_parameter(
+    versions: ModelRegistry, client
+) -> None:
+    default = client.post("/api/predict", json={"text": "win a free prize"})
+    assert default.get_json()["model_version"] == "v1"
+    assert default.get_json()["prediction"] == "Spam"
+    assert default.headers["X-Model-Version"] == "v1"
+
+    by_header = client.post(
+        "/api/predict",
+        json={"text": "win a free prize"},
+        headers={"X-Model-Version": "v2"},
+    )
+    assert by_header.get_json()["model_version"] == "v2"
+    assert by_header.get_json()["prediction"] == "Not Spam"
+    assert by_header.headers["X-Model-Version"] == "v2"
+
+    by_param = client.post(
+        "/api/predict/batch?model_version=v2", json={"texts": ["free prize", "hello"]}
+    )
+    assert by_param.get_json()["model_version"] == "v2"
+    assert by_param.get_json()["predictions"] == ["Not Spam", "Not Spam"]
+
+    # Asking for the default model's version doesn't load a second copy.
+    client.post("/api/predict", json={"text": "hi"}, headers={"X-Model-Version": "v1"})
+    assert versions.snapshot()["loaded"] == ["v2"]
+
+
+def test_routing_rules_and_unknown_versions(
+    versions: ModelRegistry, client, app: Flask
+) -> None:
+    app.config["MODEL_ROUTES"] = json.dumps(
+        [{"header": "X-Tenant", "equals": "acme", "version": "v2"}]
+    )
+
+    routed = client.post(
+        "/api/predict", json={"text": "free prize"}, headers={"X-Tenant": "acme"}
+    )
+    assert routed.get_json()["model_version"] == "v2"
+
+    missing = client.post(
+        "/api/predict", json={"text": "free prize"}, headers={"X-Model-Version": "v9"}
+    )
+    assert missing.status_code == 404
+    assert "v9" in missing.get_json()["error"]
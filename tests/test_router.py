@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import os
+import socket
+import threading
+
+import pytest
+from werkzeug.serving import make_server
+
+from app import create_app
+from app.config import TestingConfig
+from app.router import BACKEND_HEADER, HashRing, create_router, fingerprint
+from ml.synthetic import campaign_messages
+from tests.fixtures.fake_model import install_fake_model
+
+
+def _serve(application):
+    server = make_server("127.0.0.1", 0, application, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, thread, f"http://127.0.0.1:{server.server_port}"
+
+
+def _unused_url() -> str:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{probe.getsockname()[1]}"
+
+
+class RouterConfig(TestingConfig):
+    ADMIN_TOKEN = "router-admin"
+    ROUTER_HEALTH_INTERVAL = 0.0
+    ROUTER_TIMEOUT = 5.0
+
+
+@pytest.fixture()
+def backends(monkeypatch):
+    os.environ["FLASK_ENV"] = "testing"
+    install_fake_model(monkeypatch)
+    served = [_serve(create_app()) for _ in range(2)]
+    yield [url for _, _, url in served]
+    for server, thread, _ in served:
+        server.shutdown()
+        thread.join()
+
+
+@pytest.fixture()
+def router_client(backends):
+    RouterConfig.ROUTER_BACKENDS = backends
+    return create_router(RouterConfig).test_client()
+
+
+def test_fingerprint_groups_campaign_variants() -> None:
+    messages = campaign_messages(campaigns=20, variants=10)
+    campaigns = {}
+    for text in messages:
+        template = text.split(", ", 1)[1].rsplit(" https", 1)[0]
+        campaigns.setdefault(template, []).append(fingerprint(text))
+    agreeing = sum(max(keys.count(key) for key in keys) for keys in campaigns.values())
+
+    assert fingerprint("Win a FREE prize now") == fingerprint("win a free prize now")
+    assert fingerprint("Call 555-0100 to win a free prize") == fingerprint(
+        "Call 555-0199 to win a free prize"
+    )
+    assert agreeing / len(messages) > 0.8
+    assert len({fingerprint(text) for text in messages}) >= 20
+
+
+def test_ring_moves_only_the_departed_nodes_keys() -> None:
+    nodes = [f"http://backend-{index}" for index in range(4)]
+    full, reduced = HashRing(nodes), HashRing(nodes[:3])
+    keys = range(0, 2**32, 2**32 // 5000)
+    owners = {key: next(full.candidates(key)) for key in keys}
+
+    for key, owner in owners.items():
+        if owner != nodes[3]:
+            assert next(reduced.candidates(key)) == owner
+    spread = [list(owners.values()).count(node) / len(owners) for node in nodes]
+    assert min(spread) > 0.15
+    assert list(full.candidates(0))[0] != list(full.candidates(0))[1]
+    assert list(HashRing([]).candidates(0)) == []
+
+
+def test_same_message_sticks_to_one_backend(router_client) -> None:
+    owners = set()
+    for variant in (
+        "win a free prize today, reply YES to claim 42",
+        "win a free prize today, reply YES to claim 77",
+    ):
+        response = router_client.post("/api/predict", json={"text": variant})
+        assert response.status_code == 200
+        assert response.get_json()["prediction"] == "Spam"
+        owners.add(response.headers[BACKEND_HEADER])
+
+    assert len(owners) == 1
+    assert router_client.post("/api/predict", json={"text": "  "}).status_code == 400
+
+
+def test_batch_is_split_by_owner_and_reassembled(router_client) -> None:
+    texts = campaign_messages(campaigns=8, variants=2) + [
+        "lunch at noon?",
+        "free prize inside",
+    ]
+    response = router_client.post("/api/predict/batch", json={"texts": texts})
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["model_version"] == "mock"
+    assert body["predictions"] == [
+        "Spam"
+        if any(word in text.lower() for word in ("spam", "win", "free", "prize"))
+        else "Not Spam"
+        for text in texts
+    ]
+    assert len(response.headers[BACKEND_HEADER].split(",")) == 2
+
+
+def test_failover_and_membership_changes(backends, router_client) -> None:
+    router = router_client.application.extensions["router"]
+    dead = _unused_url()
+    headers = {"X-Admin-Token": "router-admin"}
+
+    response = router_client.post(
+        "/api/router/backends", json={"backends": backends + [dead]}, headers=headers
+    )
+    assert response.status_code == 200
+    assert response.get_json()["healthy"] == sorted(backends)
+
+    # A backend that dies between health checks is ejected on the first failure.
+    router.mark(dead, True)
+    for text in campaign_messages(campaigns=40, variants=1):
+        response = router_client.post("/api/predict", json={"text": text})
+        assert response.status_code == 200
+        assert response.headers[BACKEND_HEADER] in backends
+    snapshot = router_client.get("/api/router", headers=headers).get_json()
+    assert (
+        snapshot["backends"][dead]["ejected"] == 2
+    )  # by the health check, then by the failed request
+    assert dead not in snapshot["healthy"]
+
+    assert router_client.get("/api/router").status_code == 403
+    assert (
+        router_client.post(
+            "/api/router/backends", json={"backends": "x"}, headers=headers
+        ).status_code
+        == 400
+    )
+    assert router_client.get("/api/health").status_code == 200
+
+    router_client.post(
+        "/api/router/backends", json={"backends": [dead]}, headers=headers
+    )
+    assert router_client.get("/api/health").status_code == 503
+    assert router_client.post("/api/predict", json={"text": "hello"}).status_code == 502
+
+
+def test_backend_health_endpoint(client) -> None:
+    assert client.get("/api/health").get_json() == {"status": "ok"}
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from ml import score_archive
+from tests.fixtures.fake_model import FakeSession
+
+_MESSAGE = (
+    "From: sender@example.com\n"
+    "Subject: {subject}\n"
+    "Content-Type: text/plain\n"
+    "\n"
+    "{body}\n"
+)
+
+
+@pytest.fixture()
+def fake_model(monkeypatch) -> FakeSession:
+    session = FakeSession()
+    monkeypatch.setattr(score_archive, "load_model", lambda model_dir: (session, {}))
+    return session
+
+
+def _write_mbox(path, bodies) -> None:
+    with path.open("w") as mbox:
+        for i, body in enumerate(bodies):
+            mbox.write(f"From sender@example.com Mon Jan  1 00:00:0{i} 2024\n")
+            mbox.write(_MESSAGE.format(subject=f"message {i}", body=body))
+            mbox.write("\n")
+
+
+def test_iter_messages_reads_mbox_maildir_and_eml(tmp_path) -> None:
+    _write_mbox(tmp_path / "archive.mbox", ["first", ">From the start", "third"])
+    maildir = tmp_path / "Maildir"
+    for sub in ("cur", "new", "tmp"):
+        (maildir / sub).mkdir(parents=True)
+    (maildir / "new" / "1").write_text(
+        _MESSAGE.format(subject="md", body="maildir body")
+    )
+    eml_dir = tmp_path / "eml"
+    eml_dir.mkdir()
+    (eml_dir / "a.eml").write_text(_MESSAGE.format(subject="eml", body="eml body"))
+
+    keys = [
+        key
+        for key, _ in score_archive.iter_messages(
+            [tmp_path / "archive.mbox", maildir, eml_dir]
+        )
+    ]
+
+    assert len(keys) == 5
+    assert keys[0].endswith("archive.mbox#0")
+
+
+def test_score_archive_writes_jsonl_and_resumes_from_checkpoint(
+    fake_model, tmp_path
+) -> None:
+    mbox = tmp_path / "archive.mbox"
+    _write_mbox(
+        mbox, ["win a free prize", "lunch tomorrow?", "claim your prize", "see you"]
+    )
+    output = tmp_path / "scores.jsonl"
+    checkpoint = tmp_path / "scores.checkpoint.json"
+
+    score_archive.score_archive([mbox], output, batch_size=2, checkpoint=checkpoint)
+    first_run = output.read_text()
+
+    # Simulate an interruption after the first batch: roll the checkpoint back.
+    first_batch_bytes = len("".join(first_run.splitlines(keepends=True)[:2]).encode())
+    checkpoint.write_text(
+        json.dumps(
+            {"sources": [str(mbox)], "processed": 2, "output_bytes": first_batch_bytes}
+        ),
+    )
+    calls_before = fake_model.calls
+    total = score_archive.score_archive(
+        [mbox], output, batch_size=2, checkpoint=checkpoint
+    )
+
+    assert total == 4
+    assert fake_model.calls - calls_before == 1
+    assert output.read_text() == first_run
+    rows = [json.loads(line) for line in first_run.splitlines()]
+    assert [row["prediction"] for row in rows] == [
+        "Spam",
+        "Not Spam",
+        "Spam",
+        "Not Spam",
+    ]
+
+
+def test_score_archive_restarts_when_output_is_missing(fake_model, tmp_path) -> None:
+    mbox = tmp_path / "archive.mbox"
+    _write_mbox(mbox, ["win a free prize", "lunch tomorrow?", "see you"])
+    output = tmp_path / "scores.jsonl"
+    checkpoint = tmp_path / "scores.checkpoint.json"
+    checkpoint.write_text(
+        json.dumps({"sources": [str(mbox)], "processed": 2, "output_bytes": 100})
+    )
+
+    total = score_archive.score_archive(
+        [mbox], output, batch_size=2, checkpoint=checkpoint
+    )
+
+    assert total == 3
+    assert len(output.read_text().splitlines()) == 3
+
+
+def test_score_archive_writes_csv(fake_model, tmp_path) -> None:
+    mbox = tmp_path / "archive.mbox"
+    _write_mbox(mbox, ["free prize"])
+    output = tmp_path / "scores.csv"
+
+    score_archive.score_archive([mbox], output, fmt="csv")
+
+    lines = output.read_text().splitlines()
+    assert lines[0] == "key,prediction,probability"
+    assert lines[1].split(",")[1] == "Spam"
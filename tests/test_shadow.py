@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import threading
+
+import pytest
+from flask import Flask
+
+from app import admission, shadow
+from app.admission import AdaptiveLimiter
+from tests.fixtures.fake_model import FakeSession, install_fake_model
+
+
+class CandidateSession(FakeSession):
+    """Candidate model that only flags "prize" as spam."""
+
+    SPAM_WORDS = ("prize",)
+
+
+@pytest.fixture()
+def scorer(monkeypatch, app: Flask):
+    install_fake_model(monkeypatch)
+    candidate = CandidateSession()
+    monkeypatch.setattr(
+        shadow, "load_model", lambda base_dir, intra_op_threads=None: (candidate, {})
+    )
+    monkeypatch.setattr(shadow, "_SCORER", False)
+    monkeypatch.setattr(
+        shadow, "_STATS", {key: type(value)() for key, value in shadow._STATS.items()}
+    )
+    monkeypatch.setattr(admission, "_LIMITER", None)
+    app.config.update(
+        SHADOW_MODEL_VERSION="v2", SHADOW_SAMPLE_RATE=1.0, ADMIN_TOKEN="secret"
+    )
+    with app.app_context():
+        scorer = shadow.get_scorer()
+    assert scorer.wait_loaded(timeout=5)
+    return scorer
+
+
+def test_shadow_scores_sampled_traffic_after_response(scorer, client) -> None:
+    response = client.post(
+        "/api/predict/batch",
+        json={"texts": ["win a prize", "free stuff", "hello there"]},
+    )
+    assert response.status_code == 200
+    # The test client defers close callbacks until the response is closed.
+    response.close()
+    scorer.join()
+
+    assert scorer.session.calls == 1
+    stats = client.get("/api/metrics", headers={"X-Admin-Token": "secret"}).get_json()[
+        "shadow"
+    ]
+    assert stats["active"] and stats["version"] == "v2"
+    assert stats["scored"] == 3
+    # "free stuff" is spam for the primary model but not the candidate.
+    assert stats["agreement_rate"] == pytest.approx(2 / 3)
+    assert stats["abs_delta_max"] == pytest.approx(0.7)
+    assert stats["shadow_latency_ms_per_message"] >= 0.0
+
+
+def test_shadow_sheds_when_server_is_busy(scorer, client, app: Flask) -> None:
+    with app.app_context():
+        limiter = admission.get_limiter()
+    # One slot short of the limit, so the primary request is still admitted.
+    limiter._inflight = limiter.limit - 1
+
+    client.post("/api/predict", json={"text": "win a prize"}).close()
+
+    assert shadow._STATS["shed_busy"] == 1
+    assert shadow._STATS["sampled"] == 0
+
+
+def test_shadow_sheds_when_queue_is_full() -> None:
+    candidate = CandidateSession()
+    scorer = shadow.ShadowScorer(lambda: candidate, "v2", workers=0, max_queue=1)
+    before = shadow._STATS["shed_queue"]
+
+    assert scorer.submit(["a"], [0.2], 0.001)
+    assert not scorer.submit(["b"], [0.2], 0.001)
+    assert shadow._STATS["shed_queue"] == before + 1
+    assert scorer.busy(AdaptiveLimiter(initial_limit=4)) is False
+
+
+def test_shadow_model_loads_off_the_request_path(monkeypatch, app: Flask) -> None:
+    release = threading.Event()
+    candidate = CandidateSession()
+
+    def slow_load(base_dir, intra_op_threads=None):
+        release.wait(5)
+        return candidate, {}
+
+    monkeypatch.setattr(shadow, "load_model", slow_load)
+    monkeypatch.setattr(shadow, "_SCORER", False)
+    app.config.update(SHADOW_MODEL_VERSION="v2", SHADOW_SAMPLE_RATE=1.0)
+    with app.app_context():
+        scorer = shadow.get_scorer()
+
+    # The first request neither waits for the model nor samples before it loads.
+    assert scorer.session is None and not scorer.sample()
+    release.set()
+    assert scorer.wait_loaded(timeout=5) and scorer.sample()
+
+
+def test_shadow_mode_is_off_when_the_model_fails_to_load(
+    monkeypatch, app: Flask
+) -> None:
+    def broken_load(base_dir, intra_op_threads=None):
+        raise OSError("missing")
+
+    monkeypatch.setattr(shadow, "load_model", broken_load)
+    monkeypatch.setattr(shadow, "_SCORER", False)
+    app.config.update(SHADOW_MODEL_VERSION="v2", SHADOW_SAMPLE_RATE=1.0)
+    with app.app_context():
+        scorer = shadow.get_scorer()
+
+    assert not scorer.wait_loaded(timeout=5)
+    assert not scorer.sample()
+
+
+def test_shadow_mode_is_off_without_a_version(monkeypatch, app: Flask) -> None:
+    monkeypatch.setattr(shadow, "_SCORER", False)
+    with app.app_context():
+        assert shadow.get_scorer() is None
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import create_app, sidecar, spam
+from app.config import TestingConfig
+from tests.fixtures.fake_model import install_fake_model
+
+_real_get_pipeline_and_metadata = spam.get_pipeline_and_metadata
+
+
+class SidecarConfig(TestingConfig):
+    ADMIN_TOKEN = "sidecar-admin"
+    INFERENCE_BACKEND = "sidecar"
+    SIDECAR_RETRY_SECONDS = 0.0
+    SIDECAR_POOL_SIZE = 2
+
+
+@pytest.fixture()
+def socket_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "inference.sock")
+    monkeypatch.setattr(SidecarConfig, "SIDECAR_SOCKET", path)
+    monkeypatch.setattr(sidecar, "_CLIENT", None)
+    monkeypatch.setattr(
+        sidecar, "_CLIENT_STATS", dict.fromkeys(sidecar._CLIENT_STATS, 0)
+    )
+    return path
+
+
+@pytest.fixture()
+def server(socket_path, monkeypatch):
+    """A sidecar in this process, on its own app, scoring with the fake model."""
+
+    session = install_fake_model(monkeypatch)
+    monkeypatch.setattr(TestingConfig, "SIDECAR_BATCH_WAIT_MS", 50.0)
+    stop = threading.Event()
+    thread = threading.Thread(
+        target=sidecar.serve, args=(create_app(TestingConfig), socket_path, stop)
+    )
+    thread.start()
+    yield session
+    stop.set()
+    thread.join()
+
+
+def test_protocol_round_trip() -> None:
+    texts = ["win a free prize", b"Subject: hi\r\n\r\nraw mime", ""]
+    assert sidecar.decode_request(
+        sidecar.encode_request(sidecar.OP_SCORE_PROCESSED, texts)
+    ) == (
+        sidecar.OP_SCORE_PROCESSED,
+        texts,
+    )
+
+    body = sidecar.encode_scores([0.25, 0.9], ["win free prize", None])
+    probabilities, processed = sidecar.decode_scores(body, with_processed=True)
+    assert probabilities.tolist() == [0.25, 0.9]
+    assert processed == ["win free prize", None]
+    assert sidecar.decode_scores(body)[1] is None
+
+    with pytest.raises(sidecar.ProtocolError):
+        sidecar.decode_request(sidecar.encode_request(sidecar.OP_SCORE, ["abc"])[:-1])
+
+
+def test_workers_score_through_the_sidecar(server, socket_path) -> None:
+    app = create_app(SidecarConfig)
+    client = app.test_client()
+
+    response = client.post("/api/predict", json={"text": "win a free prize"})
+    assert response.status_code == 200
+    assert (
+        response.get_json()["prediction"] == "Spam"
+        and response.get_json()["model_version"] == "mock"
+    )
+    batch = client.post(
+        "/api/predict/batch", json={"texts": ["lunch at noon?", "free prize"]}
+    ).get_json()
+    assert batch["predictions"] == ["Not Spam", "Spam"]
+    with app.app_context():
+        probabilities, processed = spam.score_texts(
+            ["hello there", b"Subject: prize\r\n\r\nfree prize"]
+        )
+        assert probabilities.tolist() == pytest.approx([0.2, 0.9]) and all(processed)
+        # The worker takes the model's metadata from the sidecar instead of loading it.
+        assert _real_get_pipeline_and_metadata() == (None, {"version": "mock"})
+
+    stats = client.get(
+        "/api/metrics", headers={"X-Admin-Token": "sidecar-admin"}
+    ).get_json()["sidecar"]
+    assert (stats["requests"], stats["texts"], stats["fallbacks"]) == (3, 5, 0)
+    assert stats["idle_connections"] == 1  # one connection, reused for every call
+    assert stats["server"]["texts"] == 5 and stats["server"]["connections"] == 1
+
+
+def test_requests_from_many_workers_share_batches(server, socket_path) -> None:
+    clients = [sidecar.SidecarClient(socket_path, 5.0, 0.0, 1, 30.0) for _ in range(8)]
+    app = create_app(SidecarConfig)
+
+    def score(client: sidecar.SidecarClient):
+        with app.app_context():
+            return client.score(["free prize", "see you soon"])[0].tolist()
+
+    with ThreadPoolExecutor(len(clients)) as pool:
+        results = list(pool.map(score, clients))
+
+    assert results == [pytest.approx([0.9, 0.2])] * len(clients)
+    with app.app_context():
+        stats = clients[0].server_stats()
+    assert stats["requests"] == len(clients)
+    assert stats["batches"] < len(clients)
+    assert stats["connections"] == len(clients)
+    for client in clients:
+        client.close()
+
+
+def test_a_failing_request_does_not_fail_its_batch(server, socket_path) -> None:
+    score = server.run
+
+    def run(output_names, inputs):
+        if any("poison" in row[0] for row in inputs["input"]):
+            raise ValueError("cannot score this")
+        return score(output_names, inputs)
+
+    server.run = run
+    clients = [sidecar.SidecarClient(socket_path, 5.0, 30.0, 1, 30.0) for _ in range(2)]
+    app = create_app(SidecarConfig)
+
+    def call(args):
+        client, texts = args
+        with app.app_context():
+            return client.score(texts)
+
+    with ThreadPoolExecutor(2) as pool:
+        good, bad = pool.map(
+            call, [(clients[0], ["free prize"]), (clients[1], ["poison pill"])]
+        )
+
+    assert good[0].tolist() == pytest.approx([0.9])
+    # The poisoned request falls back in-process, but the sidecar stays in use.
+    assert bad is None
+    assert all(client.available() for client in clients)
+    assert sidecar._CLIENT_STATS["errors"] == 1
+    assert sidecar._CLIENT_STATS["failures"] == 0
+    with app.app_context():
+        assert clients[0].server_stats()["errors"] == 1
+    for client in clients:
+        client.close()
+
+
+def test_falls_back_in_process_when_sidecar_is_down(socket_path, monkeypatch) -> None:
+    session = install_fake_model(monkeypatch)
+    # In fallback the worker loads the model itself; the fake stands in for that.
+    app = create_app(SidecarConfig)
+    client = app.test_client()
+
+    response = client.post("/api/predict", json={"text": "free prize"})
+    assert response.status_code == 200 and response.get_json()["prediction"] == "Spam"
+    assert session.calls == 1
+
+    stats = client.get(
+        "/api/metrics", headers={"X-Admin-Token": "sidecar-admin"}
+    ).get_json()["sidecar"]
+    assert (
+        stats["fallbacks"] >= 1 and stats["failures"] >= 1 and stats["server"] is None
+    )
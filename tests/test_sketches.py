@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import json
+import random
+import time
+
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from app import create_app, sketches
+from app.config import TestingConfig
+from app.sketches import BASELINE_FILENAME, HyperLogLog, TrafficStats, build_baseline
+from app.spam import transform_text
+from tests.fixtures.fake_model import install_fake_model
+
+
+def _stream(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    words = [f"word{index}" for index in range(500)]
+    texts = [" ".join(rng.choices(words, k=12)) for _ in range(count)]
+    return texts, [rng.random() for _ in texts], texts
+
+
+def test_merged_halves_equal_one_pass() -> None:
+    texts, probabilities, processed = _stream(400)
+    whole, first, second = TrafficStats(), TrafficStats(), TrafficStats()
+    whole.observe(texts, probabilities, processed)
+    first.observe(texts[:150], probabilities[:150], processed[:150])
+    second.observe(texts[150:], probabilities[150:], processed[150:])
+
+    first.merge(TrafficStats.from_dict(json.loads(json.dumps(second.to_dict()))))
+
+    assert first.messages == whole.messages == 400
+    assert first.tokens == whole.tokens
+    assert first.histogram.counts == whole.histogram.counts
+    assert (first.heavy_hitters.sketch.table == whole.heavy_hitters.sketch.table).all()
+    assert first.texts.registers == whole.texts.registers
+    assert [token for token, _ in first.heavy_hitters.top(10)] == [
+        token for token, _ in whole.heavy_hitters.top(10)
+    ]
+
+
+def test_hyperloglog_estimates_distinct_counts() -> None:
+    small, large = HyperLogLog(), HyperLogLog()
+    for index in range(50):
+        small.add(f"user{index}@example.com")
+        small.add(f"user{index}@example.com")
+    for index in range(50_000):
+        large.add(f"message {index}")
+
+    assert abs(small.count() - 50) < 2
+    assert abs(large.count() - 50_000) / 50_000 < 0.05
+
+
+def test_heavy_hitters_find_a_campaign_in_background_traffic() -> None:
+    texts, probabilities, processed = _stream(2000)
+    campaign = ["claim your crypto bonus now"] * 150
+    stats = TrafficStats()
+    stats.observe(
+        texts[:1000] + campaign + texts[1000:],
+        probabilities[:1000] + [0.99] * 150 + probabilities[1000:],
+        processed[:1000] + campaign + processed[1000:],
+    )
+
+    top = {token for token, _ in stats.heavy_hitters.top(5)}
+    assert {"claim", "your", "crypto", "bonus", "now"} <= top
+    estimate = dict(stats.heavy_hitters.top())["crypto"]
+    assert 150 <= estimate <= 150 + stats.tokens // 500
+
+
+def test_psi_and_quantiles() -> None:
+    reference, same, shifted = TrafficStats(), TrafficStats(), TrafficStats()
+    reference.histogram.add([index / 1000 for index in range(1000)])
+    same.histogram.add([index / 500 for index in range(500)])
+    shifted.histogram.add([0.95] * 500)
+
+    assert same.histogram.psi(reference.histogram) < 0.01
+    assert shifted.histogram.psi(reference.histogram) > 0.25
+    assert same.histogram.quantile(0.5) == pytest.approx(0.5, abs=0.05)
+    assert TrafficStats().histogram.quantile(0.5) is None
+
+
+class StatsConfig(TestingConfig):
+    ADMIN_TOKEN = "stats-admin"
+    STATS_ENABLED = True
+    STATS_FLUSH_SECONDS = 0.0
+
+
+@pytest.fixture()
+def stats_app(monkeypatch, tmp_path, sample_dataset):
+    texts = sample_dataset[0] * 10
+    processed = [transform_text(text) for text in texts]
+    vectorizer = TfidfVectorizer().fit(processed)
+    baseline = build_baseline(texts, processed, [0.2] * len(texts), vectorizer)
+    (tmp_path / BASELINE_FILENAME).write_text(json.dumps(baseline), encoding="utf-8")
+
+    monkeypatch.setattr(StatsConfig, "MODEL_DIR", tmp_path)
+    monkeypatch.setattr(StatsConfig, "STATS_DIR", str(tmp_path / "stats"))
+    install_fake_model(monkeypatch)
+    sketches.reset()
+    yield create_app(StatsConfig)
+    sketches.reset()
+
+
+def test_traffic_endpoint_reports_drift_across_workers(stats_app, tmp_path) -> None:
+    client = stats_app.test_client()
+    headers = {"X-Admin-Token": "stats-admin"}
+    campaign = "claim your zorblax tokens at zorblax dot example"
+    for index in range(12):
+        assert (
+            client.post(
+                "/api/predict",
+                json={"text": campaign, "sender": f"bot{index}@example.com"},
+            ).status_code
+            == 200
+        )
+    client.post(
+        "/api/predict/batch", json={"texts": ["see you at lunch", "free prize inside"]}
+    )
+
+    # Another worker's flushed window, and a file left by a worker long gone.
+    with stats_app.app_context():
+        window_id = sketches._window_id()
+    other = TrafficStats()
+    other.observe(["quarterly report attached"], [0.1], ["quarterli report attach"])
+    stats_dir = tmp_path / "stats"
+    (stats_dir / "other-1.json").write_text(
+        json.dumps({"windows": {str(window_id): other.to_dict()}})
+    )
+    (stats_dir / "gone-2.json").write_text(
+        json.dumps({"windows": {str(window_id - 5): other.to_dict()}})
+    )
+
+    report = client.get("/api/traffic", headers=headers).get_json()
+
+    assert (report["messages"], report["workers"], report["baseline"]) == (15, 2, True)
+    assert report["distinct_texts"] == 4
+    assert report["distinct_senders"] == 12
+    assert report["heavy_hitters"][0] == {"token": "zorblax", "count": 24}
+    assert 0 < report["oov_ratio"] < 1
+    assert report["drift"]["probability_psi"] > 0
+    assert "zorblax" in [item["token"] for item in report["drift"]["emerging_tokens"]]
+    assert not (stats_dir / "gone-2.json").exists()
+
+    previous = client.get("/api/traffic?window=previous", headers=headers).get_json()
+    assert previous["messages"] == 0 and previous["window"]["complete"] is True
+    assert client.get("/api/traffic").status_code == 403
+    assert client.get("/api/traffic?window=last", headers=headers).status_code == 400
+    assert (
+        client.post("/api/predict", json={"text": "hi", "sender": 5}).status_code == 400
+    )
+
+
+def test_disabled_stats_record_nothing(client, monkeypatch) -> None:
+    install_fake_model(monkeypatch)
+    sketches.reset()
+    client.post("/api/predict", json={"text": "win a free prize"})
+
+    with client.application.app_context():
+        stats, workers = sketches.collect(sketches._window_id(time.time()))
+    assert (stats.messages, workers) == (0, 0)
@@ -4,6 +4,7 @@ import pickle
 
 from flask import Flask
 
+from app import cascade
 from app import spam as spam_module
 from app.spam import transform_text
 
@@ -54,7 +55,6 @@ def test_load_pickle_roundtrip(tmp_path) -> None:  # type: ignore[override]
     assert loaded["value"] == 1
 
 
-
 def test_get_pipeline_and_metadata_raises_if_missing(tmp_path, app: Flask) -> None:  # type: ignore[override]
     from app.spam import get_pipeline_and_metadata
 
@@ -68,3 +68,31 @@ def test_get_pipeline_and_metadata_raises_if_missing(tmp_path, app: Flask) -> No
             return
 
         assert False, "Expected FileNotFoundError when model pipeline is missing"
+
+
+def test_get_pipeline_and_metadata_reloads_published_model(
+    tmp_path, monkeypatch, app: Flask
+) -> None:
+    loads = []
+
+    def fake_load_model(base_dir):  # type: ignore[override]
+        loads.append(base_dir)
+        return object(), {"version": f"v{len(loads)}"}
+
+    monkeypatch.setattr(spam_module, "load_model", fake_load_model)
+    monkeypatch.setattr(spam_module, "_SESSION", None)
+    (tmp_path / "metadata.json").write_text("{}")
+
+    with app.app_context():
+        app.config["MODEL_DIR"] = tmp_path
+        app.config["MODEL_RELOAD_SECONDS"] = 0.001
+
+        assert spam_module.get_pipeline_and_metadata()[1]["version"] == "v1"
+        monkeypatch.setattr(spam_module, "_MODEL_CHECKED_AT", 0.0)
+        assert spam_module.get_pipeline_and_metadata()[1]["version"] == "v1"
+
+        (tmp_path / "model.onnx").write_bytes(b"new")
+        monkeypatch.setattr(spam_module, "_MODEL_CHECKED_AT", 0.0)
+        monkeypatch.setattr(cascade, "_FIRST_STAGE", "stale first stage")
+        assert spam_module.get_pipeline_and_metadata()[1]["version"] == "v2"
+        assert cascade._FIRST_STAGE is False
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import io
+import json
+import time
+
+from app import admission, streaming
+from app.admission import AdaptiveLimiter
+from tests.fixtures.fake_model import install_fake_model
+
+
+def _ndjson(lines) -> bytes:
+    return b"".join(json.dumps(line).encode() + b"\n" for line in lines)
+
+
+def test_stream_scores_items_in_batches_and_preserves_order(
+    monkeypatch, client, app
+) -> None:
+    session = install_fake_model(monkeypatch)
+    app.config["STREAM_BATCH_SIZE"] = 2
+    body = _ndjson(
+        [{"id": "a", "text": "win a prize"}, "hello friend", {"text": "free offer"}]
+    )
+
+    response = client.post(
+        "/api/predict/stream", data=body, content_type="application/x-ndjson"
+    )
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    assert response.headers["X-Model-Version"] == "mock"
+    results = [json.loads(line) for line in response.data.splitlines()]
+    assert [r["line"] for r in results] == [1, 2, 3]
+    assert results[0]["id"] == "a"
+    assert [r["prediction"] for r in results] == ["Spam", "Not Spam", "Spam"]
+    assert session.calls == 2
+
+
+def test_stream_reports_invalid_lines_without_aborting(monkeypatch, client) -> None:
+    install_fake_model(monkeypatch)
+    body = b'not json\n\n{"text": ""}\n"win big"\n'
+
+    response = client.post("/api/predict/stream", data=body)
+
+    results = [json.loads(line) for line in response.data.splitlines()]
+    assert [r.get("error") is not None for r in results] == [True, True, False]
+    assert results[2]["line"] == 4
+
+
+def test_overlong_lines_are_drained_and_reported() -> None:
+    stream = io.BytesIO(b"x" * 50 + b"\n" + b'"ok"\n')
+
+    lines = list(streaming.iter_lines(stream, max_line_bytes=10))
+
+    assert lines == [(1, None), (2, b'"ok"')]
+
+
+def test_closing_the_stream_stops_reading_input(monkeypatch, app) -> None:
+    session = install_fake_model(monkeypatch)
+    stream = io.BytesIO(_ndjson(["spam"] * 10))
+
+    with app.app_context():
+        results = streaming.score_stream(
+            stream, batch_size=2, max_line_bytes=1024, max_text_length=100
+        )
+        next(results)
+        results.close()
+
+    assert session.calls == 1
+    assert stream.tell() < len(stream.getvalue())
+
+
+def test_shed_batches_are_retried_instead_of_failing(monkeypatch, app) -> None:
+    install_fake_model(monkeypatch)
+    limiter = AdaptiveLimiter(initial_limit=1, max_limit=1)
+    monkeypatch.setattr(admission, "_LIMITER", limiter)
+    attempts = iter([False, True])
+    monkeypatch.setattr(limiter, "try_acquire", lambda: next(attempts))
+    monkeypatch.setattr(streaming, "_OVERLOAD_BACKOFF_SECONDS", 0)
+
+    with app.app_context():
+        chunks = list(streaming.score_stream(io.BytesIO(b'"spam"\n'), 8, 1024, 100))
+
+    assert json.loads(chunks[0])["prediction"] == "Spam"
+
+
+def test_shed_batches_stop_retrying_at_the_deadline(monkeypatch, app) -> None:
+    session = install_fake_model(monkeypatch)
+    limiter = AdaptiveLimiter(initial_limit=1, max_limit=1)
+    monkeypatch.setattr(admission, "_LIMITER", limiter)
+    monkeypatch.setattr(limiter, "try_acquire", lambda: False)
+    monkeypatch.setattr(streaming, "_OVERLOAD_BACKOFF_SECONDS", 1.0)
+    stream = io.BytesIO(b'"spam"\n')
+
+    with app.app_context():
+        started = time.time()
+        deadline = started + 0.05
+        chunks = list(streaming.score_stream(stream, 8, 1024, 100, deadline))
+
+    assert chunks == [b'{"error":"Request deadline exceeded."}\n']
+    assert session.calls == 0
+    # The back-off is cut short at the deadline.
+    assert time.time() - started < 0.5
+
+
+def test_shed_batches_give_up_after_max_attempts(monkeypatch, app) -> None:
+    install_fake_model(monkeypatch)
+    limiter = AdaptiveLimiter(initial_limit=1, max_limit=1)
+    monkeypatch.setattr(admission, "_LIMITER", limiter)
+    # Shed for the first batch's three attempts, admitted for the second.
+    attempts = iter([False, False, False, True])
+    monkeypatch.setattr(limiter, "try_acquire", lambda: next(attempts))
+    monkeypatch.setattr(streaming, "_OVERLOAD_BACKOFF_SECONDS", 0)
+
+    with app.app_context():
+        chunks = list(
+            streaming.score_stream(io.BytesIO(b'"spam"\n"hello"\n'), 1, 1024, 100)
+        )
+
+    shed, scored = (json.loads(chunk) for chunk in chunks)
+    assert shed == {
+        "line": 1,
+        "error": "Server is overloaded. Please retry later.",
+        "status": 503,
+    }
+    assert scored["line"] == 2 and scored["prediction"] == "Not Spam"